@@ -23,7 +23,7 @@ import tempfile
 import re
 from logging.handlers import SysLogHandler
 from subprocess import Popen, PIPE, STDOUT
-from time import sleep
+from time import sleep, time
 
 import pwd
 import syslog
@@ -463,18 +463,36 @@ class Dbsnapshots(RPCAgent):
 
         syslog_info('Executing {0}'.format(log_command))
 
+        started = time()
         try:
             _stdout = self.exec_command(vjbackup_cmd, sudo='versant',
                                         environ=environ, use_shell=True)
         except IOError as error:
             syslog_error("Received Error Output: {0}".format(str(error)))
             return self.get_return_struct(1, stderr=str(error))
+        frozen = time() - started
         _stdout_log = re.sub(r'--password=.*? ',
                              '--password=****** ',
                              _stdout)
 
         syslog_info("Received Output: {0}".format(_stdout_log))
-        return self.get_return_struct(0, stdout=_stdout_log)
+        syslog_info('Versant split for {0:.1f} seconds'.format(frozen))
+        return self.get_frozen_struct(frozen, stdout=_stdout_log)
+
+    def get_frozen_struct(self, frozen, stdout=''):
+        """
+        Construct the MCO response of a snapshot taken with the database
+        frozen
+        :param frozen: Seconds the database was frozen for, as measured on
+        this node around the command that freezes, snaps and thaws it
+        :type frozen: float
+        :param stdout: Any STDOUT from the MCO action.
+        :returns: A struct that can be returned to whom ever called the action.
+        :rtype: dict
+        """
+        struct = self.get_return_struct(0, stdout=stdout)
+        struct['frozen'] = '{0:.1f}'.format(frozen)
+        return struct
 
     def get_mysql_db_psw(self, psw_key, kfile, prop_file=GLOBAL_PROP_FILE):
         """
@@ -577,8 +595,12 @@ class Dbsnapshots(RPCAgent):
                                  logstring)
 
             syslog_info('Snapping MySQL LUN with: {0}'.format(logstring))
+            started = time()
             stdout = self.exec_command(lock_snap_cmd_str, use_shell=True)
+            frozen = time() - started
             syslog_info('MySQL Snap Output: {0}'.format(stdout))
+            syslog_info('MySQL tables locked for {0:.1f} '
+                        'seconds'.format(frozen))
             if 'FAILED_SNAP_COMMAND' in stdout:
                 # If the system command fails then the mysql cli will still
                 # exit zero so check the output for the failed shell command
@@ -587,7 +609,7 @@ class Dbsnapshots(RPCAgent):
             else:
                 msg = 'Snapped LUN {0}/{1}'.format(dblun, snap_name)
                 syslog_info(msg)
-                return self.get_return_struct(0, stdout=msg)
+                return self.get_frozen_struct(frozen, stdout=msg)
         except IOError as error:
             return self.get_return_struct(1, stderr=str(error))
 
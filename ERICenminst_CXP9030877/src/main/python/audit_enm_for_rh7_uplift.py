@@ -16,10 +16,11 @@ ENM model auditor for RHEL 7.x uplift.
 
 import os
 import sys
-import time
 import hashlib
 import platform
+import signal
 import subprocess
+import threading
 import xml.etree.ElementTree as ET
 from collections import defaultdict
 from argparse import ArgumentParser, RawTextHelpFormatter
@@ -69,67 +70,12 @@ class EnmAuditForUplift(object):
 
     remove_scriptlet = 'audit_enm_for_rh7_uplift.remove_items'
 
-    class Timeout(object):
-        """
-        Class to manage a timer/timeout
-        """
-        def __init__(self, seconds):
-            """
-            Initialise a new Timeout
-            :param seconds: Seconds for which this Timeout should run
-            :type seconds: int
-            """
-            self._wait_for = seconds
-            self._start_time = EnmAuditForUplift.Timeout.get_cur_time()
-
-        @staticmethod
-        def get_cur_time():
-            """
-            Get the current (integer) time
-            :return: Current time
-            :rtype: int
-            """
-            return time.time()
-
-        @staticmethod
-        def take_a_nap(secs):
-            """
-            Nap/sleep for a fixed time
-            :param secs: nap interval
-            :type secs: int
-            :return: None
-            """
-            time.sleep(secs)
-
-        def has_time_elapsed(self):
-            """
-            Check if the maximum Timeout time has elapsed
-            :return: Boolean True if Timeout seconds have elapsed
-            """
-            return self.get_time_elapsed() >= self._wait_for
-
-        def get_time_elapsed(self):
-            """
-            Get the time difference between now and start of Timeout
-            :return: Time difference
-            :rtype: int
-            """
-            return int(EnmAuditForUplift.Timeout.get_cur_time() -
-                       self._start_time)
-
-        def get_remaining_time(self):
-            """
-            Get the time remaining in this Timeout
-            :return: Time remaining
-            :rtype: int
-            """
-            return int(self._wait_for - self.get_time_elapsed())
-
     def __init__(self):
         self.cleanup_required = True
         self.gen_reportfile = True
         self.all_inherit_types = []
         self.srcs_ref_counts = {}
+        self.model_items = {}
         self.models_yum_repo_rpmnames = None
         self.removable_items = None
 
@@ -148,32 +94,45 @@ class EnmAuditForUplift(object):
         :rtype: 2-tuple: int, string
         """
 
-        stdout = ''
+        # The output is read while the command runs, a command filling the
+        # pipe would otherwise never exit. This script runs standalone so
+        # it does not use h_util.h_process.
         proc = None
-
-        timeout = EnmAuditForUplift.Timeout(timeout_secs)
+        lines = []
 
         try:
-            proc = subprocess.Popen(cmd,
-                                    stdout=subprocess.PIPE,
-                                    stderr=subprocess.STDOUT,
-                                    shell=True)
+            with open(os.devnull) as devnull:
+                proc = subprocess.Popen(cmd,
+                                        stdin=devnull,
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT,
+                                        shell=True,
+                                        close_fds=True,
+                                        preexec_fn=os.setpgrp)
         except OSError as oe_err:
             msg = ('Error processing command {0}, {1}, {2}\n'
                    .format(cmd, oe_err.errno, oe_err.strerror))
             sys.stderr.write(msg)
             sys.exit(1)
 
-        while proc.poll() is None and not timeout.has_time_elapsed():
-            timeout.take_a_nap(0.5)
+        reader = threading.Thread(
+            target=lambda: lines.extend(iter(proc.stdout.readline, '')))
+        reader.daemon = True
+        reader.start()
+        reader.join(timeout_secs)
 
-        if proc.poll() is None and timeout.has_time_elapsed():
+        if reader.is_alive():
+            # Kill the command and anything it started
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
             msg = 'Command timed out, {0}\n'.format(cmd)
             sys.stderr.write(msg)
             sys.exit(1)
 
-        stdout, _ = proc.communicate()
-        cleaned_stdout = stdout.strip()
+        proc.wait()
+        cleaned_stdout = ''.join(lines).strip()
 
         return proc.returncode, cleaned_stdout
 
@@ -546,60 +505,16 @@ For more information, contact your local Ericsson support team.
         :return 2-tuple ItemType and vpath
         :rtype: 2-tuple (string, string)
         """
-        (itype, vpath) = entry.split('::', 2)
+        (itype, vpath) = entry.split('::', 1)
         return itype, vpath
 
-    # pylint: disable=R0913
-    def _iter_by_itype(self, element, itype, vpath, it_items, ref_counts):
-        """
-        Iterate by recursing over XML elements,
-        identifying items by ItemType.
-        :param element: Current XML element
-        :type element: ``xml.etree.ElementTree.Element``
-        :param itype: ItemType
-        :type itype: string
-        :param vpath: LITP vpath [suffix]
-        :type vpath: string
-        :param it_items: Cumulative set of items
-        :type it_items: set
-        :param ref_counts: reference counts by vpath
-        :type ref_counts: dict
-        :return: None
-        """
-        if (not element.tag or
-            not element.tag.startswith(EnmAuditForUplift.namespace)):
-            return
-
-        full_path = vpath
-        element_id = element.get('id')
-        if element_id:
-            full_path = vpath + '/' + element_id
-
-        if ref_counts != None:
-            element_src = element.get('source_path')
-            if element_src:
-                if element_src not in ref_counts.keys():
-                    ref_counts[element_src] = 0
-                ref_counts[element_src] += 1
-
-        if itype:
-            if element.tag == EnmAuditForUplift._gen_itype_name(itype):
-                it_items.add(full_path)
-        else:
-            it_items.add(EnmAuditForUplift._encode_item(element.tag,
-                                                        full_path))
-
-        for child in element.getchildren():
-            self._iter_by_itype(child, itype, full_path, it_items, ref_counts)
-
     @staticmethod
-    def _get_xml_root(xml_file):
+    def _assert_xml_file(xml_file):
         """
-        Get root element for XML document
+        Check an XML document exists, exit if it does not
         :param xml_file: XML file absolute path
         :type xml_file: string
-        :return: Root XML element
-        :rtype: ``xml.etree.ElementTree.Element``
+        :return: None
         """
         if not os.path.exists(xml_file):
             msg = 'File "{0}" does not exist\n'.format(xml_file)
@@ -609,8 +524,75 @@ For more information, contact your local Ericsson support team.
         msg = "Processing {0} ...\n".format(xml_file)
         sys.stdout.write(msg)
 
-        tree = ET.parse(xml_file)
-        return tree.getroot()
+    def _scan_xml_file(self, xml_file, ref_counts=None):
+        """
+        Get all the items of an XML [model] file in a single streaming
+        pass. Each element is dropped once parsed so memory use does not
+        grow with the size of the model.
+        Only LITP elements below the root element are items; elements
+        in other namespaces, and everything below them, are skipped.
+        :param xml_file: XML file absolute path
+        :type xml_file: string
+        :param ref_counts: reference counts by vpath, updated if not None
+        :type ref_counts: dict
+        :return: set of encoded items (ItemType and vpath)
+        :rtype: set
+        """
+        EnmAuditForUplift._assert_xml_file(xml_file)
+
+        items = set()
+        # vpath of each open element, None below elements that are not items
+        vpaths = []
+        parents = []
+        for event, element in ET.iterparse(xml_file,
+                                           events=('start', 'end')):
+            if event == 'start':
+                if not parents:
+                    vpath = ''
+                elif (vpaths[-1] is None or not element.tag or
+                      not element.tag.startswith(
+                          EnmAuditForUplift.namespace)):
+                    vpath = None
+                else:
+                    vpath = vpaths[-1]
+                    element_id = element.get('id')
+                    if element_id:
+                        vpath = vpath + '/' + element_id
+
+                    if ref_counts != None:
+                        element_src = element.get('source_path')
+                        if element_src:
+                            ref_counts[element_src] = \
+                                ref_counts.get(element_src, 0) + 1
+
+                    items.add(EnmAuditForUplift._encode_item(element.tag,
+                                                             vpath))
+                vpaths.append(vpath)
+                parents.append(element)
+            else:
+                vpaths.pop()
+                parents.pop()
+                element.clear()
+                if parents:
+                    # The earlier siblings are already gone, this is the
+                    # only child left
+                    parents[-1].remove(element)
+        return items
+
+    def _get_model_items(self, xml_file):
+        """
+        Get the items of an XML [model] file with its source_path
+        reference counts. The file is scanned on first use only.
+        :param xml_file: XML file absolute path
+        :type xml_file: string
+        :return: 2-tuple set of encoded items, reference counts by vpath
+        :rtype: 2-tuple (set, dict)
+        """
+        if xml_file not in self.model_items:
+            ref_counts = {}
+            items = self._scan_xml_file(xml_file, ref_counts)
+            self.model_items[xml_file] = (items, ref_counts)
+        return self.model_items[xml_file]
 
     def _process_xml_file(self, xml_file):
         """
@@ -620,16 +602,14 @@ For more information, contact your local Ericsson support team.
         :return: dictionary keyed on ItemType, values are sets of item vpaths.
         :rtype: dict
         """
-        root = EnmAuditForUplift._get_xml_root(xml_file)
-
         model_data = {}
 
-        for itype in EnmAuditForUplift.itemtypes:
-            it_items = set()
-            for child in root.getchildren():
-                self._iter_by_itype(child, itype, '', it_items, None)
-            if it_items:
-                model_data[itype] = it_items
+        for entry in self._get_model_items(xml_file)[0]:
+            (itype, vpath) = EnmAuditForUplift._decode_item(entry)
+            if itype in EnmAuditForUplift.itemtypes:
+                if itype not in model_data:
+                    model_data[itype] = set()
+                model_data[itype].add(vpath)
 
         return model_data
 
@@ -655,30 +635,12 @@ For more information, contact your local Ericsson support team.
         :return: set of custom items
         :rtype: set
         """
-        all_items = []
-
-        for (mfile, ref_counts) in \
-                       ((EnmAuditForUplift.model_file2, self.srcs_ref_counts),
-                        (EnmAuditForUplift.model_file1, None)):
-            root = self._get_xml_root(mfile)
-            all_items.append(self._get_all_items(root, ref_counts))
+        items2, ref_counts = self._get_model_items(
+                                               EnmAuditForUplift.model_file2)
+        self.srcs_ref_counts.update(ref_counts)
+        items1, _ = self._get_model_items(EnmAuditForUplift.model_file1)
 
-        return all_items[0] - all_items[1]
-
-    def _get_all_items(self, root_element, ref_counts):
-        """
-        Get all children XML elements / item from a given XML root
-        :param root_element: XML doc root element
-        :type root_element: ``xml.etree.ElementTree.Element``
-        :param ref_counts: reference counts by vpath
-        :type ref_counts: dict
-        :return: complete set of items in XML "tree"
-        :rtype: set
-        """
-        items = set()
-        for child in root_element.getchildren():
-            self._iter_by_itype(child, None, '', items, ref_counts)
-        return items
+        return items2 - items1
 
     def _hndl_removable_item(self, itype, vpath):
         """
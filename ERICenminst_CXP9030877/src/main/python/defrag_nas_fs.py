@@ -12,13 +12,34 @@ NAS filesystem defrag script
 ##############################################################################
 
 import logging
+import os
+from collections import deque
+from multiprocessing.pool import ThreadPool
+from Queue import Empty, Queue
+
+from simplejson import dump, load
 
 from h_litp.litp_rest_client import LitpRestClient
 from h_logging.enminst_logger import init_enminst_logging
 from h_logging.enminst_logger import set_logging_level
 from litp.core.base_plugin_api import BasePluginApi
 from litp.core.model_manager import ModelManager
-from h_util.h_utils import create_ssh_client
+from h_util.h_utils import create_ssh_client, read_enminst_config
+
+FSADM = '/opt/VRTS/bin/fsadm -t vxfs -T {0} -d {1}'
+# One sample of the NAS load: number of CPUs, load averages and the vmstat
+# counters over one second
+LOAD_COMMAND = 'nproc; cat /proc/loadavg; vmstat 1 2'
+# Seconds to wait before sampling the NAS load again when it is too high
+LOAD_BACKOFF = 60
+PROGRESS_FILE = 'defrag_nas_fs_progress.json'
+# Output lines kept to report a failed command whose output is streamed
+ERROR_LINES = 20
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_FS_TIME = 3600
+DEFAULT_MAX_LOAD = 1.0
+DEFAULT_MAX_IOWAIT = 30
 
 
 def disconnect(ssh):
@@ -30,23 +51,35 @@ def disconnect(ssh):
     ssh.close()
 
 
-def nas_command(ssh, command):
+def nas_command(ssh, command, callback=None):
     """
     Execute a command on remote system
     :param ssh: An instance reference to paramiko.SSHClient
     :type ssh: SSHClient
     :param command: A Command to be executed
     :type command: str
-    :return: Return code, Command output
+    :param callback: Called with each output line as it arrives, the lines
+    are then not kept in the returned output, only the last ERROR_LINES are
+    kept to report a failure
+    :type callback: callable
+    :return: Return code, Command output (stdout and stderr)
     :rtype: list
     """
-    _, stdout, stderr = ssh.exec_command(command)
+    _, stdout, _ = ssh.exec_command(command)
+    # stderr is read with stdout: a command filling the stderr window while
+    # only stdout is read would stall
+    stdout.channel.set_combine_stderr(True)
+    if callback:
+        output = deque(maxlen=ERROR_LINES)
+        for line in stdout:
+            callback(line.strip())
+            output.append(line.strip())
+    else:
+        output = [line.strip() for line in stdout.readlines()]
     retcode = stdout.channel.recv_exit_status()
     if retcode != 0:
-        err = [line.strip() for line in stderr.readlines()]
-        raise NasCommandException(err)
-    output = [line.strip() for line in stdout.readlines()]
-    return retcode, output
+        raise NasCommandException(list(output))
+    return retcode, [] if callback else output
 
 
 class NasCommandException(Exception):
@@ -54,6 +87,97 @@ class NasCommandException(Exception):
     pass
 
 
+def parse_nas_load(output):
+    """
+    Get the load of the NAS from the output of LOAD_COMMAND
+    :param output: The command output lines
+    :type output: list
+    :return: 1 minute load average per CPU and IO wait percentage, None if
+    the output could not be parsed
+    :rtype: tuple
+    """
+    try:
+        cpus = int(output[0])
+        load_avg = float(output[1].split()[0])
+        header = [line.split() for line in output if 'wa' in line.split()]
+        iowait = int(output[-1].split()[header[-1].index('wa')])
+    except (IndexError, ValueError):
+        return None
+    return load_avg / max(cpus, 1), iowait
+
+
+class DefragProgress(object):
+    """
+    The file systems of each NAS already defragmented in the current cycle,
+    kept in a file so an interrupted job skips them when run again. A cycle
+    ends once every file system of the NAS has been defragmented.
+    """
+
+    def __init__(self, filename):
+        """
+        :param filename: The progress file
+        :type filename: str
+        """
+        self.log = logging.getLogger('enminst')
+        self.filename = filename
+        self.done = {}
+        if os.path.exists(filename):
+            try:
+                with open(filename) as _reader:
+                    self.done = load(_reader)
+            except (IOError, ValueError) as error:
+                self.log.warning('Ignoring defrag progress file {0}: '
+                                 '{1}'.format(filename, error))
+
+    def remaining(self, nas, filesystems):
+        """
+        The file systems of a NAS still to be defragmented in the current
+        cycle, a new cycle is started if they were all done
+        :param nas: The NAS (sfs-service) id
+        :type nas: str
+        :param filesystems: All the file systems to defragment
+        :type filesystems: list
+        :return: The file systems to defragment
+        :rtype: list
+        """
+        done = self.done.get(nas, {})
+        todo = [filesystem for filesystem in filesystems
+                if filesystem not in done]
+        if todo and done:
+            self.log.info('Resuming defragmentation, {0} file system(s) '
+                          'already done in this cycle: {1}'.format(
+                                len(done), ', '.join(sorted(done))))
+        return todo or list(filesystems)
+
+    def completed(self, nas, filesystem, status):
+        """
+        Record a file system as done in the current cycle
+        :param nas: The NAS (sfs-service) id
+        :param filesystem: The file system
+        :param status: 'ok' or 'failed'
+        """
+        self.done.setdefault(nas, {})[filesystem] = status
+        self.save()
+
+    def finished(self, nas):
+        """
+        End the cycle of a NAS, its next job starts on all file systems
+        :param nas: The NAS (sfs-service) id
+        """
+        self.done.pop(nas, None)
+        self.save()
+
+    def save(self):
+        """ Write the progress file """
+        try:
+            with open(self.filename + '.tmp', 'w') as _writer:
+                dump(self.done, _writer)
+            os.rename(self.filename + '.tmp', self.filename)
+        except (IOError, OSError) as error:
+            self.log.warning('Could not save defrag progress to {0}: '
+                             '{1}'.format(self.filename, error))
+
+
 class NasLitpModel(object):  # pylint: disable=R0903
     """
     Provide mechanism to obtain NAS information from the LITP model
@@ -103,8 +227,26 @@ class DefragNasFs(object):
     on a volume
     """
 
-    def __init__(self):
+    def __init__(self, config=None):
+        """
+        :param config: The ENMINST configuration, read if not given. The
+        NAS_DEFRAG_CONCURRENCY, NAS_DEFRAG_FS_TIME, NAS_DEFRAG_MAX_LOAD and
+        NAS_DEFRAG_MAX_IOWAIT settings are used.
+        :type config: dict
+        """
         self.log = logging.getLogger('enminst')
+        if config is None:
+            config = read_enminst_config()
+        self.concurrency = max(1, int(config.get('nas_defrag_concurrency',
+                                                 DEFAULT_CONCURRENCY)))
+        self.fs_time = int(config.get('nas_defrag_fs_time', DEFAULT_FS_TIME))
+        self.max_load = float(config.get('nas_defrag_max_load',
+                                         DEFAULT_MAX_LOAD))
+        self.max_iowait = int(config.get('nas_defrag_max_iowait',
+                                         DEFAULT_MAX_IOWAIT))
+        runtime = config.get('enminst_runtime', '/opt/ericsson/enminst/'
+                                                'runtime')
+        self.progress = DefragProgress(os.path.join(runtime, PROGRESS_FILE))
 
     def connect_to_nas(self, nasip, username, sfs_key):
         """
@@ -129,6 +271,20 @@ class DefragNasFs(object):
         self.log.info('Connected to NAS: {0}'.format(nasip))
         return ssh
 
+    def _progress(self, filesystem):
+        """
+        Callback logging the output of a defrag as it runs
+        :param filesystem: The file system being defragmented
+        :type filesystem: str
+        :return: Function logging an output line
+        :rtype: callable
+        """
+        def log_line(line):
+            """ Log a line of fsadm output """
+            if line:
+                self.log.info('{0}: {1}'.format(filesystem, line))
+        return log_line
+
     def get_nas_mounted_fs(self, ssh):
         """
         Obtain a list of mounted file systems on NAS
@@ -153,34 +309,114 @@ class DefragNasFs(object):
                 ', '.join(mounted_fs)))
         return mounted_fs
 
+    def nas_load_ok(self, ssh):
+        """
+        Check the NAS load allows another defrag to start
+        :param ssh: An instance reference to paramiko.SSHClient
+        :type ssh: SSHClient
+        :return: False if the NAS CPU or IO load is above its limit
+        :rtype: bool
+        """
+        if self.max_load <= 0 and self.max_iowait <= 0:
+            return True
+        try:
+            sample = parse_nas_load(nas_command(ssh, LOAD_COMMAND)[1])
+        except NasCommandException as err:
+            self.log.debug('Could not sample the NAS load: {0}'.format(err))
+            return True
+        if sample is None:
+            return True
+        load_avg, iowait = sample
+        if 0 < self.max_load < load_avg or 0 < self.max_iowait < iowait:
+            self.log.info('NAS load {0:.2f} per CPU, IO wait {1}%; waiting '
+                          'before starting another defrag'.format(load_avg,
+                                                                  iowait))
+            return False
+        return True
+
+    def defrag_one(self, ssh, filesystem):
+        """
+        Defragment a file system, at most for the per file system time
+        :param ssh: An instance reference to paramiko.SSHClient
+        :type ssh: SSHClient
+        :param filesystem: The file system to defragment
+        :type filesystem: str
+        :return: The file system and whether it was defragmented
+        :rtype: tuple
+        """
+        command = FSADM.format(self.fs_time, filesystem)
+        self.log.info('Executing: {0}'.format(command))
+        try:
+            nas_command(ssh, command, callback=self._progress(filesystem))
+        except Exception as err:  # pylint: disable=W0703
+            self.log.exception(err)
+            return filesystem, False
+        self.log.info('{0} defragmented successfully'.format(filesystem))
+        return filesystem, True
+
+    def defrag_filesystems(self, ssh, nas, filesystems):
+        """
+        Defragment file systems concurrently over one SSH connection.
+
+        Up to 'concurrency' defrags run at once. While the NAS load is above
+        its limit no new defrag is started unless none is running, so a
+        loaded NAS falls back to one defrag at a time.
+
+        :param ssh: An instance reference to paramiko.SSHClient
+        :type ssh: SSHClient
+        :param nas: The NAS (sfs-service) id, for the progress file
+        :type nas: str
+        :param filesystems: The file systems to defragment
+        :type filesystems: list
+        """
+        pending = self.progress.remaining(nas, filesystems)
+        finished = Queue()
+        running = 0
+        pool = ThreadPool(processes=min(self.concurrency, len(pending)))
+        try:
+            while pending or running:
+                while pending and running < self.concurrency and \
+                        (not running or self.nas_load_ok(ssh)):
+                    pool.apply_async(self.defrag_one,
+                                     args=(ssh, pending.pop(0)),
+                                     callback=finished.put)
+                    running += 1
+                try:
+                    filesystem, success = finished.get(timeout=LOAD_BACKOFF)
+                except Empty:
+                    continue
+                running -= 1
+                self.progress.completed(nas, filesystem,
+                                        'ok' if success else 'failed')
+            pool.close()
+            pool.join()
+        except KeyboardInterrupt:
+            pool.terminate()
+            raise
+        self.progress.finished(nas)
+
     def defrag_fs(self):
         """
         Execute fsadm command for each file system defined in the LITP model
         and mounted on SFS
         """
-        fsadm = '/opt/VRTS/bin/fsadm -t vxfs -T 3600 -d {0}'
         nlm = NasLitpModel()
         nas_info = nlm.get_nas_info()
         for nas in nas_info:
             ssh = self.connect_to_nas(nas_info[nas][0], nas_info[nas][1],
                                       nas_info[nas][2])
             mounted_fs = self.get_nas_mounted_fs(ssh)
+            filesystems = []
             for filesystem in nas_info[nas][-1]:
                 if filesystem in mounted_fs:
-                    command = fsadm.format(filesystem)
-                    self.log.info('Executing: {0}'.format(command))
-                    try:
-                        nas_command(ssh, command)
-                    except NasCommandException as err:
-                        self.log.exception(err)
-                    else:
-                        self.log.info('{0} defragmented successfully'.format(
-                                filesystem))
+                    filesystems.append(filesystem)
                 else:
                     self.log.info(
                             'File system {0} defined in the LITP model but '
                             'not mounted on the NAS. Skipping '
                             'defragmentation'.format(filesystem))
+            if filesystems:
+                self.defrag_filesystems(ssh, nas, filesystems)
             disconnect(ssh)
 
 
@@ -249,6 +249,7 @@ class HealthCheck(object):  # pylint: disable=R0902, R0904
         self.excluded = []
         self.neo4j_cluster = Neo4jClusterOverview()
         self.nas_type = get_nas_type(self.rest)
+        self._nas_consoles = {}
 
         if self.nas_type == 'unityxt':
             HealthCheck.STORAGE_POOL_PATH = '/infrastructure/storage/' \
@@ -534,12 +535,7 @@ class HealthCheck(object):  # pylint: disable=R0902, R0904
         nas_info = self._get_nas_info()
 
         for nas in nas_info:
-            nas_pwd = self._get_psw(nas_info[nas][2],
-                                    nas_info[nas][1],
-                                    sanitise=False)
-
-            nas_console = NasConsole(nas_info[nas][0], nas_info[nas][1],
-                                     nas_pwd)
+            nas_console = self._get_nas_console(nas, nas_info[nas])
 
             self.run_nas_audit(nas_console, nas, verbose)
 
@@ -930,8 +926,11 @@ class HealthCheck(object):  # pylint: disable=R0902, R0904
         :param nas: Info on NAS
         :param verbose: Turn on verbose logging
         """
-        retcode, stdout, stderr, _ = nas_console.exec_basic_nas_command(
-            self.NAS_AUDIT, as_master=False)
+        audit = nas_console.stream_nas_command(
+            self.NAS_AUDIT, callback=self._log_nas_audit_line, check=False)
+        stdout = list(audit)
+        retcode = audit.status
+        stderr = []
 
         report_location, failure_location = self._decode_nas_audit_output(
             stdout)
@@ -948,6 +947,14 @@ class HealthCheck(object):  # pylint: disable=R0902, R0904
         self._parse_nas_audit_response(retcode, stdout, stderr, nas_console,
                                        nas, report_location, verbose)
 
+    def _log_nas_audit_line(self, line):
+        """
+        Function Description:
+        Logs the progress of nasAudit as its output arrives
+        :param line: A line of nasAudit output
+        """
+        self.logger.debug('NAS AUDIT: {0}'.format(line.rstrip()))
+
     def _parse_nas_audit_response(self,  # pylint: disable=R0913
                                   retcode, stdout, stderr, nas_console,
                                   nas, report_location, verbose):
@@ -1496,13 +1503,9 @@ class HealthCheck(object):  # pylint: disable=R0902, R0904
         nas_fs_usage = dict()
 
         for nas in nas_info:
-            nas_pwd = self._get_psw(nas_info[nas][2],
-                                    nas_info[nas][1],
-                                    sanitise=False)
+            nas_console = self._get_nas_console(nas, nas_info[nas])
 
             if self.nas_type == 'unityxt':
-                nas_console = NasConsole(nas_info[nas][0], nas_info[nas][1],
-                                             nas_pwd, nas_type="unityxt")
 
                 nas_pool = self.rest.get_items_by_type(self.STORAGE_POOL_PATH,
                                                        'sfs-pool', [])
@@ -1525,8 +1528,6 @@ class HealthCheck(object):  # pylint: disable=R0902, R0904
 
                 return unity_fs_usage
 
-            nas_console = NasConsole(nas_info[nas][0], nas_info[nas][1],
-                                     nas_pwd)
             try:
                 output = nas_console.exec_nas_command(self.NAS_CMD_USAGE,
                                                       as_master=False)
@@ -1538,6 +1539,24 @@ class HealthCheck(object):  # pylint: disable=R0902, R0904
 
         return nas_fs_usage
 
+    def _get_nas_console(self, nas, nas_details):
+        """
+        Function Description:
+        Console of a NAS, one per NAS is shared by all the healthchecks so
+        its listings are only loaded once
+        :param nas: The NAS (sfs-service) id
+        :param nas_details: The NAS details as returned by _get_nas_info
+        :return: NasConsole
+        """
+        if nas not in self._nas_consoles:
+            nas_pwd = self._get_psw(nas_details[2], nas_details[1],
+                                    sanitise=False)
+            self._nas_consoles[nas] = NasConsole(nas_details[0],
+                                                 nas_details[1], nas_pwd,
+                                                 nas_type=self.nas_type,
+                                                 inventory=True)
+        return self._nas_consoles[nas]
+
     def _get_nas_info(self):
         """
         Function Description:
@@ -43,6 +43,10 @@ from h_snapshots.lvm_snapshot import LVMSnapshots
 from h_snapshots.san_snapshot import VNXSnap
 from h_snapshots.sfs_snapshot import SfsSnapshots
 from h_snapshots.snap_agent import SnapAgents
+from h_snapshots.snap_estimate import SnapshotDurationHistory, \
+    format_estimate
+from h_snapshots.snap_timeline import CATEGORY_NODE_POWER, \
+    CATEGORY_OPERATION, start_timeline, stop_timeline, timeline_span, traced
 from h_util import h_utils
 from h_util.h_utils import (exec_process, keyboard_interruptable,
                             read_enminst_config, ExitCodes, touch, time_delta,
@@ -80,6 +84,10 @@ ITRP_MSG = {
 
 DATA_PATH = '/ericsson/tor/data'
 
+TIMELINE_ACTIONS = ['create_snapshot', 'validate_snapshot',
+                    'restore_snapshot', 'remove_snapshot']
+ESTIMATE_ACTIONS = ['create_snapshot', 'restore_snapshot']
+
 
 def set_current_action(action):
     """
@@ -455,6 +463,7 @@ class EnmSnap(object):  # pylint: disable=R0902,R0904
                              sanitise=False)
         return self.node_cred
 
+    @traced(CATEGORY_NODE_POWER, 'shutdown_nodes')
     def shutdown_nodes(self,  # pylint: disable=R0914,R0912
                        redfish, node_cred, timeout=60):
         """
@@ -531,6 +540,7 @@ class EnmSnap(object):  # pylint: disable=R0902,R0904
                                    'return with result')
         self.logger.info('All the nodes are shut down successfully')
 
+    @traced(CATEGORY_NODE_POWER, 'power off', label='node')
     def poweroff_node(self, redfish, node, node_cred, timeout):
         """
         Power off the managed node
@@ -612,6 +622,7 @@ class EnmSnap(object):  # pylint: disable=R0902,R0904
                                      host_list=all_nodes)
         self.logger.info('All completed.')
 
+    @traced(CATEGORY_NODE_POWER, 'power on', label='node')
     def power_up_node(self,  # pylint: disable=R0913
                       redfish, node, node_cred, timeout, ignore_if_on):
         """
@@ -670,6 +681,7 @@ class EnmSnap(object):  # pylint: disable=R0902,R0904
             return True
         return False
 
+    @traced(CATEGORY_NODE_POWER, 'start_nodes')
     def start_nodes(self,  # pylint: disable=R0913,R0914,R0912
                 redfish, node_cred, timeout=60, sleeptime=1,
                 ignore_if_on=False):
@@ -1102,7 +1114,7 @@ def manage_snapshots(action,  # pylint: disable=R0913
                      lvm_snapsize=None,
                      snap_type='enminst',
                      force=False, snap_name=None, detailed=False,
-                     num_of_threads=10, log_silent=False):
+                     num_of_threads=10, log_silent=False, estimate=False):
     """
     Manage system snapshots.
 
@@ -1116,9 +1128,16 @@ def manage_snapshots(action,  # pylint: disable=R0913
     :param snap_type: The snap type, one of "all" "enminst" or "litp"
     :param num_of_threads: number of threads
     :param log_silent: disable logging to enminst log
+    :param estimate: Only estimate the duration of the action
     :return:
     """
     configure_logging(verbose, log_silent)
+    if estimate and (snap_type != 'enminst' or
+                     action not in ESTIMATE_ACTIONS):
+        get_logger().error('Option "--estimate" only supported with '
+                           '--snap_type=enminst and action '
+                           '"create_snapshot" or "restore_snapshot"')
+        raise SystemExit(ExitCodes.INVALID_USAGE)
     valid_actions = ['list_snapshot', 'remove_snapshot']
     if action != 'list_snapshot' and log_silent:
         get_logger().error('Option "--log_silent" only supported with '
@@ -1144,6 +1163,9 @@ def manage_snapshots(action,  # pylint: disable=R0913
                              s_name=snap_name, verbose=verbose,
                              log_silent=log_silent)
 
+    elif estimate:
+        estimate_enminst_snapshots(action, snap_prefix=snap_prefix,
+                                   num_of_threads=num_of_threads)
     elif snap_type == 'enminst':
         manage_enminst_snapshots(action, snap_prefix=snap_prefix,
                                  lvm_snapsize=lvm_snapsize,
@@ -1531,11 +1553,143 @@ def is_mount_option_migrated(litp):
     return False
 
 
-def manage_enminst_snapshots(action,  # pylint: disable=R0912,R0914,R0915,R0913
+def report_snapshot_timeline(timeline):
+    """
+    Log the critical path of a snapshot operation and write its timeline as
+    JSON and Chrome trace files to the enminst runtime directory.
+
+    :param timeline: The timeline recorded for the operation
+    :type timeline: SnapshotTimeline
+    """
+    for line in timeline.summary():
+        get_logger().info(line)
+    try:
+        config = read_enminst_config()
+        timeline_file, trace_file = timeline.write(config['enminst_runtime'])
+        history = SnapshotDurationHistory(config['enminst_runtime'])
+        if history.record(timeline):
+            history.save()
+    except (IOError, OSError) as error:
+        get_logger().warning('Could not write the snapshot timeline: '
+                             '{0}'.format(error))
+    else:
+        get_logger().info('Snapshot timeline written to {0} and {1}'.format(
+                timeline_file, trace_file))
+
+
+def estimate_enminst_snapshots(action,  # pylint: disable=R0914
+                               snap_prefix='Snapshot', num_of_threads=10):
+    """
+    Dry run of a create or restore: list the LUNs, NAS filesystems, LVs and
+    nodes that would be acted on and estimate how long the action would take
+    from the durations of previous runs. Nothing is changed.
+
+    :param action: create_snapshot or restore_snapshot
+    :param snap_prefix: tag in the snapshot name
+    :param num_of_threads: Max number of threads to use to perform any actions
+    """
+    config = read_enminst_config()
+    snapper = EnmSnap(config, num_of_threads=num_of_threads)
+    san_creds = snapper.get_san_cred()
+    nas_creds = snapper.get_nas_cred()
+    lvm_snapper = LVMSnapshots(snap_prefix=snap_prefix,
+                               num_of_threads=num_of_threads)
+    items = {}
+    if nas_creds:
+        nas_snapper = SfsSnapshots(nas_creds, snap_prefix,
+                                   num_of_threads=num_of_threads)
+        if action == 'create_snapshot':
+            filesystems = nas_snapper.build_fs_to_snap()
+            cache, cache_size = nas_snapper.plan_rollback_cache(filesystems)
+            if cache:
+                get_logger().info('NAS rollback cache {0}: {1}'.format(
+                        cache, cache_size or 'exists'))
+            items['nas create_snapshots'] = len(filesystems)
+        else:
+            filesystems = nas_snapper.get_snapshots_info()
+            for phase in ['nas validate', 'nas remove_sfs_shares',
+                          'nas restore_snapshots']:
+                items[phase] = len(filesystems)
+        for filesystem in sorted(filesystems):
+            get_logger().info('NAS filesystem: {0}'.format(filesystem))
+    if san_creds:
+        san_snapper = VNXSnap(san_creds, snap_prefix,
+                              num_of_threads=num_of_threads)
+        if action == 'create_snapshot':
+            luns = san_snapper.get_snappable_luns()
+            items['san create_snapshots'] = len(luns)
+        else:
+            luns = san_snapper.get_snappable_luns(
+                    snapper.load_list(snapper.lun_list_bkup))
+            for phase in ['san validate', 'san restore_snapshots',
+                          'san remove_snaps_by_prefix']:
+                items[phase] = len(luns)
+        for lunid in sorted(luns):
+            get_logger().info('SAN LUN: {0}/{1}'.format(lunid,
+                                                        luns[lunid].name))
+    if action == 'create_snapshot':
+        lms_vols, node_vols = lvm_snapper.get_snappable_volumes()
+        items['lvm create_snapshots'] = len(lms_vols)
+    else:
+        lms_vols = snapper.load_list(snapper.lms_vol_bkup) or []
+        node_vols = snapper.load_list(snapper.node_vol_bkup) or {}
+        items['lvm validate'] = None
+        items['lvm restore_lms_snapshots'] = None
+        if node_vols:
+            items['lvm restore_nodelocal_snapshots'] = None
+        nodes = sorted(snapper.get_node_cred())
+        items['shutdown_nodes'] = len(nodes)
+        items['start_nodes'] = len(nodes)
+        get_logger().info('Nodes to power off and on: {0}'.format(
+                ', '.join(nodes)))
+    get_logger().info('LMS Logical Volumes: {0}'.format(', '.join(lms_vols)))
+    for node in sorted(node_vols):
+        get_logger().info('{0} Logical Volumes: {1}'.format(
+                node, ', '.join(node_vols[node])))
+
+    history = SnapshotDurationHistory(config['enminst_runtime'])
+    steps, total = history.estimate(action, items)
+    for line in format_estimate(action, steps, total, history.runs(action)):
+        get_logger().info(line)
+
+
+def manage_enminst_snapshots(action,  # pylint: disable=R0913
                              snap_prefix='Snapshot',
                              lvm_snapsize=None, num_of_threads=10,
                              verbose=False, detailed=False, log_silent=False):
     """
+    Manage ENMIST snapshots, recording a timeline of the create, validate,
+    restore and remove actions.
+
+    :param lvm_snapsize: LVM snapshot size
+    :param action: action to be performed
+    :param snap_prefix: tag in the snapshot name
+    :param num_of_threads: Max number of threads to use to perform any actions
+    :param detailed: Show detailed snapshot info
+    :param log_silent: disable logging to enminst log
+    """
+    if action not in TIMELINE_ACTIONS:
+        _manage_enminst_snapshots(action, snap_prefix, lvm_snapsize,
+                                  num_of_threads, verbose, detailed,
+                                  log_silent)
+        return
+    timeline = start_timeline(action)
+    try:
+        with timeline_span(action, CATEGORY_OPERATION,
+                           snap_prefix=snap_prefix):
+            _manage_enminst_snapshots(action, snap_prefix, lvm_snapsize,
+                                      num_of_threads, verbose, detailed,
+                                      log_silent)
+    finally:
+        stop_timeline()
+        report_snapshot_timeline(timeline)
+
+
+def _manage_enminst_snapshots(action,  # pylint: disable=R0912,R0914,R0915,R0913
+                              snap_prefix='Snapshot',
+                              lvm_snapsize=None, num_of_threads=10,
+                              verbose=False, detailed=False, log_silent=False):
+    """
     Manage ENMIST snapshots.
 
     :param lvm_snapsize: LVM snapshot size
@@ -1562,7 +1716,8 @@ def manage_enminst_snapshots(action,  # pylint: disable=R0912,R0914,R0915,R0913
                                    num_of_threads=num_of_threads,
                                    log_silent=log_silent)
     lvm_snapper = LVMSnapshots(snap_prefix=snap_prefix,
-                               log_silent=log_silent)
+                               log_silent=log_silent,
+                               num_of_threads=num_of_threads)
     set_current_action(action)
     if action == 'create_snapshot':
         litp = LitpRestClient()
@@ -2033,6 +2188,14 @@ def create_argument_parser():
                             help='Disable logging to enminst log for '
                                  'list_snapshot')
 
+    arg_parser.add_argument('--estimate', dest='estimate',
+                            action='store_true', default=False,
+                            help='List what a create_snapshot or '
+                                 'restore_snapshot would act on and '
+                                 'estimate how long it would take from '
+                                 'previous runs, nothing is changed (only '
+                                 'used when --snap_type=enminst)')
+
     arg_parser.add_argument('--force', dest='litp_force',
                             default=False, action='store_true',
                             help='Pass the force flag to LITP (only used when '
@@ -2061,7 +2224,8 @@ def main(args):
                          force=options.litp_force,
                          detailed=options.detailed,
                          num_of_threads=options.num_of_threads,
-                         log_silent=options.log_silent)
+                         log_silent=options.log_silent,
+                         estimate=options.estimate)
     except SystemExit as error:
         if error.args[0] == ExitCodes.INVALID_USAGE:
             arg_parser.print_help()
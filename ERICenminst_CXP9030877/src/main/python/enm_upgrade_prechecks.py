@@ -15,7 +15,6 @@ Check and apply ENM pre-requisites
 import re
 import sys
 import textwrap
-import subprocess
 import os
 import time
 import random
@@ -35,6 +34,7 @@ from h_puppet.h_puppet import puppet_trigger_wait
 from h_util.h_utils import Translator, ExitCodes, exec_process, Sed, \
                            _exec_curl_command, get_edp_generated_sed, \
                            is_env_on_rack, get_nas_type
+from h_util.h_process import run_process, ProcessTimeout
 from h_vcs.vcs_utils import is_dps_using_neo4j
 from h_vcs.vcs_utils import report_tab_data
 from enm_grub_cfg_check import GrubConfCheck
@@ -543,7 +543,7 @@ class EnmPreChecks(object):  # pylint: disable=R0904
 
     def run_command(self, command, timeout_secs=CMD_TIMEOUT, do_logging=True):
         """
-        Thin wrapper to call subprocess.Popen
+        Thin wrapper to call run_process
         :param command: Command string to execute
         :type command: string
         :param timeout_secs: seconds to wait before timing out command
@@ -558,39 +558,28 @@ class EnmPreChecks(object):  # pylint: disable=R0904
         if do_logging:
             self.log.debug("Will run command: %s" % command)
 
-        stdout = ''
-        process = None
-
         command_to_log = command if do_logging else '<hidden>'
-        timeout = EnmPreChecks.Timeout(timeout_secs)
 
         try:
-            process = subprocess.Popen(command,
-                                       stdout=subprocess.PIPE,
-                                       stderr=subprocess.STDOUT,
-                                       shell=True)
+            result = run_process(command, timeout=timeout_secs,
+                                 logger=self.log if do_logging else None)
         except OSError as oe_err:
             msg = self._('ERROR_PROCESSING_COMMAND').format(command_to_log,
                                                oe_err.errno, oe_err.strerror)
             self.print_error(msg)
             sys.exit(1)
-
-        while process.poll() is None and not timeout.has_elapsed():
-            timeout.sleep(0.5)
-
-        if process.poll() is None and timeout.has_elapsed():
+        except ProcessTimeout:
             msg = self._('TIMEOUT_OUT_COMMAND').format(command_to_log)
             self.print_error(msg)
             sys.exit(1)
 
-        stdout, _ = process.communicate()
-        cleaned_stdout = stdout.strip()
+        cleaned_stdout = result.output.strip()
 
         if do_logging:
             self.log.debug('Return code: %d Output: "%s"' %
-                           (process.returncode, cleaned_stdout))
+                           (result.returncode, cleaned_stdout))
 
-        return process.returncode, cleaned_stdout
+        return result.returncode, cleaned_stdout
 
     def check_litp_model_synchronized(self):
         """
@@ -29,7 +29,8 @@ from h_puppet.mco_agents import Neo4jClusterMcoAgent, McoAgentException, \
     Neo4jFilesystemMcoAgent
 from h_util.h_collections import ExceptHandlingDict
 from h_util.h_decorators import retry_if_fail, cached_property, cached_method
-from h_util.h_ssh.client import SuIncorrectPassword, SshClient
+from h_util.h_ssh.client import SuIncorrectPassword
+from h_util.h_ssh.fanout import SshFanout
 from h_util.h_units import Size
 from h_util.h_utils import Sed, ExitCodes, exec_process, is_env_on_rack
 
@@ -654,30 +655,31 @@ class DbNodesSshCredentials(object):
         if errors:
             raise DbNodesSshCredsException('. '.join(errors))
 
-        for host in self._db_hosts:
-            litp_pass = self._credentials_dict[host][self.litp_user]
-            client = SshClient(host, self.litp_user, litp_pass)
-
-            try:
-                client.connect()
-            except AuthenticationException:
+        credentials = dict(
+            (host, (self.litp_user,
+                    self._credentials_dict[host][self.litp_user]))
+            for host in self._db_hosts)
+        root_passwords = dict(
+            (host, {'su_password': self._credentials_dict[host][
+                self.root_user]}) for host in self._db_hosts)
+        with SshFanout(credentials) as fanout:
+            results = fanout.run(self._db_hosts, "ls",
+                                 su_user=self.root_user,
+                                 host_args=root_passwords)
+        for host, result in results.items():
+            if isinstance(result.error, AuthenticationException):
                 raise DbNodesSshCredsException("Connection to %s failed. "
                                                "Invalid password provided "
                                                "for user '%s'"
                                                % (host, self.litp_user))
-            else:
-                root_pass = self._credentials_dict[host][self.root_user]
-                try:
-                    client.run("ls", su_user=self.root_user,
-                               su_password=root_pass)
-                except SuIncorrectPassword:
-                    raise DbNodesSshCredsException("Connection to %s "
-                                                   "failed. Invalid "
-                                                   "password provided for "
-                                                   "user '%s'"
-                                                   % (host, self.root_user))
-            finally:
-                client.close()
+            if isinstance(result.error, SuIncorrectPassword):
+                raise DbNodesSshCredsException("Connection to %s "
+                                               "failed. Invalid "
+                                               "password provided for "
+                                               "user '%s'"
+                                               % (host, self.root_user))
+            if result.error is not None:
+                raise result.error
             self.logger.info("validate_credentials done for host %s" % host)
 
     # pylint: disable=C0103,R0912,R0914
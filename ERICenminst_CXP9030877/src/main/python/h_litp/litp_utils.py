@@ -21,7 +21,7 @@ from ConfigParser import ConfigParser, MissingSectionHeaderError, \
     NoOptionError
 from json import dumps
 from os.path import expanduser, join, exists
-from h_xml.xml_utils import xpath, load_xml
+from h_xml.xml_model import load_model
 from h_util.h_utils import keyboard_interruptable, is_physical_environment,\
     exec_process_via_pipes
 
@@ -351,19 +351,15 @@ def is_custom_service(vm_service, path):
     :returns: boolean of whether the service is a customised service or not
     :rtype bool
     """
-    services = []
     try:
 
         vm_serv = vm_service.get('id')
-        dd_xml = load_xml(path)
-
-        for service in xpath(dd_xml, 'vm-service-inherit'):
-            service_path = service.get('source_path')
-            services.append(service_path)
+        dd_model = load_model(path)
 
         vm_serv_path = '/software/services/{0}'.format(vm_serv)
 
-        if vm_serv_path not in services:
+        if not dd_model.items('vm-service-inherit',
+                              {'source_path': vm_serv_path}):
             print 'Custom Service: {0}'.format(vm_serv)
             return True
         return False
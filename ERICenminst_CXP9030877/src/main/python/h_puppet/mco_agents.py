@@ -89,8 +89,9 @@ class BaseAgent(object):
         :type mco_exec_host: str[]|str|None
         :param errkey: The key to use to check for error responses
         :type errkey: str
-        :param stdoutkey: The key containing command output (if any)
-        :type stdoutkey: str
+        :param stdoutkey: The key containing command output (if any), None
+        for all the data of the reply
+        :type stdoutkey: str|None
         :param rpc_command_timeout: RPC command execution timeout
         :type rpc_command_timeout: None|int
         :param ignore_agent_errors: Should agent error be ignored or not
@@ -105,13 +106,8 @@ class BaseAgent(object):
         else:
             rpc_hosts = [mco_exec_host]
 
-        map_args = {}
-        if args:
-            for line in args:
-                name, value = line.split('=', 1)
-                map_args[name] = value
         rpc_results = run_rpc_command(rpc_hosts, self.__agent,
-                                      command, map_args,
+                                      command, BaseAgent._map_args(args),
                                       timeout=rpc_command_timeout,
                                       retries=0)
         return_results = {}
@@ -126,12 +122,79 @@ class BaseAgent(object):
                 exception_data = dict(sender_data)
                 exception_data['node'] = sender
                 raise McoAgentException(exception_data)
-            return_results[sender] = sender_data[stdoutkey]
+            if stdoutkey is None:
+                return_results[sender] = sender_data
+            else:
+                return_results[sender] = sender_data[stdoutkey]
         if not mco_exec_host or type(mco_exec_host) is list:
             return return_results
         else:
             return return_results[mco_exec_host]
 
+    @staticmethod
+    def _map_args(args):
+        """
+        Convert a list of name=value agent arguments to a dict
+
+        :param args: list of agent arguement args
+        :type args: list()|None
+        :rtype: dict
+        """
+        map_args = {}
+        if args:
+            for line in args:
+                name, value = line.split('=', 1)
+                map_args[name] = value
+        return map_args
+
+    def mco_exec_per_host(self,  # pylint: disable=too-many-arguments
+                          command, args, hosts,
+                          errkey='retcode', stdoutkey='out',
+                          rpc_command_timeout=None):
+        """
+        Execute an agent action on a list of hosts in one RPC call. Unlike
+        ``mco_exec`` a failure on one host does not fail the whole call, the
+        failures are returned per host.
+
+        :param command: The action name
+        :type command: str
+        :param args: list of agent arguement args
+        :type args: list()
+        :param hosts: The hosts to execute the agent command on
+        :type hosts: str[]
+        :param errkey: The key to use to check for error responses
+        :type errkey: str
+        :param stdoutkey: The key containing command output (if any)
+        :type stdoutkey: str
+        :param rpc_command_timeout: RPC command execution timeout
+        :type rpc_command_timeout: None|int
+        :returns: Map of host to command output for the hosts the action
+         succeeded on and map of host to McoAgentException for the hosts it
+         failed on
+        :rtype: tuple(dict, dict)
+        """
+        rpc_results = run_rpc_command(hosts, self.__agent,
+                                      command, BaseAgent._map_args(args),
+                                      timeout=rpc_command_timeout,
+                                      retries=0)
+        return_results = {}
+        host_errors = {}
+        for host in hosts:
+            rpc_data = rpc_results.get(host)
+            if not rpc_data:
+                host_errors[host] = McoAgentException(
+                        {host: {'errors': 'No answer from node {0}'.format(
+                                host), 'data': {}}})
+            elif rpc_data['errors']:
+                host_errors[host] = McoAgentException({host: rpc_data})
+            elif int(rpc_data['data'][errkey]) != 0:
+                exception_data = dict(rpc_data['data'])
+                exception_data['node'] = host
+                host_errors[host] = McoAgentException(exception_data)
+            else:
+                return_results[host] = rpc_data['data'][stdoutkey]
+        return return_results, host_errors
+
     @staticmethod
     def get_exec_system(system, mco_host):
         """
@@ -555,19 +618,24 @@ class EnminstAgent(BaseAgent):  # pylint: disable=R0904
                               '{0}'.format(group_name))
             raise ioe
 
-    def lvs_list(self, hosts, lv_opts):
+    def lvs_list(self, hosts, lv_opts, per_host=False):
         """
         Get LVM information from nodes
         :param hosts: List of mcollective hosts to get the LVM data
         :type hosts: str[]
         :param lv_opts: Comma seperated list of logical volume fields to get,
         see ``lvs -o help`` for possible values.
+        :param per_host: Return failures per host rather than raising
+        :type per_host: bool
 
-        :returns: Map of host and LVM data
-        :rtype dict
+        :returns: Map of host and LVM data, if ``per_host`` is set a tuple of
+         that map and a map of host to McoAgentException
+        :rtype dict|tuple
         """
-        return self.mco_exec('lvs_list', ['lv_opts={0}'.format(lv_opts)],
-                             mco_exec_host=hosts)
+        args = ['lv_opts={0}'.format(lv_opts)]
+        if per_host:
+            return self.mco_exec_per_host('lvs_list', args, hosts)
+        return self.mco_exec('lvs_list', args, mco_exec_host=hosts)
 
     def get_mem(self):
         """
@@ -681,7 +749,7 @@ class EnminstAgent(BaseAgent):  # pylint: disable=R0904
         return self.mco_exec('create_lv_snapshots', args,
                              mco_exec_host=snap_hosts)
 
-    def delete_lv_snapshots(self, snap_tag, snap_hosts):
+    def delete_lv_snapshots(self, snap_tag, snap_hosts, per_host=False):
         """
         Delete LV snapshot with specific tag
 
@@ -689,14 +757,20 @@ class EnminstAgent(BaseAgent):  # pylint: disable=R0904
         :type snap_tag: str
         :param snap_hosts: Hosts to execute the lvremove on
         :type snap_hosts: str[]
-        :returns: Output of lvremove on hosts
-        :rtype: dict
+        :param per_host: Return failures per host rather than raising
+        :type per_host: bool
+        :returns: Output of lvremove on hosts, if ``per_host`` is set a tuple
+         of that map and a map of host to McoAgentException
+        :rtype: dict|tuple
         """
         args = ['tag_name={0}'.format(snap_tag)]
+        if per_host:
+            return self.mco_exec_per_host('delete_lv_snapshots', args,
+                                          snap_hosts)
         return self.mco_exec('delete_lv_snapshots', args,
                              mco_exec_host=snap_hosts)
 
-    def restore_lv_snapshots(self, snap_tag, snap_hosts):
+    def restore_lv_snapshots(self, snap_tag, snap_hosts, per_host=False):
         """
         Restore LV snapshot with specific tag
 
@@ -704,10 +778,16 @@ class EnminstAgent(BaseAgent):  # pylint: disable=R0904
         :type snap_tag: str
         :param snap_hosts: Hosts to execute the lvconvert on
         :type snap_hosts: str[]
-        :returns: Output of lvconvert on hosts
-        :rtype: dict
+        :param per_host: Return failures per host rather than raising
+        :type per_host: bool
+        :returns: Output of lvconvert on hosts, if ``per_host`` is set a
+         tuple of that map and a map of host to McoAgentException
+        :rtype: dict|tuple
         """
         args = ['tag_name={0}'.format(snap_tag)]
+        if per_host:
+            return self.mco_exec_per_host('restore_lv_snapshots', args,
+                                          snap_hosts)
         return self.mco_exec('restore_lv_snapshots', args,
                              mco_exec_host=snap_hosts)
 
@@ -24,6 +24,8 @@ from h_litp.litp_rest_client import LitpException, LitpRestClient
 from h_litp.litp_utils import LitpObject
 from h_puppet.mco_agents import EnminstAgent, FilemanagerAgent, \
     McoAgentException
+from h_snapshots.snap_timeline import CATEGORY_BACKEND, CATEGORY_LV, \
+    timeline_span, traced
 from h_util.h_utils import exec_process, is_env_on_rack
 GRUB_RHEL6 = '/boot/grub/grub.conf'
 GRUB_RHEL6_SAVE = '/boot/grub/grub.conf.org'
@@ -43,6 +45,170 @@ class LVMManagerException(Exception):
     pass
 
 
+class LVMInventory(object):
+    """
+    In-memory view of the local ``lvs`` output, scanned once and indexed by
+    volume group, LV name and tag.
+
+    The inventory is kept in step with the create/remove/merge operations
+    done by LVMManager so that repeated listings do not rescan the devices.
+    Call ``rescan`` if changes made outside of this process are suspected.
+    """
+
+    # Workaround/fix for typo in default snap name
+    TYPO_TAG = 'enm_upgarde_snapshot'
+
+    def __init__(self, scanner):
+        """
+        :param scanner: Callable returning the current list of LogicalVolume
+        :type scanner: callable
+        """
+        self._scanner = scanner
+        self._volumes = None
+        self._lv_sizes = None
+        self.by_vg = {}
+        self.by_name = {}
+        self.by_tag = {}
+        self.scan_count = 0
+
+    def rescan(self):
+        """
+        Discard the current state, the next lookup re-reads it with ``lvs``
+        """
+        self._volumes = None
+        self._lv_sizes = None
+
+    @property
+    def scanned(self):
+        """
+        Whether the inventory currently holds scanned data
+        :rtype: bool
+        """
+        return self._volumes is not None
+
+    def _load(self):
+        """
+        Scan the LVs if not already done
+        """
+        if self._volumes is None:
+            self._volumes = list(self._scanner())
+            self.scan_count += 1
+            self._reindex()
+
+    def _reindex(self):
+        """
+        Rebuild the volume group, name and tag indexes
+        """
+        self.by_vg = {}
+        self.by_name = {}
+        self.by_tag = {}
+        for volume in self._volumes:
+            self.by_vg.setdefault(volume.vg_name, []).append(volume)
+            self.by_name[(volume.vg_name, volume.lv_name)] = volume
+            if volume.lv_tags:
+                self.by_tag.setdefault(volume.lv_tags, []).append(volume)
+
+    def volumes(self, volume_group=None, tag=None):
+        """
+        Get the volumes matching a volume group and/or tag. Like ``lvs`` the
+        selection is the union of both arguments, a tag also selects volumes
+        tagged with the mistyped default tag.
+        :param volume_group: Volume group name
+        :type volume_group: str|None
+        :param tag: LV tag
+        :type tag: str|None
+        :returns: Volumes in ``lvs`` order
+        :rtype: list
+        """
+        self._load()
+        if not volume_group and not tag:
+            return list(self._volumes)
+        selected = set()
+        if volume_group:
+            selected.update(id(vol) for vol in self.by_vg.get(volume_group,
+                                                               []))
+        if tag:
+            for _tag in (tag, LVMInventory.TYPO_TAG):
+                selected.update(id(vol) for vol in self.by_tag.get(_tag, []))
+        return [vol for vol in self._volumes if id(vol) in selected]
+
+    def get(self, vg_name, lv_name):
+        """
+        Lookup a single volume
+        :param vg_name: Volume group name
+        :param lv_name: Logical volume name
+        :returns: The volume or None
+        """
+        self._load()
+        return self.by_name.get((vg_name, lv_name))
+
+    def lv_sizes(self, sizer):
+        """
+        Get the LV sizes, reading them once with ``sizer``
+        :param sizer: Callable returning a list of sizes (MB)
+        :type sizer: callable
+        :rtype: list
+        """
+        if self._lv_sizes is None:
+            self._lv_sizes = list(sizer())
+        return self._lv_sizes
+
+    def _set_origin_attr(self, vg_name, origin):
+        """
+        Update the volume type flag of an origin LV based on whether it still
+        has any snapshots in the inventory.
+        """
+        volume = self.by_name.get((vg_name, origin))
+        if not volume:
+            return
+        has_snaps = any(vol.origin == origin and vol.lv_attr.startswith('s')
+                        for vol in self.by_vg.get(vg_name, []))
+        flag = 'o' if has_snaps else '-'
+        if volume.lv_attr[:1] != flag:
+            idx = self._volumes.index(volume)
+            self._volumes[idx] = volume._replace(  # pylint: disable=W0212
+                lv_attr=flag + volume.lv_attr[1:])
+            self._reindex()
+
+    def added(self, volume):
+        """
+        Record an LV created by this process
+        :param volume: The new LogicalVolume
+        """
+        if not self.scanned:
+            return
+        self._volumes.append(volume)
+        self._lv_sizes = None
+        self._reindex()
+        if volume.origin:
+            self._set_origin_attr(volume.vg_name, volume.origin)
+
+    def removed(self, tags=None, lv_paths=None):
+        """
+        Drop LVs removed (or merged into their origin) by this process
+        :param tags: Tags the removal was done with
+        :type tags: list|None
+        :param lv_paths: Paths of the removed LVs
+        :type lv_paths: list|None
+        """
+        if not self.scanned:
+            return
+        lv_paths = set(lv_paths or [])
+        tags = set(tags or [])
+        gone = [vol for vol in self._volumes
+                if vol.lv_path in lv_paths or vol.lv_tags in tags]
+        if not gone:
+            return
+        gone_ids = set(id(vol) for vol in gone)
+        self._volumes = [vol for vol in self._volumes
+                         if id(vol) not in gone_ids]
+        self._lv_sizes = None
+        self._reindex()
+        for vol in gone:
+            if vol.origin:
+                self._set_origin_attr(vol.vg_name, vol.origin)
+
+
 class LVMManager(object):
     """
     Class to run lvm commands snapshot operations
@@ -68,6 +234,7 @@ class LVMManager(object):
         self.log_prefix = 'LVM MGR'
         self.lvm_default_snap_percentage = 100
         self._litp = LitpRestClient()
+        self.inventory = LVMInventory(self._scan_volumes)
 
     @staticmethod
     def process_out(std_out):
@@ -115,6 +282,23 @@ class LVMManager(object):
         """
         return [getattr(vol, attr, '') for vol in volumes]
 
+    def _scan_volumes(self):
+        """
+        Read all logical volumes on the host
+        :return: list of all volumes
+        :type: list
+        """
+        command = 'lvs -o {lv_opts} {lv_args}'.format(lv_opts=self.lv_opts,
+                                                      lv_args=self.lv_args)
+        return self.process_lvm_output(exec_process(command.split()))
+
+    def rescan(self):
+        """
+        Re-read the LVM inventory, to be used when the volumes may have been
+        changed outside of this LVMManager
+        """
+        self.inventory.rescan()
+
     def list_volumes(self, volume_group=None, tag=None, exclude_lv=True):
         """
         List the volumes attributes with options specified
@@ -127,30 +311,14 @@ class LVMManager(object):
         :return: list volumes attributes
         :type: list
         """
-        params = {
-            'lv_opts': self.lv_opts,
-            'tag': tag and '@%s' % tag or '',
-            'lv_args': self.lv_args,
-            'vg': volume_group or ''
-        }
-
-        if tag:
-            # Workaround/fix for typo in default snap name
-            params['tag'] += ' @enm_upgarde_snapshot'
-        command = 'lvs -o {lv_opts} {tag} {lv_args} {vg}'.format(
-                lv_opts=params['lv_opts'],
-                tag=params['tag'],
-                lv_args=params['lv_args'],
-                vg=params['vg'])
-        output = exec_process(command.split())
+        volumes = self.inventory.volumes(volume_group=volume_group, tag=tag)
         if exclude_lv:
-            volumes = self.process_lvm_output(output)
             return [vol for vol in volumes
                     if vol.lv_name.lower().find('swap') < 0
                     if vol.lv_name.lower().find('log') < 0
                     if vol.lv_name.lower().find('software') < 0]
 
-        return self.process_lvm_output(output)
+        return volumes
 
     def list_origin_volumes(self, volume_group=None, tag=None):
         """
@@ -188,13 +356,7 @@ class LVMManager(object):
         std_out = exec_process(cmd.split())
         std_out = ''.join(self.process_out(std_out.splitlines()))
         pfree = int(std_out.split('.')[0])
-        cmd = 'lvs  --units m -o lv_size --noheadings'
-        std_out = exec_process(cmd.split())
-        lvs_size = self.process_out(std_out.splitlines())
-        sumlsize = 0
-        for lv_size in lvs_size:
-            if lv_size.strip():
-                sumlsize += int(lv_size.split('.')[0].lstrip())
+        sumlsize = sum(self.inventory.lv_sizes(self._scan_lv_sizes))
         self.logger.debug("Pfree and sumlsize are calculated to {0} and {1} "
                           "respectively".format(pfree, sumlsize))
         if pfree <= sumlsize:
@@ -202,6 +364,18 @@ class LVMManager(object):
         else:
             return self.lvm_default_snap_percentage
 
+    def _scan_lv_sizes(self):
+        """
+        Read the size of all logical volumes on the host
+        :return: LV sizes in megabytes
+        :type: list
+        """
+        cmd = 'lvs  --units m -o lv_size --noheadings'
+        std_out = exec_process(cmd.split())
+        return [int(lv_size.split('.')[0].lstrip())
+                for lv_size in self.process_out(std_out.splitlines())
+                if lv_size.strip()]
+
     def create_snapshots(self,  # pylint: disable=R0913,C0103
                          volumes, tag='', pc=None, prefix='snapshot',
                          suffix='snap'):
@@ -222,6 +396,7 @@ class LVMManager(object):
         """
         if self.list_snapshots(tag=tag):
             raise LVMManagerException('LVM snapshots already exist!')
+        snap_tag = tag
         if tag:
             tag = '--addtag %s' % tag
         self.logger.info('{0}: Creating LVM snapshot(s)'.format(
@@ -250,13 +425,24 @@ class LVMManager(object):
             self.logger.info('{0}: Creating snapshot for volume {1}'.
                              format(self.log_prefix, volume['lv_name']))
             try:
-                std_out = exec_process(command.split())
+                with timeline_span(volume['lv_name'], CATEGORY_LV,
+                                   lv_path=volume['lv_path']):
+                    std_out = exec_process(command.split())
                 std_out = ''.join(self.process_out(std_out.splitlines()))
                 outputs.append(std_out.strip())
             except IOError as error:
                 std_out = 'Failed to create snapshot for %s with message %s' \
                           % (volume['lv_name'], error.strerror)
                 raise LVMManagerException(std_out)
+            snap_name = '{prefix}{vol_name}{suffix}'.format(**params)
+            vg_name = os.path.dirname(params['vol_path']).split('/')[-1]
+            self.inventory.added(self.LogicalVolume(
+                    lv_name=snap_name, lv_tags=snap_tag or '',
+                    lv_attr='swi-a-s---',
+                    lv_path='/dev/{0}/{1}'.format(vg_name, snap_name),
+                    vg_name=vg_name, origin=params['vol_name'],
+                    lv_snapshot_invalid='', snap_percent='0.00',
+                    lv_time=''))
         return outputs
 
     def remove_snapshots(self, tag=None, volumes=None):
@@ -288,6 +474,8 @@ class LVMManager(object):
             self.logger.info('%s: Removing snapshots %s' %
                              (self.log_prefix, volume_paths))
         _stdout = exec_process(command.split()).splitlines()
+        self.inventory.removed(tags=[tag, LVMInventory.TYPO_TAG],
+                               lv_paths=volume_paths)
         return self.process_out(_stdout)
 
     def restore_snapshots(self, tag=None, volumes=None):
@@ -323,7 +511,11 @@ class LVMManager(object):
             self.logger.info('%s: Restoring snapshots %s' %
                              (self.log_prefix, volume_paths))
 
-        return self.process_out(exec_process(command.split()).splitlines())
+        _stdout = exec_process(command.split()).splitlines()
+        self.inventory.removed(
+                tags=[tag, LVMInventory.TYPO_TAG] if tag else None,
+                lv_paths=volume_paths)
+        return self.process_out(_stdout)
 
     def get_nodes_using_local_storage(self, ignore_states=None,
                                       is_migration=False):
@@ -372,7 +564,7 @@ class LVMSnapshots(object):
     DEFAULT_SNAPSHOT_LABEL = 'enm_upgrade_snapshot'
 
     def __init__(self, snap_prefix, tag=DEFAULT_SNAPSHOT_LABEL,
-                 log_silent=False):
+                 log_silent=False, num_of_threads=10):
         """
         Constructor
         :param snap_prefix: snapshot prefix name
@@ -381,10 +573,14 @@ class LVMSnapshots(object):
         :type tag: string
         :param log_silent: disable logging to enminst log
         :type tag: boolean
+        :param num_of_threads: Max number of nodes to run node local
+         actions on at once
+        :type num_of_threads: int
         :return:
         """
         self.snap_prefix = snap_prefix
         self.tag = tag
+        self.num_of_threads = max(1, num_of_threads)
         self.lvm = LVMManager(log_silent)
         if log_silent:
             self.logger = logging.getLogger('enmsnapshots')
@@ -395,6 +591,65 @@ class LVMSnapshots(object):
         self.grub = GRUB_RHEL6
         self.grub_save = GRUB_RHEL6_SAVE
 
+    def _run_on_hosts(self, agent_action, hosts):
+        """
+        Run an agent action on a list of hosts as multi-host RPC calls with
+        at most ``num_of_threads`` hosts per call. A failure on a host does
+        not stop the action on the other hosts.
+
+        :param agent_action: Agent method taking a host list and returning a
+         tuple of host->output and host->McoAgentException maps
+        :type agent_action: callable
+        :param hosts: Hosts to run the action on
+        :type hosts: str[]
+        :returns: Map of host to output and map of host to McoAgentException
+        :rtype: tuple(dict, dict)
+        """
+        results = {}
+        errors = {}
+        hosts = sorted(hosts)
+        for index in range(0, len(hosts), self.num_of_threads):
+            _results, _errors = agent_action(
+                    hosts[index:index + self.num_of_threads])
+            results.update(_results)
+            errors.update(_errors)
+        return results, errors
+
+    def _log_host_output(self, host_output):
+        """
+        Log the output of an agent action for each host
+        :param host_output: Map of host to command output
+        :type host_output: dict
+        :returns: Hosts that did not return any output
+        :rtype: str[]
+        """
+        no_output = []
+        for _node, _stdout in sorted(host_output.items()):
+            _lines = filter(None, _stdout.split('\n'))
+            if _lines:
+                for _line in _lines:
+                    self.logger.info('{0}: {1} : {2}'.format(
+                            self.log_prefix, _node, _line.strip()))
+            else:
+                no_output.append(_node)
+        return no_output
+
+    def _raise_host_errors(self, action, host_errors):
+        """
+        Log the per host failures of an agent action and raise if any
+        :param action: Description of the action
+        :type action: str
+        :param host_errors: Map of host to McoAgentException
+        :type host_errors: dict
+        """
+        if not host_errors:
+            return
+        for _node, _error in sorted(host_errors.items()):
+            self.logger.error('{0}: {1} : Failed to {2}: {3}'.format(
+                    self.log_prefix, _node, action, _error.err))
+        raise LVMManagerException('Failed to {0} on node(s) {1}'.format(
+                action, ', '.join(sorted(host_errors))))
+
     @staticmethod
     def _fmt_snap_log(log_prefix, snap_volume, details):
         """
@@ -763,6 +1018,22 @@ class LVMSnapshots(object):
                 sfile = GRUB_RHEL7_SAVE
         return (gfile, sfile)
 
+    def get_snappable_volumes(self):
+        """
+        The Logical Volumes a snapshot create would snap, nothing is created.
+
+        :returns: LMS volume names and a mapping of node hostname to the
+        names of its local volumes
+        :rtype: tuple
+        """
+        lms_vol_names = [vol['lv_name'] for vol in
+                         self._get_lms_snappable_vols()]
+        node_vol_names = {}
+        for _node, _fsystems in self._get_node_snappable_localvols(
+                self.snap_prefix).items():
+            node_vol_names[_node] = [vol['lv_name'] for vol in _fsystems]
+        return lms_vol_names, node_vol_names
+
     def snap_lms_volumes(self, lvm_snapsize=None):
         """
         Create LV snapshots of the LMS volumes
@@ -796,6 +1067,7 @@ class LVMSnapshots(object):
                                 grub_save_file))
         return vol_names
 
+    @traced(CATEGORY_BACKEND, 'lvm snap_nodelocal_volumes')
     def snap_nodelocal_volumes(self):
         """
         Create LV snapshots of volumes on nodes that are using physical disks
@@ -876,6 +1148,7 @@ class LVMSnapshots(object):
             output = filemgr.copy_file(sources[1], targets[1], hosts)
         return output
 
+    @traced(CATEGORY_BACKEND, 'lvm create_snapshots')
     def create_snapshots(self, lvm_snapsize=None):
         """
         Create the snapshot
@@ -926,6 +1199,8 @@ class LVMSnapshots(object):
         :returns: True if there are invalid snapshots, False otherwise
         :rtype: bool
         """
+        # Snapshot validity and usage change over time, read them fresh
+        self.lvm.rescan()
         snaps = self.lvm.list_snapshots()
         self.logger.info('{0}: Validating LMS snapshots'.format(
                 self.log_prefix))
@@ -1023,28 +1298,28 @@ class LVMSnapshots(object):
         validation_errors = False
         if node_local_vols and backedup_volumes:
             lost_nodes = []
-            host_lv_data = {}
             for node_name in node_local_vols.keys():
                 if node_name not in backedup_volumes.keys():
                     self.logger.debug('{0}: Expanded node {1} not part '
                                       'of snapshot'.format(self.log_prefix,
                                                            node_name))
                     del node_local_vols[node_name]
-                else:
-                    try:
-                        lv_data = EnminstAgent().lvs_list(
-                        [node_name],
-                        LVMManager.DEFAULT_LV_OPTS)
-                        host_lv_data.update(lv_data)
-                    except McoAgentException as error:
-                        if "No answer" in str(error.message) and\
-                            self.is_migration():
-                            self.logger.info('{0}: {1} is unreachable, being'
-                            ' categorized as a lost node'.
-                            format(self.log_prefix, node_name))
-                            lost_nodes.append(node_name)
-                            del node_local_vols[node_name]
-                            del backedup_volumes[node_name]
+
+            agent = EnminstAgent()
+            host_lv_data, lv_errors = self._run_on_hosts(
+                    lambda hosts: agent.lvs_list(hosts,
+                                                 LVMManager.DEFAULT_LV_OPTS,
+                                                 per_host=True),
+                    node_local_vols.keys())
+            for node_name, error in sorted(lv_errors.items()):
+                if "No answer" in str(error.message) and\
+                        self.is_migration():
+                    self.logger.info('{0}: {1} is unreachable, being'
+                                     ' categorized as a lost node'.
+                                     format(self.log_prefix, node_name))
+                    lost_nodes.append(node_name)
+                    del node_local_vols[node_name]
+                    del backedup_volumes[node_name]
 
             host_grub6_data = {}
             host_grub7_data = {}
@@ -1125,6 +1400,7 @@ class LVMSnapshots(object):
             host_grub7_data = {}
         return host_grub6_data, host_grub7_data
 
+    @traced(CATEGORY_BACKEND, 'lvm validate')
     def validate(self, lms_vol_names=None, node_vol_names=None,
                  detailed=False):
         """
@@ -1139,6 +1415,7 @@ class LVMSnapshots(object):
         if lms_errors or node_errors:
             raise LVMManagerException('Invalid LV snapshots found!')
 
+    @traced(CATEGORY_BACKEND, 'lvm restore_lms_snapshots')
     def restore_lms_snapshots(self):
         """
         Restore the snapshots on the LMS
@@ -1165,6 +1442,7 @@ class LVMSnapshots(object):
                 self.logger.info('{0}: LMS : {1}'.format(self.log_prefix,
                                                          _line))
 
+    @traced(CATEGORY_BACKEND, 'lvm restore_nodelocal_snapshots')
     def restore_nodelocal_snapshots(self, restore_volume_hosts):
         """
         Restore LV snapshots on nodes using local storage.
@@ -1189,24 +1467,17 @@ class LVMSnapshots(object):
         self.logger.info('Restoring LV snapshots on {0} nodes.'.format(
                 len(restore_volume_hosts)
         ))
-        remote_output = snap_agent.restore_lv_snapshots(self.tag,
-                                                        restore_volume_hosts)
-        for _node, _stdout in remote_output.items():
-            _lines = filter(None, _stdout.split('\n'))
-            if _lines:
-                for _line in _lines:
-                    self.logger.info('{0}: {1} : {2}'.format(
-                            self.log_prefix, _node, _line.strip()))
+        remote_output, restore_errors = self._run_on_hosts(
+                lambda hosts: snap_agent.restore_lv_snapshots(
+                        self.tag, hosts, per_host=True),
+                restore_volume_hosts)
+        self._log_host_output(remote_output)
 
         # TORF-317966: run /bin/sync command at the end to make sure
         # grub.conf copy registered on disk
         remote_output = snap_agent.execute_sync_command(restore_volume_hosts)
-        for _node, _stdout in remote_output.items():
-            _lines = filter(None, _stdout.split('\n'))
-            if _lines:
-                for _line in _lines:
-                    self.logger.info('{0}: {1} : {2}'.format(
-                            self.log_prefix, _node, _line.strip()))
+        self._log_host_output(remote_output)
+        self._raise_host_errors('restore LV snapshots', restore_errors)
 
     def remove_lms_snaphots(self):
         """
@@ -1258,17 +1529,14 @@ class LVMSnapshots(object):
         if node_local_vols:
             enminst_agent = EnminstAgent()
             fmgr_agent = FilemanagerAgent()
-            _results = enminst_agent.delete_lv_snapshots(
-                    self.tag, node_local_vols.keys())
-            for _node, _stdout in _results.items():
-                _lines = filter(None, _stdout.split('\n'))
-                if _lines:
-                    for _line in _lines:
-                        self.logger.info('{0}: {1} : {2}'.format(
-                                self.log_prefix, _node, _line.strip()))
-                else:
-                    self.logger.info('{0}: {1} : No LV snapshots found to '
-                                     'delete.'.format(self.log_prefix, _node))
+            _results, delete_errors = self._run_on_hosts(
+                    lambda hosts: enminst_agent.delete_lv_snapshots(
+                            self.tag, hosts, per_host=True),
+                    node_local_vols.keys())
+            for _node in self._log_host_output(_results):
+                self.logger.info('{0}: {1} : No LV snapshots found to '
+                                 'delete.'.format(self.log_prefix, _node))
+            self._raise_host_errors('delete LV snapshots', delete_errors)
 
             _results = {}
             try:
@@ -1289,6 +1557,7 @@ class LVMSnapshots(object):
         else:
             self.logger.info('{0}: No nodes using local storage.')
 
+    @traced(CATEGORY_BACKEND, 'lvm remove_snapshots')
     def remove_snapshots(self):
         """
        Remove all LVM snapshots on the LMS and any nodes using local storage
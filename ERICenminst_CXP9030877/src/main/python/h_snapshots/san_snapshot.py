@@ -12,22 +12,34 @@ Class to handle SFS filesystem snapshots
 # program(s) have been supplied.
 # ********************************************************************
 import logging
+import sys
 from multiprocessing.pool import ThreadPool
 from time import sleep
 
 from h_litp.litp_rest_client import LitpRestClient
 from h_snapshots.litp_snapshots import LitpSanSnapshots
 from h_snapshots.snap_agent import SnapAgents
+from h_snapshots.snap_timeline import CATEGORY_BACKEND, CATEGORY_DB, \
+    CATEGORY_LUN, timeline_span, traced
 from h_snapshots.snapshots_utils import SAN_POOLNAME, SAN_PW, SAN_USER,\
     SAN_LOGIN_SCOPE, SAN_SPA_IP, SAN_TYPE, SAN_SPB_IP, NavisecCLI,\
     SAN_TYPE, read_ini, get_default_config, SanApiException
 
+from h_util.h_timing import TimeWindow, sec_pretty
 from h_util.h_utils import ExitCodes
 from h_vcs.vcs_cli import Vcs
 from h_vcs.vcs_utils import VcsException, is_dps_using_neo4j, \
     VCS_AVAIL_PARALLEL
 from h_puppet.mco_agents import EnminstAgent
 
+# What the freeze time logged for each database covers
+FREEZE_SCOPES = {
+    'neo4j': 'from the freeze request to the end of the thaw request, '
+             'RPC round trips included',
+    'versant': 'vjbackup split, measured on the DB node',
+    'mysql': 'tables locked, measured on the DB node'
+}
+
 
 class InvalidStateForSnapshotCreation(Exception):
     """ This exception will be raised in an event of not a valid state during
@@ -337,6 +349,7 @@ class VNXSnap(object):  # pylint: disable=R0902
                          ' on nodes {0}'.
                          format(node_list))
 
+    @traced(CATEGORY_BACKEND, 'san create_snapshots')
     def create_snapshots(self):   # pylint: disable=R0912,R0914,R0915
         """ Create the snapshots of the LUNs
         :return:
@@ -438,7 +451,10 @@ class VNXSnap(object):  # pylint: disable=R0902
                 opendj_vcs_action = True
 
             if opendj_vcs_action:
-                # Offline OpenDJ, see TORF-142036
+                # Offline OpenDJ, see TORF-142036. The OpenDJ LUNs are kept
+                # out of the concurrent DB freeze and snapped one at a time
+                # so there is always an OpenDJ instance online.
+                opendj_window = TimeWindow('opendj offline').start()
                 self.logger.info("Offlining OpenDJ on {node}/{sys}".format(
                                  node=opendj_node,
                                  sys=Vcs.node_name_to_vcs_system(opendj_node)))
@@ -449,7 +465,9 @@ class VNXSnap(object):  # pylint: disable=R0902
                 sleep(60)
 
             try:
-                self.navi_cli.snap_create(lunid, snapname)
+                with timeline_span(lunid, CATEGORY_LUN, lun=lunname,
+                                   snapshot=snapname):
+                    self.navi_cli.snap_create(lunid, snapname)
             except SanApiException:
                 self.logger.exception('{plog} : Failed to create the snapshot'
                                       ' "{snapname}" on LUN {lunid}/{lunname}'
@@ -475,43 +493,26 @@ class VNXSnap(object):  # pylint: disable=R0902
                                      Vcs.node_name_to_vcs_system(opendj_node),
                                      Vcs.ENM_DB_CLUSTER_NAME,
                                      -1)
+                    opendj_window.stop()
+                    self.logger.info('{0} : OpenDJ on {1} was offline for {2}'
+                                     ' (offline request to end of online '
+                                     'request)'.format(
+                                            self.log_prefix, opendj_node,
+                                            opendj_window.duration_display))
 
         self.logger.info('{0} : Snapping the DB '
                          'luns...'.format(self.log_prefix))
 
-        ####### Neo4j snapshot
-
-        if dps_using_neo4j:
-            lun_ids = dict([(k, v)
-                            for k, v in db_id_name.items() if "neo4j" in k])
-            self.logger.debug('db_id_name: {0} '.format(str(db_id_name)))
-            self.logger.debug('Neo4j lun_ids: {0} '.format(str(lun_ids)))
-            self.neo4j_snapper.force_neo4j_checkpoint(online_neo4j_nodes)
-            self.neo4j_snapper.freeze_neo4j_db_filesystems(online_neo4j_nodes)
-            self.snapper.create_neo4j_snapshot(lun_ids,
-                                               self.san_cred[SAN_TYPE],
-                                               self.san_cred[SAN_SPA_IP],
-                                               self.san_cred[SAN_SPB_IP],
-                                               online_neo4j_nodes,
-                                               self.san_cred[SAN_USER],
-                                               self.san_cred[SAN_PW],
-                                               self.san_cred[SAN_LOGIN_SCOPE],
-                                               self.get_snap_prefix(),
-                                               self.descr)
-            self.neo4j_snapper.unfreeze_neo4j_db_filesystems(
-                             online_neo4j_nodes)
-            self.logger.info("{0} : Neo4j DB LUN : Neo4j snapshot finished"
-                             " successfully".format(self.log_prefix))
-        else:
-            self.logger.debug("Neo4j snapshot skipped as it is not set as "
-                              "DPS provider")
-        ####### End of Neo4j snapshot
+        self._snap_frozen_dbs(db_id_name, dps_using_neo4j,
+                              online_neo4j_nodes, active_versant_node)
 
         ####### Postgres snapshot (it has to happen after neo4j snapshot)
         pg_lun_id = db_id_name['postgresdb']
         pg_snap_name = self.get_snap_prefix() + "_" + pg_lun_id
         try:
-            self.navi_cli.snap_create(pg_lun_id, pg_snap_name)
+            with timeline_span(pg_lun_id, CATEGORY_LUN, lun='postgresdb',
+                               snapshot=pg_snap_name):
+                self.navi_cli.snap_create(pg_lun_id, pg_snap_name)
         except SanApiException:
             self.logger.exception('{plog} : Failed to create the snapshot'
                                   ' "{snapname}" on LUN {lunid}/{lunname}'
@@ -529,43 +530,176 @@ class VNXSnap(object):  # pylint: disable=R0902
 
         ##### End of Postgres snapshot
 
-        if not dps_using_neo4j:
+        self.logger.info("%s : SAN Snapshot create "
+                         "finished successfully" % self.log_prefix)
+
+    def _snap_frozen_dbs(self, db_id_name, dps_using_neo4j,
+                         online_neo4j_nodes, active_versant_node):
+        """
+        Snap the LUNs of the databases that have to be frozen (Neo4j or
+        Versant, and MySQL) for their snapshot.
+
+        The databases are frozen concurrently and each one is thawed as soon
+        as its own LUNs are snapped, so the freeze window is that of the
+        slowest database rather than the sum of all of them. Only the LUNs of
+        the frozen database are snapped inside its window. The time each
+        database was frozen for is logged, FREEZE_SCOPES says what it covers.
+
+        :param db_id_name: database name to LUN id
+        :type db_id_name: dict
+        :param dps_using_neo4j: True if Neo4j is the DPS provider
+        :type dps_using_neo4j: bool
+        :param online_neo4j_nodes: Nodes Neo4j is online on
+        :type online_neo4j_nodes: list
+        :param active_versant_node: Node Versant is active on
+        :type active_versant_node: str
+        :return:
+        """
+        jobs = []
+        if dps_using_neo4j:
+            lun_ids = dict([(k, v)
+                            for k, v in db_id_name.items() if "neo4j" in k])
+            self.logger.debug('db_id_name: {0} '.format(str(db_id_name)))
+            self.logger.debug('Neo4j lun_ids: {0} '.format(str(lun_ids)))
+            # Checkpoint before the freeze so the window only covers the
+            # snapshot itself
+            self.neo4j_snapper.force_neo4j_checkpoint(online_neo4j_nodes)
+            jobs.append(('neo4j', self._snap_neo4j_db,
+                         (lun_ids, online_neo4j_nodes)))
+        else:
+            self.logger.debug("Neo4j snapshot skipped as it is not set as "
+                              "DPS provider")
             self.logger.info("Versant in use and active!")
-            self.snapper.create_versant_snapshot('versant',
-                                             db_id_name['versantdb'],
-                                             self.san_cred[SAN_TYPE],
-                                             self.san_cred[SAN_SPA_IP],
-                                             self.san_cred[SAN_SPB_IP],
-                                             active_versant_node,
-                                             self.san_cred[SAN_USER],
-                                             self.san_cred[SAN_PW],
-                                             self.san_cred[
-                                                SAN_LOGIN_SCOPE],
-                                             self.get_snap_prefix(),
-                                             self.descr)
-            self.logger.info("{0} : Versant DB LUN : {1} snapshot "
-                         "finished successfully".format(self.log_prefix,
-                                            db_id_name['versantdb']))
+            jobs.append(('versant', self._snap_versant_db,
+                         (db_id_name['versantdb'], active_versant_node)))
 
         active_mysql_node = self._get_active_mysql_node()
         if active_mysql_node:
-            self.snapper.create_mysql_snapshot('mysql', db_id_name['mysql'],
+            jobs.append(('mysql', self._snap_mysql_db,
+                         (db_id_name['mysql'], active_mysql_node)))
+
+        thread_pool = ThreadPool(processes=len(jobs))
+        try:
+            results = [(name, thread_pool.apply_async(
+                            self._frozen_db_window, args=(name, job, args)))
+                       for name, job, args in jobs]
+            thread_pool.close()
+            thread_pool.join()
+        except KeyboardInterrupt:
+            thread_pool.terminate()
+            raise
+
+        failed = []
+        for name, result in results:
+            frozen, exc_info = result.get()
+            if frozen is not None:
+                self.logger.info('{0} : {1} DB was frozen for {2} ({3})'
+                                 ''.format(self.log_prefix, name,
+                                           sec_pretty(frozen),
+                                           FREEZE_SCOPES[name]))
+            if exc_info:
+                failed.append((name, exc_info))
+        if failed:
+            for name, exc_info in failed:
+                self.logger.error('{0} : {1} DB snapshot failed: {2}'.format(
+                        self.log_prefix, name, exc_info[1]))
+            exc_type, exc_value, exc_traceback = failed[0][1]
+            raise exc_type, exc_value, exc_traceback
+
+    def _frozen_db_window(self, name, job, args):
+        """
+        Run a database snapshot job in a worker thread.
+        :param name: database name
+        :type name: str
+        :param job: function that freezes, snaps and thaws the database and
+        returns the seconds it was frozen for, see FREEZE_SCOPES
+        :param args: job arguments
+        :type args: tuple
+        :return: The seconds the database was frozen for (None if unknown)
+        and the sys.exc_info() of the job if it failed
+        :rtype: tuple
+        """
+        try:
+            with timeline_span('{0} frozen'.format(name), CATEGORY_DB):
+                return job(*args), None
+        except Exception:  # pylint: disable=W0703
+            return None, sys.exc_info()
+
+    def _snap_neo4j_db(self, lun_ids, online_neo4j_nodes):
+        """
+        Freeze the Neo4j filesystems, snap the Neo4j LUNs and thaw them
+        :param lun_ids: Neo4j LUN name to LUN id
+        :type lun_ids: dict
+        :param online_neo4j_nodes: Nodes Neo4j is online on
+        :type online_neo4j_nodes: list
+        :returns: Seconds from the freeze request to the end of the thaw
+        request
+        :rtype: float
+        """
+        window = TimeWindow('neo4j frozen').start()
+        self.neo4j_snapper.freeze_neo4j_db_filesystems(online_neo4j_nodes)
+        try:
+            self.snapper.create_neo4j_snapshot(lun_ids,
                                                self.san_cred[SAN_TYPE],
                                                self.san_cred[SAN_SPA_IP],
                                                self.san_cred[SAN_SPB_IP],
-                                               active_mysql_node,
+                                               online_neo4j_nodes,
                                                self.san_cred[SAN_USER],
                                                self.san_cred[SAN_PW],
                                                self.san_cred[SAN_LOGIN_SCOPE],
                                                self.get_snap_prefix(),
-                                               self.descr,
-                                               self.mysql_user)
-            self.logger.info("{0} : Mysql DB LUN : {1} snapshot finished "
-                             "successfully".format(self.log_prefix,
-                                                   db_id_name['mysql']))
+                                               self.descr)
+        finally:
+            self.neo4j_snapper.unfreeze_neo4j_db_filesystems(
+                    online_neo4j_nodes)
+            window.stop()
+        self.logger.info("{0} : Neo4j DB LUN : Neo4j snapshot finished"
+                         " successfully".format(self.log_prefix))
+        return float(window.duration)
 
-        self.logger.info("%s : SAN Snapshot create "
-                         "finished successfully" % self.log_prefix)
+    def _snap_versant_db(self, versant_lun_id, active_versant_node):
+        """
+        Snap the Versant LUN, the agent freezes and thaws the database
+        around the snapshot.
+        :param versant_lun_id: Versant LUN id
+        :type versant_lun_id: str
+        :param active_versant_node: Node Versant is active on
+        :type active_versant_node: str
+        :returns: Seconds Versant was split for, as measured by the agent
+        :rtype: float
+        """
+        frozen = self.snapper.create_versant_snapshot(
+            'versant', versant_lun_id, self.san_cred[SAN_TYPE],
+            self.san_cred[SAN_SPA_IP], self.san_cred[SAN_SPB_IP],
+            active_versant_node, self.san_cred[SAN_USER],
+            self.san_cred[SAN_PW], self.san_cred[SAN_LOGIN_SCOPE],
+            self.get_snap_prefix(), self.descr)
+        self.logger.info("{0} : Versant DB LUN : {1} snapshot "
+                         "finished successfully".format(self.log_prefix,
+                                                        versant_lun_id))
+        return frozen
+
+    def _snap_mysql_db(self, mysql_lun_id, active_mysql_node):
+        """
+        Snap the MySQL LUN, the agent locks and unlocks the tables around
+        the snapshot.
+        :param mysql_lun_id: MySQL LUN id
+        :type mysql_lun_id: str
+        :param active_mysql_node: Node MySQL is active on
+        :type active_mysql_node: str
+        :returns: Seconds the tables were locked for, as measured by the agent
+        :rtype: float
+        """
+        frozen = self.snapper.create_mysql_snapshot(
+            'mysql', mysql_lun_id, self.san_cred[SAN_TYPE],
+            self.san_cred[SAN_SPA_IP], self.san_cred[SAN_SPB_IP],
+            active_mysql_node, self.san_cred[SAN_USER], self.san_cred[SAN_PW],
+            self.san_cred[SAN_LOGIN_SCOPE], self.get_snap_prefix(), self.descr,
+            self.mysql_user)
+        self.logger.info("{0} : Mysql DB LUN : {1} snapshot finished "
+                         "successfully".format(self.log_prefix,
+                                               mysql_lun_id))
+        return frozen
 
     def _get_neo4j_nodes(self):
         """ Get the all neo4j nodes
@@ -653,6 +787,7 @@ class VNXSnap(object):  # pylint: disable=R0902
             raise VcsException('OpenDJ is not active on any nodes!')
         return node_list
 
+    @traced(CATEGORY_BACKEND, 'san remove_snapshots')
     def remove_snapshots(self, luns=None, lunlist=None):
         """
         Deletes SAN snapshots on the LUNs in a storage pool
@@ -756,6 +891,7 @@ class VNXSnap(object):  # pylint: disable=R0902
                                                   lunname),
                     callback=report)
 
+    @traced(CATEGORY_LUN, 'destroy', label='lunid')
     def _remove_lun_snaps(self, lunid, snapshot, lunname):
         """
         Function to remove the LUN snapshot
@@ -786,6 +922,7 @@ class VNXSnap(object):  # pylint: disable=R0902
             return False, str(error), snaps_destroyed
         return True, None, snaps_destroyed
 
+    @traced(CATEGORY_BACKEND, 'san validate')
     def validate(self, luns=None):
         """
         Validates that all the luns have an associated snap
@@ -798,6 +935,7 @@ class VNXSnap(object):  # pylint: disable=R0902
                          ' expected snapshots.'.format(plog=self.log_prefix,
                                                        pool=self.poolname))
 
+    @traced(CATEGORY_BACKEND, 'san restore_snapshots')
     def restore_snapshots(self,  # pylint: disable=R0912
                           restore_lunids=None):
         """
@@ -889,6 +1027,7 @@ class VNXSnap(object):  # pylint: disable=R0902
         self.logger.info("%s : SAN Snapshot restore finished successfully"
                          % self.log_prefix)
 
+    @traced(CATEGORY_BACKEND, 'san remove_snaps_by_prefix')
     def remove_snaps_by_prefix(self, restore_lunids=None, lunlist=None):
         """
         Function to remove the snapshot with prefix name
@@ -914,6 +1053,7 @@ class VNXSnap(object):  # pylint: disable=R0902
         # the restore
         self._remove_snaps_by_prefix('enm_upgrade_bkup', luns=lunlist)
 
+    @traced(CATEGORY_LUN, 'restore', label='lunid')
     def restore_san_lun(self, lunid, lunlist, snapshots):
         """
         Function to restore the snapshot
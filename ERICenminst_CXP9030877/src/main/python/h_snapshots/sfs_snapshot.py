@@ -16,6 +16,7 @@ Class to handle SAN filesystem snapshots
 # Purpose : The purpose of this script is to run sfs snapshots
 # operations
 # ********************************************************************
+from functools import wraps
 from math import floor
 import logging
 from multiprocessing.pool import ThreadPool
@@ -25,6 +26,8 @@ from h_litp.litp_utils import LitpObject, LitpException
 from h_util.h_nas_console import NasConsole, get_rollback_cache_name, \
     get_rollback_name, normalize_size, NasConsoleException
 from h_litp.litp_rest_client import LitpRestClient
+from h_snapshots.snap_timeline import CATEGORY_BACKEND, CATEGORY_FS, \
+    timeline_span, traced
 from h_util.h_utils import get_nas_type
 
 LITP_INVALID_LOCATION_ERROR = 'InvalidLocationError'
@@ -49,6 +52,26 @@ class SfsSnapshotsException(Exception):
     pass
 
 
+def closes_console(func):
+    """
+    Close the NAS console of SfsSnapshots, logging how its connections were
+    used, when the outermost public operation returns. Operations called by
+    other operations keep using the open connections.
+    """
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        """ Run the operation and close the console if it is the outermost
+        one """
+        self.operations += 1
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            self.operations -= 1
+            if not self.operations:
+                self.close_console(self.nasconsole)
+    return wrapper
+
+
 class SfsSnapshots(object):  # pylint: disable=R0902
     """
     Class to run SFS snapshot operations for a deployment
@@ -95,8 +118,30 @@ class SfsSnapshots(object):  # pylint: disable=R0902
                                      self.cred[SK_NASCONSOLE_SUPUSER],
                                      self.cred[SK_NASCONSOLE_SUPPASSWD],
                                      ssh_port=self.ssh_port,
-                                     nas_type=self.nas_type_name)
+                                     nas_type=self.nas_type_name,
+                                     persistent=True,
+                                     sessions=self.num_of_threads,
+                                     inventory=True)
+        self.operations = 0
 
+    def close_console(self, nasconsole):
+        """
+        Close a persistent NAS console and log its connection counts
+        :param nasconsole: The console to close
+        :type nasconsole: NasConsole
+        :return:
+        """
+        stats = nasconsole.session_stats()
+        nasconsole.close()
+        if stats:
+            self.logger.info('{0}: NAS sessions: {1} opened, {2} reused, '
+                             '{3} dropped'.format(self.log_prefix,
+                                                  stats['opened'],
+                                                  stats['reused'],
+                                                  stats['dropped']))
+
+    @traced(CATEGORY_BACKEND, 'nas remove_snapshots')
+    @closes_console
     def remove_snapshots(self, file_system_list=None):
         """
         Destroy all rollbacks (snapshots) in a storage pool
@@ -113,7 +158,10 @@ class SfsSnapshots(object):  # pylint: disable=R0902
                 for snap in rollbacks:
                     self.logger.info('{0}: Destroying rollback {1}'.
                                      format(self.log_prefix, snap))
-                    self.nasconsole.storage_rollback_destroy(snap, filesystem)
+                    with timeline_span(filesystem, CATEGORY_FS,
+                                       rollback=snap):
+                        self.nasconsole.storage_rollback_destroy(snap,
+                                                                 filesystem)
         if rollbacks:
             self.logger.info('{0}: Rollbacks destroyed.'.
                              format(self.log_prefix))
@@ -123,6 +171,8 @@ class SfsSnapshots(object):  # pylint: disable=R0902
         if self.nas_type_name == 'veritas':
             self.remove_rollback_cache()
 
+    @traced(CATEGORY_BACKEND, 'nas create_snapshots')
+    @closes_console
     def create_snapshots(self):
         """
         Create rollbacks of all filesystems in the storage pool
@@ -143,22 +193,34 @@ class SfsSnapshots(object):  # pylint: disable=R0902
             raise SfsSnapshotsException('{0}: No filesystems to snapshot!'.
                                         format(self.log_prefix))
         if self.nas_type_name == 'veritas':
-            cache = get_rollback_cache_name(self.poolname)
-            cache_size = self.calculate_cache_size(filesystems, cache,
-                                               modelled_filesystems)
+            cache, cache_size = self.plan_rollback_cache(filesystems,
+                                                         modelled_filesystems)
             self.logger.info('{0}: Creating rollback cache {1} of {2}'
                              .format(self.log_prefix, cache, cache_size))
 
             self.nasconsole.storage_rollback_cache_create(cache, cache_size,
                                                           self.poolname)
-        for fs_name, _ in filesystems.items():
-            rollback_name = get_rollback_name(self.snap_prefix, fs_name)
-            self.logger.info('{0}: Creating rollback {1} for filesystem {2}'.
-                             format(self.log_prefix, rollback_name, fs_name))
-            self.nasconsole.storage_rollback_create(rollback_name,
-                                                    fs_name, cache)
-            self.logger.info('{0}: Created rollback {1}'.
-                             format(self.log_prefix, rollback_name))
+        rollbacks = [(get_rollback_name(self.snap_prefix, fs_name), fs_name)
+                     for fs_name in filesystems]
+        self.logger.info('{0}: Creating {1} rollbacks'.
+                         format(self.log_prefix, len(rollbacks)))
+        # The rollbacks are created one after the other over one NAS
+        # connection, each span ends when its rollback is reported created.
+        created = self.nasconsole.storage_rollback_create_batch(rollbacks,
+                                                                cache)
+        try:
+            for rollback_name, fs_name in rollbacks:
+                self.logger.info('{0}: Creating rollback {1} for filesystem '
+                                 '{2}'.format(self.log_prefix, rollback_name,
+                                              fs_name))
+                with timeline_span(fs_name, CATEGORY_FS,
+                                   rollback=rollback_name):
+                    next(created)
+                self.logger.info('{0}: Created rollback {1}'.
+                                 format(self.log_prefix, rollback_name))
+        finally:
+            # Hands the NAS connection back
+            created.close()
         self.logger.info('{0}: Snapshots created for all filesystems in the '
                          'storage pool {1}'.format(self.log_prefix,
                                                    self.poolname))
@@ -166,6 +228,26 @@ class SfsSnapshots(object):  # pylint: disable=R0902
                          format(self.log_prefix, self.snap_prefix))
         return filesystems
 
+    @closes_console
+    def plan_rollback_cache(self, filesystems, modelled_filesystems=None):
+        """
+        The rollback cache a snapshot create would use, nothing is created.
+        :param filesystems: the file systems to be snapped
+        :type filesystems: dict
+        :param modelled_filesystems: SFS file systems in the LITP model
+        :type modelled_filesystems: dict
+        :return: Cache name and size, None and None if the NAS type does not
+        use a rollback cache. The size is None if the cache already exists.
+        :rtype: tuple
+        """
+        if self.nas_type_name != 'veritas':
+            return None, None
+        if modelled_filesystems is None:
+            modelled_filesystems = self.get_modelled_filesystems()
+        cache = get_rollback_cache_name(self.poolname)
+        return cache, self.calculate_cache_size(filesystems, cache,
+                                                modelled_filesystems)
+
     def calculate_cache_size(self, filesystems, cache, modelled_filesystems):
         """
         Calculate the size of the sfs cache.
@@ -202,6 +284,7 @@ class SfsSnapshots(object):  # pylint: disable=R0902
                              format(self.log_prefix, cache))
         return cache_size
 
+    @closes_console
     def build_exported_fs(self):
         """
         Get a list of exported snappable filesystems.
@@ -230,6 +313,7 @@ class SfsSnapshots(object):  # pylint: disable=R0902
                     sleep(2)
         return self.build_fs_to_snap(filesystems=fs_exports_all)
 
+    @closes_console
     def build_fs_to_snap(self, file_system_list=None, filesystems=None):
         """
         Building a list of filesystems to be snapped.
@@ -254,6 +338,7 @@ class SfsSnapshots(object):  # pylint: disable=R0902
                     fs_to_snap[filesystem] = filesystems[filesystem]
         return fs_to_snap
 
+    @closes_console
     def list_rollbacks(self):
         """
        Get the snapshots from SFS server
@@ -264,6 +349,7 @@ class SfsSnapshots(object):  # pylint: disable=R0902
         return self.nasconsole.storage_rollback_list(storage_pool,
                                                      self.snap_prefix)
 
+    @closes_console
     def list_snapshots(self, detailed):
         """
         List the existing snapshots
@@ -301,6 +387,8 @@ class SfsSnapshots(object):  # pylint: disable=R0902
                                                   self.snap_prefix))
         return snapshots
 
+    @traced(CATEGORY_BACKEND, 'nas validate')
+    @closes_console
     def validate(self, filesystems=None):
         """
         Check the validity of snapshot
@@ -386,6 +474,9 @@ class SfsSnapshots(object):  # pylint: disable=R0902
         except KeyboardInterrupt:
             pool.terminate()
             raise
+        finally:
+            # The threads change the NAS through their own consoles
+            self.nasconsole.inventory.refresh(self.poolname)
 
         if not results:
             raise SfsSnapshotsException('{0}: {1} NAS FS threads did not'
@@ -413,6 +504,7 @@ class SfsSnapshots(object):  # pylint: disable=R0902
                                         ' threads did not return result'.
                                         format(self.log_prefix, action))
 
+    @closes_console
     def get_snapshots_info(self):
         """
         Get snapshot data
@@ -421,6 +513,8 @@ class SfsSnapshots(object):  # pylint: disable=R0902
                                                               self.snap_prefix)
         return self.build_fs_to_snap(filesystems=snapshots_all)
 
+    @traced(CATEGORY_BACKEND, 'nas restore_snapshots')
+    @closes_console
     def restore_snapshots(self, snap_fs_export):
         """
         Offline SFS filesystems using threads
@@ -431,16 +525,55 @@ class SfsSnapshots(object):  # pylint: disable=R0902
         :return:
         """
         snapshots = self.get_snapshots_info()
+        if self.nas_type_name == 'veritas':
+            self.offline_filesystems(sorted(snapshots))
         self.create_threads(self.rollback_nas_fs, snapshots, 'Rollback',
                             snap_fs_export)
         self.logger.info('{0}: Restore rollbacks finished '.
                          format(self.log_prefix))
 
-    def rollback_nas_fs(self,  # pylint: disable=R0912, R0915
-                        filesystem, snapshots, snap_fs_export):
+    def offline_filesystems(self, filesystems):
         """
-        Offline, Restore and Export nas fs share for a given file
-        system
+        Offline file systems in a series of threads and wait until they are
+        all offline, their status is polled for all of them at once
+        :param filesystems: file systems to offline
+        :type filesystems: list
+        """
+        pool = ThreadPool(processes=self.num_of_threads)
+        try:
+            try:
+                pool.map(self.offline_filesystem, filesystems)
+                pool.close()
+                pool.join()
+            except KeyboardInterrupt:
+                pool.terminate()
+                raise
+            polls = self.nasconsole.wait_fs_status(filesystems,
+                                                   self.poolname, 'offline')
+        except Exception as error:  # pylint: disable=W0703
+            self.logger.error("{0}: Offline of file systems failed with "
+                              "error {1}".format(self.log_prefix,
+                                                 str(error)))
+            raise SfsSnapshotsException('{0}: Offline of file systems '
+                                        'failed'.format(self.log_prefix))
+        self.logger.debug('{0}: Status polls per filesystem: {1}'.format(
+                self.log_prefix, polls))
+
+    def offline_filesystem(self, filesystem):
+        """
+        Offline a file system, without waiting for it to be offline
+        :param filesystem: file system to offline
+        :type filesystem: str
+        """
+        self.logger.info('{0}: Offlining filesystem {1}'.
+                         format(self.log_prefix, filesystem))
+        self.nasconsole.storage_fs_offline(filesystem)
+
+    @traced(CATEGORY_FS, 'rollback', label='filesystem')
+    def rollback_nas_fs(self, filesystem, snapshots, snap_fs_export):
+        """
+        Restore and Export nas fs share for a given file system, all over
+        one NAS connection. The file system must already be offline.
         :param filesystem: filesystem to be rolled back
         :param snapshots: snapshots for fs
         :param snap_fs_export: list of nas exports
@@ -450,20 +583,24 @@ class SfsSnapshots(object):  # pylint: disable=R0902
                                 self.cred[SK_NASCONSOLE_SUPUSER],
                                 self.cred[SK_NASCONSOLE_SUPPASSWD],
                                 ssh_port=self.ssh_port,
-                                nas_type=self.nas_type_name)
-        if self.nas_type_name == 'veritas':
-            try:
-                self.logger.info('{0}: Offlining filesystem {1}'.
-                             format(self.log_prefix, filesystem))
-                nasconsole.storage_fs_offline(filesystem)
-                nasconsole.ensure_fs_status(filesystem, self.poolname,
-                                            'offline')
-            except Exception as error:  # pylint: disable=W0703
-                self.logger.error("{0}: Offline for fs {1} failed "
-                              "with error {2}".format(self.log_prefix,
-                                                      filesystem,
-                                                      str(error)))
-                return False, filesystem
+                                nas_type=self.nas_type_name,
+                                persistent=True)
+        try:
+            return self._rollback_nas_fs(nasconsole, filesystem, snapshots,
+                                         snap_fs_export)
+        finally:
+            self.close_console(nasconsole)
+
+    def _rollback_nas_fs(self,  # pylint: disable=R0912, R0913, R0915
+                         nasconsole, filesystem, snapshots, snap_fs_export):
+        """
+        Restore and Export nas fs share for a given file system
+        :param nasconsole: Console to run the NAS commands on
+        :param filesystem: filesystem to be rolled back
+        :param snapshots: snapshots for fs
+        :param snap_fs_export: list of nas exports
+        :return:
+        """
         if len(snapshots) > 1:
             return False, 'More than one rollback found for NAS filesystem ' \
                           '{0}'.format(filesystem)
@@ -565,6 +702,7 @@ class SfsSnapshots(object):  # pylint: disable=R0902
                          format(self.log_prefix, filesystem, snapshot))
         return True, filesystem
 
+    @closes_console
     def remove_rollback_cache(self):
         """
         Destroy the rollback cache (if it exists)
@@ -582,6 +720,8 @@ class SfsSnapshots(object):  # pylint: disable=R0902
             self.logger.info('{0}: No rollback cache needs destroying.'.
                              format(self.log_prefix))
 
+    @traced(CATEGORY_BACKEND, 'nas remove_sfs_shares')
+    @closes_console
     def remove_sfs_shares(self):
         """
         Remove SFS Share(if it exists) of the file systems having snapshots
@@ -595,6 +735,7 @@ class SfsSnapshots(object):  # pylint: disable=R0902
         self.create_threads(self.nfs_share_delete, snapshots, 'Remove',
                             fs_exports)
 
+    @traced(CATEGORY_FS, 'unexport', label='filesystem')
     def nfs_share_delete(self, filesystem, fs_exports):
         """
         Removes Nas shares of the filesystems
@@ -699,6 +840,7 @@ class SfsSnapshots(object):  # pylint: disable=R0902
                     raise
         return filesystems_to_remove
 
+    @closes_console
     def ensure_removal_fs_not_required(self):
         """
         Get filesystems that are marked to be removed from NAS. If they exist
@@ -19,6 +19,7 @@ MCO client for the dbsnapshots RPC agent
 import json
 
 from h_puppet.mco_agents import BaseAgent
+from h_snapshots.snap_timeline import CATEGORY_DB, traced
 
 
 class SnapAgents(BaseAgent):
@@ -31,6 +32,7 @@ class SnapAgents(BaseAgent):
         """
         super(SnapAgents, self).__init__(agent_name)
 
+    @traced(CATEGORY_DB, 'neo4j checkpoint')
     def force_neo4j_checkpoint(self, target_hosts):
         """ Force a checkpoint on the specified Neo4j instances
         :param target_hosts: target hosts
@@ -40,6 +42,7 @@ class SnapAgents(BaseAgent):
         self.mco_exec('force_neo4j_checkpoint', [], target_hosts,
                       rpc_command_timeout=5400)
 
+    @traced(CATEGORY_DB, 'neo4j freeze')
     def freeze_neo4j_db_filesystems(self, target_hosts):
         """ Freezes Neo4j database filesystems of the specified hosts
         :param target_hosts: target hosts
@@ -48,6 +51,7 @@ class SnapAgents(BaseAgent):
         """
         self.mco_exec('freeze_neo4j_db_filesystem', [], target_hosts)
 
+    @traced(CATEGORY_DB, 'neo4j thaw')
     def unfreeze_neo4j_db_filesystems(self, target_hosts):
         """ Unfreezes Neo4j database filesystems of the specified hosts
         :param target_hosts: target hosts
@@ -56,6 +60,7 @@ class SnapAgents(BaseAgent):
         """
         self.mco_exec('unfreeze_neo4j_db_filesystem', [], target_hosts)
 
+    @traced(CATEGORY_DB, 'neo4j snapshot')
     def create_neo4j_snapshot(self,  # pylint: disable=R0913
                               lun_ids, array_type, spa_ip, spb_ip,
                               target_hosts, san_user, san_pw, san_login_scope,
@@ -97,6 +102,7 @@ class SnapAgents(BaseAgent):
         ]
         self.mco_exec('create_snapshot', args, target_hosts)
 
+    @traced(CATEGORY_DB, 'versant freeze/snapshot/thaw')
     def create_versant_snapshot(self,  # pylint: disable=R0913
                                 db_name, dblun_id,
                                 array_type, spa_ip, spb_ip,
@@ -127,7 +133,9 @@ class SnapAgents(BaseAgent):
         :param descr: snap description
         :type descr: str
         :param san_login_scope: SAN login scope
-        :return:
+        :returns: Seconds Versant was split for, as measured by the agent,
+        None if the agent did not report it
+        :rtype: float
         """
         args = [
             'dbtype={0}'.format(db_name),
@@ -142,8 +150,9 @@ class SnapAgents(BaseAgent):
             'descr={0}'.format(descr)
 
         ]
-        self.mco_exec('create_snapshot', args, active_db_host)
+        return self._create_snapshot(args, active_db_host)
 
+    @traced(CATEGORY_DB, 'mysql freeze/snapshot/thaw')
     def create_mysql_snapshot(self,  # pylint: disable=R0913,R0914
                               db_name, dblun_id, array_type,
                               spa_ip, spb_ip,
@@ -176,7 +185,9 @@ class SnapAgents(BaseAgent):
         :param mysql_user: mysql user name
         :type mysql_user: str
         :param san_login_scope: SAN login scope
-        :return:
+        :returns: Seconds the MySQL tables were locked for, as measured by
+        the agent, None if the agent did not report it
+        :rtype: float
         """
         args = [
             'dbtype={0}'.format(db_name),
@@ -191,7 +202,25 @@ class SnapAgents(BaseAgent):
             'descr={0}'.format(descr),
             'mysql_user={0}'.format(mysql_user)
         ]
-        self.mco_exec('create_snapshot', args, active_db_host)
+        return self._create_snapshot(args, active_db_host)
+
+    def _create_snapshot(self, args, active_db_host):
+        """
+        Run the create_snapshot action and get the freeze time reported by
+        the agent. Agents older than the 'frozen' key do not report it.
+        :param args: The action arguments
+        :type args: list
+        :param active_db_host: hostname where db is active
+        :type active_db_host: str
+        :returns: The seconds, None if there is no (valid) value
+        :rtype: float
+        """
+        reply = self.mco_exec('create_snapshot', args, active_db_host,
+                              stdoutkey=None)
+        try:
+            return float(reply.get('frozen'))
+        except (TypeError, ValueError):
+            return None
 
     def backup_opendj(self, node_list, opendj_backup_cmd, opendj_backup_dir,
                       opendj_log_dir):
@@ -0,0 +1,218 @@
+"""
+Duration history of snapshot operations and estimates built from it
+"""
+##############################################################################
+# COPYRIGHT Ericsson AB 2026
+#
+# The copyright to the computer program(s) herein is the property of
+# Ericsson AB. The programs may be used and/or copied only with written
+# permission from Ericsson AB. or in accordance with the terms and
+# conditions stipulated in the agreement/contract under which the
+# program(s) have been supplied.
+# ********************************************************************
+#
+# ********************************************************************
+# Name    : snap_estimate.py
+# Purpose : Keep the phase durations of previous snapshot runs and use them
+# to estimate how long a create or restore would take.
+##############################################################################
+from os.path import exists, join
+
+from simplejson import dump, load
+
+from h_snapshots.snap_timeline import CATEGORY_BACKEND, CATEGORY_FS, \
+    CATEGORY_LUN, CATEGORY_LV, CATEGORY_NODE_POWER, CATEGORY_OPERATION, \
+    STATUS_OK
+from h_util.h_timing import sec_pretty
+
+HISTORY_FILE = 'snapshot_durations.json'
+HISTORY_SIZE = 10
+UNACCOUNTED = 'other'
+
+# The top level phases of each action in the order they run, with the
+# category of the items (LUNs, filesystems, ...) whose number drives how
+# long the phase takes. Phase names are the timeline span names.
+PHASES = {
+    'create_snapshot': [
+        ('nas create_snapshots', CATEGORY_FS),
+        ('san create_snapshots', CATEGORY_LUN),
+        ('lvm create_snapshots', CATEGORY_LV)],
+    'restore_snapshot': [
+        ('nas validate', CATEGORY_FS),
+        ('lvm validate', None),
+        ('san validate', CATEGORY_LUN),
+        ('shutdown_nodes', CATEGORY_NODE_POWER),
+        ('lvm restore_nodelocal_snapshots', None),
+        ('nas remove_sfs_shares', CATEGORY_FS),
+        ('nas restore_snapshots', CATEGORY_FS),
+        ('san restore_snapshots', CATEGORY_LUN),
+        ('start_nodes', CATEGORY_NODE_POWER),
+        ('san remove_snaps_by_prefix', CATEGORY_LUN),
+        ('lvm restore_lms_snapshots', None)]
+}
+
+
+def _mean(values):
+    """ Average of a list of numbers, None if the list is empty """
+    if not values:
+        return None
+    return float(sum(values)) / len(values)
+
+
+class SnapshotDurationHistory(object):
+    """
+    Phase durations of the last HISTORY_SIZE runs of each snapshot action,
+    stored as JSON in a local file.
+    """
+
+    def __init__(self, directory):
+        """ Constructor
+        :param directory: Directory the history file is kept in
+        """
+        self.filename = join(directory, HISTORY_FILE)
+        self._history = None
+
+    @property
+    def history(self):
+        """ The stored history, loaded on first use
+        :rtype: dict
+        """
+        if self._history is None:
+            self._history = {}
+            if exists(self.filename):
+                try:
+                    with open(self.filename) as _reader:
+                        self._history = load(_reader)
+                except ValueError:
+                    # A damaged history only costs the estimates, the next
+                    # run starts a new one
+                    pass
+        return self._history
+
+    def save(self):
+        """ Write the history back to its file """
+        with open(self.filename, 'w') as _writer:
+            dump(self.history, _writer, indent=2)
+
+    @staticmethod
+    def _append(values, value):
+        """ Add a value, keeping only the last HISTORY_SIZE values """
+        values.append(round(value, 3))
+        del values[:-HISTORY_SIZE]
+
+    def record(self, timeline):
+        """ Add the phase durations of a completed operation.
+
+        Nothing is recorded for failed operations as their durations do not
+        represent a full run.
+
+        :param timeline: The timeline of the operation
+        :type timeline: SnapshotTimeline
+        :returns: True if the timeline was recorded
+        :rtype: bool
+        """
+        roots = [span for span in timeline.children(None)
+                 if span.category == CATEGORY_OPERATION]
+        if timeline.action not in PHASES or not roots or \
+                roots[0].status != STATUS_OK:
+            return False
+        operation = roots[0]
+        action = self.history.setdefault(timeline.action,
+                                         {'operation': [], 'phases': {}})
+        self._append(action['operation'], operation.duration)
+        accounted = 0
+        for name, item_category in PHASES[timeline.action]:
+            spans = [span for span in timeline.children(operation)
+                     if span.category in (CATEGORY_BACKEND,
+                                          CATEGORY_NODE_POWER) and
+                     span.name == name]
+            if not spans:
+                continue
+            duration = sum(span.duration for span in spans)
+            items = 0
+            if item_category:
+                for span in spans:
+                    items += len(timeline.descendants(span, item_category))
+            phase = action['phases'].setdefault(
+                    name, {'durations': [], 'items': []})
+            self._append(phase['durations'], duration)
+            self._append(phase['items'], items)
+            accounted += duration
+        phase = action['phases'].setdefault(
+                UNACCOUNTED, {'durations': [], 'items': []})
+        self._append(phase['durations'],
+                     max(0, operation.duration - accounted))
+        self._append(phase['items'], 0)
+        return True
+
+    def runs(self, action):
+        """ Number of runs of an action in the history
+        :rtype: int
+        """
+        return len(self.history.get(action, {}).get('operation', []))
+
+    def estimate_phase(self, action, phase, items=None):
+        """ Estimated duration of a phase.
+
+        When both the history and the current run have a count of items the
+        per item average is scaled to the current count, otherwise the
+        average phase duration is used.
+
+        :param action: Snapshot action
+        :param phase: Phase (span) name
+        :param items: Number of items the phase will act on
+        :returns: Seconds, None if the phase has no history
+        :rtype: float
+        """
+        history = self.history.get(action, {}).get('phases', {}).get(phase)
+        if not history:
+            return None
+        per_item = [duration / count for duration, count in
+                    zip(history['durations'], history['items']) if count]
+        if items and per_item:
+            return _mean(per_item) * items
+        return _mean(history['durations'])
+
+    def estimate(self, action, items):
+        """ Estimated timeline of an action.
+
+        :param action: Snapshot action, one of the PHASES keys
+        :param items: Number of items each phase will act on, phases not in
+        the dict are skipped as they do not apply to this deployment
+        :type items: dict
+        :returns: (phase, items, start offset, seconds) tuples in run order
+        followed by the estimated total; seconds is None for phases with no
+        history
+        :rtype: tuple
+        """
+        steps = []
+        offset = 0
+        phases = [name for name, _ in PHASES[action] if name in items]
+        for name in phases + [UNACCOUNTED]:
+            count = items.get(name)
+            seconds = self.estimate_phase(action, name, count)
+            steps.append((name, count, offset, seconds))
+            offset += seconds or 0
+        return steps, offset
+
+
+def format_estimate(action, steps, total, runs):
+    """ Human readable version of an estimate
+    :param action: Snapshot action
+    :param steps: Estimated steps as returned by estimate
+    :param total: Estimated total in seconds
+    :param runs: Number of previous runs the estimate is based on
+    :returns: Report lines
+    :rtype: list
+    """
+    lines = ['Estimated {0} timeline (based on {1} previous run(s)):'.format(
+            action, runs)]
+    for name, count, offset, seconds in steps:
+        what = name if count is None else '{0} ({1} items)'.format(name,
+                                                                   count)
+        took = 'no history' if seconds is None else \
+            sec_pretty(seconds, short=True)
+        lines.append('  +{0:<10} {1} : {2}'.format(
+                sec_pretty(offset, short=True), what, took))
+    lines.append('Estimated total: {0}'.format(sec_pretty(total)))
+    return lines
@@ -0,0 +1,379 @@
+"""
+Timeline of the spans recorded during a snapshot operation
+"""
+##############################################################################
+# COPYRIGHT Ericsson AB 2026
+#
+# The copyright to the computer program(s) herein is the property of
+# Ericsson AB. The programs may be used and/or copied only with written
+# permission from Ericsson AB. or in accordance with the terms and
+# conditions stipulated in the agreement/contract under which the
+# program(s) have been supplied.
+# ********************************************************************
+#
+# ********************************************************************
+# Name    : snap_timeline.py
+# Purpose : Record how long each backend, LUN, filesystem, logical volume,
+# node power action and DB freeze/thaw takes during a snapshot operation and
+# report it as JSON, as a Chrome trace and as a critical path summary.
+##############################################################################
+import os
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from inspect import getcallargs
+from os.path import join
+from time import time
+
+from simplejson import dump
+
+from h_util.h_timing import sec_pretty
+
+CATEGORY_OPERATION = 'operation'
+CATEGORY_BACKEND = 'backend'
+CATEGORY_LUN = 'lun'
+CATEGORY_FS = 'filesystem'
+CATEGORY_LV = 'lv'
+CATEGORY_NODE_POWER = 'node_power'
+CATEGORY_DB = 'db'
+
+STATUS_RUNNING = 'running'
+STATUS_OK = 'ok'
+STATUS_FAILED = 'failed'
+STATUS_ERROR = 'error'
+
+TIMELINE_FILE = 'snapshot_timeline_{0}.json'
+TRACE_FILE = 'snapshot_timeline_{0}.trace.json'
+
+
+class TimelineSpan(object):  # pylint: disable=R0902
+    """
+    A single timed step of a snapshot operation.
+    """
+
+    def __init__(self, span_id, name, category, parent, args):  # pylint: disable=R0913
+        """ Constructor
+        :param span_id: Unique id of the span in its timeline
+        :param name: Span name e.g. the LUN or node the step works on
+        :param category: One of the CATEGORY_* values
+        :param parent: Id of the enclosing span, None for a root span
+        :param args: Extra details to report with the span
+        """
+        self.span_id = span_id
+        self.name = name
+        self.category = category
+        self.parent = parent
+        self.args = args
+        self.thread = threading.current_thread().name
+        self.thread_id = threading.current_thread().ident
+        self.start = time()
+        self.end = None
+        self.status = STATUS_RUNNING
+
+    def __repr__(self):
+        return '<{0}: {1}/{2} {3}>'.format(self.__class__.__name__,
+                                           self.category, self.name,
+                                           self.status)
+
+    @property
+    def duration(self):
+        """ Seconds spent in the span so far
+        :returns: Duration in seconds
+        :rtype: float
+        """
+        end = time() if self.end is None else self.end
+        return end - self.start
+
+    def finish(self, status):
+        """ Close the span
+        :param status: One of the STATUS_* values
+        """
+        self.end = time()
+        self.status = status
+
+    def to_dict(self, origin):
+        """ Serializable version of the span
+        :param origin: Timestamp the offsets are relative to
+        :returns: Span details
+        :rtype: dict
+        """
+        return {'id': self.span_id,
+                'name': self.name,
+                'category': self.category,
+                'parent': self.parent,
+                'thread': self.thread,
+                'status': self.status,
+                'start': round(self.start - origin, 3),
+                'duration': round(self.duration, 3),
+                'args': self.args}
+
+
+class SnapshotTimeline(object):
+    """
+    Thread safe collection of the spans of one snapshot operation.
+
+    Spans opened on a thread nest under the innermost span still open on that
+    thread. Spans opened on worker threads (e.g. a ThreadPool restoring LUNs)
+    nest under the innermost span open on the thread that created the
+    timeline.
+    """
+
+    def __init__(self, action):
+        """ Constructor
+        :param action: The snapshot action being timed
+        """
+        self.action = action
+        self.start = time()
+        self._spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._owner_stack = self._stack()
+
+    def _stack(self):
+        """ Open spans of the calling thread, innermost last """
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name, category, **args):
+        """ Time the enclosed block as a span
+        :param name: Span name
+        :param category: One of the CATEGORY_* values
+        :param args: Extra details to report with the span
+        :returns: The open span
+        :rtype: TimelineSpan
+        """
+        stack = self._stack()
+        with self._lock:
+            parents = stack or self._owner_stack
+            parent = parents[-1].span_id if parents else None
+            span = TimelineSpan(len(self._spans), name, category, parent,
+                                args)
+            self._spans.append(span)
+        stack.append(span)
+        try:
+            yield span
+        except BaseException:
+            span.finish(STATUS_ERROR)
+            raise
+        else:
+            if span.status == STATUS_RUNNING:
+                span.finish(STATUS_OK)
+        finally:
+            stack.remove(span)
+
+    @property
+    def spans(self):
+        """ All the spans recorded so far, in start order
+        :rtype: list
+        """
+        with self._lock:
+            return list(self._spans)
+
+    def children(self, span):
+        """ Spans directly enclosed by a span
+        :param span: The parent span, None for the root spans
+        :rtype: list
+        """
+        parent = None if span is None else span.span_id
+        return [child for child in self.spans if child.parent == parent]
+
+    def descendants(self, span, category=None):
+        """ Spans enclosed by a span at any depth
+        :param span: The enclosing span
+        :param category: Only return spans of this category
+        :rtype: list
+        """
+        found = []
+        parents = set([span.span_id])
+        for child in self.spans:
+            if child.parent in parents:
+                parents.add(child.span_id)
+                if category is None or child.category == category:
+                    found.append(child)
+        return found
+
+    def critical_path(self):
+        """ The chain of spans that decided when the operation finished.
+
+        Starting from the root span that finished last, keep descending into
+        the child that finished last.
+        :returns: Spans from the root down
+        :rtype: list
+        """
+        path = []
+        candidates = self.children(None)
+        while candidates:
+            span = max(candidates, key=lambda s: (s.start + s.duration))
+            path.append(span)
+            candidates = self.children(span)
+        return path
+
+    def category_totals(self):
+        """ Time spent per span category. Spans of the same category running
+        in parallel are all counted.
+        :returns: Seconds per category
+        :rtype: dict
+        """
+        totals = {}
+        for span in self.spans:
+            totals[span.category] = totals.get(span.category, 0) + \
+                                    span.duration
+        return totals
+
+    def summary(self, slowest=5):
+        """ Short human readable report of where the time went
+        :param slowest: Number of slowest leaf spans to list
+        :returns: Report lines
+        :rtype: list
+        """
+        lines = ['Snapshot {0} timeline, critical path:'.format(self.action)]
+        for depth, span in enumerate(self.critical_path()):
+            lines.append('  {0}{1} {2} : {3} [{4}]'.format(
+                '  ' * depth, span.category, span.name,
+                sec_pretty(span.duration, short=True), span.status))
+        parents = set(span.parent for span in self.spans)
+        leaves = sorted([span for span in self.spans
+                         if span.span_id not in parents],
+                        key=lambda s: s.duration, reverse=True)[:slowest]
+        if leaves:
+            lines.append('Slowest steps:')
+            for span in leaves:
+                lines.append('  {0} {1} : {2}'.format(
+                    span.category, span.name,
+                    sec_pretty(span.duration, short=True)))
+        return lines
+
+    def to_dict(self):
+        """ Serializable version of the timeline
+        :rtype: dict
+        """
+        return {'action': self.action,
+                'start': self.start,
+                'duration': round(time() - self.start, 3),
+                'category_totals': dict(
+                    (category, round(total, 3)) for category, total in
+                    self.category_totals().items()),
+                'critical_path': [span.span_id
+                                  for span in self.critical_path()],
+                'spans': [span.to_dict(self.start) for span in self.spans]}
+
+    def to_chrome_trace(self):
+        """ The timeline in the Chrome trace event format, it can be loaded
+        in chrome://tracing or Perfetto.
+        :rtype: dict
+        """
+        pid = os.getpid()
+        events = []
+        threads = {}
+        for span in self.spans:
+            threads[span.thread_id] = span.thread
+            args = dict(span.args)
+            args['status'] = span.status
+            events.append({'name': span.name,
+                           'cat': span.category,
+                           'ph': 'X',
+                           'ts': int((span.start - self.start) * 1000000),
+                           'dur': int(span.duration * 1000000),
+                           'pid': pid,
+                           'tid': span.thread_id,
+                           'args': args})
+        for thread_id, thread_name in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid,
+                           'tid': thread_id, 'args': {'name': thread_name}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, directory):
+        """ Write the timeline JSON and the Chrome trace files
+        :param directory: Directory to write the files to
+        :returns: Paths of the timeline and trace files
+        :rtype: tuple
+        """
+        timeline_file = join(directory, TIMELINE_FILE.format(self.action))
+        trace_file = join(directory, TRACE_FILE.format(self.action))
+        with open(timeline_file, 'w') as _writer:
+            dump(self.to_dict(), _writer, indent=2)
+        with open(trace_file, 'w') as _writer:
+            dump(self.to_chrome_trace(), _writer)
+        return timeline_file, trace_file
+
+
+_TIMELINE = {'active': None}
+
+
+def start_timeline(action):
+    """ Start recording the spans of a snapshot operation
+    :param action: The snapshot action being timed
+    :rtype: SnapshotTimeline
+    """
+    _TIMELINE['active'] = SnapshotTimeline(action)
+    return _TIMELINE['active']
+
+
+def stop_timeline():
+    """ Stop recording spans
+    :returns: The timeline that was being recorded, if any
+    :rtype: SnapshotTimeline
+    """
+    timeline = _TIMELINE['active']
+    _TIMELINE['active'] = None
+    return timeline
+
+
+def get_timeline():
+    """ The timeline being recorded, if any
+    :rtype: SnapshotTimeline
+    """
+    return _TIMELINE['active']
+
+
+@contextmanager
+def timeline_span(name, category, **args):
+    """ Time the enclosed block as a span of the active timeline, does
+    nothing if no timeline is being recorded.
+    :param name: Span name
+    :param category: One of the CATEGORY_* values
+    :param args: Extra details to report with the span
+    """
+    timeline = get_timeline()
+    if timeline is None:
+        yield None
+    else:
+        with timeline.span(name, category, **args) as span:
+            yield span
+
+
+def traced(category, name=None, label=None):
+    """ Decorator timing every call of a function as a span of the active
+    timeline.
+
+    Worker functions returning the (success, ...) tuples used by the snapshot
+    thread pools are recorded as failed spans when success is False.
+
+    :param category: One of the CATEGORY_* values
+    :param name: Span name, defaults to the function name
+    :param label: Name of the argument (e.g. 'node' or 'lunid') to append to
+    the span name
+    """
+    def decorator(func):
+        """ Wrap the function """
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            """ Run the function inside a span """
+            if get_timeline() is None:
+                return func(*args, **kwargs)
+            full_name = span_name
+            if label:
+                value = getcallargs(func, *args, **kwargs)[label]
+                full_name = '{0} {1}'.format(span_name, value)
+            with timeline_span(full_name, category) as span:
+                result = func(*args, **kwargs)
+                if isinstance(result, tuple) and result and \
+                        result[0] is False:
+                    span.finish(STATUS_FAILED)
+                return result
+        return wrapper
+    return decorator
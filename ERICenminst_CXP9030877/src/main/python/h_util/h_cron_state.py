@@ -0,0 +1,111 @@
+""" Module to keep the state of a cron job between its runs: results of
+lookups that rarely change, cached for a time to live, and what the job
+last reported so it only reports again when something changed."""
+import logging
+import os
+from time import time
+
+from simplejson import dump, load
+
+LOOKUPS = 'lookups'
+REPORTED = 'reported'
+
+
+class CronState(object):
+    """
+    JSON state file of a cron job. A missing or damaged file is an empty
+    state, so the job behaves as on its first run.
+    """
+
+    def __init__(self, filename):
+        """
+        :param filename: The state file
+        :type filename: str
+        """
+        self.log = logging.getLogger('enminst')
+        self.filename = filename
+        self.state = {}
+        if os.path.exists(filename):
+            try:
+                with open(filename) as _reader:
+                    self.state = load(_reader)
+            except (IOError, ValueError) as error:
+                self.log.warning('Ignoring state file {0}: {1}'.format(
+                        filename, error))
+        if not isinstance(self.state, dict):
+            self.state = {}
+
+    def cached(self, key, ttl, loader):
+        """
+        The result of a lookup, only looked up again once the result is
+        older than ttl seconds. A None result is not kept, the lookup is
+        done again on the next call.
+        :param key: Name of the lookup
+        :type key: str
+        :param ttl: Seconds the result stays valid for
+        :type ttl: int
+        :param loader: Function doing the lookup, its result must be JSON
+        serializable
+        :return: The lookup result
+        """
+        lookups = self.state.setdefault(LOOKUPS, {})
+        entry = lookups.get(key)
+        now = time()
+        if entry and 0 <= now - entry['time'] < ttl:
+            return entry['value']
+        value = loader()
+        if value is None:
+            lookups.pop(key, None)
+        else:
+            lookups[key] = {'time': now, 'value': value}
+        return value
+
+    def forget(self, key):
+        """
+        Drop a cached lookup, e.g. after its result turned out to be stale
+        :param key: Name of the lookup
+        """
+        self.state.get(LOOKUPS, {}).pop(key, None)
+
+    def reported(self, key):
+        """
+        What was last reported for a key
+        :param key: e.g. the alarm name
+        :return: The value last reported, None if never reported
+        """
+        entry = self.state.get(REPORTED, {}).get(key)
+        return entry['value'] if entry else None
+
+    def needs_report(self, key, value, refresh):
+        """
+        Whether a value has to be reported: it differs from the value last
+        reported or that report is older than refresh seconds
+        :param key: e.g. the alarm name
+        :param value: The current value e.g. the alarm severity
+        :param refresh: Seconds after which an unchanged value is reported
+        again
+        :rtype: bool
+        """
+        entry = self.state.get(REPORTED, {}).get(key)
+        if not entry or entry['value'] != value:
+            return True
+        return not 0 <= time() - entry['time'] < refresh
+
+    def report(self, key, value):
+        """
+        Record a value as reported
+        :param key: e.g. the alarm name
+        :param value: The value reported, must be JSON serializable
+        """
+        self.state.setdefault(REPORTED, {})[key] = {'time': time(),
+                                                    'value': value}
+
+    def save(self):
+        """ Write the state file """
+        try:
+            with open(self.filename + '.tmp', 'w') as _writer:
+                dump(self.state, _writer)
+            os.rename(self.filename + '.tmp', self.filename)
+        except (IOError, OSError) as error:
+            self.log.warning('Could not save state to {0}: {1}'.format(
+                    self.filename, error))
@@ -11,8 +11,20 @@ Classes for SFS modifications
 # program(s) have been supplied.
 ##############################################################################
 import logging
-from time import sleep
+import re
+from collections import deque
+from contextlib import contextmanager
+from time import sleep, time
+
 from h_utils import read_enminst_config
+# pylint: disable=unused-import
+from h_util.h_nas_inventory import NasInventory, get_pool_prefix, \
+    is_fs_in_pool
+from h_util.h_nas_listing import ColumnLayout, iter_tabbed_data, \
+    map_tabbed_data
+# pylint: enable=unused-import
+from h_util.h_nas_session_pool import CONNECTION_ERRORS, NasSessionPool
+from h_util.h_ssh.client import SshClient
 # pylint: disable=import-error,no-name-in-module,unused-import
 from naslib.connection import NasConnection
 from naslib.log import NasLogger
@@ -28,6 +40,12 @@ EXCEPTION_MESSAGE = 'Remove snapshot failed with error below run ' \
                     'remove_snapshot again before any subsequent ' \
                     'attempt to create_snapshot.'
 
+# First interval between filesystem status polls, in seconds
+FS_STATUS_INTERVAL = 1
+
+# Number of output lines of a failed streamed command kept for its error
+STREAM_ERROR_LINES = 20
+
 
 def normalize_size(size):
     """
@@ -81,32 +99,6 @@ def get_rollback_name(prefix, fs_name):
     return '{0}-{1}'.format(prefix, fs_name)
 
 
-def get_pool_prefix(pool_name):
-    """
-    Get the storage pool prefix ENM/OSS format
-
-    :param pool_name: SFS storage pool name
-    :type  pool_name: str
-    :returns: The ENM/OSS filesystem prefix
-    :rtype: str
-    """
-    return '{0}-'.format(pool_name)
-
-
-def is_fs_in_pool(filesystem, storage_pool):
-    """
-    Test if a filesystem is in a storage pool
-
-    :param filesystem: The filesystem
-    :type  filesystem: str
-    :param storage_pool: SFS storage pool name
-    :type  storage_pool: str
-    :returns: True if in the storage pool; False otherwise
-    :rtype: bool
-    """
-    return filesystem.startswith(get_pool_prefix(storage_pool))
-
-
 class NasConsoleException(Exception):
     """
     Simple nasconsole exception
@@ -114,89 +106,49 @@ class NasConsoleException(Exception):
     pass
 
 
-def map_tabbed_data(data, id_key, fkl=0):  # pylint: disable=R0914
+class NasCommandStream(object):  # pylint: disable=too-few-public-methods
     """
-    Convert nasconsole command output in to a set of dictionaries.
-    The first line is used to get the length/width of each column
-
-    e.g. with id_key==NAME
-
-    NAME        TYPE     SNAPDATE         CHANGED_DATA SYNCED_DATA
-    L_enm-amos_ spaceopt 2016/02/01 08:30 192K(0.0%)   192K(0.0%)
-    L_enm-smrs_ spaceopt 2016/02/01 08:58 222K(0.0%)   333K(0.0%)
-
-    to
-
-    { 'L_enm-amos_': {
-        'NAME': 'L_enm-amos_',
-        'TYPE': 'spaceopt',
-        'SNAPDATE': '2016/02/01 08:30',
-        'CHANGED_DATA': '192K(0.0%)',
-        'SYNCED_DATA': '192K(0.0%)'}
-      ,
-      'L_enm-smrs_': {
-        'NAME': 'L_enm-smrs_',
-        'TYPE': 'spaceopt',
-        'SNAPDATE': '2016/02/01 08:58',
-        'CHANGED_DATA': '222K(0.0%)',
-        'SYNCED_DATA': '333K(0.0%)'}
-    }
-
-    :param data: The output of a nasconsole command
-    :param id_key:
-    :param fkl: The length of the 'id_key' value if known
-    :type fkl: int
-    :returns: Set of dictionaries, each dictionary storing a lines data
-    :rtype: dict
+    The output lines of a NAS command, see NasConsole.stream_nas_command.
+    Iterating the stream runs the command, iterate it once. Only the last
+    STREAM_ERROR_LINES lines are kept in memory, to report a failure.
     """
-    header_line = data[0]
-    headers = filter(None, header_line.split(' '))
-    header_indexes = {}
-    for idx in range(len(headers)):
-        start_index = header_line.index(headers[idx])
-        if idx >= len(headers) - 1:
-            end_index = -1
-        else:
-            end_index = header_line.index(headers[idx + 1])
-        header_indexes[headers[idx]] = (start_index, end_index)
-
-    # Yeah, some snap names are longer than expected which breaks the way this
-    # worked so the flk is the length of the snap name which is used to pad
-    # the indexes out...
-    #
-    # NAME                     TYPE           SNAPDATE
-    # Snapshot-ENM425-data     spaceopt       2017/01/30 12:2
-    #
-    # versus
-    #
-    # NAME                     TYPE           SNAPDATE
-    # Snapshot-ENM425-upgrade_indspaceopt       2017/01/30 12:27
-    #                         ^^^^^^^^^^^
-    if fkl > 0 and fkl > header_indexes[id_key][1]:
-        _pad = fkl - header_indexes[id_key][1]
-        for idx in range(len(headers)):
-            _orig = header_indexes[headers[idx]]
-            _padded = [_orig[0] + _pad, _orig[1] + _pad]
-            if idx == 0:
-                _padded = [_orig[0], _orig[1] + _pad]
-            if _orig[1] == -1:
-                _padded[1] = -1
-            header_indexes[headers[idx]] = _padded
-    # end of "workaround"........
-
-    mapped_data = {}
-    for line in data[1:]:
-        line = line.strip()
-        line_data = {}
-        for header, h_range in header_indexes.items():
-            start_index = h_range[0]
-            end_index = h_range[1]
-            if end_index == -1:
-                end_index = len(line)
-            value = line[start_index: end_index]
-            line_data[header] = value.strip()
-        mapped_data[line_data[id_key]] = line_data
-    return mapped_data
+
+    def __init__(self, session, command, callback=None, check=True):
+        """
+        :param session: Context manager giving the SshClient to run the
+        command on, None if the NAS has no CLI to run it on
+        :param command: The command to execute
+        :type command: str
+        :param callback: Called with each output line as it arrives
+        :type callback: callable
+        :param check: Raise a NasConsoleException if the command fails
+        :type check: bool
+        """
+        self.command = command
+        self.status = None
+        self._session = session
+        self._callback = callback
+        self._check = check
+
+    def __iter__(self):
+        if self._session is None:
+            self.status = 0
+            return
+        tail = deque(maxlen=STREAM_ERROR_LINES)
+        with self._session() as ssh:
+            lines = ssh.stream(self.command)
+            for line in lines:
+                line = line.strip()
+                tail.append(line)
+                if self._callback:
+                    self._callback(line)
+                yield line
+            self.status = lines.status
+        if self.status and self._check:
+            raise NasConsoleException('Command "{0}" failed with exit code '
+                                      '{1}: {2}'.format(self.command,
+                                                        self.status,
+                                                        '\n'.join(tail)))
 
 
 class NasConsole(object):  # pylint: disable=R0904
@@ -212,11 +164,18 @@ class NasConsole(object):  # pylint: disable=R0904
             username,
             password,
             ssh_port=22,
-            nas_type='veritas'
+            nas_type='veritas',
+            persistent=False,
+            sessions=1,
+            inventory=False
     ):  # pylint: disable=too-many-arguments
         """
         Connect to NAS
 
+        By default every method opens and closes its own SSH connection. In
+        persistent mode the connections are kept open in a NasSessionPool
+        until close() is called, use this for consoles running many commands.
+
         :param nasconsole: NAS management address
         :type nasconsole: str
         :param username: The user to connect as
@@ -228,18 +187,78 @@ class NasConsole(object):  # pylint: disable=R0904
         :param nas_type: The NAS type: 'veritas' or 'unityxt'
                                      : defaults to 'veritas'
         :type nas_type: str
+        :param persistent: Keep the SSH connections open between commands
+        :type persistent: bool
+        :param sessions: Maximum number of connections kept open in
+        persistent mode
+        :type sessions: int
+        :param inventory: Load the filesystem, usage, rollback, rollback
+        cache and share listings once and serve them from a NasInventory
+        :type inventory: bool
         """
         self.logger = logging.getLogger('enminst')
-        self.nas_connection = NasConnection(
-            nasconsole,
-            username,
-            password,
-            port=ssh_port,
-            nas_type=nas_type
-        )
+        self._connection_args = (nasconsole, username, password)
+        self._connection_kwargs = {'port': ssh_port, 'nas_type': nas_type}
+        self.nas_connection = NasConnection(*self._connection_args,
+                                            **self._connection_kwargs)
+        self._pool = None
+        self._ssh = None
+        if persistent:
+            self._pool = NasSessionPool(self._new_connection, sessions)
+        self.inventory = NasInventory({
+            NasInventory.FILESYSTEMS: self._list_filesystems,
+            NasInventory.USAGE: self._list_usage,
+            NasInventory.ROLLBACKS: self._list_rollbacks,
+            NasInventory.CACHES: self._list_rollback_caches,
+            NasInventory.SHARES: self._list_shares}, enabled=inventory)
         self.logger.debug('Connected to NAS; {0}@{1}'.format(username,
                                                              nasconsole))
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _new_connection(self):
+        """ A new connection to the NAS for the session pool """
+        return NasConnection(*self._connection_args,
+                             **self._connection_kwargs)
+
+    @contextmanager
+    def _nas(self):
+        """ Connection to run NAS commands on, borrowed from the session pool
+        in persistent mode and opened for the block otherwise.
+
+        :returns: The naslib driver of the connection
+        """
+        if self._pool is None:
+            with self.nas_connection as nas:
+                yield nas
+        else:
+            with self._pool.session() as nas:
+                yield nas
+
+    def session_stats(self):
+        """ Connection reuse counts of a persistent console
+
+        :returns: Number of connections opened, reused and dropped, None if
+        the console is not persistent
+        :rtype: dict
+        """
+        if self._pool is None:
+            return None
+        return dict(self._pool.stats)
+
+    def close(self):
+        """ Close the connections of a persistent console """
+        if self._pool is None:
+            return
+        if self._ssh is not None:
+            self._ssh.close()
+            self._ssh = None
+        self._pool.close()
+
     def exec_basic_nas_command(self, command, env='', as_master=False):
         # pylint: disable=unused-argument
         """
@@ -253,7 +272,7 @@ class NasConsole(object):  # pylint: disable=R0904
         """
         command = "export TERM=xterm;" + command
         if self.nas_connection.nas_type != "unityxt":
-            with self.nas_connection as nas:
+            with self._nas() as nas:
                 vxcmd = VxCommands(nas)
                 try:
                     stdout = vxcmd.execute_cmd(command)
@@ -265,7 +284,7 @@ class NasConsole(object):  # pylint: disable=R0904
                         return_code = 1
                     return (return_code, err_str, err_str, command)
         else:
-            with self.nas_connection as nas:
+            with self._nas() as nas:
                 stdout = u''
         stdout = stdout.rstrip('\n')
         stdout_list = map(unicode.strip, stdout.split(u'\n'))
@@ -286,16 +305,71 @@ class NasConsole(object):  # pylint: disable=R0904
         """
         command = "export TERM=xterm;" + command
         if self.nas_connection.nas_type != "unityxt":
-            with self.nas_connection as nas:
+            with self._nas() as nas:
                 vxcmd = VxCommands(nas)
                 stdout = vxcmd.execute(command)
         else:
-            with self.nas_connection as nas:
+            with self._nas() as nas:
                 stdout = u''
         stdout = stdout.rstrip('\n')
         stdout_list = map(unicode.strip, stdout.split(u'\n'))
         return map(str, stdout_list)
 
+    def _stream_client(self):
+        """ SSH client for streamed commands, kept open in persistent mode
+
+        :rtype: SshClient
+        """
+        if self._ssh is not None:
+            return self._ssh
+        host, username, password = self._connection_args
+        ssh = SshClient(host, username, password,
+                        port=self._connection_kwargs['port'])
+        if self._pool is not None:
+            self._ssh = ssh
+        return ssh
+
+    @contextmanager
+    def _stream_session(self):
+        """ SSH client to stream a command on, closed afterwards unless the
+        console is persistent or dropped if the connection failed.
+
+        :rtype: SshClient
+        """
+        ssh = self._stream_client()
+        try:
+            yield ssh
+        except CONNECTION_ERRORS:
+            ssh.close()
+            raise
+        finally:
+            if ssh is not self._ssh:
+                ssh.close()
+
+    def stream_nas_command(self, command, callback=None, check=True):
+        """
+        Execute a command on the NAS (over ssh) and get the lines of its
+        output as they arrive, for commands running long enough to need
+        progress reporting. The command runs when the returned stream is
+        iterated.
+
+        :param command: The command to execute
+        :type command: str
+        :param callback: Called with each output line as it arrives
+        :type callback: callable
+        :param check: Raise a NasConsoleException once all the output has
+        been read if the exit code of the command is >=1
+        :type check: bool
+        :return: The output lines, with the exit code in status once they
+        have all been read
+        :rtype: NasCommandStream
+        """
+        session = None
+        if self.nas_connection.nas_type != "unityxt":
+            session = self._stream_session
+        return NasCommandStream(session, "export TERM=xterm;" + command,
+                                callback=callback, check=check)
+
     def nfs_share_show(self, storage_pool):
         """
         Get a list of exports for filesystems in a storage pool
@@ -305,8 +379,12 @@ class NasConsole(object):  # pylint: disable=R0904
         :return: Collection of exports for filesystems
         :rtype: dict
         """
+        return self.inventory.get(NasInventory.SHARES, storage_pool)
+
+    def _list_shares(self, storage_pool):
+        """ Load the exports of the filesystems in a storage pool """
         share_exports = {}
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             for share in nas.share.list():
                 fs_name = share.name.split('/')[-1]
                 if is_fs_in_pool(fs_name, storage_pool):
@@ -336,8 +414,10 @@ class NasConsole(object):  # pylint: disable=R0904
         """
         if self.nas_connection.nas_type != "unityxt":
             filesystem = NasConsole.VX_PATH_PREFIX + filesystem
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             nas.share.delete(filesystem, client)
+        self.inventory.forget(NasInventory.SHARES,
+                              filesystem.split('/')[-1])
 
     def storage_fs_list(self, storage_pool):
         """
@@ -348,8 +428,12 @@ class NasConsole(object):  # pylint: disable=R0904
         :return: Collecion of filesystems in the storage pool
         :rtype: dict
         """
+        return self.inventory.get(NasInventory.FILESYSTEMS, storage_pool)
+
+    def _list_filesystems(self, storage_pool):
+        """ Load the filesystems of a storage pool """
         filesystems = {}
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             for filesystem in nas.filesystem.list():
                 if is_fs_in_pool(filesystem.name, storage_pool):
                     if self.nas_connection.nas_type != "unityxt":
@@ -379,8 +463,12 @@ class NasConsole(object):  # pylint: disable=R0904
         with used space as X%
         :rtype: dict
         """
+        return self.inventory.get(NasInventory.USAGE, storage_pool)
+
+    def _list_usage(self, storage_pool):
+        """ Load the used space of the filesystems of a storage pool """
         usage = []
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             for filesystem in nas.filesystem.usage():
                 if is_fs_in_pool(filesystem['FileSystem'], storage_pool):
                     usage.append(filesystem)
@@ -397,7 +485,7 @@ class NasConsole(object):  # pylint: disable=R0904
         :rtype: boolean
         """
         try:
-            with self.nas_connection as nas:
+            with self._nas() as nas:
                 for fsdetails in nas.filesystem.list():
                     if is_fs_in_pool(fsdetails.name, storage_pool):
                         if nas.filesystem.is_restore_running(fsdetails.name):
@@ -417,7 +505,7 @@ class NasConsole(object):  # pylint: disable=R0904
         :returns: Detailed info on the NAS filesystem
         """
         fs_details = []
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             if self.nas_connection.nas_type != "unityxt":
                 # pylint: disable=protected-access
                 fsdetails = nas.filesystem._properties(fs_name)
@@ -439,52 +527,115 @@ class NasConsole(object):  # pylint: disable=R0904
         :param filesystem: The filesystem to destroy
         :type filesystem: str
         """
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             nas.filesystem.delete(filesystem)
+        self.inventory.filesystem_destroyed(filesystem)
 
     def storage_fs_create(self, name, size, pool, layout_or_nas_server):
         """
         Create a filesystem
         """
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             nas.filesystem.create(name, size, pool, layout_or_nas_server)
+        self.inventory.forget(NasInventory.FILESYSTEMS, name)
+        self.inventory.forget(NasInventory.USAGE, name)
 
-    def ensure_fs_status(self, filesystem, storage_pool, status):
+    def fs_status(self, filesystems, storage_pool):
         """
-        Ensure that a filesystem is online/offline
+        Get the status of some filesystems of a storage pool, with a single
+        listing of the NAS filesystems filtered to the requested ones
 
-        :param filesystem: The filesystem to determine the status of
-        :type filesystem: str
+        :param filesystems: The filesystems to get the status of
+        :type filesystems: list
         :param storage_pool: The storage pool name
         :type storage_pool: str
-        :param status: The status to check
+        :returns: 'online' or 'offline' per filesystem, filesystems not found
+        are not included
+        :rtype: dict
+        """
+        wanted = set(filesystems)
+        statuses = {}
+        with self._nas() as nas:
+            for filesystem in nas.filesystem.list():
+                if filesystem.name in wanted and \
+                        is_fs_in_pool(filesystem.name, storage_pool):
+                    statuses[filesystem.name] = \
+                        'online' if filesystem.online else 'offline'
+        for filesystem, status in statuses.items():
+            self.inventory.filesystem_status(filesystem, status)
+        return statuses
+
+    def wait_fs_status(self, filesystems, storage_pool, status):
+        """
+        Wait for filesystems to be online/offline
+
+        Each poll queries the status of all the filesystems still waited on
+        at once. The interval between polls starts at FS_STATUS_INTERVAL and
+        doubles up to the interval of the fs_status_check setting; the wait
+        gives up once both the number of checks and the time that setting
+        allows have been used.
+
+        :param filesystems: The filesystems to wait for
+        :type filesystems: list
+        :param storage_pool: The storage pool name
+        :type storage_pool: str
+        :param status: The status to wait for
         :type status: string
+        :returns: The number of polls each filesystem needed
+        :rtype: dict
         """
-        status_check = 'offline'
-        if status == 'offline':
-            if self.nas_connection.nas_type == "unityxt":
-                self.logger.info('\'offline\' status is not applicable '\
-                                 'to UnityXT - continuing')
-                return
-            status_check = 'online'
+        if status == 'offline' and \
+                self.nas_connection.nas_type == "unityxt":
+            self.logger.info('\'offline\' status is not applicable '\
+                             'to UnityXT - continuing')
+            return dict((filesystem, 0) for filesystem in filesystems)
         config = read_enminst_config()
         property_fs_status_check = config['fs_status_check'].split(',')
         check_interval = int(property_fs_status_check[0])
         num_checks = int(property_fs_status_check[1])
+        waiting = set(filesystems)
+        self.logger.info('Waiting for filesystem(s) {0} to {1}...'
+                         .format(', '.join(sorted(waiting)), status))
+        polls = {}
         count = 0
-        self.logger.info('Waiting for filesystem \'{0}\' to {1}...'
-                         .format(filesystem, status))
-        while (self.storage_fs_list(storage_pool)[filesystem]['status'] ==
-               status_check and count != num_checks):
+        interval = min(FS_STATUS_INTERVAL, check_interval)
+        started = time()
+        while waiting:
+            if count >= num_checks and \
+                    time() - started >= check_interval * num_checks:
+                error = '{0} not {1}. Queried {2} times for {1} status.'\
+                        .format(', '.join('\'{0}\''.format(filesystem)
+                                          for filesystem in sorted(waiting)),
+                                status, count)
+                raise NasConsoleException(error)
+            if count:
+                sleep(interval)
+                interval = min(interval * 2, check_interval)
             count += 1
-            sleep(check_interval)
-        if count == num_checks:
-            error = '\'{0}\' is not {1}. \'{0}\' was queried '\
-                    '{2} times for {1} status.'\
-                    .format(filesystem, status, num_checks)
-            raise Exception(error)
-        else:
-            self.logger.info('\'{0}\' is {1}'.format(filesystem, status))
+            statuses = self.fs_status(sorted(waiting), storage_pool)
+            for filesystem in sorted(waiting):
+                if statuses.get(filesystem) == status:
+                    waiting.remove(filesystem)
+                    polls[filesystem] = count
+                    self.logger.info('\'{0}\' is {1}'.format(filesystem,
+                                                             status))
+        return polls
+
+    def ensure_fs_status(self, filesystem, storage_pool, status):
+        """
+        Ensure that a filesystem is online/offline
+
+        :param filesystem: The filesystem to determine the status of
+        :type filesystem: str
+        :param storage_pool: The storage pool name
+        :type storage_pool: str
+        :param status: The status to check
+        :type status: string
+        :returns: The number of polls needed
+        :rtype: int
+        """
+        return self.wait_fs_status([filesystem], storage_pool,
+                                   status)[filesystem]
 
     def storage_fs_offline(self, filesystem):
         """
@@ -493,8 +644,9 @@ class NasConsole(object):  # pylint: disable=R0904
         :param filesystem: Changing the filesystem to an offline state
         :type filesystem: str
         """
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             nas.filesystem.online(filesystem, False)
+        self.inventory.forget(NasInventory.FILESYSTEMS, filesystem)
 
     def support_fs_destroy(self, filesystem):
         """
@@ -504,12 +656,13 @@ class NasConsole(object):  # pylint: disable=R0904
         :type filesystem: str
         """
         if self.nas_connection.nas_type != "unityxt":
-            with self.nas_connection as nas:
+            with self._nas() as nas:
                 vxcmd = VxCommands(nas)
                 vxcmd.execute('vxedit -g sfsdg -rf rm {0}'.format(filesystem))
         else:
-            with self.nas_connection as nas:
+            with self._nas() as nas:
                 nas.filesystem.delete(filesystem)
+        self.inventory.filesystem_destroyed(filesystem)
 
     def storage_rollback_list(self, storage_pool, snap_prefix):
         """
@@ -522,16 +675,21 @@ class NasConsole(object):  # pylint: disable=R0904
         :return: Collecion of rollbacks (and the filesystem they're covering)
         :rtype: dict
         """
+        rollbacks = self.inventory.get(NasInventory.ROLLBACKS, storage_pool)
+        if '*' != snap_prefix:
+            for filesystem, snapnames in rollbacks.items():
+                rollbacks[filesystem] = [snapname for snapname in snapnames
+                                         if snapname.startswith(snap_prefix)]
+        return rollbacks
+
+    def _list_rollbacks(self, storage_pool):
+        """ Load all the rollbacks of the filesystems in a storage pool """
         rollbacks = {}
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             for snap in nas.snapshot.list():
-                snapname = snap.name
-                filesystem = snap.filesystem
-                if is_fs_in_pool(filesystem, storage_pool):
-                    if filesystem not in rollbacks:
-                        rollbacks[filesystem] = []
-                    if '*' == snap_prefix or snapname.startswith(snap_prefix):
-                        rollbacks[filesystem].append(snapname)
+                if is_fs_in_pool(snap.filesystem, storage_pool):
+                    rollbacks.setdefault(snap.filesystem, []).append(
+                            snap.name)
         return rollbacks
 
     def storage_rollback_info(self, rollback_name):
@@ -543,9 +701,9 @@ class NasConsole(object):  # pylint: disable=R0904
         :returns: Some usage one the rollback
         :rtype: dict
         """
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             stdout = nas.snapshot.rollbackinfo(rollback_name)
-        return map_tabbed_data(stdout, 'NAME', len(rollback_name))
+        return map_tabbed_data(stdout, 'NAME')
 
     def storage_rollback_destroy(self, rollback_name, filesystem):
         """
@@ -557,8 +715,9 @@ class NasConsole(object):  # pylint: disable=R0904
         :type filesystem: str
         :param filesystem:
         """
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             nas.snapshot.delete(rollback_name, filesystem)
+        self.inventory.rollback_destroyed(rollback_name, filesystem)
 
     def storage_rollback_cache_list(self):
         """
@@ -566,8 +725,12 @@ class NasConsole(object):  # pylint: disable=R0904
 
         :return: str[]
         """
+        return self.inventory.get(NasInventory.CACHES)
+
+    def _list_rollback_caches(self, _storage_pool=None):
+        """ Load the rollback caches """
         cache_list = {}
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             for cache in nas.cache.list():
                 cache_size = int(normalize_size(str(getattr(cache, 'size'))))
                 cache_used = int(normalize_size(str(getattr(cache, 'used'))))
@@ -587,8 +750,9 @@ class NasConsole(object):  # pylint: disable=R0904
         """
         if self.nas_connection.nas_type == "unityxt":
             return
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             nas.cache.delete(cache_name)
+        self.inventory.forget(NasInventory.CACHES)
 
     def storage_rollback_cache_create(self, cache_name, cache_size,
                                       storage_pool):
@@ -604,8 +768,9 @@ class NasConsole(object):  # pylint: disable=R0904
         """
         if self.nas_connection.nas_type == "unityxt":
             return
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             nas.cache.create(cache_name, cache_size, storage_pool)
+        self.inventory.forget(NasInventory.CACHES)
 
     def storage_rollback_create(self, rollback_name, filesystem, cache_name,
                                 cache_type='space-optimized'):
@@ -620,8 +785,29 @@ class NasConsole(object):  # pylint: disable=R0904
         :param cache_name: cache name
         :type cache_type: cache type
         """
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             nas.snapshot.create(rollback_name, filesystem, cache_name)
+        self.inventory.rollback_created(rollback_name, filesystem)
+
+    def storage_rollback_create_batch(self, rollbacks, cache_name):
+        """
+        Create rollbacks for a set of filesystems, one after the other over
+        the same NAS connection. Each rollback is still its own NAS command.
+        Stops at the first rollback that fails. The connection is held until
+        the generator is exhausted or closed.
+
+        :param rollbacks: (rollback name, filesystem name) pairs
+        :type rollbacks: list
+        :param cache_name: cache name
+        :type cache_name: str
+        :return: Generator of the (rollback name, filesystem name) pairs
+        created, as each one completes
+        """
+        with self._nas() as nas:
+            for rollback_name, filesystem in rollbacks:
+                nas.snapshot.create(rollback_name, filesystem, cache_name)
+                self.inventory.rollback_created(rollback_name, filesystem)
+                yield rollback_name, filesystem
 
     def storage_rollback_restore(self, filesystem, snapshot):
         """
@@ -632,8 +818,10 @@ class NasConsole(object):  # pylint: disable=R0904
         :param snapshot: Snapshot name
         :type snapshot: str
         """
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             nas.snapshot.restore(snapshot, filesystem)
+        self.inventory.forget(NasInventory.FILESYSTEMS, filesystem)
+        self.inventory.forget(NasInventory.USAGE, filesystem)
 
     def storage_fs_online(self, filesystem):
         """
@@ -641,8 +829,9 @@ class NasConsole(object):  # pylint: disable=R0904
         :param filesystem: filesystem name
         :type filesystem: str
         """
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             nas.filesystem.online(filesystem, True)
+        self.inventory.forget(NasInventory.FILESYSTEMS, filesystem)
 
     def nfs_share_add(self, filesystem, client, options):
         """
@@ -657,8 +846,10 @@ class NasConsole(object):  # pylint: disable=R0904
         """
         if self.nas_connection.nas_type != "unityxt":
             filesystem = NasConsole.VX_PATH_PREFIX + filesystem
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             nas.share.create(filesystem, client, options)
+        self.inventory.forget(NasInventory.SHARES,
+                              filesystem.split('/')[-1])
 
     def ip_route_show(self):
         """
@@ -677,7 +868,7 @@ class NasConsole(object):  # pylint: disable=R0904
         :rtype: dict
         """
         nasservers = {}
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             for nasserver in nas.nasserver.list():
                 nasservers[nasserver.name] = {
                     'ns': nasserver.name,
@@ -706,7 +897,7 @@ class NasConsole(object):  # pylint: disable=R0904
         :param ndmp_pass: NDMP user's password
         :type ndmp_pass: str
         """
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             nas.nasserver.create(
                 name,
                 pool,
@@ -723,7 +914,7 @@ class NasConsole(object):  # pylint: disable=R0904
         :param name: The NAS server to destroy
         :type name: str
         """
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             nas.nasserver.delete(name)
 
     def nas_server_list_details(self, name):
@@ -735,6 +926,6 @@ class NasConsole(object):  # pylint: disable=R0904
         :return: Collection of NAS server details
         :rtype: dict
         """
-        with self.nas_connection as nas:
+        with self._nas() as nas:
             ns_details = nas.nasserver.get_nasserver_details(name)
         return ns_details
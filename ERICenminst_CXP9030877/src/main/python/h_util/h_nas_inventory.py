@@ -0,0 +1,168 @@
+"""
+NAS listings cached per storage pool
+"""
+##############################################################################
+# COPYRIGHT Ericsson AB 2026
+#
+# The copyright to the computer program(s) herein is the property of
+# Ericsson AB. The programs may be used and/or copied only with written
+# permission from Ericsson AB. or in accordance with the terms and
+# conditions stipulated in the agreement/contract under which the
+# program(s) have been supplied.
+##############################################################################
+import threading
+from copy import deepcopy
+
+
+def get_pool_prefix(pool_name):
+    """
+    Get the storage pool prefix ENM/OSS format
+
+    :param pool_name: SFS storage pool name
+    :type  pool_name: str
+    :returns: The ENM/OSS filesystem prefix
+    :rtype: str
+    """
+    return '{0}-'.format(pool_name)
+
+
+def is_fs_in_pool(filesystem, storage_pool):
+    """
+    Test if a filesystem is in a storage pool
+
+    :param filesystem: The filesystem
+    :type  filesystem: str
+    :param storage_pool: SFS storage pool name
+    :type  storage_pool: str
+    :returns: True if in the storage pool; False otherwise
+    :rtype: bool
+    """
+    return filesystem.startswith(get_pool_prefix(storage_pool))
+
+
+class NasInventory(object):
+    """
+    Listings of a NAS (filesystems, usage, rollbacks, rollback caches and
+    shares) loaded once per storage pool and served from memory afterwards.
+
+    NasConsole tells the inventory about the changes it makes so the cached
+    listings follow them: small changes are applied in place, others drop the
+    listings they affect so they are loaded again on their next use.
+    refresh() drops everything.
+
+    A disabled inventory loads every listing on each use, as NasConsole
+    always did.
+    """
+    FILESYSTEMS = 'filesystems'
+    USAGE = 'usage'
+    ROLLBACKS = 'rollbacks'
+    CACHES = 'caches'
+    SHARES = 'shares'
+
+    def __init__(self, loaders, enabled=True):
+        """
+        :param loaders: Function loading each listing, called with the
+        storage pool name (None for the rollback caches)
+        :type loaders: dict
+        :param enabled: Cache the listings
+        :type enabled: bool
+        """
+        self._loaders = loaders
+        self.enabled = enabled
+        self._listings = {}
+        self._lock = threading.RLock()
+        self.loads = 0
+
+    def get(self, listing, storage_pool=None):
+        """
+        A listing of a storage pool, loaded if it is not cached
+
+        :param listing: One of the listing names e.g. NasInventory.ROLLBACKS
+        :type listing: str
+        :param storage_pool: The storage pool name
+        :type storage_pool: str
+        :returns: A copy of the listing, callers are free to change it
+        """
+        with self._lock:
+            key = (listing, storage_pool)
+            if key in self._listings:
+                return deepcopy(self._listings[key])
+            data = self._loaders[listing](storage_pool)
+            self.loads += 1
+            if self.enabled:
+                self._listings[key] = data
+                return deepcopy(data)
+            return data
+
+    def refresh(self, storage_pool=None):
+        """
+        Drop the cached listings so they are loaded again
+
+        :param storage_pool: Only drop the listings of this pool, the
+        rollback caches are always dropped
+        :type storage_pool: str
+        """
+        with self._lock:
+            for key in self._listings.keys():
+                if storage_pool is None or key[1] in (storage_pool, None):
+                    del self._listings[key]
+
+    def _pools_of(self, listing, filesystem):
+        """ Cached listings of the pools a filesystem is in """
+        for (name, storage_pool), data in self._listings.items():
+            if name == listing and storage_pool is not None and \
+                    is_fs_in_pool(filesystem, storage_pool):
+                yield storage_pool, data
+
+    def forget(self, listing, filesystem=None):
+        """
+        Drop a listing so it is loaded again on its next use
+
+        :param listing: The listing name
+        :type listing: str
+        :param filesystem: Only drop the listings of the pool(s) this
+        filesystem is in
+        :type filesystem: str
+        """
+        with self._lock:
+            if filesystem is None:
+                keys = [key for key in self._listings if key[0] == listing]
+            else:
+                keys = [(listing, storage_pool) for storage_pool, _ in
+                        list(self._pools_of(listing, filesystem))]
+            for key in keys:
+                del self._listings[key]
+
+    def rollback_created(self, rollback_name, filesystem):
+        """ Add a new rollback to the cached rollback listings """
+        with self._lock:
+            for _, rollbacks in self._pools_of(self.ROLLBACKS, filesystem):
+                names = rollbacks.setdefault(filesystem, [])
+                if rollback_name not in names:
+                    names.append(rollback_name)
+
+    def rollback_destroyed(self, rollback_name, filesystem):
+        """ Remove a destroyed rollback from the cached rollback listings """
+        with self._lock:
+            for _, rollbacks in self._pools_of(self.ROLLBACKS, filesystem):
+                names = rollbacks.get(filesystem, [])
+                if rollback_name in names:
+                    names.remove(rollback_name)
+                if not names:
+                    rollbacks.pop(filesystem, None)
+
+    def filesystem_status(self, filesystem, status):
+        """ Record the observed status of a filesystem """
+        with self._lock:
+            for _, filesystems in self._pools_of(self.FILESYSTEMS,
+                                                 filesystem):
+                if filesystem in filesystems:
+                    filesystems[filesystem]['status'] = status
+
+    def filesystem_destroyed(self, filesystem):
+        """ Remove a destroyed filesystem from the cached listings """
+        with self._lock:
+            for listing in (self.FILESYSTEMS, self.ROLLBACKS, self.SHARES):
+                for _, data in self._pools_of(listing, filesystem):
+                    data.pop(filesystem, None)
+            self.forget(self.USAGE, filesystem)
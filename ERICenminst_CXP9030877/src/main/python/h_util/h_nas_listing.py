@@ -0,0 +1,142 @@
+"""
+Parsing of the column aligned listings printed by the NAS console
+"""
+##############################################################################
+# COPYRIGHT Ericsson AB 2026
+#
+# The copyright to the computer program(s) herein is the property of
+# Ericsson AB. The programs may be used and/or copied only with written
+# permission from Ericsson AB. or in accordance with the terms and
+# conditions stipulated in the agreement/contract under which the
+# program(s) have been supplied.
+##############################################################################
+import re
+
+
+class ColumnLayout(object):
+    """
+    Column positions of a NAS listing, taken once from its header line and
+    used to split each data line.
+
+    Values are left aligned under their header. When the value of the first
+    column is longer than its column it runs into the second one without a
+    separator and the rest of the line is shifted right, e.g.
+
+    NAME                     TYPE           SNAPDATE
+    Snapshot-ENM425-data     spaceopt       2017/01/30 12:27
+    Snapshot-ENM425-upgrade_indspaceopt       2017/01/30 12:27
+
+    The shift is found from the columns after the second one: it is the
+    smallest one that puts each of them at the start of a value or on an
+    empty value.
+    """
+
+    _HEADER = re.compile(r'\S+')
+
+    def __init__(self, header_line):
+        """
+        :param header_line: The header line of the listing
+        :type header_line: str
+        """
+        header_line = header_line.rstrip('\r\n')
+        matches = list(ColumnLayout._HEADER.finditer(header_line))
+        self.headers = [match.group() for match in matches]
+        self.starts = [match.start() for match in matches]
+
+    def _aligned(self, line, shift):
+        """ Check the columns after the second one line up with the line
+        when shifted right by 'shift' characters """
+        for index in range(2, len(self.starts)):
+            start = self.starts[index] + shift
+            if start >= len(line):
+                return True
+            if line[start - 1] == ' ' and line[start] != ' ':
+                continue
+            end = len(line) if index == len(self.starts) - 1 else \
+                self.starts[index + 1] + shift
+            if line[start:end].strip():
+                return False
+        return True
+
+    def _shift(self, line):
+        """ Number of characters the first column overflows by """
+        if len(self.starts) < 3 or self._aligned(line, 0):
+            return 0
+        for shift in range(1, len(line) - self.starts[2]):
+            if self._aligned(line, shift):
+                return shift
+        return 0
+
+    def parse(self, line):
+        """
+        Split a data line in to its column values
+
+        :param line: A line of the listing
+        :type line: str
+        :returns: The stripped value of each column, by header
+        :rtype: dict
+        """
+        line = line.rstrip('\r\n')
+        shift = self._shift(line)
+        bounds = [0] + [start + shift for start in self.starts[1:]] + \
+                 [len(line)]
+        return dict((header, line[bounds[index]:bounds[index + 1]].strip())
+                    for index, header in enumerate(self.headers))
+
+
+def iter_tabbed_data(lines):
+    """
+    Lazily convert the lines of a nasconsole listing in to dictionaries, the
+    first line is the header giving the column positions.
+
+    :param lines: The lines of the listing, any iterable
+    :returns: Generator of a dictionary per (non blank) data line
+    """
+    layout = None
+    for line in lines:
+        if not line.strip():
+            continue
+        if layout is None:
+            layout = ColumnLayout(line)
+            continue
+        yield layout.parse(line)
+
+
+def map_tabbed_data(data, id_key, fkl=0):  # pylint: disable=unused-argument
+    """
+    Convert nasconsole command output in to a set of dictionaries.
+    The first line is used to get the length/width of each column
+
+    e.g. with id_key==NAME
+
+    NAME        TYPE     SNAPDATE         CHANGED_DATA SYNCED_DATA
+    L_enm-amos_ spaceopt 2016/02/01 08:30 192K(0.0%)   192K(0.0%)
+    L_enm-smrs_ spaceopt 2016/02/01 08:58 222K(0.0%)   333K(0.0%)
+
+    to
+
+    { 'L_enm-amos_': {
+        'NAME': 'L_enm-amos_',
+        'TYPE': 'spaceopt',
+        'SNAPDATE': '2016/02/01 08:30',
+        'CHANGED_DATA': '192K(0.0%)',
+        'SYNCED_DATA': '192K(0.0%)'}
+      ,
+      'L_enm-smrs_': {
+        'NAME': 'L_enm-smrs_',
+        'TYPE': 'spaceopt',
+        'SNAPDATE': '2016/02/01 08:58',
+        'CHANGED_DATA': '222K(0.0%)',
+        'SYNCED_DATA': '333K(0.0%)'}
+    }
+
+    :param data: The output of a nasconsole command
+    :param id_key:
+    :param fkl: Not used, overflowing 'id_key' values are detected by
+    ColumnLayout
+    :type fkl: int
+    :returns: Set of dictionaries, each dictionary storing a lines data
+    :rtype: dict
+    """
+    return dict((line_data[id_key], line_data)
+                for line_data in iter_tabbed_data(data))
@@ -0,0 +1,147 @@
+"""
+Pool of open NAS console connections
+"""
+##############################################################################
+# COPYRIGHT Ericsson AB 2026
+#
+# The copyright to the computer program(s) herein is the property of
+# Ericsson AB. The programs may be used and/or copied only with written
+# permission from Ericsson AB. or in accordance with the terms and
+# conditions stipulated in the agreement/contract under which the
+# program(s) have been supplied.
+##############################################################################
+import socket
+import threading
+from contextlib import contextmanager
+
+from paramiko import SSHException
+
+# pylint: disable=import-error,no-name-in-module
+from naslib.nasexceptions import NasConnectionException
+# pylint: enable=import-error,no-name-in-module
+
+# Errors that leave a NAS session unusable, the session is dropped and the
+# next command opens a new one.
+CONNECTION_ERRORS = (NasConnectionException, SSHException, socket.error,
+                     EOFError)
+
+
+class NasSessionPool(object):
+    """
+    Authenticated NAS connections kept open between commands.
+
+    Every command borrows an open connection and naslib runs it on a new
+    channel of that connection's transport, so only the first command pays
+    for the key exchange and authentication. All the connections go to the
+    same NAS console address.
+
+    A connection that fails with one of the CONNECTION_ERRORS, or is found
+    closed when it is next borrowed, is dropped and replaced by a new one.
+    """
+
+    def __init__(self, factory, size=1):
+        """
+        :param factory: Callable returning a new (not yet entered)
+        NasConnection
+        :param size: Maximum number of connections open at a time
+        :type size: int
+        """
+        self._factory = factory
+        self._size = max(1, size)
+        self._idle = []
+        self._open = 0
+        self._cond = threading.Condition()
+        self.stats = {'opened': 0, 'reused': 0, 'dropped': 0}
+
+    @staticmethod
+    def _is_alive(session):
+        """ Check the transport of an idle connection is still up """
+        ssh = getattr(session[0], 'ssh', None)
+        is_connected = getattr(ssh, 'is_connected', None)
+        return is_connected is None or bool(is_connected())
+
+    def _open_session(self):
+        """ Open and authenticate a new connection """
+        connection = self._factory()
+        nas = connection.__enter__()  # pylint: disable=no-member
+        with self._cond:
+            self.stats['opened'] += 1
+        return connection, nas
+
+    @staticmethod
+    def _close_session(session):
+        """ Close a connection, errors are ignored as it is not used again """
+        try:
+            session[0].__exit__(None, None, None)
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    def _checkout(self):
+        """ Borrow an idle connection or open a new one """
+        with self._cond:
+            while True:
+                if self._idle:
+                    session = self._idle.pop()
+                    break
+                if self._open < self._size:
+                    self._open += 1
+                    session = None
+                    break
+                self._cond.wait()
+        try:
+            if session is not None and not self._is_alive(session):
+                with self._cond:
+                    self.stats['dropped'] += 1
+                self._close_session(session)
+                session = None
+            if session is None:
+                return self._open_session()
+        except BaseException:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.stats['reused'] += 1
+        return session
+
+    def _checkin(self, session):
+        """ Give a connection back to the pool """
+        with self._cond:
+            self._idle.append(session)
+            self._cond.notify()
+
+    def _drop(self, session):
+        """ Close a failed connection and free its place in the pool """
+        self._close_session(session)
+        with self._cond:
+            self._open -= 1
+            self.stats['dropped'] += 1
+            self._cond.notify()
+
+    @contextmanager
+    def session(self):
+        """ Borrow a connection for the enclosed block
+
+        :returns: The naslib driver of the connection
+        """
+        session = self._checkout()
+        try:
+            yield session[1]
+        except CONNECTION_ERRORS:
+            self._drop(session)
+            raise
+        except BaseException:
+            self._checkin(session)
+            raise
+        else:
+            self._checkin(session)
+
+    def close(self):
+        """ Close all the idle connections """
+        with self._cond:
+            sessions = self._idle
+            self._idle = []
+            self._open -= len(sessions)
+        for session in sessions:
+            self._close_session(session)
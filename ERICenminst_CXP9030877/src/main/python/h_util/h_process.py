@@ -0,0 +1,151 @@
+""" Module to run local commands, reading their output while they run so
+a command with a lot of output can not block on a full pipe, and returning
+as soon as the command exits."""
+import os
+import signal
+import subprocess
+import threading
+from collections import namedtuple
+from time import time
+
+from h_util.h_timing import sec_pretty
+
+# Commands that may install or remove packages
+PACKAGE_COMMANDS = ('rpm', 'yum')
+
+
+class ProcessResult(namedtuple('ProcessResult',
+                               'returncode output duration')):
+    """ Exit code, combined stdout and stderr, and seconds the command took
+    """
+    __slots__ = ()
+
+
+class ProcessTimeout(Exception):
+    """ The command did not finish in time and was killed """
+
+    def __init__(self, command, timeout, output):
+        """
+        :param command: The command
+        :param timeout: The timeout in seconds
+        :param output: Output of the command up to the timeout
+        """
+        super(ProcessTimeout, self).__init__(
+                'Command timed out after {0}s: {1}'.format(timeout, command))
+        self.command = command
+        self.timeout = timeout
+        self.output = output
+
+
+def package_command(command):
+    """ The package command and operation a command runs, if it may change
+    the installed packages.
+
+    :param command: The command, a string or a list of arguments
+    :returns: e.g. 'yum install', None if the command is not an rpm or yum
+    command
+    :rtype: str
+    """
+    words = command.split() if isinstance(command, basestring) else command
+    if words and os.path.basename(words[0]) in PACKAGE_COMMANDS:
+        return ' '.join(words[:2])
+    return None
+
+
+def flush_after(command):
+    """ Drop the cached output of the read-only commands of h_utils after a
+    command that may have installed or removed packages.
+
+    :param command: The command that ran, a string or a list of arguments
+    """
+    changed = package_command(command)
+    if changed:
+        # Imported here, h_utils imports this module
+        from h_util.h_utils import flush_command_cache
+        flush_command_cache(changed)
+
+
+def _kill_group(process):
+    """ Kill a command and every process it started
+    :param process: The command process, leader of its process group
+    :type process: subprocess.Popen
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        # Already gone
+        pass
+
+
+# pylint: disable=too-many-arguments
+def run_process(command, timeout=None, shell=True, logger=None,
+                log_output=False, label=None):
+    """ Run a command and wait for it to exit.
+
+    The command runs in its own process group so that on timeout it is
+    killed together with any process it started. Its stdin is /dev/null,
+    a command in a background process group reading the terminal would
+    be stopped until the timeout.
+
+    :param command: The command, a string if shell is True else a list
+    :param timeout: Seconds the command may run for, None for no limit
+    :param shell: Run the command through the shell
+    :param logger: Logger for the duration and, with log_output, the output
+    lines of the command; nothing is logged if None
+    :param log_output: Log each output line as the command writes it
+    :param label: How the command is shown in the logs, e.g. to hide the
+    arguments, defaults to the command
+    :returns: The exit code, output and duration of the command
+    :rtype: ProcessResult
+    :raises OSError: If the command could not be started
+    :raises ProcessTimeout: If the command did not finish in time
+    """
+    try:
+        return _run_process(command, timeout, shell, logger, log_output,
+                            label)
+    finally:
+        flush_after(command)
+
+
+def _run_process(command, timeout, shell, logger, log_output, label):
+    """ Run a command and wait for it to exit, see run_process """
+    label = command if label is None else label
+    start = time()
+    with open(os.devnull) as devnull:
+        process = subprocess.Popen(command, stdin=devnull,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, shell=shell,
+                                   close_fds=True, preexec_fn=os.setpgrp)
+    lines = []
+
+    def drain():
+        """ Read the output until the command closes it """
+        for line in iter(process.stdout.readline, ''):
+            lines.append(line)
+            if log_output and logger:
+                logger.debug('{0}: {1}'.format(label, line.rstrip('\n')))
+        process.stdout.close()
+
+    reader = threading.Thread(target=drain, name='run_process')
+    reader.daemon = True
+    reader.start()
+    try:
+        reader.join(timeout)
+        if reader.is_alive():
+            _kill_group(process)
+            reader.join()
+            process.wait()
+            if logger:
+                logger.debug('{0} killed after {1}'.format(
+                        label, sec_pretty(time() - start, short=True)))
+            raise ProcessTimeout(label, timeout, ''.join(lines))
+        process.wait()
+    except KeyboardInterrupt:
+        _kill_group(process)
+        raise
+    duration = time() - start
+    if logger:
+        logger.debug('{0} returned {1} in {2}'.format(
+                label, process.returncode,
+                sec_pretty(duration, short=True)))
+    return ProcessResult(process.returncode, ''.join(lines), duration)
@@ -12,6 +12,12 @@ from h_util.h_ssh.cmd import Command
 from h_util.h_timing import TimeWindow
 
 CONNECT_TIMEOUT = 20   # seconds
+SU_PROMPT_TIMEOUT = 10  # seconds
+READ_INTERVAL = 1  # seconds a channel read waits for data
+CHUNK_SIZE = 32768
+
+MAX_LINE_LENGTH = 65536
+PASSWORD_PROMPT = "Password: "
 
 RETRY_MSGS = [
     "SSH session not active",
@@ -23,14 +29,83 @@ class SuIncorrectPassword(Exception):
     """ Exception raised if provided su password is incorrect """
 
 
+def is_su_auth_failure(output):
+    """ Checks the output of a command for su authentication errors
+    >>> is_su_auth_failure('su: incorrect password')
+    True
+    >>> is_su_auth_failure('output')
+    False
+    """
+    return 'su: incorrect password' in output or \
+        'su: Authentication failure' in output
+
+
+def iter_lines(chunks, max_length=MAX_LINE_LENGTH):
+    """ Splits a stream of output chunks into lines, without the line
+    endings. Lines longer than max_length are split so the memory held is
+    bounded whatever the output.
+    >>> list(iter_lines(['a\\r\\nb', 'c\\n', 'd']))
+    ['a', 'bc', 'd']
+    >>> list(iter_lines(['abcde\\nf'], max_length=2))
+    ['abcde', 'f']
+    >>> list(iter_lines(['abc', 'de', 'f'], max_length=2))
+    ['ab', 'cd', 'ef']
+    """
+    partial = ''
+    for chunk in chunks:
+        lines = (partial + chunk).split('\n')
+        partial = lines.pop()
+        for line in lines:
+            yield line.rstrip('\r')
+        while len(partial) > max_length:
+            yield partial[:max_length]
+            partial = partial[max_length:]
+    if partial:
+        yield partial.rstrip('\r')
+
+
+class CommandStream(object):
+    """ The output lines of a command started with SshClient.stream, read as
+    they arrive. The exit status of the command is in status once all the
+    lines have been read. Each stream has its own status, so commands
+    streamed at the same time on one client do not mix them up.
+    """
+
+    def __init__(self, channel, lines):
+        """
+        :param channel: The channel the command runs on
+        :param lines: Generator of the output lines
+        """
+        self.channel = channel
+        self._lines = lines
+        self.status = None
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        """ The next output line, the exit status is read after the last
+        one """
+        try:
+            return next(self._lines)
+        except StopIteration:
+            if self.status is None:
+                self.status = self.channel.recv_exit_status()
+            raise
+
+
 # pylint: disable=too-many-instance-attributes
 class SshClient(object):
     """ This class implements basic features of paramiko library in order to
     run remote commands.
     """
 
-    def __init__(self, host, user, password=None, port=22):
+    # pylint: disable=too-many-arguments
+    def __init__(self, host, user, password=None, port=22,
+                 command_timeout=None):
         """ This constructor requires the connection arguments.
+        command_timeout is the number of seconds each command may run for
+        before CommandTimeout is raised, None for no limit.
         >>> SshClient("host", "user")
         <SshClient host 22>
         >>> p = "some_password"
@@ -46,6 +121,7 @@ class SshClient(object):
         self.user = user
         self.password = password
         self.port = port
+        self.command_timeout = command_timeout
         self._ssh = None
         self._transport = None
         self._last_channel = None
@@ -110,12 +186,66 @@ class SshClient(object):
             is_active = self._transport.is_active()
         return bool(self._transport and is_active)
 
+    def _wait_su_prompt(self, channel, su_user):
+        """ Waits for the su password prompt, without the output received
+        before it.
+        """
+        buf = ''
+        with TimeWindow("") as time_window:
+            while "Password:" not in buf:
+                if time_window.elapsed > SU_PROMPT_TIMEOUT:
+                    raise CommandTimeout("Timeout reached while trying to "
+                                         "send su password for %s user" %
+                                         su_user)
+                try:
+                    resp = channel.recv(1024)
+                except socket.timeout:
+                    continue
+                if resp == '':
+                    # Channel closed, there is no prompt to answer
+                    break
+                if resp:
+                    buf += resp
+
+    def _read_channel(self, channel, cmd, timeout=None):
+        """ Generator of the output chunks of a command, stdout first and
+        then stderr.
+
+        Reads block on the channel for up to its timeout (READ_INTERVAL) so
+        the loop only wakes up to receive data or to check the timeout.
+
+        :param channel: Channel the command is running on
+        :param cmd: The command, to report a timeout
+        :param timeout: Seconds the command may run for, None for no limit
+        """
+        with TimeWindow("") as time_window:
+            while True:
+                if timeout is not None and time_window.elapsed > timeout:
+                    channel.close()
+                    raise CommandTimeout("Timeout of %ss reached while "
+                                         "executing the following command "
+                                         "remotely through SSH on %s: "
+                                         "\"%s\"" % (timeout, self.host, cmd),
+                                         cmd=cmd)
+                try:
+                    resp = channel.recv(CHUNK_SIZE)
+                except socket.timeout:
+                    continue
+                if not resp:
+                    break
+                yield resp
+        while channel.recv_stderr_ready():
+            resp_err = channel.recv_stderr(CHUNK_SIZE)
+            if not resp_err:
+                break
+            yield resp_err
+
     # pylint: disable=too-many-arguments
-    # pylint: disable=too-many-branches
-    def _run(self, cmd, su_user=None, su_password=None, sudo=False,
-             env=None, sh_source_path=None):
-        """ Executes a command using self._transport object to open a channel
-        inside the host machine.
+    def _exec(self, cmd, su_user=None, su_password=None, sudo=False,
+              env=None, sh_source_path=None):
+        """ Starts a command on a new channel of self._transport, answering
+        the su password prompt if needed.
+        :return: The channel and the command as sent
         """
         if self._transport is None:
             self.connect()
@@ -131,58 +261,78 @@ class SshClient(object):
         cmd = str(Command(cmd, su_user, sudo, env, sh_source_path))
         if not cmd.strip().endswith("&"):
             channel.get_pty()
+        channel.settimeout(READ_INTERVAL)
         channel.exec_command(cmd)
 
         if su_password is not None and not sudo:
-            buf = ''
-            with TimeWindow("") as time_window:
-                while True:
-                    resp = channel.recv(1024)
-                    if resp:
-                        buf += resp
-                    if "Password:" in buf:
-                        break
-                    if time_window.elapsed > 10:
-                        raise CommandTimeout("Timeout reached while trying to "
-                                             "send su password for %s user" %
-                                             su_user)
-                    time.sleep(0.1)
+            self._wait_su_prompt(channel, su_user)
             channel.send('%s\n' % su_password)
+        return channel, cmd
 
-        buf = ''
-        while True:
-            resp = channel.recv(1024)
-            if resp:
-                buf += resp
-            exit_status_ready = channel.exit_status_ready()
-            if not resp and exit_status_ready:
-                break
+    # pylint: disable=too-many-arguments
+    def _run(self, cmd, su_user=None, su_password=None, sudo=False,
+             env=None, sh_source_path=None):
+        """ Executes a command using self._transport object to open a channel
+        inside the host machine.
+        """
+        channel, cmd = self._exec(cmd, su_user, su_password, sudo, env,
+                                  sh_source_path)
 
-        while True:
-            resp_err = channel.recv_stderr(1024)
-            if resp_err:
-                buf += resp_err
-            exit_status_ready = channel.exit_status_ready()
-            if not resp_err and exit_status_ready:
-                break
+        buf = ''.join(self._read_channel(channel, cmd, self.command_timeout))
 
         def clean(output):
             """ Strip "Password: " prompt from the output
             """
-            password_prompt = "Password: "
             if (su_password is not None or su_user is not None) and not sudo:
-                if output.startswith(password_prompt):
-                    return output[len(password_prompt):].lstrip()
+                if output.startswith(PASSWORD_PROMPT):
+                    return output[len(PASSWORD_PROMPT):].lstrip()
             return output
 
         status = channel.recv_exit_status()
         if su_password is not None and not sudo:
-            if 'su: incorrect password' in buf or \
-                    'su: Authentication failure' in buf:
+            if is_su_auth_failure(buf):
                 raise SuIncorrectPassword(buf)
 
         return status, clean(buf)
 
+    # pylint: disable=too-many-arguments
+    def stream(self, cmd, su_user=None, su_password=None, sudo=False,
+               env=None, sh_source_path=None, callback=None):
+        """ Executes a command and returns its output lines, without the line
+        endings, as they arrive. Only the line being received is held in
+        memory whatever the size of the output.
+
+        :param callback: Called with each line before it is returned, e.g. to
+        log the progress of a long command
+        :type callback: callable
+        :return: The output lines, with the exit status in status once they
+        have all been read
+        :rtype: CommandStream
+        """
+        channel, cmd = self._exec(cmd, su_user, su_password, sudo, env,
+                                  sh_source_path)
+        return CommandStream(channel, self._stream_lines(
+                channel, cmd, su_user, su_password, sudo, callback))
+
+    # pylint: disable=too-many-arguments
+    def _stream_lines(self, channel, cmd, su_user, su_password, sudo,
+                      callback):
+        """ Generator of the output lines of a streamed command """
+        prompted = (su_password is not None or su_user is not None) and \
+            not sudo
+        first = True
+        for line in iter_lines(self._read_channel(channel, cmd,
+                                                  self.command_timeout)):
+            if prompted and first and line.startswith(PASSWORD_PROMPT):
+                line = line[len(PASSWORD_PROMPT):].lstrip()
+            first = False
+            if su_password is not None and not sudo and \
+                    is_su_auth_failure(line):
+                raise SuIncorrectPassword(line)
+            if callback:
+                callback(line)
+            yield line
+
     @property
     def last_status(self):
         """ Previous channel exit status
@@ -0,0 +1,150 @@
+""" Python module to run the same command on many hosts over SSH at once,
+keeping the connection to each host open between commands.
+"""
+import threading
+from collections import namedtuple, OrderedDict
+from multiprocessing.pool import ThreadPool
+
+from h_logging.enminst_logger import init_enminst_logging
+from h_util.h_ssh.client import SshClient
+
+MAX_WORKERS = 10
+
+
+class SshResult(namedtuple('SshResult', 'host status output error')):
+    """ Result of a command on one host. status and output are None if the
+    command could not be run, error is then the exception raised.
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):  # pylint: disable=invalid-name
+        """ The command ran and returned 0
+        >>> SshResult('db-1', 0, 'out', None).ok
+        True
+        >>> SshResult('db-1', None, None, IOError()).ok
+        False
+        """
+        return self.error is None and self.status == 0
+
+
+class SshFanout(object):
+    """ Runs commands on a set of hosts with a bounded number of hosts at
+    once. The SshClient of each host is kept so its authenticated transport
+    is reused by the next command to the same host, until close() is called.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, credentials, port=22, max_workers=MAX_WORKERS,
+                 timeout=None):
+        """ Constructor
+        >>> SshFanout({'db-1': ('litp-admin', 'pass')})
+        <SshFanout 0/1 connected>
+
+        :param credentials: (user, password) per host, as a dict or as a
+        function of the host
+        :param port: The SSH port
+        :param max_workers: Maximum number of hosts worked on at once
+        :param timeout: Seconds a command may run for on each host, None for
+        no limit
+        """
+        self.credentials = credentials
+        self.port = port
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._clients = {}
+        self._lock = threading.Lock()
+        self.log = init_enminst_logging()
+
+    def __repr__(self):
+        connected = len([client for client in self._clients.values()
+                         if client.is_connected()])
+        total = len(self.credentials) \
+            if isinstance(self.credentials, dict) else len(self._clients)
+        return '<%s %s/%s connected>' % (self.__class__.__name__, connected,
+                                         total)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def client(self, host):
+        """ The SshClient of a host, created on first use
+        :rtype: SshClient
+        """
+        with self._lock:
+            if host not in self._clients:
+                if isinstance(self.credentials, dict):
+                    user, password = self.credentials[host]
+                else:
+                    user, password = self.credentials(host)
+                self._clients[host] = SshClient(host, user, password,
+                                                port=self.port)
+            return self._clients[host]
+
+    def _run_on(self, host, cmd, timeout, kwargs):
+        """ Run a command on one host, any error is returned in the result
+        :rtype: SshResult
+        """
+        try:
+            client = self.client(host)
+            if not client.is_connected():
+                # First command to the host or its connection was lost
+                client.close()
+                client.connect()
+            client.command_timeout = timeout
+            status, output = client.run(cmd, **kwargs)
+        except Exception as error:  # pylint: disable=broad-except
+            self.log.debug('SshFanout: "%s" failed on %s: %s: %s' %
+                           (cmd, host, type(error).__name__, error))
+            return SshResult(host, None, None, error)
+        return SshResult(host, status, output, None)
+
+    # pylint: disable=too-many-arguments
+    def run(self, hosts, cmd, host_args=None, timeout=None, **kwargs):
+        """ Run a command on each host, up to max_workers hosts at once.
+        >>> SshFanout({}).run([], 'ls')
+        OrderedDict()
+
+        :param hosts: The hosts to run the command on
+        :param cmd: The command
+        :param host_args: Extra SshClient.run arguments per host, e.g. the
+        su_password of each host
+        :type host_args: dict
+        :param timeout: Seconds the command may run for on each host,
+        defaults to the fan-out timeout
+        :param kwargs: SshClient.run arguments for all the hosts
+        :returns: SshResult per host, in the order of hosts
+        :rtype: OrderedDict
+        """
+        hosts = list(hosts)
+        results = OrderedDict((host, None) for host in hosts)
+        if not hosts:
+            return results
+        if timeout is None:
+            timeout = self.timeout
+        jobs = []
+        for host in hosts:
+            args = dict(kwargs)
+            args.update((host_args or {}).get(host, {}))
+            jobs.append((host, cmd, timeout, args))
+        pool = ThreadPool(processes=min(self.max_workers, len(hosts)))
+        try:
+            for result in pool.map(lambda job: self._run_on(*job), jobs):
+                results[result.host] = result
+        except KeyboardInterrupt:
+            pool.terminate()
+            raise
+        pool.close()
+        pool.join()
+        return results
+
+    def close(self):
+        """ Close the connections to all the hosts """
+        with self._lock:
+            clients = self._clients.values()
+            self._clients = {}
+        for client in clients:
+            client.close()
@@ -19,6 +19,8 @@ import pwd
 import re
 import shutil
 import sys
+import threading
+import time
 import filecmp
 import glob
 import gettext
@@ -33,9 +35,9 @@ from base64 import standard_b64decode, standard_b64encode
 from gettext import NullTranslations
 from datetime import datetime, timedelta
 from os.path import exists, join
-from re import match
 from subprocess import Popen, PIPE, STDOUT
 from Crypto.Cipher import AES
+from h_util.h_process import flush_after
 try:
     import redfish  # pylint: disable=import-error
     # pylint: disable=import-error
@@ -64,6 +66,10 @@ cmd_DISABLE_CRON_ON_EXPIRY = 'if [ -f  {0}.bak ]; then '\
                              'mv -f {0}.bak {0}; '\
                              'fi'.format(KICKSTART_ERB)
 LITP_ERB_TEMPLATES = '/opt/ericsson/nms/litp/etc/puppet/modules/litp/files/'
+COMMAND_CACHE_TTL = 60
+RPM_QUERY_PREFIX = 'rpm:'
+RPM_QUERY_FORMAT = RPM_QUERY_PREFIX + 'name=%{NAME},version=%{VERSION},' \
+                                      'release=%{RELEASE},size=%{LONGSIZE}\n'
 
 
 class ExitCodes(object):  # pylint: disable=too-few-public-methods
@@ -105,12 +111,112 @@ class ExitCodes(object):  # pylint: disable=too-few-public-methods
     CREATE_PLAN_FAILED = 50
 
 
+class CommandCache(object):
+    """
+    Output of read-only commands, see exec_process(read_only=True).
+    The output of a command is reused for COMMAND_CACHE_TTL seconds of the
+    enminst config, 0 to always run the command, and is dropped after any
+    rpm or yum install or remove.
+    """
+
+    def __init__(self, ttl=None):
+        """
+        :param ttl: Seconds the output is reused for, None to read it from
+        the enminst config on first use
+        :type ttl: float
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._hits = {}
+
+    def _get_ttl(self):
+        """
+        Get the TTL, reading it from the enminst config the first time
+        :rtype: float
+        """
+        if self.ttl is None:
+            try:
+                self.ttl = float(read_enminst_config().get(
+                        'command_cache_ttl', COMMAND_CACHE_TTL))
+            except (SystemExit, TypeError, ValueError):
+                self.ttl = COMMAND_CACHE_TTL
+        return self.ttl
+
+    def get(self, key, label, loader):
+        """
+        Get the output of a command, running it if it is not cached or has
+        expired. Errors are not cached.
+        :param key: The command and anything else changing its output
+        :type key: tuple
+        :param label: How the command is shown in the debug log
+        :type label: str
+        :param loader: Runs the command and returns its output
+        :type loader: callable
+        """
+        ttl = self._get_ttl()
+        if ttl <= 0:
+            return loader()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and 0 <= now - entry[0] < ttl:
+                self._hits[label] = self._hits.get(label, 0) + 1
+                LOG.debug('Cached output of {0} reused ({1} hits)'.format(
+                        label, self._hits[label]))
+                return entry[1]
+        output = loader()
+        with self._lock:
+            self._entries[key] = (now, output)
+        return output
+
+    def flush(self, reason):
+        """
+        Drop all the cached output and log the hits per command
+        :param reason: Why the cache is flushed, for the debug log
+        :type reason: str
+        """
+        with self._lock:
+            if not self._entries:
+                return
+            self._entries.clear()
+            hits, self._hits = self._hits, {}
+        LOG.debug('Command cache flushed after {0}'.format(reason))
+        for label in sorted(hits):
+            LOG.debug('Command cache: {0} hits for {1}'.format(hits[label],
+                                                              label))
+
+
+_COMMAND_CACHE = CommandCache()
+
+
+def flush_command_cache(reason):
+    """
+    Drop the output of the read-only commands, e.g. after a change to the
+    installed packages
+    :param reason: Why the cache is flushed, for the debug log
+    :type reason: str
+    """
+    _COMMAND_CACHE.flush(reason)
+
+
 def check_package_installed(rpm_name):
     """
     Checks if rpm package is installed.
     :param rpm_name: Name of rpm to check
     :return: True if package found, false if not found
     """
+    return _COMMAND_CACHE.get(('isPackageInstalled', rpm_name),
+                              'rpm -q {0}'.format(rpm_name),
+                              lambda: _is_package_installed(rpm_name))
+
+
+def _is_package_installed(rpm_name):
+    """
+    Checks if rpm package is installed, through the rpm database.
+    :param rpm_name: Name of rpm to check
+    :return: True if package found, false if not found
+    """
     try:
         yum_base = yum.YumBase()
         return yum_base.isPackageInstalled(rpm_name)
@@ -164,6 +270,7 @@ def remove_rpm(rpm_name):
         raise
     finally:
         yum_base.closeRpmDB()
+        flush_command_cache('removing rpm {0}'.format(rpm_name))
 
 
 def install_rpm(rpm_name, rpm_path=''):
@@ -214,6 +321,65 @@ def install_rpm(rpm_name, rpm_path=''):
         raise
     finally:
         yum_base.closeRpmDB()
+        flush_command_cache('installing rpm {0}'.format(rpm_name))
+
+
+def query_rpms(rpm_names=None, rpm_paths=None):
+    """
+    Get the name, version, release and install size of installed RPMs or of
+    RPM files, running one rpm command for the whole list.
+    :param rpm_names: Names of installed RPMs, without version
+    :type rpm_names: list
+    :param rpm_paths: Paths of RPM files
+    :type rpm_paths: list
+    :return: dict with name, version, release and size keyed on each name
+    or path, None for an RPM that is not installed or a file that could not
+    be read
+    :rtype: dict
+    :raises IOError: If the rpm output could not be matched to the files
+    """
+    if (rpm_names is None) == (rpm_paths is None):
+        raise ValueError("Call with one and only one of rpm_names, "
+                         "rpm_paths")
+    rpms = list(rpm_names if rpm_paths is None else rpm_paths)
+    if not rpms:
+        return {}
+
+    rpm_cmd = ['rpm',
+               '-q' if rpm_paths is None else '-qp',
+               '--queryformat',
+               RPM_QUERY_FORMAT] + rpms
+    out = exec_process(rpm_cmd, ignore_error=True, read_only=True)
+
+    found = []
+    errors = []
+    for line in out.splitlines():
+        if line.startswith(RPM_QUERY_PREFIX):
+            found.append(dict(key_val.split('=', 1) for key_val in
+                              line[len(RPM_QUERY_PREFIX):].split(',')))
+        elif line.startswith('error:'):
+            errors.append(line)
+
+    if rpm_paths is None:
+        by_name = dict((info['name'], info) for info in found)
+        result = dict((rpm, by_name.get(rpm)) for rpm in rpms)
+    else:
+        # One line per file read, in the order of the files
+        failed = set(rpm for rpm in rpms for line in errors
+                     if re.search(r'\s{0}[:\s]'.format(re.escape(rpm)),
+                                  line + ' '))
+        read = [rpm for rpm in rpms if rpm not in failed]
+        if len(read) != len(found):
+            raise IOError(1, out, rpm_cmd)
+        result = dict(zip(read, found))
+        result.update((rpm, None) for rpm in failed)
+
+    for rpm in rpms:
+        if result[rpm] is None:
+            LOG.info('RPM {0} is {1}'.format(rpm, 'not installed' if
+                                             rpm_paths is None else
+                                             'not readable'))
+    return result
 
 
 def get_rpm_info(host_name, rpm_name=None, rpm_path=None):
@@ -233,27 +399,23 @@ def get_rpm_info(host_name, rpm_name=None, rpm_path=None):
     if rpm_name:
         LOG.info("Querying installed RPM {0} on LMS {1}".format(rpm_name,
                                                                 host_name))
-        args = '-q'
         rpm = rpm_name
+        query = {'rpm_names': [rpm]}
     elif rpm_path:
         LOG.info("Querying RPM file {0} on LMS {1}".format(rpm_path,
                                                            host_name))
-        args = '-qp'
         rpm = rpm_path
-
-    rpm_cmd = ['rpm',
-               args,
-               '--queryformat',
-               'name=%{Name},version=%{VERSION},release=%{RELEASE}',
-               rpm]
+        query = {'rpm_paths': [rpm]}
 
     try:
-        out = exec_process(rpm_cmd)
+        info = query_rpms(**query)[rpm]
+        if info is None:
+            raise IOError(1, 'Failed to query RPM {0}'.format(rpm))
     except IOError as error:
         LOG.exception(error)
         raise
 
-    return dict(key_val.split('=') for key_val in out.split(','))
+    return dict((key, info[key]) for key in ('name', 'version', 'release'))
 
 
 def get_rpm_install_size(rpm_name=None, rpm_path=None):
@@ -267,22 +429,18 @@ def get_rpm_install_size(rpm_name=None, rpm_path=None):
     try:
         if rpm_name:
             LOG.info("Querying size of RPM: {0}".format(rpm_name))
-            args = '-qi'
             rpm = rpm_name
+            query = {'rpm_names': [rpm]}
 
         elif rpm_path:
             LOG.info("Querying size of RPM: {0}".format(rpm_path))
-            args = '-qip'
             rpm = rpm_path
+            query = {'rpm_paths': [rpm]}
 
-        rpm_cmd = ['rpm',
-                   args,
-                   '--queryformat',
-                   'size=%{longsize}',
-                   rpm]
-        out = exec_process(rpm_cmd)
-        rpm_size = out.split('=')[-1]
-        return rpm_size
+        info = query_rpms(**query)[rpm]
+        if info is None:
+            raise IOError(1, 'Failed to query RPM {0}'.format(rpm))
+        return info['size']
 
     except IOError as error:
         LOG.exception(error)
@@ -373,7 +531,7 @@ def _exec_curl_command(curl_command, retries=2, hide_output=False):
 
 
 def exec_process(command, ignore_error=False, sudo=None, environ=None,
-                 stderr=STDOUT, use_shell=False):
+                 stderr=STDOUT, use_shell=False, read_only=False):
     # pylint: disable=R0913
     """
     Execute a system process.
@@ -385,8 +543,32 @@ def exec_process(command, ignore_error=False, sudo=None, environ=None,
     :param stderr: Where stderr should be redirected to
     :param use_shell: If set to True causes Popen to use shell
                       to exec process.
+    :param read_only: The command changes nothing so its output may be
+                      reused for the same command and environment, see
+                      CommandCache
     :return:
     """
+    if read_only:
+        key = (command if isinstance(command, basestring) else
+               tuple(command), sudo, stderr, use_shell, ignore_error,
+               tuple(sorted(environ.items())) if environ else None)
+        label = command if isinstance(command, basestring) else \
+            ' '.join(command)
+        return _COMMAND_CACHE.get(key, label, lambda: _exec_process(
+                command, ignore_error, sudo, environ, stderr, use_shell))
+
+    try:
+        return _exec_process(command, ignore_error, sudo, environ, stderr,
+                             use_shell)
+    finally:
+        flush_after(command)
+
+
+def _exec_process(command, ignore_error, sudo, environ, stderr, use_shell):
+    # pylint: disable=R0913
+    """
+    Execute a system process, see exec_process
+    """
     process = Popen(command, stderr=stderr, stdout=PIPE, env=environ,
                     preexec_fn=switch_user(sudo), shell=use_shell)
     stdout = process.communicate()[0]
@@ -489,7 +671,11 @@ def exec_process_via_pipes(*commands):
         # a SIGPIPE if next process exits.
         processes[index_close].stdout.close()
         index_close += 1
-    stdout = processes[last_process_index].communicate()[0]
+    try:
+        stdout = processes[last_process_index].communicate()[0]
+    finally:
+        for command in commands:
+            flush_after(command)
 
     if processes[last_process_index].returncode != 0:
         raise IOError(processes[last_process_index].returncode,
@@ -696,9 +882,73 @@ class Formatter(object):  # pylint: disable=too-few-public-methods
         return '{0}{1}{2}'.format(color, text, Formatter.ENDC)
 
 
+_SED_PATTERNS = {}
+_SED_NODE_FILTER = re.compile(r'^([\w-]+)_\(\.\*\)$')
+
+
+def _sed_pattern(key_filter):
+    """
+    Get the compiled regex for a Sed key filter, compiling it once
+
+    :param key_filter: The regex
+    :type key_filter: str
+    :rtype: _sre.SRE_Pattern
+    """
+    pattern = _SED_PATTERNS.get(key_filter)
+    if pattern is None:
+        pattern = _SED_PATTERNS[key_filter] = re.compile(key_filter)
+    return pattern
+
+
+class _SedIndex(object):  # pylint: disable=too-few-public-methods
+    """
+    Lookup tables over the keys/values of a Sed, in key order
+    """
+
+    def __init__(self, sed):
+        """
+        :param sed: The Sed to index
+        :type sed: Sed
+        """
+        self.keys = dict.keys(sed)
+        self.order = dict((_key, pos) for pos, _key in enumerate(self.keys))
+        # Key part before each '_' e.g. 'svc', 'node1' in svc_node1_IP
+        self.segments = {}
+        self.values = {}
+        self.matches = {}
+        for _key, _value in dict.iteritems(sed):
+            for segment in set(_key.split('_')[:-1]):
+                self.segments.setdefault(segment, []).append(_key)
+            try:
+                if _value not in self.values:
+                    self.values[_value] = _key
+            except TypeError:
+                pass
+
+    def node_keys(self, node_id):
+        """
+        Get the keys that can contain "<node_id>_"
+
+        :param node_id: The node ID e.g. svc_node1 or enclosure1
+        :type node_id: str
+        :rtype: list
+        """
+        if '_' in node_id:
+            # The part after the last '_' is a whole segment of the key
+            return self.segments.get(node_id.rsplit('_', 1)[1], [])
+        keys = set()
+        for segment, segment_keys in self.segments.iteritems():
+            if segment.endswith(node_id):
+                keys.update(segment_keys)
+        return sorted(keys, key=self.order.get)
+
+
 class Sed(dict):  # pylint: disable=too-many-public-methods
     """
     Class to access SED parameters
+
+    Lookups go through an index of the keys/values built on first use and
+    dropped whenever the Sed is changed.
     """
     SK_HOSTNAME = 'hostname'
     SK_IPINTERNAL = 'IP_internal'
@@ -715,9 +965,54 @@ class Sed(dict):  # pylint: disable=too-many-public-methods
         """
         super(Sed, self).__init__()
         self._sedfile = sed_file
+        self._index = None
         if sed_file:
             self._load(self._sedfile)
 
+    def __setitem__(self, key, value):
+        self._index = None
+        super(Sed, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._index = None
+        super(Sed, self).__delitem__(key)
+
+    def clear(self):
+        """ See dict.clear """
+        self._index = None
+        super(Sed, self).clear()
+
+    def update(self, *args, **kwargs):
+        """ See dict.update """
+        self._index = None
+        super(Sed, self).update(*args, **kwargs)
+
+    def pop(self, *args):
+        """ See dict.pop """
+        self._index = None
+        return super(Sed, self).pop(*args)
+
+    def popitem(self):
+        """ See dict.popitem """
+        self._index = None
+        return super(Sed, self).popitem()
+
+    def setdefault(self, key, default=None):
+        """ See dict.setdefault """
+        self._index = None
+        return super(Sed, self).setdefault(key, default)
+
+    def _get_index(self):
+        """
+        Get the index of the current keys/values, building it if needed
+
+        :rtype: _SedIndex
+        """
+        index = getattr(self, '_index', None)
+        if index is None:
+            index = self._index = _SedIndex(self)
+        return index
+
     @property
     def sed(self):
         """
@@ -800,11 +1095,14 @@ class Sed(dict):  # pylint: disable=too-many-public-methods
         :type key_filter: str
         :rtype: list
         """
-        matched_keys = []
-        for key_name in self.keys():
-            if match(key_filter, key_name):
-                matched_keys.append(key_name)
-        return matched_keys
+        index = self._get_index()
+        matched_keys = index.matches.get(key_filter)
+        if matched_keys is None:
+            matcher = _sed_pattern(key_filter)
+            matched_keys = index.matches[key_filter] = \
+                [key_name for key_name in index.keys
+                 if matcher.match(key_name)]
+        return list(matched_keys)
 
     def has_site_key(self, key_name):
         """
@@ -851,9 +1149,15 @@ class Sed(dict):  # pylint: disable=too-many-public-methods
         :returns: Sed object with matching subnet values.
         :rtype: Sed
         """
-        matcher = re.compile(key_filter)
+        matcher = _sed_pattern(key_filter)
+        node_filter = _SED_NODE_FILTER.match(key_filter)
+        if node_filter:
+            # Only the keys of the node can match, see get_node_config
+            keys = self._get_index().node_keys(node_filter.group(1))
+        else:
+            keys = self.keys()
         sub_data = Sed(None)
-        for _key in self.keys():
+        for _key in keys:
             _match = matcher.search(_key)
             if _match:
                 sub_data[_match.group(1)] = self.get(_key)
@@ -879,10 +1183,13 @@ class Sed(dict):  # pylint: disable=too-many-public-methods
         :returns: The Key for the value
         :type: str
         """
-        for _key, _value in self.items():
-            if _value == value:
-                return _key
-        return None
+        try:
+            return self._get_index().values.get(value)
+        except TypeError:
+            for _key, _value in self.items():
+                if _value == value:
+                    return _key
+            return None
 
     @staticmethod
     def get_last_applied_sed():
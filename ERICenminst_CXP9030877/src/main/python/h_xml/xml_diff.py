@@ -0,0 +1,189 @@
+"""
+Differences between two LITP deployment description XML files
+"""
+##############################################################################
+# COPYRIGHT Ericsson AB 2026
+#
+# The copyright to the computer program(s) herein is the property of
+# Ericsson AB. The programs may be used and/or copied only with written
+# permission from Ericsson AB. or in accordance with the terms and
+# conditions stipulated in the agreement/contract under which the
+# program(s) have been supplied.
+##############################################################################
+from collections import namedtuple, OrderedDict
+
+from h_xml.xml_model import load_model
+from h_xml.xml_utils import _LITPNS
+
+
+class XmlItem(namedtuple('XmlItem',
+                         'item_type vpath properties source_path')):
+    """
+    A LITP item of a deployment description. source_path is the path of
+    the source item of an inherited item, None otherwise.
+    """
+    __slots__ = ()
+
+
+class ItemChange(namedtuple('ItemChange', 'old new')):
+    """
+    An item in both deployment descriptions, with different properties or
+    source path
+    """
+    __slots__ = ()
+
+    @property
+    def added(self):
+        """
+        Properties only set in the new item
+        :returns: property values keyed on name
+        :rtype: dict
+        """
+        return dict((name, value)
+                    for (name, value) in self.new.properties.iteritems()
+                    if name not in self.old.properties)
+
+    @property
+    def removed(self):
+        """
+        Properties only set in the old item
+        :returns: old property values keyed on name
+        :rtype: dict
+        """
+        return dict((name, value)
+                    for (name, value) in self.old.properties.iteritems()
+                    if name not in self.new.properties)
+
+    @property
+    def modified(self):
+        """
+        Properties set in both items, with different values
+        :returns: 2-tuples of the old and new value, keyed on name
+        :rtype: dict
+        """
+        return dict((name, (value, self.new.properties[name]))
+                    for (name, value) in self.old.properties.iteritems()
+                    if name in self.new.properties and
+                    value != self.new.properties[name])
+
+
+def _item_properties(element):
+    """
+    Get the properties of an item, an empty property has the value ''
+    :param element: The item element
+    :type element: Element
+    :rtype: dict
+    """
+    return dict((child.tag, (child.text or '').strip()) for child in element
+                if isinstance(child.tag, basestring) and
+                not child.tag.startswith(_LITPNS))
+
+
+def read_items(xml_file):
+    """
+    Read the items of a deployment description from its model, see
+    h_xml.xml_model.load_model for the vpaths and the sharing of the model.
+    LITP elements below an element that is not an item are not items.
+    :param xml_file: The deployment description
+    :type xml_file: str
+    :returns: XmlItem instances keyed on vpath, in document order
+    :rtype: OrderedDict
+    :raises IOError: If the file does not exist
+    :raises XMLSyntaxError: If the file is not well formed XML
+    """
+    model = load_model(xml_file)
+    items = OrderedDict()
+    for element in model.elements():
+        parent = element.getparent()
+        if parent is not model.root and model.vpath(parent) not in items:
+            continue
+        vpath = model.vpath(element)
+        items[vpath] = XmlItem(element.tag[len(_LITPNS):], vpath,
+                               _item_properties(element),
+                               element.get('source_path'))
+    return items
+
+
+class ModelDiff(object):
+    """
+    Items added, removed and changed going from one deployment description
+    to another. An item whose ItemType changed is removed and added.
+    """
+
+    def __init__(self, from_items, to_items):
+        """
+        :param from_items: From-state items, see read_items
+        :type from_items: OrderedDict
+        :param to_items: To-state items, see read_items
+        :type to_items: OrderedDict
+        """
+        self.from_items = from_items
+        self.to_items = to_items
+        self.added = OrderedDict()
+        self.removed = OrderedDict()
+        self.changed = OrderedDict()
+
+        for (vpath, old) in from_items.iteritems():
+            new = to_items.get(vpath)
+            if new is None or new.item_type != old.item_type:
+                self.removed[vpath] = old
+            elif new.properties != old.properties or \
+                    new.source_path != old.source_path:
+                self.changed[vpath] = ItemChange(old, new)
+
+        for (vpath, new) in to_items.iteritems():
+            old = from_items.get(vpath)
+            if old is None or old.item_type != new.item_type:
+                self.added[vpath] = new
+
+    def __nonzero__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def delta_lines(self):
+        """
+        What is in the From-state only, in the deployment delta file format,
+        in From-state document order:
+        "y <vpath>" for an item to remove,
+        "n <vpath>" for an item to remove that is the source of inherited
+        items, so is not removed on its own,
+        "y <property>@<vpath>" for a property to remove from an item.
+        This follows what the delta file parsers read, it has not been
+        checked line for line against dst_dd_delta_generator.sh output.
+        :returns: The delta file lines
+        :rtype: list
+        """
+        sources = set(item.source_path
+                      for item in self.from_items.itervalues()
+                      if item.source_path)
+        lines = []
+        for vpath in self.from_items:
+            if vpath in self.removed:
+                lines.append('{0} {1}'.format(
+                        'n' if vpath in sources else 'y', vpath))
+            elif vpath in self.changed:
+                for name in sorted(self.changed[vpath].removed):
+                    lines.append('y {0}@{1}'.format(name, vpath))
+        return lines
+
+    def write_delta(self, delta_file):
+        """
+        Write the deployment delta file, see delta_lines
+        :param delta_file: The file to write
+        :type delta_file: str
+        """
+        with open(delta_file, 'w') as _writer:
+            for line in self.delta_lines():
+                _writer.write(line + '\n')
+
+
+def diff_models(from_xml, to_xml):
+    """
+    Compare two deployment descriptions, reading each file once
+    :param from_xml: The From-state deployment description
+    :type from_xml: str
+    :param to_xml: The To-state deployment description
+    :type to_xml: str
+    :rtype: ModelDiff
+    :raises XMLSyntaxError: If a file is not well formed XML
+    """
+    return ModelDiff(read_items(from_xml), read_items(to_xml))
@@ -0,0 +1,188 @@
+"""
+Deployment description model with indexed item lookups
+"""
+##############################################################################
+# COPYRIGHT Ericsson AB 2026
+#
+# The copyright to the computer program(s) herein is the property of
+# Ericsson AB. The programs may be used and/or copied only with written
+# permission from Ericsson AB. or in accordance with the terms and
+# conditions stipulated in the agreement/contract under which the
+# program(s) have been supplied.
+##############################################################################
+import os
+import threading
+
+from h_xml.xml_utils import _LITPNS, load_xml, get_xml_element_properties
+
+_MODELS = {}
+_MODELS_LOCK = threading.Lock()
+
+
+class DeploymentModel(object):
+    """
+    A parsed deployment description with its LITP elements indexed by
+    ItemType, id, vpath and, for inherited items, source path.
+    The indexes are built once, changes made to the XML afterwards are not
+    reflected in them.
+    """
+
+    def __init__(self, xml_doc):
+        """
+        :param xml_doc: The parsed deployment description, see load_xml
+        :type xml_doc: etree.ElementTree
+        """
+        self.doc = xml_doc
+        self.root = xml_doc.getroot()
+        self._types = {}
+        self._ids = {}
+        self._sources = {}
+        self._vpaths = {}
+        self._elements = {self.root: ''}
+        self._order = []
+
+        for element in self.root.iterdescendants():
+            tag = element.tag
+            if not isinstance(tag, basestring) or not tag.startswith(_LITPNS):
+                continue
+            vpath = '{0}/{1}'.format(self.vpath(element.getparent()),
+                                     element.get('id'))
+            self._elements[element] = vpath
+            self._order.append(element)
+            self._vpaths.setdefault(vpath, element)
+            self._types.setdefault(tag[len(_LITPNS):], []).append(element)
+            self._ids.setdefault(element.get('id'), []).append(element)
+            source_path = element.get('source_path')
+            if source_path:
+                self._sources.setdefault(source_path, []).append(element)
+
+    def vpath(self, element):
+        """
+        Get the model path of an element e.g. /deployments/enm
+        :param element: A LITP element of the model, '' for the root element
+        :type element: Element
+        :rtype: str
+        """
+        vpath = self._elements.get(element)
+        if vpath is None:
+            # Below an element that is not a LITP item
+            parent = element.getparent()
+            vpath = '' if parent is None else '{0}/{1}'.format(
+                    self.vpath(parent), element.get('id'))
+        return vpath
+
+    def elements(self):
+        """
+        Get all the LITP elements of the model
+        :returns: The elements below the root element, in document order
+        :rtype: list
+        """
+        return list(self._order)
+
+    def get(self, vpath):
+        """
+        Get the element at a model path
+        :param vpath: The model path e.g. /ms/items/java
+        :type vpath: str
+        :returns: The element, None if there is none at vpath
+        :rtype: Element
+        """
+        return self._vpaths.get(vpath)
+
+    def items(self, item_type, attributes=None, within=None):
+        """
+        Get the elements of an ItemType, like xpath() but from the indexes
+        :param item_type: The ItemType e.g. vm-service-inherit
+        :type item_type: str
+        :param attributes: Attribute values the elements must have
+        :type attributes: dict
+        :param within: Only the elements below this one
+        :type within: Element
+        :returns: The elements found, in document order
+        :rtype: list
+        """
+        attributes = attributes or {}
+        if 'id' in attributes:
+            found = self._ids.get(attributes['id'], [])
+        elif 'source_path' in attributes:
+            found = self._sources.get(attributes['source_path'], [])
+        else:
+            found = self._types.get(item_type, [])
+        tag = _LITPNS + item_type
+        prefix = None if within is None else self.vpath(within) + '/'
+        return [element for element in found
+                if element.tag == tag and
+                all(element.get(name) == value
+                    for (name, value) in attributes.iteritems()) and
+                (prefix is None or self._elements[element].startswith(
+                        prefix))]
+
+    def inherits(self, source_path):
+        """
+        Get the inherited items of a source item
+        :param source_path: The model path of the source item
+        :type source_path: str
+        :returns: The inherit elements, in document order
+        :rtype: list
+        """
+        return list(self._sources.get(source_path, []))
+
+    @staticmethod
+    def parent(element, item_type):
+        """
+        Get the closest element of an ItemType above an element
+        :param element: The element to start from
+        :type element: Element
+        :param item_type: The ItemType of the parent e.g. vcs-cluster
+        :type item_type: str
+        :returns: The parent element, None if there is none
+        :rtype: Element
+        """
+        tag = _LITPNS + item_type
+        parent = element.getparent()
+        while parent is not None and parent.tag != tag:
+            parent = parent.getparent()
+        return parent
+
+    @staticmethod
+    def properties(element):
+        """
+        Get the properties of an item
+        :param element: The item element
+        :type element: Element
+        :rtype: dict
+        """
+        return get_xml_element_properties(element)
+
+
+def load_model(xml_file):
+    """
+    Get the model of a deployment description. A file is parsed once per
+    path, modification time and size for the life of the process so the
+    model is shared: do not change it, use DeploymentModel(load_xml(path))
+    for a private copy.
+    :param xml_file: The deployment description
+    :type xml_file: str
+    :rtype: DeploymentModel
+    :raises IOError: If the file does not exist
+    """
+    xml_file = os.path.abspath(xml_file)
+    if not os.path.exists(xml_file):
+        raise IOError('File {0} not found!'.format(xml_file))
+    stat = os.stat(xml_file)
+    version = (stat.st_mtime, stat.st_size)
+    with _MODELS_LOCK:
+        cached = _MODELS.get(xml_file)
+        if cached and cached[0] == version:
+            return cached[1]
+        model = DeploymentModel(load_xml(xml_file))
+        _MODELS[xml_file] = (version, model)
+        return model
+
+
+def clear_model_cache():
+    """
+    Forget all the loaded models
+    """
+    with _MODELS_LOCK:
+        _MODELS.clear()
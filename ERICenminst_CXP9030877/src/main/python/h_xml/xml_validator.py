@@ -12,9 +12,42 @@ XML Validator
 # program(s) have been supplied.
 ##############################################################################
 
-from lxml.etree import parse, XMLSchema, \
-    DocumentInvalid, XMLSyntaxError
 import logging
+import threading
+import os
+
+from lxml.etree import parse, iterparse, XMLSchema, \
+    DocumentInvalid, XMLSyntaxError
+
+_SCHEMAS = {}
+_SCHEMAS_LOCK = threading.Lock()
+
+
+def get_schema(schema_path):
+    """
+    Compiled schema of an XSD file. Schemas are compiled once per path,
+    modification time and size for the life of the process.
+    :param schema_path: Path to xml schema file
+    :returns: The compiled schema
+    :rtype: XMLSchema
+    """
+    stat = os.stat(schema_path)
+    version = (stat.st_mtime, stat.st_size)
+    with _SCHEMAS_LOCK:
+        cached = _SCHEMAS.get(schema_path)
+        if cached and cached[0] == version:
+            return cached[1]
+        schema = XMLSchema(parse(schema_path))
+        _SCHEMAS[schema_path] = (version, schema)
+        return schema
+
+
+def clear_schema_cache():
+    """
+    Forget all the compiled schemas
+    """
+    with _SCHEMAS_LOCK:
+        _SCHEMAS.clear()
 
 
 class XMLValidator(object):
@@ -25,17 +58,21 @@ class XMLValidator(object):
     def __init__(self):
         self.log = logging.getLogger('enminst')
 
-    def validate(self, xml_path, schema_path):
+    def validate(self, xml_path, schema_path, incremental=False):
         """
         Validates XML against Schema
         :xml_path: Path to xml file
         :schema_path: Path to xml schema file
+        :incremental: Validate the XML while parsing it, dropping each
+        element once parsed, so large documents are never fully in memory
         """
         try:
             self.log.debug("Parsing schema: {0}".format(schema_path))
-            schema_doc = parse(schema_path)
+            schema = get_schema(schema_path)
 
-            schema = XMLSchema(schema_doc)
+            if incremental and self._validate_incremental(xml_path,
+                                                          schema):
+                return
 
             self.log.debug("Parsing XML: {0}".format(xml_path))
             doc = parse(xml_path)
@@ -52,3 +89,25 @@ class XMLValidator(object):
 
         except Exception:
             raise
+
+    def _validate_incremental(self, xml_path, schema):
+        """
+        Validates XML against Schema while parsing it
+        :xml_path: Path to xml file
+        :schema: The compiled schema
+        :returns: True if the XML is valid, False if it is not. Errors found
+        while streaming carry no line numbers, the caller validates the
+        whole document again to report them.
+        """
+        self.log.debug("Validating XML incrementally: {0}".format(xml_path))
+        try:
+            for _, element in iterparse(xml_path, schema=schema):
+                element.clear()
+                # Drop the preceding siblings, already validated
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+        except XMLSyntaxError as error:
+            self.log.debug("Incremental validation failed: {0}"
+                           .format(error))
+            return False
+        return True
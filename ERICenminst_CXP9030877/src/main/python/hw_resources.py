@@ -37,6 +37,7 @@ from h_logging.enminst_logger import init_enminst_logging
 from h_puppet.mco_agents import EnminstAgent
 from h_util.h_utils import ExitCodes
 from h_vcs.vcs_utils import report_tab_data, sort_tab_data
+from h_xml.xml_model import DeploymentModel
 from h_xml.xml_utils import load_xml, \
     get_xml_element_properties, xpath, get_parent
 
@@ -98,15 +99,15 @@ class HwResources(object):
         path = litp_utils.get_dd_xml_file()
         if not path:
             path = litp_utils.get_xml_deployment_file()
-        vm_services = xpath(xml_document, 'vm-service')
+        model = DeploymentModel(xml_document)
+        vm_services = model.items('vm-service')
         resource_usage = {}
         to_model_services = []
         for vm_service in vm_services:
             service = vm_service.get('id')
-            inherited_vm = xpath(xml_document,
-                                  'vm-service-inherit',
-                                  {'source_path': '/software/services/'
-                                                  '{0}'.format(service)})
+            inherited_vm = model.items('vm-service-inherit',
+                                       {'source_path': '/software/services/'
+                                                       '{0}'.format(service)})
             if not inherited_vm:
                 lmsnode = get_parent(vm_service, 'ms')
                 if lmsnode is None:
@@ -18,6 +18,7 @@ If any errors are found then fmalarm should be created.
 from restapi import RESTapi
 from h_litp.litp_rest_client import LitpRestClient, LitpException
 from h_litp.litp_maintenance import LitpMaintenance
+from h_util.h_cron_state import CronState
 from h_util.h_nas_console import NasConsole
 from h_logging.enminst_logger import init_enminst_logging
 from enm_healthcheck import HealthCheck
@@ -26,6 +27,11 @@ ALARM_REQUEST_HEADER = {"Content-Type": "application/json"}
 ALARM_REQUEST_PATH = "/internal-alarm-service/internalalarm/" \
                      "internalalarmservice/translate"
 ALARMS_FILE_PATH = "/var/log/current_nasaudit_alarms.txt"
+STATE_FILE = "/var/log/nasaudit_error_check_state.json"
+# LITP model and NAS software lookups are redone after LOOKUP_TTL seconds,
+# an unchanged alarm is sent again after ALARM_REFRESH seconds
+LOOKUP_TTL = 3600
+ALARM_REFRESH = 86400
 
 
 class NasAuditCheck(object):
@@ -46,8 +52,17 @@ class NasAuditCheck(object):
     def __init__(self):
         self.logger = init_enminst_logging()
         self.litp_rest = LitpRestClient()
+        self.state = CronState(STATE_FILE)
 
     def build_alarm_url(self):
+        """
+        Builds the url that is required to create or clear an FMalarm,
+        looked up again once it is older than LOOKUP_TTL.
+        """
+        return self.state.cached('alarm_url', LOOKUP_TTL,
+                                 self.lookup_alarm_url)
+
+    def lookup_alarm_url(self):
         """
         Retrieves the haproxy internal IP address from the LITP model
         and stores it in a class variable.
@@ -114,42 +129,77 @@ class NasAuditCheck(object):
                               '{0}'.format(str(val_error)))
             raise SystemExit(1)
 
+    def is_va_installed(self, nas_check, nas_console):
+        """
+        Checks the NAS has the Veritas Access software installed
+        :return: True if installed, None if not
+        """
+        ls_va_res = nas_console.exec_basic_nas_command(
+            nas_check.NAS_VA_CHECK, as_master=False)
+        ls_va74_res = nas_console.exec_basic_nas_command(
+            nas_check.NAS_VA74_CHECK, as_master=False)
+        if ls_va_res[0] == 0 or ls_va74_res[0] == 0:
+            return True
+        return None
+
+    def audit_nas(self, nas_check, nas, nas_details):
+        """
+        Runs the NAS Audit on a NAS and raises or clears its alarm if the
+        result changed since the last alarm sent for it
+        :param nas_check: HealthCheck used to query the NAS details
+        :param nas: The NAS (sfs-service) id
+        :param nas_details: The NAS details from the LITP model
+        :raises: SystemExit if the NAS software is not found
+        """
+        nas_pwd = nas_check._get_psw(nas_details[2], nas_details[1],
+                                     sanitise=False)
+        nas_console = NasConsole(nas_details[0], nas_details[1], nas_pwd)
+        if not self.state.cached(
+                'va_installed {0}'.format(nas), LOOKUP_TTL,
+                lambda: self.is_va_installed(nas_check, nas_console)):
+            self.logger.error('HealthCheck status: FAILED.')
+            raise SystemExit(1)
+        retcode = nas_console.exec_basic_nas_command(
+            nas_check.NAS_AUDIT, as_master=False)
+        self.logger.info("HealthCheck status: PASSED, "
+                         "Checking Alarm Status..")
+        if retcode[0] == 3:
+            severity, message = 'WARNING', "Warning Alarm was Raised!"
+        elif retcode[0] in [1, 2]:
+            severity, message = 'WARNING', "Error Alarm was Raised!"
+        elif retcode[0] == 0:
+            severity, message = 'CLEARED', "Alarm was Cleared!"
+        else:
+            return
+        alarm = 'alarm {0}'.format(nas)
+        if not self.state.needs_report(alarm, severity, ALARM_REFRESH):
+            self.logger.debug('NAS Audit alarm of {0} already {1}'.format(
+                    nas, severity))
+            return
+        sent = self.build_alarm()
+        if severity != 'CLEARED':
+            sent = self.build_alarm(perceived_severity=severity) and sent
+        if sent:
+            self.state.report(alarm, severity)
+        else:
+            # Send it again on the next run, the haproxy address may have
+            # moved
+            self.state.forget('alarm_url')
+        self.logger.info(message)
+
     def nasaudit_main(self):
         """
         Main function
         """
         nas_check = HealthCheck()
         if not self.check_litp_maintenance():
-            nas_info = nas_check._get_nas_info()
-            for nas in nas_info:
-                nas_pwd = nas_check._get_psw(nas_info[nas][2],
-                                             nas_info[nas][1],
-                                             sanitise=False)
-                nas_console = NasConsole(nas_info[nas][0], nas_info[nas][1],
-                                         nas_pwd)
-                ls_va_res = nas_console.exec_basic_nas_command(
-                    nas_check.NAS_VA_CHECK, as_master=False)
-                ls_va74_res = nas_console.exec_basic_nas_command(
-                    nas_check.NAS_VA74_CHECK, as_master=False)
-                if ls_va_res[0] == 0 or ls_va74_res[0] == 0:
-                    retcode = nas_console.exec_basic_nas_command(
-                        nas_check.NAS_AUDIT, as_master=False)
-                    self.logger.info("HealthCheck status: PASSED, "
-                                     "Checking Alarm Status..")
-                    if retcode[0] == 3:
-                        self.build_alarm()
-                        self.build_alarm(perceived_severity='WARNING')
-                        self.logger.info("Warning Alarm was Raised!")
-                    elif retcode[0] in [1, 2]:
-                        self.build_alarm()
-                        self.build_alarm(perceived_severity='WARNING')
-                        self.logger.info("Error Alarm was Raised!")
-                    elif retcode[0] == 0:
-                        self.build_alarm()
-                        self.logger.info("Alarm was Cleared!")
-                else:
-                    self.logger.error('HealthCheck status: FAILED.')
-                    raise SystemExit(1)
+            nas_info = self.state.cached('nas_info', LOOKUP_TTL,
+                                         nas_check._get_nas_info)
+            try:
+                for nas in nas_info:
+                    self.audit_nas(nas_check, nas, nas_info[nas])
+            finally:
+                self.state.save()
         else:
             self.logger.warning("Unable to run NAS Audit Error check")
 
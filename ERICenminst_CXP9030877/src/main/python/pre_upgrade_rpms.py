@@ -31,8 +31,8 @@ from h_litp.litp_utils import main_exceptions, get_xml_deployment_file, \
     get_dd_xml_file
 from h_puppet.mco_agents import EnmPreCheckAgent, McoAgentException
 from h_util.h_utils import install_rpm, copy_file, \
-    delete_file, check_package_installed, get_rpm_info, get_rpm_install_size, \
-    get_lms_free_space
+    delete_file, check_package_installed, get_rpm_info, \
+    get_lms_free_space, query_rpms
 from h_puppet import h_puppet
 
 NAS_PATH = '/ericsson/enm/dumps'
@@ -152,11 +152,13 @@ class PreUpgradeRpm(object):
         If the RPM is not installed it will show the version as None.
         :return: None
         """
-        result = ""
-
-        for rpm in self.rpms_to_install:
-            rpm_name = re.search(RPM_NAME_REGEX, rpm).group()
+        rpm_names = [re.search(RPM_NAME_REGEX, rpm).group()
+                     for rpm in self.rpms_to_install]
+        installed = query_rpms(rpm_names=rpm_names)
 
+        for rpm, rpm_name in zip(self.rpms_to_install, rpm_names):
+            result = installed[rpm_name] or {'release': '1', 'version': None,
+                                             'name': rpm_name}
             if SAN_PSL_PACKAGE in rpm:
                 for db_node in self.db_cluster:
                     host = db_node.properties['hostname']
@@ -172,16 +174,7 @@ class PreUpgradeRpm(object):
                     except McoAgentException:
                         LOGGER.warning("Failed to get info on %s from %s",
                                        rpm_name, host)
-                result = get_rpm_info(self.lms, rpm_name=rpm_name)
-                self.rpm_info.append(RpmsUpgradedInfo(self.lms, result))
-            else:
-                if check_package_installed_wrapper(rpm_name):
-                    result = get_rpm_info(self.lms, rpm_name)
-                    self.rpm_info.append(RpmsUpgradedInfo(self.lms, result))
-                else:
-                    result = {'release': '1', 'version': None,
-                              'name': rpm_name}
-                    self.rpm_info.append(RpmsUpgradedInfo(self.lms, result))
+            self.rpm_info.append(RpmsUpgradedInfo(self.lms, result))
 
     def get_rpms_to_upgrade(self):
         """
@@ -224,14 +217,18 @@ class PreUpgradeRpm(object):
         log_header(LOGGER, "Checking if there's sufficient space "
                            "for rpms to install.")
         total_install_size = 0.0
-        old_rpm = 0.0
         try:
             space_available = int(get_lms_free_space())
-            for rpm in self.rpms_to_install:
-                rpm_name = re.search(RPM_NAME_REGEX, rpm).group()
-                if check_package_installed_wrapper(rpm_name):
-                    old_rpm = int(get_rpm_install_size(rpm_name=rpm_name))
-                rpm_size = int(get_rpm_install_size(rpm_path=rpm))
+            rpm_names = [re.search(RPM_NAME_REGEX, rpm).group()
+                         for rpm in self.rpms_to_install]
+            installed = query_rpms(rpm_names=rpm_names)
+            iso_rpms = query_rpms(rpm_paths=self.rpms_to_install)
+            for rpm, rpm_name in zip(self.rpms_to_install, rpm_names):
+                if iso_rpms[rpm] is None:
+                    raise IOError(1, 'Failed to query RPM {0}'.format(rpm))
+                old_rpm = int(installed[rpm_name]['size']) \
+                    if installed[rpm_name] else 0
+                rpm_size = int(iso_rpms[rpm]['size'])
                 print rpm_size
                 print old_rpm
                 install_diff = rpm_size - old_rpm
@@ -28,6 +28,8 @@ import collections
 import simplejson
 from argparse import ArgumentParser, RawTextHelpFormatter
 from contextlib import closing
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 from lxml import etree
 from base64 import standard_b64encode
 
@@ -48,9 +50,11 @@ from h_puppet.h_puppet import puppet_trigger_wait
 from encrypt_passwords import EncryptPassword
 from h_util.h_postgres import PostgresService
 from substitute_parameters import Substituter
-from h_xml.xml_utils import load_xml, xpath, get_xml_element_properties
+from h_xml.xml_diff import diff_models
 from h_infra import pre_upgrade_infra as infra_check
 from h_util.h_housekeeping import EnmLmsHouseKeeping
+from h_util.h_process import run_process, ProcessTimeout
+from h_util.h_timing import sec_pretty
 from h_util.h_utils import RHELUtil, copy_file, \
                            litp_backup_state_cron, \
                            cleanup_java_core_dumps_cron, \
@@ -58,7 +62,7 @@ from h_util.h_utils import RHELUtil, copy_file, \
                            create_nasaudit_errorcheck_cron, \
                            migrate_cleanup_cmd, \
                            get_enable_cron_on_expiry_cmd, \
-                           cmd_DISABLE_CRON_ON_EXPIRY
+                           cmd_DISABLE_CRON_ON_EXPIRY, read_enminst_config
 from enm_snapshots import manage_snapshots, \
                           create_snapshots_indicator_file
 from enm_upgrade_prechecks import EnmPreChecks
@@ -102,6 +106,8 @@ class Rh7EnmUpgrade(object):
     # For R State 'R3EZ09' the major digit will be '3'.
     RHEL7_UPLIFT_LITP_VERSION = 3
     CMD_TIMEOUT = 4 * 60 * 60  # 4h
+    CREATEREPO_WORKERS = 4
+    CREATEREPO_CACHE_DIR = os.path.join(os.sep, 'var', 'cache', 'createrepo')
 
     # Match ERIClitpcore cherrypy_server.py response.timeout
     PLAN_TIMEOUT = 2 * 60 * 60  # 2h
@@ -115,6 +121,7 @@ class Rh7EnmUpgrade(object):
     PARAM_LITP_TO_VER = 'to_state_litp_version'
     PARAM_HYBRID = 'hybrid_state'
     PARAM_RESUME = 'resume'
+    PARAM_DD_DIFF = 'dd_diff_in_process'
 
     ACTION_CHOICES = ['get_upgrade_type',
                       'validate_deployment',
@@ -477,7 +484,10 @@ class Rh7EnmUpgrade(object):
         bool_args = [{'arg': Rh7EnmUpgrade.PARAM_HYBRID,
                       'help': 'Hybrid state'},
                      {'arg': Rh7EnmUpgrade.PARAM_RESUME,
-                      'help': 'Resume uplift'}]
+                      'help': 'Resume uplift'},
+                     {'arg': Rh7EnmUpgrade.PARAM_DD_DIFF,
+                      'help': 'Generate the deployment description delta '
+                              'in process instead of with the DST tool'}]
         for bool_arg in bool_args:
             optional_group.add_argument('--{0}'.format(bool_arg['arg']),
                                         dest=bool_arg['arg'],
@@ -769,7 +779,7 @@ class Rh7EnmUpgrade(object):
 
     def _run_command(self, command, timeout_secs=CMD_TIMEOUT, do_logging=True):
         """
-        Thin wrapper to call subprocess.Popen
+        Thin wrapper to call run_process
         :param command: Command string to execute
         :type command: string
         :param timeout_secs: seconds to wait before timing out command
@@ -784,38 +794,27 @@ class Rh7EnmUpgrade(object):
         if do_logging:
             self.log.info('Will run command: {0}'.format(command))
 
-        stdout = ''
-        process = None
-
         command_to_log = command if do_logging else '<hidden>'
-        timeout = Rh7EnmUpgrade.Timeout(timeout_secs)
 
         try:
-            process = subprocess.Popen(command,
-                                       stdout=subprocess.PIPE,
-                                       stderr=subprocess.STDOUT,
-                                       shell=True)
+            result = run_process(command, timeout=timeout_secs,
+                                 logger=self.log if do_logging else None)
         except OSError as oe_err:
             msg = ('Error processing command {0}, {1}, {2}'
                    .format(command_to_log, oe_err.errno, oe_err.strerror))
             self._print_error(msg)
             sys.exit(1)
-
-        while process.poll() is None and not timeout.has_time_elapsed():
-            timeout.sleep_for(0.5)
-
-        if process.poll() is None and timeout.has_time_elapsed():
+        except ProcessTimeout:
             msg = 'Command timed out, {0}'.format(command_to_log)
             self._print_error(msg)
             sys.exit(1)
 
-        stdout, _ = process.communicate()
-        cleaned_stdout = stdout.strip()
+        cleaned_stdout = result.output.strip()
         if do_logging:
             self.log.debug('Return code: {0}, Output: "{1}"'
-                           .format(process.returncode, cleaned_stdout))
+                           .format(result.returncode, cleaned_stdout))
 
-        return process.returncode, cleaned_stdout
+        return result.returncode, cleaned_stdout
 
     def _run_rpc_mco(self, command):
         """
@@ -1165,43 +1164,122 @@ class Rh7EnmUpgrade(object):
                                   )
         return repo_names
 
-    def _refresh_yum_repos(self):
+    @staticmethod
+    def _format_create_repo_cmd(path):
+        """
+        Format a create-repo command. Existing metadata is updated rather
+        than recreated, and package checksums are kept in a cache directory
+        for the next run.
+        :param path: subfolder of yum public dir
+        :type path: Directory path
+        :return: fully formatted create-repo command
+        :rtype: string
         """
-        Refresh / recreate yum repos after data has been restored
+        cache_dir = os.path.join(Rh7EnmUpgrade.CREATEREPO_CACHE_DIR,
+                                 path.strip(os.sep).replace(os.sep, '_'))
+        update = '--update ' if os.path.exists(
+                os.path.join(path, 'repodata', 'repomd.xml')) else ''
+        return 'createrepo {0}--cachedir {1} {2}'.format(update, cache_dir,
+                                                         path)
+
+    @staticmethod
+    def _get_createrepo_workers():
+        """
+        Get how many repositories may be refreshed at once, CREATEREPO_WORKERS
+        of the enminst config but no more than the CPUs, 1 to refresh them
+        one after the other
+        :return: The number of workers
+        :rtype: int
+        """
+        try:
+            workers = int(read_enminst_config().get(
+                    'createrepo_workers', Rh7EnmUpgrade.CREATEREPO_WORKERS))
+        except ValueError:
+            workers = Rh7EnmUpgrade.CREATEREPO_WORKERS
+        return max(1, min(workers, cpu_count()))
+
+    def _create_repos(self, repo_paths, cmd_desc_preamble, workers=1):
+        """
+        Create or update the metadata of yum repositories
+        :param repo_paths: The repository directories
+        :type repo_paths: list
+        :param cmd_desc_preamble: Command description preamble
+        :type cmd_desc_preamble: string
+        :param workers: Repositories refreshed at once, 1 to refresh them
+                        one after the other and stop at the first failure
+        :type workers: int
         :return: None
         """
 
-        def _format_create_repo_cmd(path):
+        def _create_repo(path):
             """
-            Format a create-repo command
-            :param path: subfolder of yum public dir
-            :type path: Directory path
-            :return: fully formatted create-repo command
-            :rtype: string
+            Run the create-repo command of a repository
+            :param path: The repository directory
+            :type path: string
+            :return: the command, return code (None if it could not be
+                     run) and seconds taken
+            :rtype: 3-tuple: string, int, float
             """
-            return 'createrepo {0}'.format(path)
+            cmd = Rh7EnmUpgrade._format_create_repo_cmd(path)
+            start = time.time()
+            try:
+                return_code, _ = self._run_command(
+                        cmd, timeout_secs=Rh7EnmUpgrade.CMD_TIMEOUT)
+            except SystemExit:
+                # Already reported, a worker thread can not exit the script
+                return_code = None
+            duration = time.time() - start
+            self.log.info('Repository {0} refreshed in {1}'.format(
+                    path, sec_pretty(duration, short=True)))
+            return cmd, return_code, duration
+
+        if workers > 1 and len(repo_paths) > 1:
+            pool = ThreadPool(processes=min(workers, len(repo_paths)))
+            try:
+                results = pool.map(_create_repo, repo_paths)
+                pool.close()
+                pool.join()
+            except KeyboardInterrupt:
+                pool.terminate()
+                raise
+        else:
+            results = []
+            for path in repo_paths:
+                results.append(_create_repo(path))
+                if results[-1][1] != 0:
+                    break
+
+        for cmd, return_code, _ in results:
+            if return_code is None:
+                sys.exit(1)
+            self._assert_return_code(return_code,
+                                     cmd_desc_preamble + ': ' + cmd)
 
+    def _refresh_yum_repos(self):
+        """
+        Refresh / recreate yum repos after data has been restored
+        :return: None
+        """
         repo_paths = Rh7EnmUpgrade._get_all_non_plugin_repo_paths()
 
-        cmds = ['yum clean metadata'] + \
-               [_format_create_repo_cmd(
-                  os.path.join(Rh7EnmUpgrade.HTML_DIR, folder))
-                 for folder in ('litp', 'litp_plugins')] + \
-               [_format_create_repo_cmd(path)
-                 for path in repo_paths
-                 if '7.9' not in path and '_rhel7' not in path and\
-                 '6.10' not in path and '7.6' not in path] + \
-               [_format_create_repo_cmd(os.path.join(Rh7EnmUpgrade.HTML_DIR,
-                                        os.path.join(version, folder,
-                                                     'x86_64', 'Packages')))
-                for folder in ('os', 'updates')
-                for version in ('6.10', '7.6')
-                if os.path.exists(os.path.join(Rh7EnmUpgrade.HTML_DIR,
-                                               version, folder,
-                                               'x86_64', 'Packages'))]
+        repo_paths = [os.path.join(Rh7EnmUpgrade.HTML_DIR, folder)
+                      for folder in ('litp', 'litp_plugins')] + \
+                     [path for path in repo_paths
+                      if '7.9' not in path and '_rhel7' not in path and\
+                      '6.10' not in path and '7.6' not in path] + \
+                     [os.path.join(Rh7EnmUpgrade.HTML_DIR,
+                                   os.path.join(version, folder,
+                                                'x86_64', 'Packages'))
+                      for folder in ('os', 'updates')
+                      for version in ('6.10', '7.6')
+                      if os.path.exists(os.path.join(Rh7EnmUpgrade.HTML_DIR,
+                                                     version, folder,
+                                                     'x86_64', 'Packages'))]
 
         msg = 'Refresh yum repositories'
-        self._run_command_set(cmds, msg)
+        self._run_command_set(['yum clean metadata'], msg)
+        self._create_repos(repo_paths, msg,
+                           workers=self._get_createrepo_workers())
 
     def _create_symlinks(self):
         """
@@ -2994,29 +3072,6 @@ class Rh7EnmUpgrade(object):
         :return: None
         """
 
-        def dict_compare(dict1, dict2):
-            """
-            Compare two dictionaries
-            :param dict1: the first dictionary
-            :type dict1: dict
-            :param dict2: the second dictionary
-            :type dict2: dict
-            :return: 2-tuple of dictionary deltas: items added, items modified
-            :rtype: 2-tuple: set, dict
-            """
-            d1_keys = set(dict1.keys())
-            d2_keys = set(dict2.keys())
-            shared_keys = d1_keys.intersection(d2_keys)
-
-            added = d1_keys - d2_keys
-
-            modified = {}
-            for skey in shared_keys:
-                if dict1[skey] != dict2[skey]:
-                    modified[skey] = (dict1[skey], dict2[skey])
-
-            return added, modified
-
         self._print_stage_start()
 
         desc = 'Infra'
@@ -3040,29 +3095,28 @@ class Rh7EnmUpgrade(object):
                     self._print_error(msg)
                     sys.exit(1)
 
-            from_root = load_xml(self.EXPORTED_ENM_FROM_STATE_DD).getroot()
-            to_root = load_xml(self.the_to_state_dd).getroot()
+            xml_diff = diff_models(self.EXPORTED_ENM_FROM_STATE_DD,
+                                   self.the_to_state_dd)
 
             key_delimiter = '::'
 
-            from_items_dict = {}
-            to_items_dict = {}
-
-            for ctype in infra_check.CHANGE_TYPES:
-                for (the_root, the_dict) in ((from_root, from_items_dict),
-                                         (to_root, to_items_dict)):
-                    for fitem in xpath(the_root, ctype):
-                        ckey = "{0}{1}{2}".format(ctype, key_delimiter,
-                                            infra_check.get_model_path(fitem))
-
-                        the_dict[ckey] = {}
-                        for key, val in get_xml_element_properties(
-                            fitem).items():
-                            if key in infra_check.CHANGE_TYPE_PROPERTIES[
-                                ctype]:
-                                the_dict[ckey][key] = val
+            # In To-state document order, parents are created first
+            added = ["{0}{1}{2}".format(item.item_type, key_delimiter, vpath)
+                     for (vpath, item) in xml_diff.added.iteritems()
+                     if item.item_type in infra_check.CHANGE_TYPES]
+            modified = {}
 
-            added, modified = dict_compare(to_items_dict, from_items_dict)
+            for (vpath, change) in xml_diff.changed.iteritems():
+                ctype = change.new.item_type
+                if ctype in infra_check.CHANGE_TYPES:
+                    props = infra_check.CHANGE_TYPE_PROPERTIES[ctype]
+                    to_props, from_props = \
+                        [infra_check.get_modprops(item.properties, props)
+                         for item in (change.new, change.old)]
+                    if to_props != from_props:
+                        modified["{0}{1}{2}".format(ctype, key_delimiter,
+                                                    vpath)] = (to_props,
+                                                               from_props)
 
             self.log.debug("New items added: {0}".format(added))
             self.log.debug("Items modified: {0}".format(modified))
@@ -3070,7 +3124,7 @@ class Rh7EnmUpgrade(object):
             if added or modified:
                 clis = self._gen_infra_plan_delta_clis(added,
                                                    modified,
-                                                   to_root,
+                                                   xml_diff.to_items,
                                                    key_delimiter)
 
                 if clis:
@@ -3114,64 +3168,48 @@ class Rh7EnmUpgrade(object):
         msg = 'Infrastructure delta completed'
         self._print_stage_success(msg)
 
-    def _gen_infra_plan_delta_clis(self, added, modified, xml_root, delimiter):
+    def _gen_infra_plan_delta_clis(self, added, modified, to_items,
+                                   delimiter):
         """
         Generate Infrastructure Plan "delta" CLIs
         (ie LITP 'create' and 'update' commands)
         :param added: items to be added
-        :type added: set of itemtype::model-path strings
+        :type added: list of itemtype::model-path strings
         :param modified: modified items
         :type modified: dict
-        :param xml_root: XML doc root for To-state DD
-        :type xml_root: root Element
+        :param to_items: To-state DD items keyed on vpath
+        :type to_items: dict of XmlItem
         :param delimter: compound dict key delimiter
         :type delimiter: string
         :return: delta CLIs
         :rtype: string
         """
 
-        def _get_item_by_itemtype_and_vpath(xml_root, itemtype, vpath):
-            """
-            Get XML item by ItemType and vpath
-            :param xml_root: XML doc root for To-state DD
-            :type xml_root: root Element
-            :param itemtype: LITP ItemType
-            :type itemtype: string
-            :param vpath: LITP item vpath
-            :type vpath: string
-            :return: LITP XML item
-            :rtype: list
-            """
-            for titem in xpath(xml_root, itemtype):
-                if vpath == infra_check.get_model_path(titem):
-                    return titem
-
-        def _process_delta(compound_key, xml_root, litp_rest):
+        def _process_delta(compound_key, to_items, litp_rest):
             """
             Process a modified or added delta
             :param compound_key: compound key of itemtype and vpath
             :type compound_key: string
-            :param xml_root: XML doc root for To-state DD
-            :type xml_root: root Element
+            :param to_items: To-state DD items keyed on vpath
+            :type to_items: dict of XmlItem
             :param litp_rest: LITP Rest client
             :type litp_rest: LitpRestClient
             :return: 4-tuple: itemtype, vpath, properties, valid-infra-delta
             :rtype: 4-tuple: string, string, dict, bool
             """
             ctype, path = compound_key.split(delimiter, 1)
-            item = _get_item_by_itemtype_and_vpath(xml_root, ctype, path)
-            props = get_xml_element_properties(item)
+            props = to_items[path].properties
             valid_delta = (('file-system' != ctype) or
                            ('type' in props.keys() and
                             'vxfs' == props['type'] and
-                        litp_rest.exists(infra_check._get_parent_path(item))))
+                        litp_rest.exists(path.rsplit('/', 1)[0] or '/')))
             return ctype, path, props, valid_delta
 
         clis = ''
 
         for compound_key in added:
             ctype, path, props, valid_delta = _process_delta(compound_key,
-                                                             xml_root,
+                                                             to_items,
                                                              self.litp)
             if valid_delta:
                 params = ' '.join("{0}={1}".format(k, v)
@@ -3182,7 +3220,7 @@ class Rh7EnmUpgrade(object):
 
         for (compound_key, delta) in modified.items():
             ctype, path, _, valid_delta = _process_delta(compound_key,
-                                                         xml_root,
+                                                         to_items,
                                                          self.litp)
             if valid_delta:
                 params = ' '.join("{0}={1}".format(k, v)
@@ -3665,13 +3703,19 @@ class Rh7EnmUpgrade(object):
 
     def _create_xml_diff_file(self, from_state_xml, to_state_xml):
         """
-        Generate a diff file with a list of item path's to be removed
+        Generate a diff file with a list of item path's to be removed.
+        The DST dst_dd_delta_generator.sh tool generates it unless the
+        dd_diff_in_process option is given
         param from_state_xml: XML file name
         type from_state_xml: string
         param to_state_xml: XML file name
         type to_state_xml: string
         :return: None
         """
+        if getattr(self.processed_args, Rh7EnmUpgrade.PARAM_DD_DIFF, False):
+            self._create_xml_diff_file_in_process(from_state_xml,
+                                                  to_state_xml)
+            return
 
         dd_delta_tool = os.path.join(Rh7EnmUpgrade.OPT_ERIC, 'dstutilities',
                                      'bin', 'dst_dd_delta_generator.sh')
@@ -3695,6 +3739,35 @@ class Rh7EnmUpgrade(object):
         msg = 'Created XML diff file {0}.'.format(Rh7EnmUpgrade.DELTA_OUTPUT)
         self._print_message(msg)
 
+    def _create_xml_diff_file_in_process(self, from_state_xml, to_state_xml):
+        """
+        Generate the diff file of _create_xml_diff_file with h_xml.xml_diff
+        instead of the DST tool
+        param from_state_xml: XML file name
+        type from_state_xml: string
+        param to_state_xml: XML file name
+        type to_state_xml: string
+        :return: None
+        """
+        if not os.path.isfile(from_state_xml) or \
+           not os.path.isfile(to_state_xml):
+
+            msg = 'File {0} or {1} not found'.format(from_state_xml,
+                                                     to_state_xml)
+            self._print_error(msg)
+            sys.exit(1)
+        self._remove_file(Rh7EnmUpgrade.DELTA_OUTPUT)
+        try:
+            diff_models(from_state_xml, to_state_xml).write_delta(
+                    Rh7EnmUpgrade.DELTA_OUTPUT)
+        except (IOError, etree.XMLSyntaxError) as error:
+            msg = 'Failed to create XML diff file {0}: {1}'.format(
+                Rh7EnmUpgrade.DELTA_OUTPUT, error)
+            self._print_error(msg)
+            sys.exit(1)
+        msg = 'Created XML diff file {0}.'.format(Rh7EnmUpgrade.DELTA_OUTPUT)
+        self._print_message(msg)
+
     def _parse_model_packages_from_diff(self):
         """
         Parse the DELTA_OUTPUT file to identify removable model_packages.
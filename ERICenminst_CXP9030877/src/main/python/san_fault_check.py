@@ -24,6 +24,7 @@ from h_litp.litp_utils import main_exceptions
 from h_litp.litp_maintenance import LitpMaintenance
 from h_logging.enminst_logger import init_enminst_logging
 from h_litp.litp_rest_client import LitpRestClient, LitpException
+from h_util.h_cron_state import CronState
 from h_util.h_utils import get_nas_type
 from sanapi import api_builder
 from sanapiexception import SanApiException
@@ -48,6 +49,12 @@ SAN_ALERT_THRESHOLD = 2
 SAN_ALERT_INACTIVE = 2
 SAN_ALERT_FILTER_FILE = '/opt/ericsson/enminst/etc/dell_unity_alert_filters'
 ALARMS_FILE_PATH = "/var/log/current_san_alarms.txt"
+STATE_FILE = "/var/log/san_fault_check_state.json"
+# LITP model lookups are redone after LOOKUP_TTL seconds, all the active
+# alarms are sent again after ALARM_REFRESH seconds
+LOOKUP_TTL = 3600
+ALARM_REFRESH = 86400
+REFRESHED = 'alarms_refreshed'
 
 
 class SanFaultCheck(object):
@@ -61,9 +68,11 @@ class SanFaultCheck(object):
         self.san_alerts = []
         self.alerts_to_create = []
         self.alerts_to_clear = []
+        self.active_alarms = []
         self.litp_nas_servers = []
         self.haproxy_int_ip = None
         self.nas_server_fault = False
+        self.state = CronState(STATE_FILE)
 
     def is_unityxt(self):
         """
@@ -189,10 +198,18 @@ class SanFaultCheck(object):
 
     def set_haproxy_internal_ip(self):
         """
-        Retrieves the haproxy internal IP address from the LITP model
-        and stores it in a class variable.
+        Stores the haproxy internal IP address in a class variable,
+        looked up again once it is older than LOOKUP_TTL.
         :return: None
         """
+        self.haproxy_int_ip = self.state.cached(
+            'haproxy_int_ip', LOOKUP_TTL, self.lookup_haproxy_internal_ip)
+
+    def lookup_haproxy_internal_ip(self):
+        """
+        Retrieves the haproxy internal IP address from the LITP model.
+        :return: The haproxy internal IP address
+        """
         path = "/deployments/enm/clusters/svc_cluster/services/" \
                "haproxy-int/ipaddresses/haproxy-int_internal_vip"
 
@@ -202,7 +219,7 @@ class SanFaultCheck(object):
             self.logger.error(err)
             raise
 
-        self.haproxy_int_ip = items["properties"]["ipaddress"]
+        return items["properties"]["ipaddress"]
 
     @staticmethod
     def build_alarm_message(alert):
@@ -223,7 +240,8 @@ class SanFaultCheck(object):
         haproxy internal IP address and the request path.
         :return: url to create/clear an FMalarm.
         """
-        self.set_haproxy_internal_ip()
+        if self.haproxy_int_ip is None:
+            self.set_haproxy_internal_ip()
         url = "http://{ip}:8081{path}".format(ip=self.haproxy_int_ip,
                                               path=ALARM_REQUEST_PATH)
 
@@ -254,6 +272,9 @@ class SanFaultCheck(object):
             else:
                 self.logger.error("HTTP {0} - Failed to clear FMalarm - {1}"
                     .format(response.status_code, alert))
+                # Still active, clear it again on the next run
+                self.active_alarms.append(alert)
+                self.state.forget('haproxy_int_ip')
 
     def create_fmalarm(self):
         """
@@ -276,6 +297,10 @@ class SanFaultCheck(object):
                 self.logger.error("HTTP {0} - " \
                     "Failed to create FMalarm for SAN alert - {1}"
                     .format(response.status_code, alert))
+                # Not raised, create it again on the next run
+                if alert in self.active_alarms:
+                    self.active_alarms.remove(alert)
+                self.state.forget('haproxy_int_ip')
 
     @staticmethod
     def get_current_alarms():
@@ -342,7 +367,7 @@ class SanFaultCheck(object):
         :return: None
         """
         with open(ALARMS_FILE_PATH, 'w') as alarm_file:
-            for alert in self.alerts_to_create:
+            for alert in self.active_alarms:
                 alarm_file.write(alert)
                 alarm_file.write("!")
             alarm_file.close()
@@ -350,6 +375,9 @@ class SanFaultCheck(object):
     def get_alarms_to_create_and_clear(self):
         """
         Gets the list of alarms to create and clear.
+        Only the alarms not already raised by a previous run are created,
+        unless ALARM_REFRESH has passed since all the active alarms were
+        last sent.
         Subsequently updates a text file to hold
         the active alarms.
         :return: None
@@ -357,16 +385,22 @@ class SanFaultCheck(object):
 
         current_alarms = self.get_current_alarms()
 
-        for alert in self.san_alerts:
-            self.alerts_to_create.append(
-                SanFaultCheck.build_alarm_message(alert))
+        alarms = [SanFaultCheck.build_alarm_message(alert)
+                  for alert in self.san_alerts]
         if self.nas_server_fault:
             ALARM_TEMPLATE["probableCause"] = NAS_SERVER_MESS
-            self.alerts_to_create.append(
-                json.dumps(ALARM_TEMPLATE))
-
+            alarms.append(json.dumps(ALARM_TEMPLATE))
+        for alarm in alarms:
+            if alarm not in self.active_alarms:
+                self.active_alarms.append(alarm)
+
+        refresh = self.state.needs_report(REFRESHED, True, ALARM_REFRESH)
+        if refresh:
+            self.state.report(REFRESHED, True)
+        self.alerts_to_create = [alarm for alarm in self.active_alarms
+                                 if refresh or alarm not in current_alarms]
         self.alerts_to_clear = list(set(current_alarms) -
-                                    set(self.alerts_to_create))
+                                    set(self.active_alarms))
 
         self.write_alarms_to_file()
 
@@ -407,7 +441,10 @@ def main():
 
         for san in san_info:
 
-            if san_fault_check.is_unityxt():
+            # Only a UnityXT answer is kept, failed lookups are retried
+            if san_fault_check.state.cached(
+                    'unityxt', LOOKUP_TTL,
+                    lambda: san_fault_check.is_unityxt() or None):
                 try:
                     san_fault_check.check_nas_servers(san_info, san)
                 except Exception as error:  # pylint: disable=W0703
@@ -438,6 +475,10 @@ def main():
 
                 san_fault_check.clear_fmalarm()
 
+                san_fault_check.write_alarms_to_file()
+
+    san_fault_check.state.save()
+
 
 if __name__ == '__main__':
     main_exceptions(main)
@@ -13,6 +13,7 @@ template specified by the user as input
 ##############################################################################
 
 from argparse import ArgumentParser
+from collections import OrderedDict
 from os.path import exists
 import sys
 import re
@@ -22,6 +23,74 @@ from h_litp.litp_utils import main_exceptions
 from h_logging.enminst_logger import init_enminst_logging, set_logging_level
 import logging
 
+PLACEHOLDER_MARK = '%%'
+UNRESOLVED = re.compile('%%([^%\n]+)%%')
+
+
+def substitute_placeholders(text, values):
+    """
+    Replaces the %%key%% placeholders of a text with their values in a single
+    pass over the text. Placeholders of unknown keys are left as they are.
+
+    The result is the same as calling text.replace('%%key%%', value) for
+    each key in turn. When a value has a '%' in it, e.g. file:// contents
+    with placeholders of their own, that is what is done: the replacements
+    of the keys that follow expand the placeholders the value brings in.
+
+    :param text: Text with placeholders
+    :type text: str
+    :param values: Value of each key
+    :type values: dict
+    :returns: The text with the placeholders replaced
+    :rtype: str
+    """
+    if any('%' in value for value in values.itervalues()):
+        for key, value in values.items():
+            text = text.replace('%%{0}%%'.format(key), value)
+        return text
+    parts = []
+    copied = 0
+    position = 0
+    while True:
+        start = text.find(PLACEHOLDER_MARK, position)
+        if start < 0:
+            break
+        end = text.find(PLACEHOLDER_MARK, start + 2)
+        if end < 0:
+            break
+        key = text[start + 2:end]
+        if key in values:
+            parts.append(text[copied:start])
+            parts.append(values[key])
+            copied = position = end + 2
+        else:
+            # Not a placeholder of a known key, a placeholder can still
+            # start at the next character e.g. '%%%key%%'
+            position = start + 1
+    parts.append(text[copied:])
+    return ''.join(parts)
+
+
+def find_placeholders(text):
+    """
+    Finds the %%key%% placeholders left in a text.
+
+    :param text: Text to search
+    :type text: str
+    :returns: Line numbers of each placeholder, in order of first occurrence
+    :rtype: OrderedDict
+    """
+    found = OrderedDict()
+    line = 1
+    position = 0
+    for match in UNRESOLVED.finditer(text):
+        line += text.count('\n', position, match.start())
+        position = match.start()
+        lines = found.setdefault(match.group(0), [])
+        if line not in lines:
+            lines.append(line)
+    return found
+
 
 class Substituter(object):
     """
@@ -112,9 +181,7 @@ class Substituter(object):
         :returns: An xml with keys found replaced by the corresponding value
         :rtype: str
         """
-        for key, value in self.full_parameter_list.items():
-            xml = xml.replace('%%{0}%%'.format(key), value)
-        return xml
+        return substitute_placeholders(xml, self.full_parameter_list)
 
     def verify_xml(self, xml):
         """
@@ -124,20 +191,17 @@ class Substituter(object):
         :param xml: A deployment description xml after the values have been
                     replaced.
         :type xml: str
+        :returns: Line numbers of each parameter not substituted
+        :rtype: OrderedDict
         :raises: SystemExit if not all parameters are replaced.
         """
-        outstanding = set(re.findall('%%.*%%', xml))
+        outstanding = find_placeholders(xml)
         if outstanding:
             self.log.error('Not all parameters are substituted!!')
-            for parameter in outstanding:
-                if ',' in parameter:
-                    for param in parameter.split(','):
-                        if param not in outstanding:
-                            self.log.error('Parameter {0} not substituted'
-                                           .format(param))
-                else:
-                    self.log.error('Parameter {0} not substituted'.format(
-                            parameter))
+            for parameter, lines in outstanding.items():
+                self.log.error('Parameter {0} not substituted on line(s) {1}'
+                               .format(parameter,
+                                       ', '.join(str(line) for line in lines)))
             raise SystemExit(5)
         else:
             self.log.info('Successfully substituted all parameters')
@@ -77,7 +77,8 @@ from h_util.h_utils import exec_process, exec_process_via_pipes, ExitCodes, \
     compare_versions, copy_custom_banners, get_rpm_info
 from h_vcs.vcs_cli import Vcs
 
-from h_xml.xml_utils import load_xml, xpath
+from h_xml.xml_model import load_model
+from h_xml.xml_utils import load_xml
 from hw_resources import HwResources
 from switch_db_groups import switch_dbcluster_groups
 from litp.core.rpc_commands import PuppetExecutionProcessor
@@ -1354,11 +1355,11 @@ class ENMUpgrade(object):  # pylint: disable=R0902,R0904,R0912
         :param cfg: parsed configuration parameters
         """
         if cfg.model_xml:
-            proposed_dd = load_xml(cfg.model_xml)
+            proposed_dd = load_model(cfg.model_xml)
             dd_cluster_nodes = {}
-            clusters = xpath(proposed_dd, 'vcs-cluster')
+            clusters = proposed_dd.items('vcs-cluster')
             for cluster in clusters:
-                nodes = xpath(cluster, 'node')
+                nodes = proposed_dd.items('node', within=cluster)
                 dd_cluster_nodes[cluster.get('id')] = len(nodes)
 
             model_hosts = self.litp.get_cluster_nodes()
@@ -1892,12 +1893,12 @@ class ENMUpgrade(object):  # pylint: disable=R0902,R0904,R0912
         :param cfg: parsed configuration parameters
         """
         if cfg.model_xml:
-            proposed_dd = load_xml(cfg.model_xml)
+            proposed_dd = load_model(cfg.model_xml)
 
             dd_cluster_nodes = {}
-            clusters = xpath(proposed_dd, 'vcs-cluster')
+            clusters = proposed_dd.items('vcs-cluster')
             for cluster in clusters:
-                nodes = xpath(cluster, 'node')
+                nodes = proposed_dd.items('node', within=cluster)
                 dd_cluster_nodes[cluster.get('id')] = len(nodes)
 
             model_hosts = self.litp.get_cluster_nodes()
@@ -1932,8 +1933,8 @@ class ENMUpgrade(object):  # pylint: disable=R0902,R0904,R0912
         gossip_applied_in_model = True
 
         if cfg.model_xml:
-            proposed_dd = load_xml(cfg.model_xml)
-            clustered_services = xpath(proposed_dd, 'vcs-clustered-service')
+            proposed_dd = load_model(cfg.model_xml)
+            clustered_services = proposed_dd.items('vcs-clustered-service')
             for clustered_service in clustered_services:
                 if clustered_service.get('id').lower() == \
                                 'gossiprouter_clustered_service':
@@ -2210,7 +2211,8 @@ class ENMUpgrade(object):  # pylint: disable=R0902,R0904,R0912
         if os.path.exists(self.runtime_xml_deployment):
             self.log.info("Validating {0}".format(self.runtime_xml_deployment))
             try:
-                xml.validate(self.runtime_xml_deployment, self.litp_xsd)
+                xml.validate(self.runtime_xml_deployment, self.litp_xsd,
+                             incremental=True)
             except:
                 raise SystemExit(ExitCodes.ERROR)
 
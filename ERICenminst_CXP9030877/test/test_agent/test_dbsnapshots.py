@@ -333,6 +333,7 @@ class TestDbsnapshots(TestCase):
         output = snap.create_versant_db_snapshot(args)
         self.assertTrue(ec.called)
         self.assertEqual(output['err'], '')
+        self.assertGreaterEqual(float(output['frozen']), 0)
 
     @patch('agent.dbsnapshots.Popen')
     def test_create_versant_db_snapshot_exception(self, popen):
@@ -421,7 +422,10 @@ class TestDbsnapshots(TestCase):
         }
         get_mysql_db_psw.return_value = 'Password'
         snap = Dbsnapshots()
-        snap.create_mysql_snapshot(args)
+        exec_command.return_value = 'stdout'
+        output = snap.create_mysql_snapshot(args)
+        self.assertEqual(0, output['retcode'])
+        self.assertGreaterEqual(float(output['frozen']), 0)
 
         exec_command.assert_called_with('/opt/mysql/bin/mysql --delimiter="\'" '
                                         "--user=mysql_user --password=Password "
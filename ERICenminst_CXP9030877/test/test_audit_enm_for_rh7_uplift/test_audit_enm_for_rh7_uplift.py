@@ -42,43 +42,57 @@ class TestEnmAuditForUplift(TestCase):
             self.assertEqual(expected,
                              self.auditor._gen_itype_name(itemtype))
 
-    def test_iter_by_itype(self):
-        valid_itypes = ['user', 'group', 'eth', 'bond']
-        invalid_itypes = ['vm-package', 'vm-firewall-rule', 'file-system']
-        ns = '{http://www.ericsson.com/litp}'
-
-        expected1 = set(['/ms/item1', '/ms/item1/item2'])
-        for (itypes, valid, expected) in [(valid_itypes, True, expected1),
-                                          (invalid_itypes, False, set())]:
-            for itype in itypes:
-                tag = (ns + itype) if valid else 'bogus'
-                grand_kid1 = Mock(tag=tag,
-                                  get = lambda x: 'item2',
-                                  getchildren = lambda: [])
-                kid1 = Mock(tag=tag,
-                            get = lambda x: 'item1',
-                            getchildren = lambda: [grand_kid1])
-                root_element = Mock(tag = (ns + 'ms'),
-                                    get = lambda x: 'ms',
-                                    getchildren = lambda: [kid1])
-
-                items = set()
-                self.auditor._iter_by_itype(root_element, itype, '',
-                                            items, None)
-                self.assertEqual(expected, items)
+    def _write_xml(self, xml):
+        tmp_file = NamedTemporaryFile().name
+        with open(tmp_file, 'w') as fd:
+            fd.write(xml)
+        self.addCleanup(os.remove, tmp_file)
+        return tmp_file
+
+    def test_scan_xml_file(self):
+        xml = ('<?xml version="1.0" encoding="UTF-8"?>'
+               '<litp:root xmlns:litp="http://www.ericsson.com/litp" '
+               'xmlns:other="http://www.example.com/other" id="root">'
+               '<litp:ms id="ms">'
+               '<litp:user id="item1" source_path="/software/users/u1">'
+               '<litp:user id="item2"/>'
+               '</litp:user>'
+               '<other:user id="bogus1"><litp:user id="bogus2"/></other:user>'
+               '</litp:ms>'
+               '<litp:deployment id="d1">'
+               '<litp:package source_path="/software/users/u1"/>'
+               '</litp:deployment>'
+               '</litp:root>')
+        tmp_file = self._write_xml(xml)
 
-        # ----
-        all_types = valid_itypes + ['blade', 'bmc', 'cluster', 'disk']
-
-        for itype in all_types:
-            tag = ns + itype
-            element = Mock(tag= tag,
-                           get = lambda x: 'item1',
-                           getchildren = lambda: [])
-            expected = set([itype +'::/item1'])
-            items = set()
-            self.auditor._iter_by_itype(element, None, '', items, None)
-            self.assertEqual(expected, items)
+        ref_counts = {}
+        items = self.auditor._scan_xml_file(tmp_file, ref_counts)
+        expected = set(['ms::/ms', 'user::/ms/item1', 'user::/ms/item1/item2',
+                        'deployment::/d1', 'package::/d1'])
+        self.assertEqual(expected, items)
+        self.assertEqual({'/software/users/u1': 2}, ref_counts)
+
+        self.assertEqual(expected, self.auditor._scan_xml_file(tmp_file))
+
+    def test_scan_large_xml_file(self):
+        nodes = []
+        expected = set(['cluster::/c1'])
+        eths = set()
+        for node in range(2000):
+            nodes.append('<litp:node id="n{0}"><litp:eth id="eth0"/>'
+                         '<litp:eth id="eth1"/></litp:node>'.format(node))
+            expected.add('node::/c1/n{0}'.format(node))
+            for eth in ('eth0', 'eth1'):
+                eths.add('/c1/n{0}/{1}'.format(node, eth))
+        expected.update('eth::' + vpath for vpath in eths)
+        xml = ('<litp:root xmlns:litp="http://www.ericsson.com/litp" '
+               'id="root"><litp:cluster id="c1">' + ''.join(nodes) +
+               '</litp:cluster></litp:root>')
+        tmp_file = self._write_xml(xml)
+
+        self.assertEqual(expected, self.auditor._scan_xml_file(tmp_file))
+        self.assertEqual({'eth': eths},
+                         self.auditor._process_xml_file(tmp_file))
 
     def test_process_xml_file(self):
         xml_hdr = ('<?xml version="1.0" encoding="UTF-8"?>'
@@ -241,44 +255,33 @@ class TestEnmAuditForUplift(TestCase):
           self.auditor._decode_item(self.auditor._encode_item(ns + token1,
                                                               token2)))
     @patch('audit_enm_for_rh7_uplift.os.path.exists')
-    def test_get_xml_root(self, mock_exists):
+    def test_assert_xml_file(self, mock_exists):
         mock_exists.return_value = False
-
-        self.assertRaises(SystemExit, self.auditor._get_xml_root, 'bogus')
-
-        # ----
-
-        xml = ('<?xml version="1.0" encoding="UTF-8"?>'
-               '<litp:root xmlns:litp="http://www.ericsson.com/litp" '
-               'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
-               'xsi:schemaLocation="http://www.ericsson.com/litp '
-               'litp--schema/litp.xsd" id="root">'
-               '<litp:ms id="ms"/>'
-               '</litp:root>')
-
-        tmp_file1 = NamedTemporaryFile().name
-        with open(tmp_file1, 'w') as fd1:
-            fd1.write(xml)
+        self.assertRaises(SystemExit, self.auditor._assert_xml_file, 'bogus')
+        self.assertRaises(SystemExit, self.auditor._scan_xml_file, 'bogus')
 
         mock_exists.return_value = True
-        self.auditor._get_xml_root(tmp_file1)
-
-        os.remove(tmp_file1)
+        self.auditor._assert_xml_file('bogus')
 
     def test_get_all_custom_items(self):
-        set1 = set(['/a', '/b'])
-        set2 = set(['/a', '/b', '/c'])
-        root1 = Mock(tag='root1')
-        root2 = Mock(tag='root2')
-        self.auditor._get_xml_root = Mock(side_effect=[root1, root2])
-        self.auditor._get_all_items = Mock(side_effect=[set2, set1])
-        expected = set(['/c'])
+        set1 = set(['alias::/a', 'alias::/b'])
+        set2 = set(['alias::/a', 'alias::/b', 'alias::/c'])
+        self.auditor._scan_xml_file = Mock(side_effect=[set2, set1])
+        expected = set(['alias::/c'])
         citems = self.auditor._get_all_custom_items()
         self.assertEquals(expected, citems)
+        self.auditor._scan_xml_file.assert_has_calls(
+            [call(EnmAuditForUplift.model_file2, {}),
+             call(EnmAuditForUplift.model_file1, {})])
+
+        # The ItemType data comes from the same scans
+        self.auditor._process_xml_file(EnmAuditForUplift.model_file2)
+        self.auditor._process_xml_file(EnmAuditForUplift.model_file1)
+        self.assertEquals(2, self.auditor._scan_xml_file.call_count)
 
         # ---
-        self.auditor._get_xml_root = Mock(side_effect=[root1, root2])
-        self.auditor._get_all_items = Mock(side_effect=[set1, set2])
+        self.auditor.model_items = {}
+        self.auditor._scan_xml_file = Mock(side_effect=[set1, set2])
         expected = set([])
         citems = self.auditor._get_all_custom_items()
         self.assertEquals(expected, citems)
@@ -332,16 +335,6 @@ class TestEnmAuditForUplift(TestCase):
         rc_items = self.auditor.categorize_custom_items()
         self.assertEqual(expected, rc_items)
 
-    def test_get_all_items(self):
-        def _mock_iterator(element, itype, vpath, items, ref_counts):
-            items.add(element)
-
-        root = Mock(getchildren=Mock(return_value=range(5)))
-        self.auditor._iter_by_itype = _mock_iterator
-        items = self.auditor._get_all_items(root, None)
-        expected = set(range(5))
-        self.assertEqual(expected, items)
-
     def _assert_itypes(self, itypes=None):
         print "inherited itypes:" + str(self.auditor.all_inherit_types)
 
@@ -452,14 +445,6 @@ class TestEnmAuditForUplift(TestCase):
         itypes = self.auditor._get_ext_itemtypes(cps)
         self.assertEquals(expected, itypes)
 
-    def test_timeout(self):
-        timer = self.auditor.Timeout(60)
-        timer.get_cur_time()
-        timer.take_a_nap(1)
-        self.assertFalse(timer.has_time_elapsed())
-        self.assertEquals(60 - timer.get_time_elapsed(),
-                          timer.get_remaining_time())
-
     def test_get_rtd_13032_ndm_rpm_names(self):
         ndm_rpms = self.auditor._get_rtd_13032_ndm_rpm_names()
         self.assertEquals(54, len(ndm_rpms))
@@ -1,8 +1,13 @@
+import shutil
+from os.path import join
+from tempfile import mkdtemp
+
 import unittest2
 from mock import call, MagicMock, patch
 
 from defrag_nas_fs import NasLitpModel, DefragNasFs, NasCommandException, \
-    main, disconnect, nas_command
+    main, disconnect, nas_command, parse_nas_load, DefragProgress, \
+    LOAD_COMMAND, PROGRESS_FILE
 
 sp1_path = [
     {'path': '/infrastructure/storage/storage_providers/sp1',
@@ -45,8 +50,35 @@ class TestNasLitpModel(unittest2.TestCase):
                                    ['/vx/enm1-00pm']]})
 
 
+LOAD_OUTPUT = [
+    '4',
+    '{0} 1.10 0.90 2/512 12345',
+    'procs -----------memory---------- ---swap-- -----io---- -system-- '
+    '------cpu-----',
+    ' r  b   swpd   free   buff  cache   si   so    bi    bo   in   cs us '
+    'sy id wa st',
+    ' 1  0      0 812344  10240 904812    0    0     5    10   50   80  2 '
+    ' 1 96  1  0',
+    ' 2  1      0 812300  10240 904812    0    0   900  1200  700  900  5 '
+    ' 3 {1}  {2}  0']
+
+
+def load_output(load_avg, iowait):
+    return [line.format(load_avg, 90 - iowait, iowait)
+            for line in LOAD_OUTPUT]
+
+
 class TestDefragNasFs(unittest2.TestCase):
 
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.config = {'enminst_runtime': self.tmpdir,
+                       'nas_defrag_concurrency': '2',
+                       'nas_defrag_fs_time': '1800'}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
     def patch_ssh(self, ssh_mock, return_code, stdout, stderr):
         mstdout = MagicMock()
         mstdout.channel.recv_exit_status.return_value = return_code
@@ -84,8 +116,38 @@ class TestDefragNasFs(unittest2.TestCase):
         self.assertListEqual(output, ['test output'])
         self.assertEquals(rc, 0)
 
-        self.patch_ssh(ssh, 1, ['test output'], ['test error'])
-        self.assertRaises(NasCommandException, nas_command, ssh, command)
+        stdout = ssh.exec_command.return_value[1]
+        stdout.channel.set_combine_stderr.assert_called_once_with(True)
+
+        # stderr comes with stdout
+        self.patch_ssh(ssh, 1, ['test error'], [])
+        with self.assertRaises(NasCommandException) as error:
+            nas_command(ssh, command)
+        self.assertEqual(['test error'], error.exception.args[0])
+
+    def test_nas_command_callback(self):
+        ssh = MagicMock()
+        self.patch_ssh(ssh, 0, [], [])
+        stdout = ssh.exec_command.return_value[1]
+        stdout.__iter__.return_value = iter(['line 1\n', 'line 2\n'])
+        received = []
+        rc, output = nas_command(ssh, 'test command',
+                                 callback=received.append)
+        self.assertEquals(0, rc)
+        self.assertEquals([], output)
+        self.assertEquals(['line 1', 'line 2'], received)
+        self.assertFalse(stdout.readlines.called)
+
+        # Only the last lines are kept to report a failure
+        self.patch_ssh(ssh, 2, [], [])
+        stdout = ssh.exec_command.return_value[1]
+        stdout.__iter__.return_value = iter(
+                ['line {0}\n'.format(index) for index in range(100)])
+        with self.assertRaises(NasCommandException) as error:
+            nas_command(ssh, 'test command', callback=received.append)
+        self.assertEqual(['line {0}'.format(index)
+                          for index in range(80, 100)],
+                         error.exception.args[0])
 
     def test_get_nas_mounted_fs(self):
         sfsdg = '/dev/vx/dsk/sfsdg'
@@ -102,7 +164,7 @@ class TestDefragNasFs(unittest2.TestCase):
         self.assertIn('/vx/enm1-01pm', mounted_fs)
         self.assertIn('/vx/enm1-02pm', mounted_fs)
 
-        self.patch_ssh(ssh, 1, [], ['Cannot display FS'])
+        self.patch_ssh(ssh, 1, ['Cannot display FS'], [])
         self.assertRaises(NasCommandException, dnf.get_nas_mounted_fs, ssh)
 
     @patch('defrag_nas_fs.NasLitpModel.get_nas_info')
@@ -120,7 +182,7 @@ class TestDefragNasFs(unittest2.TestCase):
                                                ['/vx/enm1-02pm',
                                                 '/vx/enm1-00pm']]}
 
-        dnf = DefragNasFs()
+        dnf = DefragNasFs(self.config)
         m_ssh = MagicMock()
         self.patch_ssh(m_ssh, 0, sfs_fs_list, [])
 
@@ -134,13 +196,112 @@ class TestDefragNasFs(unittest2.TestCase):
                                                  'key-for-sfs')
         m_ssh.assert_has_calls([
             call.exec_command(
-                    '/opt/VRTS/bin/fsadm -t vxfs -T 3600 -d /vx/enm1-02pm')
+                    '/opt/VRTS/bin/fsadm -t vxfs -T 1800 -d /vx/enm1-02pm')
         ])
 
         m_ssh.reset_mock()
         self.patch_ssh(m_ssh, 1, sfs_fs_list, [])
         self.assertRaises(NasCommandException, dnf.defrag_fs)
 
+    def test_parse_nas_load(self):
+        self.assertEqual((0.5, 12), parse_nas_load(load_output('2.00', 12)))
+        self.assertIsNone(parse_nas_load(['test output']))
+
+    @patch('defrag_nas_fs.nas_command')
+    def test_nas_load_ok(self, m_nas_command):
+        dnf = DefragNasFs(self.config)
+        m_nas_command.return_value = 0, load_output('2.00', 12)
+        self.assertTrue(dnf.nas_load_ok(None))
+        m_nas_command.assert_called_once_with(None, LOAD_COMMAND)
+        m_nas_command.return_value = 0, load_output('8.00', 12)
+        self.assertFalse(dnf.nas_load_ok(None))
+        m_nas_command.return_value = 0, load_output('2.00', 45)
+        self.assertFalse(dnf.nas_load_ok(None))
+        m_nas_command.side_effect = NasCommandException(['no vmstat'])
+        self.assertTrue(dnf.nas_load_ok(None))
+
+        m_nas_command.reset_mock()
+        self.config['nas_defrag_max_load'] = '0'
+        self.config['nas_defrag_max_iowait'] = '0'
+        self.assertTrue(DefragNasFs(self.config).nas_load_ok(None))
+        self.assertFalse(m_nas_command.called)
+
+    @patch('defrag_nas_fs.nas_command')
+    def test_defrag_filesystems_concurrent(self, m_nas_command):
+        started = []
+
+        def command(ssh, cmd, callback=None):
+            if cmd == LOAD_COMMAND:
+                # Busy once two defrags have been started
+                return 0, load_output('8.00' if len(started) > 1 else '1.00',
+                                      5)
+            started.append(cmd.split()[-1])
+            if cmd.endswith('fs3'):
+                raise NasCommandException(['fsadm failed'])
+            return 0, []
+
+        m_nas_command.side_effect = command
+        self.config['nas_defrag_concurrency'] = '3'
+        dnf = DefragNasFs(self.config)
+        filesystems = ['/vx/fs1', '/vx/fs2', '/vx/fs3', '/vx/fs4']
+        dnf.defrag_filesystems(MagicMock(), 'sp1', filesystems)
+        self.assertEqual(filesystems, sorted(started))
+        # The calls interleave differently from run to run, only the
+        # commands sent are checked
+        commands = [args[1] for args, _ in m_nas_command.call_args_list]
+        self.assertEqual(filesystems, sorted(
+                cmd.split()[-1] for cmd in commands if cmd != LOAD_COMMAND))
+        # The first defrag starts with nothing running, the load is checked
+        # before starting the next one
+        self.assertIn(LOAD_COMMAND, commands)
+        # A full cycle leaves no progress behind
+        self.assertEqual({}, DefragProgress(
+                join(self.tmpdir, PROGRESS_FILE)).done)
+
+        # One at a time, a defrag never starts while another runs so the
+        # load is never checked
+        del started[:]
+        m_nas_command.reset_mock()
+        self.config['nas_defrag_concurrency'] = '1'
+        DefragNasFs(self.config).defrag_filesystems(MagicMock(), 'sp1',
+                                                    filesystems)
+        self.assertEqual(filesystems, started)
+        self.assertNotIn(LOAD_COMMAND, [
+            args[1] for args, _ in m_nas_command.call_args_list])
+
+    @patch('defrag_nas_fs.nas_command')
+    def test_defrag_filesystems_resume(self, m_nas_command):
+        progress = DefragProgress(join(self.tmpdir, PROGRESS_FILE))
+        progress.completed('sp1', '/vx/fs1', 'ok')
+        progress.completed('sp1', '/vx/fs2', 'failed')
+        progress.completed('sp2', '/vx/fs1', 'ok')
+
+        m_nas_command.return_value = 0, []
+        self.config['nas_defrag_max_load'] = '0'
+        self.config['nas_defrag_max_iowait'] = '0'
+        dnf = DefragNasFs(self.config)
+        dnf.defrag_filesystems(MagicMock(), 'sp1',
+                               ['/vx/fs1', '/vx/fs2', '/vx/fs3'])
+        self.assertEqual(
+                [call(m_nas_command.call_args[0][0],
+                      '/opt/VRTS/bin/fsadm -t vxfs -T 1800 -d /vx/fs3',
+                      callback=m_nas_command.call_args[1]['callback'])],
+                m_nas_command.mock_calls)
+        progress = DefragProgress(join(self.tmpdir, PROGRESS_FILE))
+        self.assertEqual({'sp2': {'/vx/fs1': 'ok'}}, progress.done)
+        # With the cycle done the next job starts a new one
+        self.assertEqual(['/vx/fs1', '/vx/fs2'],
+                         progress.remaining('sp1', ['/vx/fs1', '/vx/fs2']))
+
+    def test_progress_damaged(self):
+        filename = join(self.tmpdir, PROGRESS_FILE)
+        with open(filename, 'w') as _writer:
+            _writer.write('{"sp1')
+        self.assertEqual({}, DefragProgress(filename).done)
+        progress = DefragProgress(join(self.tmpdir, 'missing', PROGRESS_FILE))
+        progress.completed('sp1', '/vx/fs1', 'ok')
+        self.assertEqual({'sp1': {'/vx/fs1': 'ok'}}, progress.done)
+
     @patch('defrag_nas_fs.DefragNasFs')
     def test_main(self, m_defragnasfs):
         main()
@@ -9,7 +9,7 @@ from collections import OrderedDict
 
 import mock
 import unittest2
-from mock import patch, MagicMock, call, PropertyMock
+from mock import patch, MagicMock, call, PropertyMock, ANY
 
 import sys
 
@@ -417,6 +417,15 @@ lrwxrwxrwx. 1 root root      8 Oct 29 23:27 vg_vmvg-vg3_lv_vms -> ../dm-11
 """
 
 
+class AuditStream(list):
+    """
+    The output of a streamed NAS command, with its exit code
+    """
+    def __init__(self, status, lines):
+        super(AuditStream, self).__init__(lines)
+        self.status = status
+
+
 class MockLitpObject(object):
     def __init__(self, path, state, properties, item_id):
         self.path = path
@@ -1644,6 +1653,7 @@ class TestHealthCheck(unittest2.TestCase):
         self.assertRaises(SystemExit, self.hc.main, ['--exclude something'])
 
     @patch('h_util.h_nas_console.NasConsole.exec_basic_nas_command')
+    @patch('h_util.h_nas_console.NasConsole.stream_nas_command')
     @patch('h_util.h_utils.Decryptor.get_password')
     @patch('h_litp.litp_rest_client.LitpRestClient.get_children')
     @patch('paramiko.SSHClient')
@@ -1651,6 +1661,7 @@ class TestHealthCheck(unittest2.TestCase):
                              ssh,
                              rest_mock,
                              nas_pw,
+                             stream_nas_cmd,
                              exec_nas_cmd):
         hc = self.c
 
@@ -1670,47 +1681,47 @@ class TestHealthCheck(unittest2.TestCase):
         # audit
         # audit check
         hc.nas_type = 'veritas'
-        exec_nas_cmd.side_effect = [(0, out_nas_audit, [], ""),
-                                    (0, ok_nas_audit_check, [], "")]
+        stream_nas_cmd.side_effect = [AuditStream(0, out_nas_audit)]
+        exec_nas_cmd.side_effect = [(0, ok_nas_audit_check, [], "")]
         rest_mock.side_effect = [sp1_path, pool_path, fs_path]
         self.assertEquals(hc.nas_healthcheck(verbose=True), None)
 
         # Simulate nasAudit failing with retcode 1
         hc.nas_type = 'veritas'
-        exec_nas_cmd.side_effect = [(1, out_nas_audit, [], ""),
-                                    (0, err_nas_audit_check, [], "")]
+        stream_nas_cmd.side_effect = [AuditStream(1, out_nas_audit)]
+        exec_nas_cmd.side_effect = [(0, err_nas_audit_check, [], "")]
         rest_mock.side_effect = [sp1_path, pool_path, fs_path]
         self.assertRaises(SystemExit, hc.nas_healthcheck)
 
         # Simulate nasAudit failing with retcode 2
         hc.nas_type = 'veritas'
-        exec_nas_cmd.side_effect = [(2, out_nas_audit, [], ""),
-                                    (0, err_warn_nas_audit_check, [], "")]
+        stream_nas_cmd.side_effect = [AuditStream(2, out_nas_audit)]
+        exec_nas_cmd.side_effect = [(0, err_warn_nas_audit_check, [], "")]
         rest_mock.side_effect = [sp1_path, pool_path, fs_path]
         self.assertRaises(SystemExit, hc.nas_healthcheck)
 
         # Simulate nasAudit failing with retcode 3
         hc.nas_type = 'veritas'
-        exec_nas_cmd.side_effect = [(3, out_nas_audit, [], ""),
-                                    (0, warn_nas_audit_check, [], "")]
+        stream_nas_cmd.side_effect = [AuditStream(3, out_nas_audit)]
+        exec_nas_cmd.side_effect = [(0, warn_nas_audit_check, [], "")]
         rest_mock.side_effect = [sp1_path, pool_path, fs_path]
         self.assertEquals(hc.nas_healthcheck(), None)
 
         # Verify do not do audit check on success if not verbose
         hc.nas_type = 'veritas'
-        exec_nas_cmd.side_effect = [(0, out_nas_audit, [], "")]
+        stream_nas_cmd.side_effect = [AuditStream(0, out_nas_audit)]
         rest_mock.side_effect = [sp1_path, pool_path, fs_path]
         self.assertEquals(hc.nas_healthcheck(verbose=False), None)
 
         # Simulate nasAudit fails to generate report
         hc.nas_type = 'veritas'
-        exec_nas_cmd.side_effect = [(1, fail_nas_audit, [], "")]
+        stream_nas_cmd.side_effect = [AuditStream(1, fail_nas_audit)]
         rest_mock.side_effect = [sp1_path, pool_path, fs_path]
         self.assertRaises(SystemExit, hc.nas_healthcheck)
 
         # Simulate nasAudit fails to generate report but no report location
         hc.nas_type = 'veritas'
-        exec_nas_cmd.side_effect = [(1, [], [], "")]
+        stream_nas_cmd.side_effect = [AuditStream(1, [])]
         rest_mock.side_effect = [sp1_path, pool_path, fs_path]
         self.assertRaises(SystemExit, hc.nas_healthcheck)
 
@@ -1721,23 +1732,25 @@ class TestHealthCheck(unittest2.TestCase):
 
         # Unexpected error code from nasAudit
         hc.nas_type = 'veritas'
-        exec_nas_cmd.side_effect = [(5, out_nas_audit, out_nas_audit, "")]
+        stream_nas_cmd.side_effect = [AuditStream(5, out_nas_audit)]
         rest_mock.side_effect = [sp1_path, pool_path, fs_path]
         self.assertRaises(SystemExit, hc.nas_healthcheck)
 
         # Simulate nasAudit warning and nasAuditCheck errors
         hc.nas_type = 'veritas'
-        exec_nas_cmd.side_effect = [(3, out_nas_audit, [], ""),
-                                    (1, warn_nas_audit_check, [], "")]
+        stream_nas_cmd.side_effect = [AuditStream(3, out_nas_audit)]
+        exec_nas_cmd.side_effect = [(1, warn_nas_audit_check, [], "")]
         rest_mock.side_effect = [sp1_path, pool_path, fs_path]
         self.assertEquals(hc.nas_healthcheck(), None)
 
         # Simulate nasAudit error and nasAuditCheck errors
         hc.nas_type = 'veritas'
-        exec_nas_cmd.side_effect = [(2, out_nas_audit, [], ""),
-                                    (1, err_nas_audit_check, [], "")]
+        stream_nas_cmd.side_effect = [AuditStream(2, out_nas_audit)]
+        exec_nas_cmd.side_effect = [(1, err_nas_audit_check, [], "")]
         rest_mock.side_effect = [sp1_path, pool_path, fs_path]
         self.assertRaises(SystemExit, hc.nas_healthcheck)
+        stream_nas_cmd.assert_called_with(hc.NAS_AUDIT, callback=ANY,
+                                          check=False)
 
     @patch('h_hc.hc_mdt.MdtHealthCheck.mdt_nfs_volume_healthcheck')
     def test_mdt_healthcheck(self, mdt):
@@ -7,18 +7,12 @@ from mock import call, patch, Mock, MagicMock
 from h_puppet.mco_agents import McoAgentException
 import os.path
 from enm_upgrade_prechecks import EnmPreChecks, Translator
+from h_util.h_process import ProcessResult, ProcessTimeout
 import enm_upgrade_prechecks
 tran = Translator('ERICenminst_CXP9030877')
 _ = tran._
 
 
-class MockTimeout(Mock):
-    def has_elapsed(self):
-        return True
-    def sleep(self, sleep_time):
-        pass
-
-
 class TestEnmPrechecks(TestCase):
     FIRST_ATTEMPT = 1
     SECOND_ATTEMPT = 2
@@ -291,29 +285,29 @@ class TestEnmPrechecks(TestCase):
         msg = self.get_msg('OPENDJ_REPLICATION_INTACT')
         self.call_method_and_assert_msgs(self.prechecks.check_opendj_replication, success_msg=msg)
 
-    @patch('subprocess.Popen')
-    def test_run_command_01(self, mock_popen):
-        mock_process1 = Mock()
-        mock_process1.poll.return_value = 'terminate'
-        mock_process1.communicate.return_value = ('xyz', None)
-        mock_popen.return_value = mock_process1
-        mock_process1.returncode = 0
+    @patch('enm_upgrade_prechecks.run_process')
+    def test_run_command_01(self, m_run_process):
+        m_run_process.return_value = ProcessResult(0, 'xyz\n', 0.01)
+
+        rc, output = self.prechecks.run_command('ls', timeout_secs=5)
+        self.assertEqual((0, 'xyz'), (rc, output))
+        m_run_process.assert_called_once_with('ls', timeout=5,
+                                              logger=self.prechecks.log)
 
-        rc, output = self.prechecks.run_command('ls')
+        self.prechecks.run_command('ls', do_logging=False)
+        m_run_process.assert_called_with(
+                'ls', timeout=EnmPreChecks.CMD_TIMEOUT, logger=None)
 
-    @patch('subprocess.Popen')
-    @patch('enm_upgrade_prechecks.EnmPreChecks.Timeout', new=MockTimeout)
-    def test_run_command_02(self, mock_popen):
-        mock_process1 = Mock()
-        mock_process1.poll.return_value = None
-        mock_popen.return_value = mock_process1
+    @patch('enm_upgrade_prechecks.run_process')
+    def test_run_command_02(self, m_run_process):
+        m_run_process.side_effect = ProcessTimeout('ls', 5, '')
 
         expected_err = self.get_msg('TIMEOUT_OUT_COMMAND').format('ls')
         self.call_method_and_assert_msgs(self.prechecks.run_command, 'ls', err_msg=expected_err)
 
-    @patch('subprocess.Popen')
-    def test_run_command_03(self, mock_popen):
-        mock_popen.side_effect = OSError("OS Error")
+    @patch('enm_upgrade_prechecks.run_process')
+    def test_run_command_03(self, m_run_process):
+        m_run_process.side_effect = OSError("OS Error")
         expected_err = self.get_msg('ERROR_PROCESSING_COMMAND').format('ls', None, None)
         self.call_method_and_assert_msgs(self.prechecks.run_command, 'ls', err_msg=expected_err)
 
@@ -915,6 +915,7 @@ class TestDbNodesSshCredentials(TestCase):
     @patch("h_hc.hc_neo4j_cluster.is_env_on_rack")
     def test_validate_credentials_blade_success(self, is_rack, exists, _open,
                            load_system_host_keys, connect, _run, c_close):
+        _run.return_value = 0, ''
         is_rack.return_value = False
         exists.return_value = True
         _open.return_value = StringIO(DB_CREDENTIALS)
@@ -930,6 +931,7 @@ class TestDbNodesSshCredentials(TestCase):
     @patch("h_hc.hc_neo4j_cluster.is_env_on_rack")
     def test_validate_credentials_rack_success(self, is_rack, exists, _open,
                            load_system_host_keys, connect, _run, c_close):
+        _run.return_value = 0, ''
         is_rack.return_value = True
         exists.return_value = True
         _open.return_value = StringIO(DB_CREDENTIALS_RACK)
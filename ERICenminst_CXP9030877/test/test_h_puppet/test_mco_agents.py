@@ -153,6 +153,14 @@ class TestBaseAgent(TestCase):
         data = ba.mco_exec('agent', ['groups=action'], 'sender')
         self.assertEqual(expected, data)
 
+        m_run_rpc_command.side_effect = [
+            {'sender': {
+                'errors': '', 'data': get_rpc_data(0, expected, 'err')}}
+        ]
+        data = ba.mco_exec('agent', ['groups=action'], 'sender',
+                           stdoutkey=None)
+        self.assertEqual(get_rpc_data(0, expected, 'err'), data)
+
         m_run_rpc_command.side_effect = [
             {'sender1': {'errors': '',
                          'data': get_rpc_data(0, 's1', 'err')},
@@ -189,6 +197,26 @@ class TestBaseAgent(TestCase):
         self.assertEqual('b', ba.get_exec_system('a', 'b'))
         self.assertEqual('a', ba.get_exec_system('a', None))
 
+    @patch('h_puppet.mco_agents.run_rpc_command')
+    def test_mco_exec_per_host(self, m_run_rpc_command):
+        ba = BaseAgent('')
+        m_run_rpc_command.return_value = {
+            'sender1': {'errors': '', 'data': get_rpc_data(0, 's1', '')},
+            'sender2': {'errors': '', 'data': get_rpc_data(1, 's2', 'bad')},
+            'sender3': {'errors': 'no!', 'data': {}}}
+        data, errors = ba.mco_exec_per_host(
+                'agent', ['groups=action'],
+                ['sender1', 'sender2', 'sender3', 'sender4'])
+        m_run_rpc_command.assert_called_once_with(
+                ['sender1', 'sender2', 'sender3', 'sender4'], '', 'agent',
+                {'groups': 'action'}, timeout=None, retries=0)
+        self.assertEqual({'sender1': 's1'}, data)
+        self.assertEqual(['sender2', 'sender3', 'sender4'], sorted(errors))
+        self.assertEqual('bad', errors['sender2'].err)
+        self.assertEqual('no!', errors['sender3'].err)
+        self.assertIn('No answer from node sender4',
+                      str(errors['sender4'].message))
+
     @patch('h_puppet.mco_agents.run_rpc_command')
     def test_mco_exec_connection_exception(self, m_run_rpc_command):
         ba = BaseAgent('')
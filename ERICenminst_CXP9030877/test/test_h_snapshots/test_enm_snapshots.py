@@ -4,7 +4,7 @@ import sys
 from base64 import standard_b64encode
 from os import makedirs
 from os.path import join, exists
-from tempfile import mktemp, gettempdir
+from tempfile import mktemp, mkdtemp, gettempdir
 
 import unittest2
 from Crypto.Cipher import AES
@@ -1471,6 +1471,69 @@ class TestEnmSnap(unittest2.TestCase):
     def test_main_help(self):
         self.assertRaises(SystemExit, main, ['--action', 'bla'])
 
+    @patch(TC_MODULE + '.estimate_enminst_snapshots')
+    @patch(TC_MODULE + '.manage_enminst_snapshots')
+    def test_main_estimate(self, m_manage, m_estimate):
+        main(['--action', 'restore_snapshot', '--estimate'])
+        m_estimate.assert_called_once_with('restore_snapshot',
+                                           snap_prefix='Snapshot',
+                                           num_of_threads=10)
+        self.assertFalse(m_manage.called)
+
+        m_estimate.reset_mock()
+        main(['--action', 'remove_snapshot', '--estimate'])
+        main(['--action', 'create_snapshot', '--estimate',
+              '--snap_type', 'litp'])
+        self.assertFalse(m_estimate.called)
+        self.assertFalse(m_manage.called)
+
+    @patch(TC_MODULE + '.read_enminst_config')
+    @patch(TC_MODULE + '.get_logger')
+    @patch(TC_MODULE + '.EnmSnap')
+    @patch(TC_MODULE + '.SfsSnapshots')
+    @patch(TC_MODULE + '.VNXSnap')
+    @patch(TC_MODULE + '.LVMSnapshots')
+    def test_estimate_enminst_snapshots(self, lvm, san, sfs, enm, m_logger,
+                                        m_read_enminst_config):
+        tmpdir = mkdtemp()
+        m_read_enminst_config.return_value = {'enminst_runtime': tmpdir}
+        luns = {'1': MagicMock(), '2': MagicMock()}
+        luns['1'].name = 'lun_a'
+        luns['2'].name = 'lun_b'
+        san.return_value.get_snappable_luns.return_value = luns
+        sfs.return_value.build_fs_to_snap.return_value = {'fs1': {}}
+        sfs.return_value.plan_rollback_cache.return_value = ('c1', '10G')
+        lvm.return_value.get_snappable_volumes.return_value = (
+            ['lv_root', 'lv_var'], {'db-1': ['lv_data']})
+        history = {'create_snapshot': {
+            'operation': [100.0],
+            'phases': {'san create_snapshots': {'durations': [30.0],
+                                                'items': [3]},
+                       'other': {'durations': [5.0], 'items': [0]}}}}
+        with open(join(tmpdir, 'snapshot_durations.json'), 'w') as _writer:
+            _writer.write(dumps(history))
+        try:
+            enm_snapshots.estimate_enminst_snapshots('create_snapshot')
+        finally:
+            shutil.rmtree(tmpdir)
+
+        self.assertFalse(san.return_value.create_snapshots.called)
+        self.assertFalse(sfs.return_value.create_snapshots.called)
+        self.assertFalse(lvm.return_value.create_snapshots.called)
+        sfs.return_value.plan_rollback_cache.assert_called_once_with(
+                {'fs1': {}})
+        logged = [args[0] for args, _ in
+                  m_logger.return_value.info.call_args_list]
+        self.assertIn('NAS rollback cache c1: 10G', logged)
+        self.assertIn('SAN LUN: 2/lun_b', logged)
+        self.assertIn('LMS Logical Volumes: lv_root, lv_var', logged)
+        self.assertIn('db-1 Logical Volumes: lv_data', logged)
+        self.assertIn('  +0.0s       nas create_snapshots (1 items) : '
+                      'no history', logged)
+        self.assertIn('  +0.0s       san create_snapshots (2 items) : 20s',
+                      logged)
+        self.assertEqual('Estimated total: 25 seconds', logged[-1])
+
     @patch(TC_MODULE + '.is_mount_option_migrated')
     @patch(TC_MODULE + '.discover_vcs_clusters')
     @patch(TC_MODULE + '.SfsSnapshots')
@@ -1832,6 +1895,10 @@ class TestEnmSnap(unittest2.TestCase):
                                  '["vol_a", "vol_b"]')
             assert_file_contents(join(tmpdir, 'node_vol_list_bkup.txt'),
                                  '{}')
+            self.assertTrue(exists(join(
+                    tmpdir, 'snapshot_timeline_create_snapshot.json')))
+            self.assertTrue(exists(join(
+                    tmpdir, 'snapshot_timeline_create_snapshot.trace.json')))
 
             # With racks in the deployment e.g. streaming
             m_lvm_create_snapshots.return_value = (['vol_a', 'vol_b'], {
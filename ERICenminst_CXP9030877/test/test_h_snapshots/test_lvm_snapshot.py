@@ -190,6 +190,7 @@ class TestLVMManager(unittest2.TestCase):
                 20480.00m
             """
         ep.side_effect = ['147040.00m', lvs_output]
+        lvm.rescan()
         self.assertEquals(90, lvm.calculate_lvm_snap_size())
 
     @patch('h_snapshots.lvm_snapshot.LVMManager.list_snapshots')
@@ -228,6 +229,72 @@ class TestLVMManager(unittest2.TestCase):
                                '@enm_upgarde_snapshot', 'vol_a', 'vol_b'])
 
 
+class TestLVMInventory(unittest2.TestCase):
+    @patch('h_snapshots.lvm_snapshot.exec_process')
+    def test_single_scan(self, ep):
+        ep.return_value = cmd_output
+        lvm = LVMManager()
+        self.assertEqual(1, len(lvm.list_snapshots()))
+        self.assertEqual(2, len(lvm.list_origin_volumes()))
+        self.assertEqual(5, len(lvm.list_volumes(exclude_lv=False)))
+        self.assertEqual(1, ep.call_count)
+        self.assertEqual(1, lvm.inventory.scan_count)
+
+        lvm.rescan()
+        self.assertEqual(1, ep.call_count)
+        lvm.list_volumes()
+        self.assertEqual(2, ep.call_count)
+
+    @patch('h_snapshots.lvm_snapshot.exec_process')
+    def test_indexes(self, ep):
+        ep.return_value = cmd_output
+        lvm = LVMManager()
+        self.assertEqual(['Snapshot_lv_home'],
+                         [v.lv_name for v in lvm.list_volumes(
+                                 tag='enm_upgrade_snapshot')])
+        self.assertEqual([], lvm.list_volumes(volume_group='vg_other'))
+        self.assertEqual(3, len(lvm.list_volumes(volume_group='vg_root')))
+        self.assertEqual('lv_var',
+                         lvm.inventory.get('vg_root', 'lv_var').lv_name)
+        self.assertIsNone(lvm.inventory.get('vg_root', 'lv_nope'))
+
+    @patch('h_snapshots.lvm_snapshot.exec_process')
+    def test_create_and_remove_update_inventory(self, ep):
+        ep.return_value = '\n'.join([
+            'lv_var,,-wi-ao----,/dev/vg_root/lv_var,vg_root,,unknown,,'
+            '2016-12-19 23:26:37 +0000'])
+        lvm = LVMManager()
+        self.assertEqual([], lvm.list_snapshots(tag='test_tag'))
+
+        ep.return_value = create_snap_output
+        lvm.create_snapshots([{'lv_name': 'lv_var',
+                               'lv_path': '/dev/vg_root/lv_var',
+                               'fs_snap_size': 100}],
+                             tag='test_tag', prefix='Snapshot', suffix=None)
+        snaps = lvm.list_snapshots(tag='test_tag')
+        self.assertEqual(1, len(snaps))
+        self.assertEqual('Snapshot_lv_var', snaps[0].lv_name)
+        self.assertEqual('/dev/vg_root/Snapshot_lv_var', snaps[0].lv_path)
+        self.assertEqual('lv_var', snaps[0].origin)
+        self.assertEqual(['lv_var'],
+                         [v.lv_name for v in lvm.list_origin_volumes()])
+
+        lvm.remove_snapshots(tag='test_tag')
+        self.assertEqual([], lvm.list_snapshots())
+        self.assertEqual([], lvm.list_origin_volumes())
+        self.assertEqual(1, len(lvm.list_volumes()))
+        self.assertEqual(1, lvm.inventory.scan_count)
+
+    @patch('h_snapshots.lvm_snapshot.exec_process')
+    def test_restore_updates_inventory(self, ep):
+        ep.return_value = cmd_output
+        lvm = LVMManager()
+        self.assertEqual(1, len(lvm.list_snapshots()))
+        lvm.restore_snapshots(tag='enm_upgrade_snapshot')
+        self.assertEqual([], lvm.list_snapshots())
+        self.assertEqual(2, ep.call_count)
+
+
 class TestLVMSnapshots(unittest2.TestCase):
     def __init__(self, method_name='runTest'):
         super(TestLVMSnapshots, self).__init__(method_name)
@@ -722,7 +789,7 @@ class TestLVMSnapshots(unittest2.TestCase):
         m_exec_process.side_effect = [
             '\n'.join(list_volumes), '\n'.join(list_volumes)]
         self.assertRaises(LVMManagerException, lvm.validate)
-        self.assertEqual(2, m_exec_process.call_count)
+        self.assertEqual(1, m_exec_process.call_count)
 
         list_volumes = [
             'lv_var,,owi-aos---,/dev/vg_root/lv_var,vg_root,,unknown,,'
@@ -833,7 +900,8 @@ class TestLVMSnapshots(unittest2.TestCase):
         lv_rpc_results_1 = {str_lost_node_1: {
             'errors':'No answer from node str-1', 'data': {}}}
 
-        m_run_rpc_command.side_effect = [lv_rpc_results_2, lv_rpc_results_1,
+        lv_rpc_results = dict(lv_rpc_results_1, **lv_rpc_results_2)
+        m_run_rpc_command.side_effect = [lv_rpc_results,
                                          grub6_rpc_results, grub7_rpc_results]
 
         lvm = LVMSnapshots('Snapshot')
@@ -926,7 +994,8 @@ class TestLVMSnapshots(unittest2.TestCase):
                    '{0}'.format(','.join(lv_output))
         }}}
 
-        m_run_rpc_command.side_effect = [lv_rpc_results_1, lv_rpc_results_2,
+        lv_rpc_results = dict(lv_rpc_results_1, **lv_rpc_results_2)
+        m_run_rpc_command.side_effect = [lv_rpc_results,
                                          grub6_rpc_results, grub7_rpc_results]
 
         lvm = LVMSnapshots('Snapshot')
@@ -1623,6 +1692,34 @@ class TestLVMSnapshots(unittest2.TestCase):
 
         lvm.restore_nodelocal_snapshots([str_node])
 
+    @patch('h_puppet.mco_agents.run_rpc_command')
+    def test_restore_nodelocal_snapshots_batched(self, m_run_rpc_command):
+        nodes = ['str-1', 'str-2', 'str-3']
+
+        def rpc_results(hosts, agent, action, action_kwargs=None,
+                        timeout=None, retries=0):
+            results = {}
+            for host in hosts:
+                if action == 'restore_lv_snapshots' and host == 'str-2':
+                    results[host] = {'errors': '', 'data': {
+                        'retcode': 5, 'err': 'Merge failed', 'out': ''}}
+                else:
+                    results[host] = {'errors': '', 'data': {
+                        'retcode': 0, 'err': '', 'out': 'done'}}
+            return results
+
+        m_run_rpc_command.side_effect = rpc_results
+        lvm = LVMSnapshots('Snapshot', num_of_threads=2)
+        with self.assertRaises(LVMManagerException) as error:
+            lvm.restore_nodelocal_snapshots(nodes)
+        self.assertIn('str-2', str(error.exception))
+        restore_calls = [c[0][0] for c in m_run_rpc_command.call_args_list
+                         if c[0][2] == 'restore_lv_snapshots']
+        self.assertEqual([['str-1', 'str-2'], ['str-3']], restore_calls)
+        sync_calls = [c[0][0] for c in m_run_rpc_command.call_args_list
+                      if c[0][2] == 'execute_sync_command']
+        self.assertEqual([nodes], sync_calls)
+
     @patch('os.path.isfile')
     @patch('os.remove')
     def test_create_rhel7_node_list_file(self, p_os_remove, p_is_file):
@@ -1686,8 +1783,10 @@ class TestLVMSnapshots(unittest2.TestCase):
     @patch(TC_MODULE + '.FilemanagerAgent')
     @patch(TC_MODULE + '.EnminstAgent')
     def test_torf_539295_restore(self, m_enminstagent, m_filemgragent):
-        m_enminstagent.restore_lv_snapshots = Mock(return_value={})
-        m_enminstagent.execute_sync_command = Mock(return_value={})
+        m_enminstagent.return_value.restore_lv_snapshots = Mock(
+            return_value=({}, {}))
+        m_enminstagent.return_value.execute_sync_command = Mock(
+            return_value={})
 
         restore_hosts = ['node-1', 'node-2', 'node-3', 'node-4']
 
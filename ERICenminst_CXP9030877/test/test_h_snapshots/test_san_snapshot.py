@@ -2,6 +2,7 @@ import unittest2
 from mock import call, patch, Mock, MagicMock
 
 import sys
+import traceback
 
 sys.modules['naslib.log'] = MagicMock()
 sys.modules['naslib.nasexceptions'] = MagicMock()
@@ -609,6 +610,99 @@ class TestVNXSnap(unittest2.TestCase):
                                          san.opendj_backup_dir,
                                          san.opendj_log_dir)
 
+    @patch('h_snapshots.san_snapshot.VNXSnap._get_active_mysql_node')
+    @patch('h_snapshots.san_snapshot.LitpSanSnapshots')
+    @patch('h_snapshots.snapshots_utils.LitpRestClient.get_auth_header')
+    @patch('h_snapshots.snapshots_utils.LitpRestClient.get')
+    def test_snap_frozen_dbs_neo4j(self, litp, litp_header, litp_san,
+                                   m_get_active_mysql_node):
+        litp_header.return_value = litp_header_value
+        litp.return_value = litp_get_value
+        m_get_active_mysql_node.return_value = 'db-3'
+        san = VNXSnap(self.san_cred, self.snap_prefix)
+        calls = []
+        san.neo4j_snapper = MagicMock()
+        san.neo4j_snapper.force_neo4j_checkpoint.side_effect = \
+            lambda nodes: calls.append('checkpoint')
+        san.neo4j_snapper.freeze_neo4j_db_filesystems.side_effect = \
+            lambda nodes: calls.append('freeze')
+        san.neo4j_snapper.unfreeze_neo4j_db_filesystems.side_effect = \
+            lambda nodes: calls.append('thaw')
+        san.snapper = MagicMock()
+        san.snapper.create_neo4j_snapshot.side_effect = \
+            lambda *args: calls.append('snap')
+        san.snapper.create_mysql_snapshot.return_value = 0.5
+        san.logger = MagicMock()
+
+        db_id_name = {'neo4j_1': '13', 'neo4j_2': '19', 'mysql': '74',
+                      'postgresdb': '14', 'versantdb': '73'}
+        san._snap_frozen_dbs(db_id_name, True, ['db-1', 'db-2'], None)
+
+        self.assertEqual(['checkpoint', 'freeze', 'snap', 'thaw'], calls)
+        # Only the neo4j LUNs are snapped in the neo4j freeze window
+        self.assertEqual({'neo4j_1': '13', 'neo4j_2': '19'},
+                         san.snapper.create_neo4j_snapshot.call_args[0][0])
+        self.assertEqual('74', san.snapper.create_mysql_snapshot.call_args[
+            0][1])
+        self.assertFalse(san.snapper.create_versant_snapshot.called)
+        logged = [args[0] for args, _ in san.logger.info.call_args_list]
+        self.assertTrue([msg for msg in logged
+                         if msg.startswith('SAN SNAP : neo4j DB was frozen '
+                                           'for ')])
+        self.assertIn('SAN SNAP : mysql DB was frozen for 0.5 second '
+                      '(tables locked, measured on the DB node)', logged)
+
+    @patch('h_snapshots.san_snapshot.VNXSnap._get_active_mysql_node')
+    @patch('h_snapshots.san_snapshot.LitpSanSnapshots')
+    @patch('h_snapshots.snapshots_utils.LitpRestClient.get_auth_header')
+    @patch('h_snapshots.snapshots_utils.LitpRestClient.get')
+    def test_snap_frozen_dbs_failure_thaws(self, litp, litp_header, litp_san,
+                                           m_get_active_mysql_node):
+        litp_header.return_value = litp_header_value
+        litp.return_value = litp_get_value
+        m_get_active_mysql_node.return_value = 'db-3'
+        san = VNXSnap(self.san_cred, self.snap_prefix)
+        san.neo4j_snapper = MagicMock()
+        san.snapper = MagicMock()
+        san.snapper.create_neo4j_snapshot.side_effect = \
+            SanApiException('snap failed', 1)
+        san.snapper.create_mysql_snapshot.return_value = 0.5
+        san.logger = MagicMock()
+
+        db_id_name = {'neo4j_1': '13', 'mysql': '74'}
+        self.assertRaises(SanApiException, san._snap_frozen_dbs, db_id_name,
+                          True, ['db-1'], None)
+        san.neo4j_snapper.unfreeze_neo4j_db_filesystems.assert_called_once_with(
+                ['db-1'])
+        # The other databases are still snapped and thawed
+        self.assertTrue(san.snapper.create_mysql_snapshot.called)
+        self.assertTrue(san.logger.error.called)
+
+    @patch('h_snapshots.san_snapshot.VNXSnap._get_active_mysql_node')
+    @patch('h_snapshots.san_snapshot.LitpSanSnapshots')
+    @patch('h_snapshots.snapshots_utils.LitpRestClient.get_auth_header')
+    @patch('h_snapshots.snapshots_utils.LitpRestClient.get')
+    def test_snap_frozen_dbs_failure_traceback(self, litp, litp_header,
+                                               litp_san,
+                                               m_get_active_mysql_node):
+        litp_header.return_value = litp_header_value
+        litp.return_value = litp_get_value
+        m_get_active_mysql_node.return_value = None
+        san = VNXSnap(self.san_cred, self.snap_prefix)
+        san.snapper = MagicMock()
+        san.snapper.create_versant_snapshot.side_effect = \
+            SanApiException('snap failed', 1)
+        san.logger = MagicMock()
+
+        try:
+            san._snap_frozen_dbs({'versantdb': '73'}, False, [], 'db-1')
+        except SanApiException:
+            frames = traceback.extract_tb(sys.exc_info()[2])
+        else:
+            self.fail('SanApiException not raised')
+        # The traceback goes down to the failed worker call
+        self.assertIn('_snap_versant_db', [frame[2] for frame in frames])
+
     @patch('h_vcs.vcs_cli.Vcs.is_sg_persistently_frozen')
     @patch('h_snapshots.san_snapshot.VNXSnap._get_opendj_luns')
     @patch('h_snapshots.san_snapshot.sleep')
@@ -764,6 +858,8 @@ class TestVNXSnap(unittest2.TestCase):
 
         m_get_active_mysql_node.return_value = 'mysql_node'
         m_get_active_versant_node.return_value = 'versant_node'
+        m_create_versant_snapshot.return_value = 4.0
+        m_create_mysql_snapshot.return_value = None
 
         litp_san.return_value.get_node_lundisks.return_value = lun_disks
 
@@ -1,5 +1,7 @@
 from copy import deepcopy
 import httplib
+import threading
+import time
 from json import dumps
 from mock import patch, MagicMock, call
 import unittest2
@@ -8,7 +10,8 @@ from h_snapshots.sfs_snapshot import SfsSnapshots, SfsSnapshotsException, \
     SFS_SNAP_SIZE_KEY
 from h_snapshots import sfs_snapshot
 from h_litp.litp_utils import LitpException
-from h_util.h_nas_console import get_rollback_cache_name
+from h_util.h_nas_console import get_rollback_cache_name, \
+    NasConsoleException
 from test_h_litp.test_h_litp_rest_client import setup_mock as setup_litp_mocks
 
 TC_MODULE = 'h_snapshots.sfs_snapshot'
@@ -250,6 +253,28 @@ class TestSfsSnapshots(unittest2.TestCase):
         sfs.remove_snapshots()
         self.assertEquals(self.deleted, {})
 
+    @patch(TC_MODULE + '.NasConsole')
+    def test_operations_close_console(self, nc, m_nas_type):
+        nc.return_value.storage_rollback_list.return_value = {}
+        nc.return_value.storage_fs_list.return_value = fs_to_snap
+        nc.return_value.session_stats.return_value = {
+            'opened': 1, 'reused': 3, 'dropped': 0}
+        sfs = SfsSnapshots(nas_cred, 'Snapshot')
+        sfs.logger = MagicMock()
+        self.get_litp_model_mock(sfs)
+        # remove_snapshots calls build_fs_to_snap and remove_rollback_cache,
+        # the console is only closed when remove_snapshots returns
+        sfs.remove_snapshots()
+        nc.return_value.close.assert_called_once_with()
+        sfs.logger.info.assert_called_with(
+                'NAS SNAP: NAS sessions: 1 opened, 3 reused, 0 dropped')
+
+        nc.return_value.close.reset_mock()
+        nc.return_value.storage_rollback_list.side_effect = IOError
+        self.assertRaises(IOError, sfs.list_rollbacks)
+        nc.return_value.close.assert_called_once_with()
+        self.assertEqual(0, sfs.operations)
+
     @patch(TC_MODULE + '.NasConsole')
     def test_create_snapshots(self, nc, m_nas_type):
         dummy_fs = {'dummy': {'status': 'online', 'shared': 'yes',
@@ -263,11 +288,19 @@ class TestSfsSnapshots(unittest2.TestCase):
             'enm-cache'
         self.create = {}
 
-        def se1(rl, fs, cache):
-            self.create[fs] = [rl, cache]
+        self.closed = False
+
+        def se1(rollbacks, cache):
+            try:
+                for rl, fs in rollbacks:
+                    self.create[fs] = [rl, cache]
+                    yield rl, fs
+            finally:
+                self.closed = True
 
-        nc.return_value.storage_rollback_create = se1
+        nc.return_value.storage_rollback_create_batch = se1
         filesystems = sfs.create_snapshots()
+        self.assertTrue(self.closed)
         self.assertIn('enm-smrs', filesystems)
         self.assertIn('enm-brsadm_home', filesystems)
         self.assertIn('Snapshot-enm-brsadm_home',
@@ -423,7 +456,7 @@ class TestSfsSnapshots(unittest2.TestCase):
         self.assertEqual(None, sfs.validate(fs_to_snap))
 
     @patch(TC_MODULE + '.NasConsole.storage_rollback_list')
-    @patch(TC_MODULE + '.NasConsole.storage_fs_list')
+    @patch(TC_MODULE + '.NasConsole.fs_status')
     @patch('h_util.h_nas_console.read_enminst_config')
     @patch('paramiko.SSHClient')
     @patch(TC_MODULE + '.NasConsole.storage_rollback_restore')
@@ -443,8 +476,8 @@ class TestSfsSnapshots(unittest2.TestCase):
                                                    'rw,sync,no_root_squash',
                                                'filesystem':
                                                    'enm-brsadm_home'}]}
-        fls.return_value = {'enm-smrs': {'status': 'offline'},
-                            'enm-brsadm_home': {'status': 'offline'}}
+        fls.return_value = {'enm-smrs': 'offline',
+                            'enm-brsadm_home': 'offline'}
         cfg.return_value = {'fs_status_check': '0,10'}
         nss.return_value = nfs_share_show
         sfs = SfsSnapshots(nas_cred, 'Snapshot')
@@ -453,7 +486,7 @@ class TestSfsSnapshots(unittest2.TestCase):
         sfs.restore_snapshots(snap_fs_export)
         self.assertTrue(rl.called)
         self.assertTrue(cfg.called)
-        self.assertTrue(fls.called)
+        fls.assert_called_once_with(['enm-brsadm_home', 'enm-smrs'], 'enm')
         self.assertTrue(srr.called)
         self.assertTrue(sfo.called)
         self.assertTrue(nss.called)
@@ -470,16 +503,65 @@ class TestSfsSnapshots(unittest2.TestCase):
             'enm-smrs': ['Snapshot-enm-smrs']
         }
 
-        fls.return_value = {'enm-smrs': {'status': 'offline'},
-                            'enm-brsadm_home': {'status': 'online'}}
+        fls.return_value = {'enm-smrs': 'offline',
+                            'enm-brsadm_home': 'online'}
         self.assertRaises(SfsSnapshotsException, sfs.restore_snapshots,
                           snap_fs_export)
 
+    @patch(TC_MODULE + '.NasConsole')
+    def test_offline_filesystems(self, nc, m_nas_type):
+        sfs = SfsSnapshots(nas_cred, 'Snapshot')
+        nc.return_value.wait_fs_status.return_value = {'fs1': 1, 'fs2': 2}
+        sfs.offline_filesystems(['fs1', 'fs2'])
+        self.assertEqual(sorted([call('fs1'), call('fs2')]),
+                         sorted(nc.return_value.storage_fs_offline.
+                                mock_calls))
+        nc.return_value.wait_fs_status.assert_called_once_with(
+                ['fs1', 'fs2'], sfs.poolname, 'offline')
+
+        nc.return_value.storage_fs_offline.side_effect = \
+            NasConsoleException('failed')
+        nc.return_value.wait_fs_status.reset_mock()
+        self.assertRaises(SfsSnapshotsException, sfs.offline_filesystems,
+                          ['fs1', 'fs2'])
+        self.assertFalse(nc.return_value.wait_fs_status.called)
+
+    @patch('h_util.h_nas_console.NasConsole.wait_fs_status')
+    @patch('h_util.h_nas_console.NasConnection')
+    def test_offline_filesystems_sessions(self, m_connection, m_wait,
+                                          m_nas_type):
+        cond = threading.Condition()
+        offlining = []
+
+        def offline(filesystem, online):
+            # Each worker waits for the other one to be offlining too, they
+            # never meet if they share one NAS session
+            with cond:
+                offlining.append(filesystem)
+                cond.notify_all()
+                started = time.time()
+                while len(offlining) < 2 and time.time() - started < 5:
+                    cond.wait(0.1)
+            self.assertEqual(2, len(offlining))
+
+        def connection(*args, **kwargs):
+            session = MagicMock()
+            session.__enter__.return_value.filesystem.online.side_effect = \
+                offline
+            return session
+
+        m_connection.side_effect = connection
+        sfs = SfsSnapshots(nas_cred, 'Snapshot', num_of_threads=2)
+        sfs.offline_filesystems(['fs1', 'fs2'])
+        self.assertEqual(['fs1', 'fs2'], sorted(offlining))
+        self.assertEqual(2, sfs.nasconsole.session_stats()['opened'])
+
     @patch(TC_MODULE + '.sleep')
     @patch(TC_MODULE + '.NasConsole.nfs_share_show')
     @patch('paramiko.SSHClient')
     @patch(TC_MODULE + '.NasConsole.nfs_share_add')
-    def test_restore_snapshots_nfs_share_issue(self, nsa, ssh, nss,
+    @patch(TC_MODULE + '.NasConsole.storage_rollback_restore')
+    def test_restore_snapshots_nfs_share_issue(self, srr, nsa, ssh, nss,
                                                m_sleep, m_nas_type):
         snap_fs_export = {'enm-smrs': [{'client': '10.140.3.0/24',
                                         'options': 'rw,sync,no_root_squash',
@@ -497,13 +579,19 @@ class TestSfsSnapshots(unittest2.TestCase):
         sfs = SfsSnapshots(nas_cred, 'Snapshot')
         self.get_litp_model_mock(sfs)
         patch_ssh(ssh, 0, [], [])
-        sfs.rollback_nas_fs('enm-brsadm_home', snap_fs_export,
-                          ['Snapshot-enm-brsadm_home'])
+        self.assertEqual((True, 'enm-brsadm_home'),
+                         sfs.rollback_nas_fs('enm-brsadm_home',
+                                             ['Snapshot-enm-brsadm_home'],
+                                             snap_fs_export))
+        srr.assert_called_once_with('enm-brsadm_home',
+                                    'Snapshot-enm-brsadm_home')
         nss.side_effect = [nfs_share_incomplete, nfs_share_incomplete,
                            nfs_share_incomplete]
-        self.assertEqual((False, 'enm-brsadm_home'), sfs.rollback_nas_fs('enm-brsadm_home',
-                                                                       snap_fs_export,
-                                                                       ['Snapshot-enm-brsadm_home']))
+        self.assertEqual((False, 'enm-brsadm_home'),
+                         sfs.rollback_nas_fs('enm-brsadm_home',
+                                             ['Snapshot-enm-brsadm_home'],
+                                             snap_fs_export))
+        self.assertEqual(5, nsa.call_count)
 
     @patch(TC_MODULE + '.NasConsole.storage_rollback_list')
     @patch(TC_MODULE + '.NasConsole.nfs_share_show')
@@ -514,9 +602,10 @@ class TestSfsSnapshots(unittest2.TestCase):
     @patch(TC_MODULE + '.NasConsole.storage_fs_online')
     @patch(TC_MODULE + '.NasConsole.nfs_share_add')
     @patch(TC_MODULE + '.SfsSnapshots.rollback_nas_fs')
-    def test_restore_snapshots_threads_exception(self, rnf, nsa, sfo, srr,
-                                                 sfof, nsd, ssh, nss, nc,
-                                                 m_nas_type):
+    @patch(TC_MODULE + '.SfsSnapshots.offline_filesystems')
+    def test_restore_snapshots_threads_exception(self, m_offline, rnf, nsa,
+                                                 sfo, srr, sfof, nsd, ssh,
+                                                 nss, nc, m_nas_type):
         nc.return_value = {
             'enm-brsadm_home': ['Snapshot-enm-brsadm_home'],
             'enm-smrs': ['Snapshot-enm-smrs']
@@ -36,7 +36,8 @@ class TestSnapAgent(unittest2.TestCase):
                          'snap_name=Snapshot_55',
                          'descr=ENM_Upgrade_Snapshot']
 
-        mco_exec.assert_called_with('create_snapshot', expected_args, 'node_1')
+        mco_exec.assert_called_with('create_snapshot', expected_args, 'node_1',
+                                    stdoutkey=None)
 
     @patch('h_snapshots.snap_agent.SnapAgents.mco_exec')
     def test_create_mysql_snapshot(self, mco_exec):
@@ -67,7 +68,27 @@ class TestSnapAgent(unittest2.TestCase):
         ]
 
         mco_exec.assert_called_with('create_snapshot', expected_args,
-                                    'node_2')
+                                    'node_2', stdoutkey=None)
+
+    @patch('h_snapshots.snap_agent.SnapAgents.mco_exec')
+    def test_create_snapshot_frozen(self, mco_exec):
+        snapper = SnapAgents()
+        mco_exec.return_value = {'retcode': 0, 'out': '', 'frozen': '2.5'}
+        self.assertEqual(2.5, snapper.create_versant_snapshot(
+                'versant', '55', 'vnx2', 'spa', 'spb', 'node_1', 'admin',
+                'passw0rd', 'global', 'Snapshot', 'descr'))
+        mco_exec.return_value = {'retcode': 0, 'out': '', 'frozen': None}
+        self.assertIsNone(snapper.create_mysql_snapshot(
+                'mysql', '56', 'vnx2', 'spa', 'spb', 'node_2', 'admin',
+                'passw0rd', 'global', 'Snapshot', 'descr', 'root'))
+        # Agent older than the 'frozen' key
+        mco_exec.return_value = {'retcode': 0, 'out': ''}
+        self.assertIsNone(snapper.create_versant_snapshot(
+                'versant', '55', 'vnx2', 'spa', 'spb', 'node_1', 'admin',
+                'passw0rd', 'global', 'Snapshot', 'descr'))
+        self.assertIsNone(snapper.create_mysql_snapshot(
+                'mysql', '56', 'vnx2', 'spa', 'spb', 'node_2', 'admin',
+                'passw0rd', 'global', 'Snapshot', 'descr', 'root'))
 
     @patch('h_snapshots.snap_agent.SnapAgents.mco_exec')
     def test_backup_opendj(self, mco_exec):
@@ -0,0 +1,99 @@
+import shutil
+from os.path import join
+from tempfile import mkdtemp
+
+import unittest2
+from mock import patch
+
+from h_snapshots.snap_estimate import SnapshotDurationHistory, \
+    format_estimate, HISTORY_FILE, HISTORY_SIZE, UNACCOUNTED
+from h_snapshots.snap_timeline import SnapshotTimeline, CATEGORY_BACKEND, \
+    CATEGORY_LUN, CATEGORY_NODE_POWER, CATEGORY_OPERATION
+
+TIMELINE_MODULE = 'h_snapshots.snap_timeline'
+
+
+def restore_timeline(luns, fail=False):
+    """ Timeline of a restore where the clock moves 10s per read """
+    with patch(TIMELINE_MODULE + '.time') as m_time:
+        m_time.side_effect = range(0, 1000, 10)
+        timeline = SnapshotTimeline('restore_snapshot')
+        try:
+            with timeline.span('restore_snapshot', CATEGORY_OPERATION):
+                with timeline.span('shutdown_nodes', CATEGORY_NODE_POWER):
+                    with timeline.span('power off db-1',
+                                       CATEGORY_NODE_POWER):
+                        pass
+                with timeline.span('san restore_snapshots',
+                                   CATEGORY_BACKEND):
+                    for lunid in range(luns):
+                        with timeline.span('restore {0}'.format(lunid),
+                                           CATEGORY_LUN):
+                            pass
+                if fail:
+                    raise IOError()
+        except IOError:
+            pass
+    return timeline
+
+
+class TestSnapshotDurationHistory(unittest2.TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_record_and_estimate(self):
+        history = SnapshotDurationHistory(self.tmpdir)
+        self.assertEqual(0, history.runs('restore_snapshot'))
+        self.assertTrue(history.record(restore_timeline(2)))
+        history.save()
+
+        history = SnapshotDurationHistory(self.tmpdir)
+        self.assertEqual(1, history.runs('restore_snapshot'))
+        phases = history.history['restore_snapshot']['phases']
+        # Each clock read moves time on by 10 seconds
+        self.assertEqual([30.0], phases['shutdown_nodes']['durations'])
+        self.assertEqual([1], phases['shutdown_nodes']['items'])
+        self.assertEqual([50.0], phases['san restore_snapshots']['durations'])
+        self.assertEqual([2], phases['san restore_snapshots']['items'])
+        self.assertEqual([30.0], phases[UNACCOUNTED]['durations'])
+
+        # Twice the LUNs, twice the time
+        steps, total = history.estimate('restore_snapshot', {
+            'shutdown_nodes': 3, 'san restore_snapshots': 4,
+            'nas restore_snapshots': 2})
+        self.assertEqual([
+            ('shutdown_nodes', 3, 0, 90.0),
+            ('nas restore_snapshots', 2, 90.0, None),
+            ('san restore_snapshots', 4, 90.0, 100.0),
+            (UNACCOUNTED, None, 190.0, 30.0)], steps)
+        self.assertEqual(220.0, total)
+
+        lines = format_estimate('restore_snapshot', steps, total, 1)
+        self.assertEqual('Estimated restore_snapshot timeline (based on 1 '
+                         'previous run(s)):', lines[0])
+        self.assertIn('nas restore_snapshots (2 items) : no history',
+                      lines[2])
+        self.assertEqual('Estimated total: 3 minutes and 40 seconds',
+                         lines[-1])
+
+    def test_failed_runs_not_recorded(self):
+        history = SnapshotDurationHistory(self.tmpdir)
+        self.assertFalse(history.record(restore_timeline(1, fail=True)))
+        self.assertEqual({}, history.history)
+
+    def test_history_size(self):
+        history = SnapshotDurationHistory(self.tmpdir)
+        for _ in range(HISTORY_SIZE + 2):
+            history.record(restore_timeline(1))
+        self.assertEqual(HISTORY_SIZE, history.runs('restore_snapshot'))
+
+    def test_damaged_history(self):
+        with open(join(self.tmpdir, HISTORY_FILE), 'w') as _writer:
+            _writer.write('{"restore_snap')
+        history = SnapshotDurationHistory(self.tmpdir)
+        self.assertEqual({}, history.history)
+        self.assertIsNone(history.estimate_phase('restore_snapshot',
+                                                 'start_nodes', 2))
@@ -0,0 +1,142 @@
+import json
+import shutil
+import threading
+from os.path import join
+from tempfile import mkdtemp
+
+import unittest2
+from mock import patch
+
+from h_snapshots.snap_timeline import SnapshotTimeline, start_timeline, \
+    stop_timeline, get_timeline, timeline_span, traced, CATEGORY_BACKEND, \
+    CATEGORY_LUN, CATEGORY_NODE_POWER, CATEGORY_OPERATION, STATUS_ERROR, \
+    STATUS_FAILED, STATUS_OK
+
+TC_MODULE = 'h_snapshots.snap_timeline'
+
+
+class PowerStub(object):
+    @traced(CATEGORY_NODE_POWER, 'power off', label='node')
+    def poweroff_node(self, redfish, node, succeed=True):
+        if succeed:
+            return True, None, node
+        return False, 'failed', node
+
+
+class TestSnapshotTimeline(unittest2.TestCase):
+    def tearDown(self):
+        stop_timeline()
+
+    @patch(TC_MODULE + '.time')
+    def test_nesting_and_critical_path(self, m_time):
+        m_time.side_effect = range(0, 100)
+        timeline = SnapshotTimeline('create_snapshot')
+        with timeline.span('create_snapshot', CATEGORY_OPERATION):
+            with timeline.span('san', CATEGORY_BACKEND):
+                with timeline.span('lun1', CATEGORY_LUN, lun='lun_a'):
+                    pass
+            with timeline.span('nas', CATEGORY_BACKEND):
+                pass
+
+        root, san, lun, nas = timeline.spans
+        self.assertIsNone(root.parent)
+        self.assertEqual(root.span_id, san.parent)
+        self.assertEqual(san.span_id, lun.parent)
+        self.assertEqual(root.span_id, nas.parent)
+        self.assertEqual([STATUS_OK] * 4,
+                         [span.status for span in timeline.spans])
+        self.assertEqual([root, nas], timeline.critical_path())
+        self.assertEqual([san, nas], timeline.children(root))
+        self.assertEqual(3, san.duration)
+
+        summary = timeline.summary()
+        self.assertEqual('Snapshot create_snapshot timeline, critical path:',
+                         summary[0])
+        self.assertIn('backend nas', summary[2])
+        self.assertIn('Slowest steps:', summary)
+
+    def test_error_status(self):
+        timeline = SnapshotTimeline('remove_snapshot')
+        with self.assertRaises(ValueError):
+            with timeline.span('san', CATEGORY_BACKEND):
+                raise ValueError()
+        self.assertEqual(STATUS_ERROR, timeline.spans[0].status)
+        self.assertIsNotNone(timeline.spans[0].end)
+
+    def test_worker_threads_nest_under_owner(self):
+        timeline = SnapshotTimeline('restore_snapshot')
+
+        def worker(lunid):
+            with timeline.span(lunid, CATEGORY_LUN):
+                pass
+
+        with timeline.span('san', CATEGORY_BACKEND) as san:
+            threads = [threading.Thread(target=worker, args=(lunid,))
+                       for lunid in ['1', '2']]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        luns = timeline.children(san)
+        self.assertEqual(['1', '2'], sorted(span.name for span in luns))
+        self.assertNotEqual(san.thread_id, luns[0].thread_id)
+
+    def test_span_is_noop_without_timeline(self):
+        self.assertIsNone(get_timeline())
+        with timeline_span('san', CATEGORY_BACKEND) as span:
+            self.assertIsNone(span)
+        self.assertEqual((True, None, 'db-1'),
+                         PowerStub().poweroff_node(None, 'db-1'))
+
+    def test_traced(self):
+        timeline = start_timeline('restore_snapshot')
+        stub = PowerStub()
+        self.assertEqual((True, None, 'db-1'),
+                         stub.poweroff_node(None, 'db-1'))
+        self.assertEqual((False, 'failed', 'db-2'),
+                         stub.poweroff_node(None, node='db-2',
+                                            succeed=False))
+        self.assertIs(timeline, stop_timeline())
+        self.assertIsNone(get_timeline())
+
+        db1, db2 = timeline.spans
+        self.assertEqual('power off db-1', db1.name)
+        self.assertEqual(CATEGORY_NODE_POWER, db1.category)
+        self.assertEqual(STATUS_OK, db1.status)
+        self.assertEqual('power off db-2', db2.name)
+        self.assertEqual(STATUS_FAILED, db2.status)
+
+    def test_write(self):
+        timeline = SnapshotTimeline('validate_snapshot')
+        with timeline.span('validate_snapshot', CATEGORY_OPERATION):
+            with timeline.span('lun1', CATEGORY_LUN, lun='lun_a'):
+                pass
+        tmpdir = mkdtemp()
+        try:
+            timeline_file, trace_file = timeline.write(tmpdir)
+            self.assertEqual(
+                    join(tmpdir, 'snapshot_timeline_validate_snapshot.json'),
+                    timeline_file)
+            with open(timeline_file) as _reader:
+                data = json.load(_reader)
+            self.assertEqual('validate_snapshot', data['action'])
+            self.assertEqual([0, 1], data['critical_path'])
+            self.assertEqual(['validate_snapshot', 'lun1'],
+                             [span['name'] for span in data['spans']])
+            self.assertEqual({'lun': 'lun_a'}, data['spans'][1]['args'])
+            self.assertEqual(set([CATEGORY_OPERATION, CATEGORY_LUN]),
+                             set(data['category_totals'].keys()))
+
+            with open(trace_file) as _reader:
+                trace = json.load(_reader)
+            complete = [event for event in trace['traceEvents']
+                        if event['ph'] == 'X']
+            self.assertEqual(2, len(complete))
+            self.assertEqual('lun1', complete[1]['name'])
+            self.assertEqual(CATEGORY_LUN, complete[1]['cat'])
+            self.assertEqual('ok', complete[1]['args']['status'])
+            self.assertEqual(1, len([event for event in trace['traceEvents']
+                                     if event['ph'] == 'M']))
+        finally:
+            shutil.rmtree(tmpdir)
@@ -0,0 +1,78 @@
+import shutil
+from os.path import join
+from tempfile import mkdtemp
+
+from mock import patch, Mock
+from unittest2 import TestCase
+
+from h_util.h_cron_state import CronState
+
+
+class TestCronState(TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.filename = join(self.tmpdir, 'state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    @patch('h_util.h_cron_state.time')
+    def test_cached(self, m_time):
+        m_time.return_value = 1000
+        loader = Mock(return_value='10.0.0.1')
+        state = CronState(self.filename)
+        self.assertEqual('10.0.0.1', state.cached('ip', 60, loader))
+        state.save()
+
+        state = CronState(self.filename)
+        m_time.return_value = 1059
+        self.assertEqual('10.0.0.1', state.cached('ip', 60, loader))
+        self.assertEqual(1, loader.call_count)
+
+        # Expired, or the clock went back
+        loader.return_value = '10.0.0.2'
+        for now in (1060, 900):
+            m_time.return_value = now
+            self.assertEqual('10.0.0.2', state.cached('ip', 60, loader))
+        self.assertEqual(3, loader.call_count)
+
+        state.forget('ip')
+        state.cached('ip', 60, loader)
+        self.assertEqual(4, loader.call_count)
+
+    def test_cached_none(self):
+        loader = Mock(return_value=None)
+        state = CronState(self.filename)
+        self.assertIsNone(state.cached('ip', 60, loader))
+        self.assertIsNone(state.cached('ip', 60, loader))
+        self.assertEqual(2, loader.call_count)
+
+    @patch('h_util.h_cron_state.time')
+    def test_needs_report(self, m_time):
+        m_time.return_value = 1000
+        state = CronState(self.filename)
+        self.assertIsNone(state.reported('alarm'))
+        self.assertTrue(state.needs_report('alarm', 'WARNING', 3600))
+        state.report('alarm', 'WARNING')
+        state.save()
+
+        state = CronState(self.filename)
+        self.assertEqual('WARNING', state.reported('alarm'))
+        self.assertFalse(state.needs_report('alarm', 'WARNING', 3600))
+        self.assertTrue(state.needs_report('alarm', 'CLEARED', 3600))
+        m_time.return_value = 4600
+        self.assertTrue(state.needs_report('alarm', 'WARNING', 3600))
+
+    def test_damaged_state(self):
+        with open(self.filename, 'w') as _writer:
+            _writer.write('{"lookups": {"ip')
+        state = CronState(self.filename)
+        self.assertEqual({}, state.state)
+        self.assertTrue(state.needs_report('alarm', 'WARNING', 3600))
+
+    def test_save_failure(self):
+        state = CronState(join(self.tmpdir, 'missing', 'state.json'))
+        state.report('alarm', 'WARNING')
+        with patch.object(state, 'log') as m_log:
+            state.save()
+        self.assertTrue(m_log.warning.called)
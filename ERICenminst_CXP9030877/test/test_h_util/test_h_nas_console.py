@@ -1,4 +1,4 @@
-from mock import MagicMock, patch
+from mock import MagicMock, call, patch
 from unittest2 import TestCase
 
 import sys
@@ -314,3 +314,245 @@ class TestNasConsole(TestCase):
         self.assertEqual('2017/01/30 12:27', data[snap_name]['SNAPDATE'])
         self.assertEqual('256K(0.1%)', data[snap_name]['CHANGED_DATA'])
         self.assertEqual('256K(0.1%)', data[snap_name]['SYNCED_DATA'])
+        # The overflow is found without being told the name length
+        self.assertEqual(data, map_tabbed_data(raw_data, 'NAME'))
+
+
+class CommandOutput(object):
+    """ The output lines of an SshClient.stream command """
+
+    def __init__(self, lines, status=0):
+        self.lines = lines
+        self.status = None
+        self._status = status
+
+    def __iter__(self):
+        for line in self.lines:
+            yield line
+        self.status = self._status
+
+
+class TestStreamNasCommand(TestCase):
+    @patch('h_util.h_nas_console.SshClient')
+    def test_stream_nas_command(self, m_ssh):
+        m_ssh.return_value.stream.return_value = CommandOutput(
+                [' line 1 ', 'line 2'])
+        received = []
+        nc = NasConsole('nas', 'user', 'pass', ssh_port=23)
+        lines = nc.stream_nas_command('storage fs defrag',
+                                      callback=received.append)
+        self.assertFalse(m_ssh.called)
+        self.assertEqual(['line 1', 'line 2'], list(lines))
+        self.assertEqual(['line 1', 'line 2'], received)
+        self.assertEqual(0, lines.status)
+        m_ssh.assert_called_once_with('nas', 'user', 'pass', port=23)
+        m_ssh.return_value.stream.assert_called_once_with(
+                'export TERM=xterm;storage fs defrag')
+        m_ssh.return_value.close.assert_called_once_with()
+
+    @patch('h_util.h_nas_console.SshClient')
+    def test_stream_nas_command_failed(self, m_ssh):
+        m_ssh.return_value.stream.return_value = CommandOutput(
+                ['line {0}'.format(idx) for idx in range(100)], 1)
+        nc = NasConsole('nas', 'user', 'pass', persistent=True)
+        with self.assertRaises(NasConsoleException) as error:
+            list(nc.stream_nas_command('storage fs defrag'))
+        self.assertIn('exit code 1', str(error.exception))
+        self.assertIn('line 99', str(error.exception))
+        self.assertNotIn('line 79', str(error.exception))
+        # Persistent consoles keep the connection for the next command
+        self.assertFalse(m_ssh.return_value.close.called)
+        nc.close()
+        m_ssh.return_value.close.assert_called_once_with()
+
+    @patch('h_util.h_nas_console.SshClient')
+    def test_stream_nas_command_not_checked(self, m_ssh):
+        m_ssh.return_value.stream.return_value = CommandOutput(['warn'], 1)
+        nc = NasConsole('nas', 'user', 'pass')
+        lines = nc.stream_nas_command('audit', check=False)
+        self.assertEqual(['warn'], list(lines))
+        self.assertEqual(1, lines.status)
+
+    @patch('h_util.h_nas_console.SshClient')
+    def test_stream_nas_command_unityxt(self, m_ssh):
+        nc = NasConsole('', '', '', nas_type='unityxt')
+        lines = nc.stream_nas_command('ls')
+        self.assertEqual([], list(lines))
+        self.assertEqual(0, lines.status)
+        self.assertFalse(m_ssh.called)
+
+
+class TestRollbackCreateBatch(TestCase):
+    @patch('naslib.connection.NasConnection.rb', create=True)
+    def test_storage_rollback_create_batch(self, m_rb):
+        m_rb.return_value.create.side_effect = [None, IOError('failed')]
+        nc = NasConsole('', '', '', persistent=True)
+        created = nc.storage_rollback_create_batch(
+                [('L_fs1', 'fs1'), ('L_fs2', 'fs2'), ('L_fs3', 'fs3')],
+                'pool-cache')
+        self.assertEqual(('L_fs1', 'fs1'), next(created))
+        self.assertEqual(1, nc.session_stats()['opened'])
+        self.assertRaises(IOError, next, created)
+        m_rb.return_value.create.assert_has_calls(
+                [call('L_fs1', 'fs1', 'pool-cache'),
+                 call('L_fs2', 'fs2', 'pool-cache')])
+        self.assertEqual(2, m_rb.return_value.create.call_count)
+
+    @patch('naslib.connection.NasConnection.rb', create=True)
+    def test_storage_rollback_create_batch_unityxt(self, m_rb):
+        nc = NasConsole('', '', '', nas_type='unityxt')
+        created = list(nc.storage_rollback_create_batch(
+                [('L_fs1', 'fs1'), ('L_fs2', 'fs2')], None))
+        self.assertEqual([('L_fs1', 'fs1'), ('L_fs2', 'fs2')], created)
+        m_rb.return_value.create.assert_any_call('L_fs2', 'fs2', None)
+
+
+class TestWaitFsStatus(TestCase):
+    @patch('naslib.connection.NasConnection.fs')
+    def test_fs_status(self, m_fs):
+        m_fs.return_value.list.return_value = [
+            named('ENM-FS1', online=True), named('ENM-FS3', online=False),
+            named('ENM-FS4', online=True), named('NOTENM-FS1', online=True)]
+        nc = NasConsole('', '', '')
+        self.assertEqual({'ENM-FS1': 'online', 'ENM-FS3': 'offline'},
+                         nc.fs_status(['ENM-FS1', 'ENM-FS2', 'ENM-FS3'],
+                                      'ENM'))
+        self.assertEqual({}, nc.fs_status(['NOTENM-FS1'], 'ENM'))
+        # One listing per call, whatever the number of filesystems
+        self.assertEqual(2, m_fs.return_value.list.call_count)
+
+    @patch('h_util.h_nas_console.time')
+    @patch('h_util.h_nas_console.sleep')
+    @patch('h_util.h_nas_console.read_enminst_config')
+    def test_wait_fs_status(self, m_config, m_sleep, m_time):
+        m_config.return_value = {'fs_status_check': '10,3'}
+        m_time.return_value = 0
+        nc = NasConsole('', '', '')
+        nc.fs_status = MagicMock(side_effect=[
+            {'fs1': 'online', 'fs2': 'online', 'fs3': 'offline'},
+            {'fs1': 'offline', 'fs2': 'online'},
+            {'fs2': 'online'},
+            {'fs2': 'offline'}])
+        m_time.side_effect = [0, 0, 0, 40]
+        self.assertEqual({'fs1': 2, 'fs2': 4, 'fs3': 1},
+                         nc.wait_fs_status(['fs1', 'fs2', 'fs3'], 'pool',
+                                           'offline'))
+        nc.fs_status.assert_has_calls([
+            call(['fs1', 'fs2', 'fs3'], 'pool'),
+            call(['fs1', 'fs2'], 'pool'),
+            call(['fs2'], 'pool'),
+            call(['fs2'], 'pool')])
+        self.assertEqual([call(1), call(2), call(4)], m_sleep.mock_calls)
+
+    @patch('h_util.h_nas_console.time')
+    @patch('h_util.h_nas_console.sleep')
+    @patch('h_util.h_nas_console.read_enminst_config')
+    def test_wait_fs_status_timeout(self, m_config, m_sleep, m_time):
+        m_config.return_value = {'fs_status_check': '10,3'}
+        # Three checks are done but the 30 seconds are not up yet
+        m_time.side_effect = [0, 5, 31]
+        nc = NasConsole('', '', '')
+        nc.fs_status = MagicMock(return_value={'fs1': 'offline'})
+        with self.assertRaises(NasConsoleException) as error:
+            nc.ensure_fs_status('fs1', 'pool', 'online')
+        self.assertEqual("'fs1' not online. Queried 4 times for online "
+                         "status.", str(error.exception))
+        self.assertEqual(4, nc.fs_status.call_count)
+
+    def test_wait_fs_status_unityxt_offline(self):
+        nc = NasConsole('', '', '', nas_type='unityxt')
+        nc.fs_status = MagicMock()
+        self.assertEqual({'fs1': 0}, nc.wait_fs_status(['fs1'], 'pool',
+                                                       'offline'))
+        self.assertFalse(nc.fs_status.called)
+
+
+def named(name, **attributes):
+    """ A naslib object mock, 'name' is taken by MagicMock itself """
+    item = MagicMock(**attributes)
+    item.name = name
+    return item
+
+
+class TestNasInventory(TestCase):
+    @patch('h_util.h_nas_console.NasConsole._nas')
+    def test_console_listings(self, m_nas):
+        nas = m_nas.return_value.__enter__.return_value
+        nas.snapshot.list.return_value = [
+            named('Snapshot-enm-fs1', filesystem='enm-fs1'),
+            named('Other-enm-fs1', filesystem='enm-fs1'),
+            named('Other-enm-fs2', filesystem='enm-fs2'),
+            named('Snapshot-pool-fs3', filesystem='pool-fs3')]
+        nas.filesystem.list.return_value = [
+            named('enm-fs1', online=True, display_size='1.00G'),
+            named('enm-fs2', online=True, display_size='2.00G')]
+
+        nc = NasConsole('', '', '', inventory=True)
+        self.assertEqual({'enm-fs1': ['Snapshot-enm-fs1'], 'enm-fs2': []},
+                         nc.storage_rollback_list('enm', 'Snapshot'))
+        self.assertEqual({'enm-fs1': ['Snapshot-enm-fs1', 'Other-enm-fs1'],
+                          'enm-fs2': ['Other-enm-fs2']},
+                         nc.storage_rollback_list('enm', '*'))
+        self.assertEqual(['enm-fs1', 'enm-fs2'],
+                         sorted(nc.storage_fs_list('enm')))
+        nc.storage_fs_list('enm')
+        self.assertEqual(1, nas.snapshot.list.call_count)
+        self.assertEqual(1, nas.filesystem.list.call_count)
+
+        # The console's own changes update the cached listings
+        nc.storage_rollback_create('Snapshot-enm-fs2', 'enm-fs2', 'cache')
+        nc.storage_rollback_destroy('Other-enm-fs2', 'enm-fs2')
+        nc.storage_rollback_destroy('Snapshot-enm-fs1', 'enm-fs1')
+        self.assertEqual({'enm-fs1': ['Other-enm-fs1'],
+                          'enm-fs2': ['Snapshot-enm-fs2']},
+                         nc.storage_rollback_list('enm', '*'))
+        self.assertEqual(1, nas.snapshot.list.call_count)
+
+        nas.filesystem.list.return_value[0].online = False
+        self.assertEqual({'enm-fs1': 'offline'},
+                         nc.fs_status(['enm-fs1'], 'enm'))
+        self.assertEqual('offline', nc.storage_fs_list('enm')['enm-fs1'][
+            'status'])
+        self.assertEqual(2, nas.filesystem.list.call_count)
+
+        nc.storage_fs_destroy('enm-fs2')
+        self.assertNotIn('enm-fs2', nc.storage_rollback_list('enm', '*'))
+        self.assertEqual(['enm-fs1'], nc.storage_fs_list('enm').keys())
+
+        # Filesystems are listed again after they are onlined
+        nc.storage_fs_online('enm-fs1')
+        nc.storage_fs_list('enm')
+        self.assertEqual(3, nas.filesystem.list.call_count)
+
+        nc.inventory.refresh()
+        nc.storage_rollback_list('enm', '*')
+        self.assertEqual(2, nas.snapshot.list.call_count)
+
+
+class TestNasSessionPool(TestCase):
+    @patch('h_util.h_nas_console.NasConnection')
+    def test_persistent_console_reuses_connection(self, m_connection):
+        nas = m_connection.return_value.__enter__.return_value
+        nas.filesystem.list.return_value = []
+        with NasConsole('', '', '', persistent=True) as nc:
+            nc.storage_fs_list('enm')
+            nc.storage_fs_list('enm')
+            nc.storage_rollback_list('enm', '*')
+            self.assertEqual({'opened': 1, 'reused': 2, 'dropped': 0},
+                             nc.session_stats())
+            self.assertEqual(
+                    1, m_connection.return_value.__enter__.call_count)
+            self.assertFalse(m_connection.return_value.__exit__.called)
+        m_connection.return_value.__exit__.assert_called_once_with(
+                None, None, None)
+
+    @patch('h_util.h_nas_console.NasConnection')
+    def test_console_not_persistent(self, m_connection):
+        nas = m_connection.return_value.__enter__.return_value
+        nas.filesystem.list.return_value = []
+        nc = NasConsole('', '', '')
+        nc.storage_fs_list('enm')
+        nc.storage_fs_list('enm')
+        self.assertEqual(2, m_connection.return_value.__enter__.call_count)
+        self.assertIsNone(nc.session_stats())
+        nc.close()
@@ -0,0 +1,34 @@
+from mock import MagicMock, call
+from unittest2 import TestCase
+
+from h_util.h_nas_inventory import NasInventory
+
+
+class TestNasInventory(TestCase):
+    def test_get_and_refresh(self):
+        loader = MagicMock(side_effect=lambda pool: {pool + '-fs1': []})
+        inventory = NasInventory({NasInventory.ROLLBACKS: loader})
+        rollbacks = inventory.get(NasInventory.ROLLBACKS, 'enm')
+        self.assertEqual({'enm-fs1': []}, rollbacks)
+        # Callers get a copy
+        rollbacks['enm-fs1'].append('Snapshot-enm-fs1')
+        self.assertEqual({'enm-fs1': []},
+                         inventory.get(NasInventory.ROLLBACKS, 'enm'))
+        inventory.get(NasInventory.ROLLBACKS, 'other')
+        self.assertEqual([call('enm'), call('other')], loader.mock_calls)
+
+        inventory.refresh('other')
+        inventory.get(NasInventory.ROLLBACKS, 'enm')
+        inventory.get(NasInventory.ROLLBACKS, 'other')
+        self.assertEqual(3, loader.call_count)
+        inventory.refresh()
+        inventory.get(NasInventory.ROLLBACKS, 'enm')
+        self.assertEqual(4, inventory.loads)
+
+    def test_disabled(self):
+        loader = MagicMock(return_value={})
+        inventory = NasInventory({NasInventory.CACHES: loader},
+                                 enabled=False)
+        inventory.get(NasInventory.CACHES)
+        inventory.get(NasInventory.CACHES)
+        self.assertEqual(2, loader.call_count)
@@ -0,0 +1,68 @@
+import os
+
+from unittest2 import TestCase
+
+from h_util.h_nas_listing import ColumnLayout, iter_tabbed_data, \
+    map_tabbed_data
+
+
+def read_resource(name):
+    path = os.path.join(os.path.dirname(__file__), '../Resources', name)
+    with open(path) as _reader:
+        return _reader.readlines()
+
+
+class TestColumnLayout(TestCase):
+    def test_rollback_list(self):
+        rows = list(iter_tabbed_data(read_resource('nas_rollback_list.txt')))
+        self.assertEqual(['Snapshot-enm-amos', 'Snapshot-enm-data',
+                          'Snapshot-enm-upgrade_indicator',
+                          'Snapshot-enm-no_of_changes_lt',
+                          'Snapshot-enm-smrs'],
+                         [row['NAME'] for row in rows])
+        self.assertEqual(['spaceopt'] * 5, [row['TYPE'] for row in rows])
+        self.assertEqual({'NAME': 'Snapshot-enm-upgrade_indicator',
+                          'TYPE': 'spaceopt',
+                          'FILESYSTEM': 'enm-upgrade_indicator',
+                          'SNAPDATE': '2017/01/30 12:28',
+                          'CHANGED_DATA': '256K(0.1%)',
+                          'SYNCED_DATA': '256K(0.1%)'}, rows[2])
+        # Overflowing name and an empty column on the same line
+        self.assertEqual('enm-no_of_changes_lt', rows[3]['FILESYSTEM'])
+        self.assertEqual('', rows[3]['CHANGED_DATA'])
+        self.assertEqual('-', rows[3]['SYNCED_DATA'])
+
+    def test_rollback_info(self):
+        data = map_tabbed_data(read_resource('nas_rollback_info.txt'),
+                               'NAME')
+        self.assertEqual(['Snapshot-ENM425-upgrade_ind'], data.keys())
+        self.assertEqual('2017/01/30 12:27',
+                         data['Snapshot-ENM425-upgrade_ind']['SNAPDATE'])
+
+    def test_two_columns(self):
+        layout = ColumnLayout('NAME      STATUS\n')
+        self.assertEqual(['NAME', 'STATUS'], layout.headers)
+        self.assertEqual([0, 10], layout.starts)
+        self.assertEqual({'NAME': 'fs1', 'STATUS': 'online'},
+                         layout.parse('fs1       online\r\n'))
+        self.assertEqual({'NAME': 'fs2', 'STATUS': ''}, layout.parse('fs2'))
+
+    def test_large_listing(self):
+        header = 'NAME                     TYPE           SNAPDATE' \
+                 '            CHANGED_DATA   SYNCED_DATA'
+        row = '{0:<25}spaceopt       2017/01/30 12:27    256K(0.1%)     ' \
+              '256K(0.1%)'
+        count = 20000
+
+        def listing():
+            yield header
+            for index in xrange(count):
+                yield row.format('Snapshot-enm-fs{0}'.format(index))
+            yield row.format('Snapshot-ENM425-upgrade_indicator')
+
+        data = map_tabbed_data(listing(), 'NAME')
+        self.assertEqual(count + 1, len(data))
+        self.assertEqual('256K(0.1%)',
+                         data['Snapshot-enm-fs19999']['SYNCED_DATA'])
+        self.assertEqual('spaceopt',
+                         data['Snapshot-ENM425-upgrade_indicator']['TYPE'])
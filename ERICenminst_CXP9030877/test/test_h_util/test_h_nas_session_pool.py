@@ -0,0 +1,54 @@
+import socket
+
+from mock import MagicMock
+from unittest2 import TestCase
+
+from h_util.h_nas_session_pool import NasSessionPool
+
+
+class TestNasSessionPool(TestCase):
+    def test_reconnect_after_connection_error(self):
+        connections = [MagicMock(), MagicMock()]
+        pool = NasSessionPool(connections.pop)
+        with self.assertRaises(socket.error):
+            with pool.session():
+                raise socket.error()
+        with pool.session():
+            pass
+        with self.assertRaises(ValueError):
+            with pool.session():
+                raise ValueError()
+        self.assertEqual({'opened': 2, 'reused': 1, 'dropped': 1},
+                         pool.stats)
+        self.assertEqual([], connections)
+
+    def test_reconnect_closed_connection(self):
+        closed = MagicMock()
+        closed.ssh.is_connected.return_value = False
+        connections = [MagicMock(), closed]
+        pool = NasSessionPool(connections.pop)
+        with pool.session() as nas:
+            self.assertIs(closed.__enter__.return_value, nas)
+        with pool.session() as nas:
+            self.assertIsNot(closed.__enter__.return_value, nas)
+        self.assertEqual({'opened': 2, 'reused': 0, 'dropped': 1},
+                         pool.stats)
+        closed.__exit__.assert_called_once_with(None, None, None)
+
+    def test_concurrent_sessions(self):
+        first = MagicMock(name='first')
+        second = MagicMock(name='second')
+        connections = [second, first]
+        pool = NasSessionPool(connections.pop, size=2)
+        with pool.session() as nas:
+            self.assertIs(first.__enter__.return_value, nas)
+            with pool.session() as nas_2:
+                self.assertIs(second.__enter__.return_value, nas_2)
+        with pool.session():
+            with pool.session():
+                pass
+        pool.close()
+        first.__exit__.assert_called_once_with(None, None, None)
+        second.__exit__.assert_called_once_with(None, None, None)
+        self.assertEqual({'opened': 2, 'reused': 2, 'dropped': 0},
+                         pool.stats)
@@ -0,0 +1,68 @@
+import os
+import shutil
+from os.path import exists, join
+from tempfile import mkdtemp
+
+from mock import Mock, patch
+from unittest2 import TestCase
+
+from h_util.h_process import run_process, ProcessTimeout, package_command
+
+
+class TestRunProcess(TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_run_process(self):
+        logger = Mock()
+        result = run_process('echo one; echo two >&2; exit 3', logger=logger,
+                             log_output=True, label='test')
+        self.assertEqual(3, result.returncode)
+        self.assertEqual('one\ntwo\n', result.output)
+        self.assertTrue(result.duration >= 0)
+        logger.debug.assert_any_call('test: one')
+        logger.debug.assert_any_call('test: two')
+        self.assertTrue(logger.debug.call_args[0][0].startswith(
+                'test returned 3 in '))
+
+    def test_large_output(self):
+        # Far more than a pipe buffer, used to block until the timeout
+        result = run_process('seq 1 200000', timeout=60)
+        self.assertEqual(0, result.returncode)
+        self.assertEqual(200000, len(result.output.splitlines()))
+
+    def test_no_stdin(self):
+        result = run_process('cat', timeout=60)
+        self.assertEqual((0, ''), result[:2])
+
+    def test_timeout_kills_group(self):
+        marker = join(self.tmpdir, 'marker')
+        with self.assertRaises(ProcessTimeout) as error:
+            run_process('echo started; (sleep 1; touch {0}) & '
+                        'sleep 30'.format(marker), timeout=0.5)
+        self.assertEqual('started\n', error.exception.output)
+        os.system('sleep 1.5')
+        self.assertFalse(exists(marker))
+
+    def test_not_started(self):
+        with self.assertRaises(OSError):
+            run_process([join(self.tmpdir, 'missing')], shell=False)
+
+    @patch('h_util.h_process.flush_after')
+    def test_flush_after(self, m_flush):
+        run_process('true')
+        m_flush.assert_called_once_with('true')
+        m_flush.reset_mock()
+        with self.assertRaises(ProcessTimeout):
+            run_process('sleep 30', timeout=0.5)
+        m_flush.assert_called_once_with('sleep 30')
+
+    def test_package_command(self):
+        self.assertEqual('/usr/bin/yum install',
+                         package_command('/usr/bin/yum install -y ERICx'))
+        self.assertEqual('rpm -e', package_command(['rpm', '-e', 'ERICx']))
+        self.assertIsNone(package_command('cat /etc/redhat-release'))
+        self.assertIsNone(package_command(''))
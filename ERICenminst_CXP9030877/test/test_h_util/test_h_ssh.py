@@ -1,12 +1,51 @@
+import socket
+
 from unittest2 import TestCase
 
-from mock import patch, PropertyMock
+from mock import patch, PropertyMock, MagicMock
 from paramiko import SSHClient
 
-from h_util.h_ssh.client import SshClient, CommandTimeout, SuIncorrectPassword
+from h_util.h_ssh.client import SshClient, CommandTimeout, \
+    SuIncorrectPassword, CHUNK_SIZE
 from h_util.h_timing import TimeWindow
 
 
+class StreamingChannel(object):
+    """ Channel sending its output in full packets, with an idle read
+    timeout before each one """
+
+    def __init__(self, output, idle=1):
+        self.output = output
+        self.idle = idle
+        self.sent = 0
+        self.recv_calls = 0
+        self.closed = False
+        self.timeout = None
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def recv(self, size):
+        self.recv_calls += 1
+        if self.idle and self.recv_calls % 2:
+            raise socket.timeout()
+        data = self.output[self.sent:self.sent + size]
+        self.sent += len(data)
+        return data
+
+    def recv_stderr_ready(self):
+        return False
+
+    def recv_exit_status(self):
+        return 0
+
+    def close(self):
+        self.closed = True
+
+    def __getattr__(self, name):
+        return MagicMock()
+
+
 class TestSshClient(TestCase):
     def setUp(self):
         self.ssh = SshClient("host", "user", "password")
@@ -81,3 +120,71 @@ class TestSshClient(TestCase):
         status, out = self.ssh.run("cmd")
         self.assertEquals(status, 1)
         self.assertEquals(out.strip(), "Error")
+
+    @patch.object(SSHClient, "get_transport")
+    @patch.object(SSHClient, "connect")
+    def test_run_streams_large_output(self, connect, get_transport):
+        output = 'x' * (CHUNK_SIZE - 1) + '\n'
+        output *= 128
+        channel = StreamingChannel(output)
+        get_transport.return_value.open_session.return_value = channel
+        status, out = self.ssh.run("cmd")
+        self.assertEquals(0, status)
+        self.assertEquals(output, out)
+        self.assertEquals(1, channel.timeout)
+        # One idle read timing out before each packet and before the end of
+        # the stream
+        self.assertEquals(129 * 2, channel.recv_calls)
+
+    @patch.object(TimeWindow, "elapsed", new_callable=PropertyMock)
+    @patch.object(SSHClient, "get_transport")
+    @patch.object(SSHClient, "connect")
+    def test_run_command_timeout(self, connect, get_transport, elapsed):
+        elapsed.side_effect = [0, 1, 5, 11]
+        channel = StreamingChannel('x' * CHUNK_SIZE * 10, idle=0)
+        get_transport.return_value.open_session.return_value = channel
+        self.ssh.command_timeout = 10
+        with self.assertRaises(CommandTimeout) as error:
+            self.ssh.run("cmd")
+        self.assertEquals("cmd", error.exception.cmd)
+        self.assertTrue(channel.closed)
+        self.assertEquals(3, channel.recv_calls)
+
+    @patch.object(SSHClient, "get_transport")
+    @patch.object(SSHClient, "connect")
+    def test_stream(self, connect, get_transport):
+        channel = StreamingChannel('Password: line 1\r\nline 2\nline', idle=0)
+        get_transport.return_value.open_session.return_value = channel
+        received = []
+        lines = self.ssh.stream("cmd", su_user="user",
+                                callback=received.append)
+        self.assertEquals('line 1', next(lines))
+        self.assertEquals(['line 1'], received)
+        self.assertEquals(['line 2', 'line'], list(lines))
+        self.assertEquals(['line 1', 'line 2', 'line'], received)
+        self.assertEquals(0, lines.status)
+
+    @patch.object(SSHClient, "get_transport")
+    @patch.object(SSHClient, "connect")
+    def test_stream_status_per_command(self, connect, get_transport):
+        first = StreamingChannel('a\n', idle=0)
+        first.recv_exit_status = MagicMock(return_value=3)
+        second = StreamingChannel('b\n', idle=0)
+        get_transport.return_value.open_session.side_effect = [first, second]
+        lines_1 = self.ssh.stream("cmd 1")
+        lines_2 = self.ssh.stream("cmd 2")
+        self.assertEquals(['b'], list(lines_2))
+        self.assertIsNone(lines_1.status)
+        self.assertEquals(['a'], list(lines_1))
+        self.assertEquals(3, lines_1.status)
+        self.assertEquals(0, lines_2.status)
+
+    @patch.object(SSHClient, "get_transport")
+    @patch.object(SSHClient, "connect")
+    def test_stream_su_incorrect_password(self, connect, get_transport):
+        channel = StreamingChannel('', idle=0)
+        channel.recv = MagicMock(side_effect=['Password:',
+                                              'su: incorrect password\n', ''])
+        get_transport.return_value.open_session.return_value = channel
+        with self.assertRaises(SuIncorrectPassword):
+            list(self.ssh.stream("cmd", su_password="test"))
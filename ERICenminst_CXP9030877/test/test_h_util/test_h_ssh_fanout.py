@@ -0,0 +1,81 @@
+import threading
+
+from unittest2 import TestCase
+
+from mock import patch
+from paramiko import AuthenticationException
+
+from h_util.h_ssh.client import SshClient, SuIncorrectPassword
+from h_util.h_ssh.fanout import SshFanout, SshResult
+
+
+class TestSshFanout(TestCase):
+
+    @patch.object(SshClient, 'close')
+    @patch.object(SshClient, 'connect')
+    @patch.object(SshClient, 'is_connected')
+    @patch.object(SshClient, 'run')
+    def test_run(self, m_run, m_is_connected, m_connect, m_close):
+        hosts = ['db-%s' % index for index in range(1, 7)]
+        running = []
+        most = []
+        changed = threading.Condition()
+
+        def run(cmd, **kwargs):
+            with changed:
+                running.append(cmd)
+                most.append(len(running))
+                changed.notify_all()
+                # Hold the first commands until the pool is full, a wait can
+                # return early on a loaded host so check again
+                while len(most) < 3:
+                    changed.wait(1)
+                running.remove(cmd)
+            return 0, 'ok %s' % kwargs.get('su_password')
+
+        m_run.side_effect = run
+        m_is_connected.side_effect = [False] * len(hosts) + \
+                                     [True] * len(hosts)
+        credentials = dict((host, ('litp-admin', 'pass')) for host in hosts)
+        with SshFanout(credentials, max_workers=3, timeout=30) as fanout:
+            results = fanout.run(hosts, 'ls', su_user='root',
+                                 host_args={'db-2': {'su_password': 'db2'}})
+            self.assertEqual(hosts, results.keys())
+            self.assertTrue(all(result.ok for result in results.values()))
+            self.assertEqual('ok db2', results['db-2'].output)
+            self.assertEqual('ok None', results['db-1'].output)
+            self.assertEqual(3, max(most))
+            self.assertEqual(30, fanout.client('db-1').command_timeout)
+            m_run.assert_any_call('ls', su_user='root', su_password='db2')
+
+            # The second command reuses the connections
+            fanout.run(hosts, 'hostname', timeout=5)
+            self.assertEqual(len(hosts), m_connect.call_count)
+            self.assertEqual(5, fanout.client('db-1').command_timeout)
+        self.assertEqual(len(hosts) * 2, m_close.call_count)
+
+    @patch.object(SshClient, 'close')
+    def test_run_errors(self, m_close):
+        def connect(client):
+            if client.host == 'db-1':
+                raise AuthenticationException('Auth Failed')
+
+        def run(client, cmd, **kwargs):
+            if client.host == 'db-2':
+                raise SuIncorrectPassword('su: incorrect password')
+            return 1, 'ls: cannot access'
+
+        with patch.object(SshClient, 'connect', autospec=True,
+                          side_effect=connect), \
+                patch.object(SshClient, 'run', autospec=True,
+                             side_effect=run):
+            fanout = SshFanout(lambda host: ('litp-admin', host))
+            results = fanout.run(['db-1', 'db-2', 'db-3'], 'ls')
+            fanout.close()
+        self.assertIsInstance(results['db-1'].error, AuthenticationException)
+        self.assertIsNone(results['db-1'].status)
+        self.assertIsInstance(results['db-2'].error, SuIncorrectPassword)
+        self.assertEqual(SshResult('db-3', 1, 'ls: cannot access', None),
+                         results['db-3'])
+        self.assertFalse(results['db-3'].ok)
+        self.assertEqual('db-3', fanout.client('db-3').password)
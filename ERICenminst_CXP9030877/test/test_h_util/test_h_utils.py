@@ -1,6 +1,7 @@
 import StringIO
 import datetime
 import os
+import re
 import shutil
 import sys
 import stat
@@ -38,7 +39,9 @@ from h_util.h_utils import (exec_process, delete_file, exec_process_via_pipes,
                             migrate_cleanup_cmd, compare_versions,
                             get_enable_cron_on_expiry_cmd, _copy_as_template,
                             copy_custom_banners, LITP_ERB_TEMPLATES,
-                            KICKSTART_ERB)
+                            KICKSTART_ERB, CommandCache,
+                            check_package_installed, query_rpms,
+                            get_rpm_info, get_rpm_install_size)
 from pexpect import EOF, TIMEOUT, ExceptionPexpect
 from yum.Errors import RemoveError
 
@@ -898,6 +901,63 @@ class TestSed(unittest2.TestCase):
         self.assertIn('eth0_macaddress', data)
         self.assertEqual('macsvc', data['eth0_macaddress'])
 
+    def test_get_node_config_indexed(self):
+        sed = Sed(None)
+        sed.sed = dict(('{0}_node{1}_{2}'.format(ntype, node, key), key)
+                       for ntype in ('svc', 'db', 'str')
+                       for node in range(1, 12)
+                       for key in ('IP', 'IP_internal', 'hostname'))
+        sed.update({'xsvc_node1_IP': 'x', 'svc_node1_svc_node1_IP': 'twice',
+                    'enclosure1_OAIP1': 'oa1', 'myenclosure1_OAIP1': 'oa1b',
+                    'enclosure1': 'no_sep', 'svc__node1_IP': 'empty'})
+
+        def scan(node_id):
+            matcher = re.compile('{0}_(.*)'.format(node_id))
+            expected = {}
+            for _key in sed.keys():
+                _match = matcher.search(_key)
+                if _match:
+                    expected[_match.group(1)] = sed[_key]
+            return expected
+
+        for node_id in ('svc_node1', 'db_node11', 'node1', 'enclosure1',
+                        'closure1', 'svc_', 'svc__node1', 'bogus', 'svc_n.*1'):
+            self.assertEqual(scan(node_id), sed.get_node_config(node_id))
+        self.assertEqual(['IP', 'IP_internal', 'hostname'],
+                         sorted(sed.get_node_config('str_node1')))
+
+    def test_index_dropped_on_change(self):
+        sed = mock_sed({'svc_node1_IP': '10.0.0.1'})
+        self.assertEqual(['svc_node1_IP'], sed.find_keys('svc_'))
+        self.assertEqual('svc_node1_IP', sed.get_key_for_value('10.0.0.1'))
+        sed['svc_node2_IP'] = '10.0.0.2'
+        self.assertEqual(2, len(sed.find_keys('svc_')))
+        self.assertEqual({'IP': '10.0.0.2'}, sed.get_node_config('svc_node2'))
+        sed.pop('svc_node1_IP')
+        self.assertIsNone(sed.get_key_for_value('10.0.0.1'))
+        sed.update(db_node1_IP='10.0.0.1')
+        self.assertEqual('db_node1_IP', sed.get_key_for_value('10.0.0.1'))
+        del sed['db_node1_IP']
+        sed.setdefault('svc_node3_IP', '10.0.0.3')
+        self.assertEqual(['svc_node2_IP', 'svc_node3_IP'],
+                         sorted(sed.find_keys('svc_')))
+        sed.sed = {}
+        self.assertEqual([], sed.find_keys('svc_'))
+        self.assertEqual({}, sed.get_node_config('svc_node2'))
+
+        # The returned list is a copy
+        sed['a'] = 'b'
+        sed.find_keys('a').append('c')
+        self.assertEqual(['a'], sed.find_keys('a'))
+
+    def test_get_key_for_value(self):
+        sed = Sed(None)
+        sed.sed = {'a': '1', 'b': '2', 'c': '2'}
+        self.assertEqual([_key for _key in sed.keys()
+                          if sed[_key] == '2'][0], sed.get_key_for_value('2'))
+        self.assertIsNone(sed.get_key_for_value('3'))
+        self.assertIsNone(sed.get_key_for_value(['2']))
+
     @patch('h_util.h_utils.exec_process')
     @patch("os.path.exists")
     def test_get_last_applied_sed_s_param(self, _exists, _exec_process):
@@ -964,6 +1024,177 @@ class TestSed(unittest2.TestCase):
                                             'value': 'Test_ENM_Servers'}}
         self.assertFalse(is_env_on_rack())
 
+class TestCommandCache(unittest2.TestCase):
+    def setUp(self):
+        self.cache = CommandCache(ttl=60)
+        patcher = patch('h_util.h_utils._COMMAND_CACHE', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('h_util.h_utils.Popen')
+    def test_exec_process_read_only(self, m_popen):
+        m_popen.return_value.returncode = 0
+        m_popen.return_value.communicate.return_value = ['1.2.3', None]
+        command = ['rpm', '-q', 'ERICenminst']
+        for _ in range(3):
+            self.assertEqual('1.2.3', exec_process(command, read_only=True))
+        self.assertEqual(1, m_popen.call_count)
+
+        # Another environment is another command
+        exec_process(command, environ={'LANG': 'C'}, read_only=True)
+        self.assertEqual(2, m_popen.call_count)
+
+        # Not declared read-only
+        exec_process(['cat', '/etc/redhat-release'])
+        self.assertEqual(3, m_popen.call_count)
+        exec_process(command, read_only=True)
+        self.assertEqual(3, m_popen.call_count)
+
+    @patch('h_util.h_utils.Popen')
+    def test_read_only_error(self, m_popen):
+        m_popen.return_value.returncode = 1
+        m_popen.return_value.communicate.return_value = ['not installed', None]
+        for _ in range(2):
+            self.assertRaises(IOError, exec_process, ['rpm', '-q', 'x'],
+                              read_only=True)
+        self.assertEqual(2, m_popen.call_count)
+
+    @patch('h_util.h_utils.time.time')
+    def test_ttl(self, m_time):
+        loader = Mock(return_value='out')
+        m_time.return_value = 1000
+        self.cache.get(('cmd',), 'cmd', loader)
+        m_time.return_value = 1059
+        self.cache.get(('cmd',), 'cmd', loader)
+        self.assertEqual(1, loader.call_count)
+        # Expired, or the clock went back
+        for now in (1060, 900):
+            m_time.return_value = now
+            self.cache.get(('cmd',), 'cmd', loader)
+        self.assertEqual(3, loader.call_count)
+
+        self.cache.ttl = 0
+        self.cache.get(('cmd',), 'cmd', loader)
+        self.assertEqual(4, loader.call_count)
+
+    @patch('h_util.h_utils.read_enminst_config')
+    def test_ttl_from_config(self, m_config):
+        m_config.return_value = {'command_cache_ttl': '5'}
+        cache = CommandCache()
+        cache.get(('cmd',), 'cmd', Mock())
+        self.assertEqual(5.0, cache.ttl)
+
+        m_config.return_value = {'command_cache_ttl': 'x'}
+        cache = CommandCache()
+        cache.get(('cmd',), 'cmd', Mock())
+        self.assertEqual(60, cache.ttl)
+
+    @patch('h_util.h_utils.LOG')
+    @patch('h_util.h_utils.Popen')
+    def test_flushed_by_package_commands(self, m_popen, m_log):
+        m_popen.return_value.returncode = 0
+        m_popen.return_value.communicate.return_value = ['', None]
+        command = ['rpm', '-q', 'ERICenminst']
+        exec_process(command, read_only=True)
+        exec_process(command, read_only=True)
+        exec_process('/usr/bin/yum install -y ERICenminst', use_shell=True)
+        exec_process(command, read_only=True)
+        self.assertEqual(3, m_popen.call_count)
+        m_log.debug.assert_any_call(
+                'Command cache: 1 hits for rpm -q ERICenminst')
+
+    @patch('h_util.h_utils.Popen')
+    def test_flushed_by_piped_package_commands(self, m_popen):
+        m_popen.return_value.returncode = 0
+        m_popen.return_value.communicate.return_value = ['', None]
+        self.cache.get(('cmd',), 'cmd', Mock())
+        exec_process_via_pipes(['cat', 'x'], ['grep', 'y'])
+        self.assertIn(('cmd',), self.cache._entries)
+        exec_process_via_pipes(['rpm', '-qa'], ['grep', 'ERIC'])
+        self.assertEqual({}, self.cache._entries)
+
+    @patch('h_util.h_utils.yum.YumBase')
+    def test_flushed_by_install_and_remove(self, m_yum):
+        m_yum.return_value.isPackageInstalled.return_value = False
+        self.assertFalse(check_package_installed('ERICenminst'))
+        self.assertFalse(check_package_installed('ERICenminst'))
+        self.assertEqual(1, m_yum.return_value.isPackageInstalled.call_count)
+
+        m_yum.return_value.isPackageInstalled.return_value = True
+        install_rpm('ERICenminst', '/tmp/ERICenminst.rpm')
+        self.assertTrue(check_package_installed('ERICenminst'))
+
+        m_yum.return_value.isPackageInstalled.side_effect = [True, False]
+        remove_rpm('ERICenminst')
+        self.assertFalse(check_package_installed('ERICenminst'))
+
+
+class TestQueryRpms(unittest2.TestCase):
+    @patch('h_util.h_utils.exec_process')
+    def test_query_installed(self, m_exec):
+        m_exec.return_value = (
+            'rpm:name=ERICenminst_CXP9030877,version=1.2.3,release=1,'
+            'size=1000\n'
+            'package ERICmissing_CXP1 is not installed\n'
+            'rpm:name=ERICdstutilities_CXP9032738,version=1.51.1,'
+            'release=SNAPSHOT20260101,size=200\n')
+        result = query_rpms(rpm_names=['ERICenminst_CXP9030877',
+                                       'ERICmissing_CXP1',
+                                       'ERICdstutilities_CXP9032738'])
+        self.assertEqual(1, m_exec.call_count)
+        command = m_exec.call_args[0][0]
+        self.assertEqual(['rpm', '-q'], command[:2])
+        self.assertEqual(['ERICenminst_CXP9030877', 'ERICmissing_CXP1',
+                          'ERICdstutilities_CXP9032738'], command[-3:])
+        self.assertEqual({'name': 'ERICenminst_CXP9030877',
+                          'version': '1.2.3', 'release': '1',
+                          'size': '1000'},
+                         result['ERICenminst_CXP9030877'])
+        self.assertIsNone(result['ERICmissing_CXP1'])
+        self.assertEqual('SNAPSHOT20260101',
+                         result['ERICdstutilities_CXP9032738']['release'])
+
+    @patch('h_util.h_utils.exec_process')
+    def test_query_files(self, m_exec):
+        m_exec.return_value = (
+            'warning: /iso/a-1.0.rpm: Header V3 RSA/SHA256 Signature, '
+            'key ID fd431d51: NOKEY\n'
+            'error: open of /iso/missing.rpm failed: No such file\n'
+            'error: /iso/broken.rpm: not an rpm package\n'
+            'rpm:name=a,version=1.0,release=1,size=10\n'
+            'rpm:name=b,version=2.0,release=1,size=20\n')
+        result = query_rpms(rpm_paths=['/iso/a-1.0.rpm', '/iso/missing.rpm',
+                                       '/iso/broken.rpm', '/iso/b-2.0.rpm'])
+        self.assertEqual('-qp', m_exec.call_args[0][0][1])
+        self.assertEqual('a', result['/iso/a-1.0.rpm']['name'])
+        self.assertEqual('20', result['/iso/b-2.0.rpm']['size'])
+        self.assertIsNone(result['/iso/missing.rpm'])
+        self.assertIsNone(result['/iso/broken.rpm'])
+
+        # Output that can not be matched to the files
+        m_exec.return_value = 'rpm:name=a,version=1.0,release=1,size=10\n'
+        self.assertRaises(IOError, query_rpms,
+                          rpm_paths=['/iso/a-1.0.rpm', '/iso/b-2.0.rpm'])
+
+    @patch('h_util.h_utils.exec_process')
+    def test_query_nothing(self, m_exec):
+        self.assertEqual({}, query_rpms(rpm_names=[]))
+        self.assertFalse(m_exec.called)
+        self.assertRaises(ValueError, query_rpms)
+        self.assertRaises(ValueError, query_rpms, ['a'], ['/iso/a.rpm'])
+
+    @patch('h_util.h_utils.exec_process')
+    def test_single_rpm_helpers(self, m_exec):
+        m_exec.return_value = 'rpm:name=a,version=1.0,release=1,size=10\n'
+        self.assertEqual({'name': 'a', 'version': '1.0', 'release': '1'},
+                         get_rpm_info('ms-1', rpm_name='a'))
+        self.assertEqual('10', get_rpm_install_size(rpm_path='/iso/a.rpm'))
+
+        m_exec.return_value = 'package a is not installed\n'
+        self.assertRaises(IOError, get_rpm_info, 'ms-1', rpm_name='a')
+        self.assertIsNone(get_rpm_install_size(rpm_name='a'))
+
+
 class TestFormatter(unittest2.TestCase):
     def setUp(self):
         self.formatter = Formatter()
@@ -0,0 +1,127 @@
+import os
+import shutil
+from os.path import dirname, join
+from tempfile import mkdtemp
+
+from lxml.etree import XMLSyntaxError
+from unittest2 import TestCase
+
+from h_xml.xml_diff import read_items, diff_models, XmlItem
+
+TEST_DATA = join(dirname(__file__), 'test_data')
+
+
+class TestXmlDiff(TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write_xml(self, name, content):
+        filename = join(self.tmpdir, name)
+        with open(filename, 'w') as _writer:
+            _writer.write('<litp:root xmlns:litp="http://www.ericsson.com/litp"'
+                          ' id="root">{0}</litp:root>'.format(content))
+        return filename
+
+    def test_read_items(self):
+        xml = self._write_xml('dd.xml', '<litp:ms id="ms">'
+                              '<hostname> ms-1 </hostname><!-- comment -->'
+                              '<litp:ms-items-collection id="items">'
+                              '<litp:alias-inherit id="a1" '
+                              'source_path="/software/items/a1">'
+                              '<alias_names/></litp:alias-inherit>'
+                              '</litp:ms-items-collection>'
+                              '<other><litp:alias id="ignored"/></other>'
+                              '</litp:ms>')
+        items = read_items(xml)
+        self.assertEqual(['/ms', '/ms/items', '/ms/items/a1'], items.keys())
+        self.assertEqual(XmlItem('ms', '/ms', {'hostname': 'ms-1',
+                                               'other': ''}, None),
+                         items['/ms'])
+        self.assertEqual(XmlItem('alias-inherit', '/ms/items/a1',
+                                 {'alias_names': ''}, '/software/items/a1'),
+                         items['/ms/items/a1'])
+
+        self.assertRaises(XMLSyntaxError, read_items,
+                          self._write_xml('bad.xml', '<litp:ms>'))
+
+    def test_diff_models(self):
+        xml_diff = diff_models(join(TEST_DATA, 'dd_from.xml'),
+                               join(TEST_DATA, 'dd_to.xml'))
+
+        self.assertEqual(
+                ['/infrastructure/storage/storage_profiles/'
+                 'db_node_storage_profile/volume_groups/vg1/file_systems/'
+                 'lv_var2',
+                 '/ms/items/esmon_alias'], xml_diff.added.keys())
+        self.assertEqual('vm-alias',
+                         xml_diff.added['/ms/items/esmon_alias'].item_type)
+        self.assertEqual('alias',
+                         xml_diff.removed['/ms/items/esmon_alias'].item_type)
+
+        self.assertEqual(
+                ['/deployments/enm/clusters/svc_cluster',
+                 '/infrastructure/storage/storage_profiles/'
+                 'db_node_storage_profile/volume_groups/vg1/file_systems/'
+                 'lv_var',
+                 '/software/items/model_package/packages/ERICmodels_kept'],
+                xml_diff.changed.keys())
+        change = xml_diff.changed['/deployments/enm/clusters/svc_cluster']
+        self.assertEqual({'default_nic_monitor': 'mii'}, change.removed)
+        self.assertEqual({}, change.added)
+        self.assertEqual({}, change.modified)
+        change = xml_diff.changed[
+                '/software/items/model_package/packages/ERICmodels_kept']
+        self.assertEqual({'version': ('1.0.1', '1.0.2')}, change.modified)
+
+        # dd_delta.txt is written by hand from the format the delta parsers
+        # read, it is not output recorded from dst_dd_delta_generator.sh
+        with open(join(TEST_DATA, 'dd_delta.txt')) as _reader:
+            self.assertEqual(_reader.read().splitlines(),
+                             xml_diff.delta_lines())
+
+        delta_file = join(self.tmpdir, 'delta.txt')
+        xml_diff.write_delta(delta_file)
+        with open(join(TEST_DATA, 'dd_delta.txt')) as _reader:
+            with open(delta_file) as _written:
+                self.assertEqual(_reader.read(), _written.read())
+
+    def test_no_diff(self):
+        dd_file = join(TEST_DATA, 'dd_from.xml')
+        xml_diff = diff_models(dd_file, dd_file)
+        self.assertFalse(xml_diff)
+        self.assertEqual([], xml_diff.delta_lines())
+        self.assertTrue(diff_models(dd_file, join(TEST_DATA, 'dd_to.xml')))
+
+    def test_diff_large_models(self):
+        def write_dd(name, nodes, version):
+            filename = join(self.tmpdir, name)
+            with open(filename, 'w') as _writer:
+                _writer.write('<litp:root xmlns:litp="http://www.ericsson.com'
+                              '/litp" id="root"><litp:deployment id="enm">'
+                              '<litp:deployment-clusters-collection '
+                              'id="nodes">')
+                for node in nodes:
+                    _writer.write('<litp:node id="n{0}"><hostname>n{0}'
+                                  '</hostname><version>{1}</version>'
+                                  '<litp:eth id="eth0"><macaddress>{0}'
+                                  '</macaddress></litp:eth>'
+                                  '</litp:node>'.format(node, version))
+                _writer.write('</litp:deployment-clusters-collection>'
+                              '</litp:deployment></litp:root>')
+            return filename
+
+        # 60000 items in each
+        from_xml = write_dd('from.xml', xrange(0, 30000), 1)
+        to_xml = write_dd('to.xml', xrange(1, 30001), 2)
+        xml_diff = diff_models(from_xml, to_xml)
+
+        self.assertEqual(['/enm/nodes/n30000', '/enm/nodes/n30000/eth0'],
+                         xml_diff.added.keys())
+        self.assertEqual(['/enm/nodes/n0', '/enm/nodes/n0/eth0'],
+                         xml_diff.removed.keys())
+        self.assertEqual(29999, len(xml_diff.changed))
+        self.assertEqual({'version': ('1', '2')},
+                         xml_diff.changed['/enm/nodes/n1'].modified)
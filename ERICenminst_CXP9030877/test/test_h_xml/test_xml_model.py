@@ -0,0 +1,130 @@
+import os
+import shutil
+from os.path import dirname, join
+from tempfile import mkdtemp
+
+from unittest2 import TestCase
+
+from h_xml.xml_model import DeploymentModel, load_model, clear_model_cache
+from h_xml.xml_utils import load_xml, xpath, _LITPNS
+
+DD_EXAMPLE = join(dirname(dirname(__file__)), 'test_h_infra',
+                  'dd_example_1.xml')
+
+DD = '''<litp:root xmlns:litp="http://www.ericsson.com/litp" id="root">
+  <litp:root-deployments-collection id="deployments">
+    <litp:deployment id="enm">
+      <litp:deployment-clusters-collection id="clusters">
+        <litp:vcs-cluster id="db_cluster">
+          <litp:cluster-nodes-collection id="nodes">
+            <litp:node id="db-1"><hostname>db-1</hostname></litp:node>
+          </litp:cluster-nodes-collection>
+        </litp:vcs-cluster>
+        <litp:vcs-cluster id="svc_cluster">
+          <litp:cluster-nodes-collection id="nodes">
+            <litp:node id="svc-1"><hostname>svc-1</hostname></litp:node>
+            <litp:node id="svc-2"><hostname>svc-2</hostname></litp:node>
+          </litp:cluster-nodes-collection>
+          <litp:cluster-services-collection id="services">
+            <litp:vcs-clustered-service id="httpd">
+              <node_list>svc-1,svc-2</node_list>
+              <litp:clustered-service-applications-collection
+                  id="applications">
+                <litp:vm-service-inherit id="vm_service_httpd"
+                    source_path="/software/services/httpd"/>
+              </litp:clustered-service-applications-collection>
+            </litp:vcs-clustered-service>
+          </litp:cluster-services-collection>
+        </litp:vcs-cluster>
+      </litp:deployment-clusters-collection>
+    </litp:deployment>
+  </litp:root-deployments-collection>
+  <litp:software id="software">
+    <litp:software-services-collection id="services">
+      <litp:vm-service id="httpd"><cpus>2</cpus></litp:vm-service>
+      <litp:vm-service id="custom"><cpus>1</cpus></litp:vm-service>
+    </litp:software-services-collection>
+  </litp:software>
+</litp:root>'''
+
+
+class TestDeploymentModel(TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.filename = join(self.tmpdir, 'dd.xml')
+        with open(self.filename, 'w') as _writer:
+            _writer.write(DD)
+        clear_model_cache()
+
+    def tearDown(self):
+        clear_model_cache()
+        shutil.rmtree(self.tmpdir)
+
+    def test_items(self):
+        model = DeploymentModel(load_xml(self.filename))
+        self.assertEqual(['db-1', 'svc-1', 'svc-2'],
+                         [n.get('id') for n in model.items('node')])
+        self.assertEqual([], model.items('ms'))
+
+        svc = model.items('vcs-cluster', {'id': 'svc_cluster'})[0]
+        self.assertEqual(['svc-1', 'svc-2'],
+                         [n.get('id')
+                          for n in model.items('node', within=svc)])
+
+        # The id of a cluster and of a vm-service
+        self.assertEqual(['httpd'], [s.get('id') for s in model.items(
+                'vcs-clustered-service', {'id': 'httpd'})])
+
+        inherit = model.items('vm-service-inherit',
+                              {'source_path': '/software/services/httpd'})
+        self.assertEqual(['vm_service_httpd'],
+                         [i.get('id') for i in inherit])
+        self.assertEqual(inherit,
+                         model.inherits('/software/services/httpd'))
+        self.assertEqual([], model.items(
+                'vm-service-inherit',
+                {'source_path': '/software/services/custom'}))
+
+    def test_navigation(self):
+        model = DeploymentModel(load_xml(self.filename))
+        inherit = model.get('/deployments/enm/clusters/svc_cluster/services/'
+                            'httpd/applications/vm_service_httpd')
+        self.assertEqual('vm_service_httpd', inherit.get('id'))
+        self.assertEqual('svc_cluster',
+                         model.parent(inherit, 'vcs-cluster').get('id'))
+        self.assertIsNone(model.parent(inherit, 'ms'))
+        service = model.parent(inherit, 'vcs-clustered-service')
+        self.assertEqual({'node_list': 'svc-1,svc-2'},
+                         model.properties(service))
+        self.assertEqual('/deployments/enm/clusters/svc_cluster/services/'
+                         'httpd', model.vpath(service))
+        self.assertIsNone(model.get('/software/services/missing'))
+
+    def test_same_as_xpath(self):
+        doc = load_xml(DD_EXAMPLE)
+        model = DeploymentModel(doc)
+        item_types = set(e.tag[len(_LITPNS):] for e in doc.iter()
+                         if isinstance(e.tag, basestring) and
+                         e.tag.startswith(_LITPNS))
+        for item_type in item_types:
+            self.assertEqual(xpath(doc, item_type), model.items(item_type))
+
+    def test_load_model(self):
+        model = load_model(self.filename)
+        self.assertIs(model, load_model(self.filename))
+        self.assertIs(model, load_model(
+                join(self.tmpdir, '.', 'dd.xml')))
+
+        # Changed on disk
+        with open(self.filename, 'w') as _writer:
+            _writer.write(DD.replace('db-1', 'db-01'))
+        changed = load_model(self.filename)
+        self.assertIsNot(model, changed)
+        self.assertEqual(['db-01', 'svc-1', 'svc-2'],
+                         [n.get('id') for n in changed.items('node')])
+
+        clear_model_cache()
+        self.assertIsNot(changed, load_model(self.filename))
+
+        os.remove(self.filename)
+        self.assertRaises(IOError, load_model, self.filename)
@@ -1,8 +1,10 @@
-from h_xml.xml_validator import XMLValidator
+from h_xml.xml_validator import XMLValidator, get_schema, \
+    clear_schema_cache
 from h_util.h_utils import touch
-from lxml.etree import DocumentInvalid, XMLSyntaxError
+from lxml.etree import DocumentInvalid, XMLSyntaxError, parse
 from os.path import join
-from os import path, remove
+from os import path, remove, utime
+from mock import patch
 from tempfile import gettempdir
 import unittest2 as unittest
 
@@ -77,6 +79,7 @@ class TestXMLValidator(unittest.TestCase):
         self.schema_path = path.join(gettempdir(), 'litp.xsd')
         self.make_file(self.xml_path)
         self.make_file(self.schema_path)
+        clear_schema_cache()
 
     def tearDown(self):
         try:
@@ -119,3 +122,43 @@ class TestXMLValidator(unittest.TestCase):
         self.write_content_to_file(SCHEMA_XML, self.schema_path)
         self.assertRaises(DocumentInvalid, xml_validator.validate, self.xml_path, self.schema_path)
 
+    def test_schema_cache(self):
+        self.write_content_to_file(SCHEMA_XML, self.schema_path)
+        utime(self.schema_path, (1000, 1000))
+        schema = get_schema(self.schema_path)
+        self.assertIs(schema, get_schema(self.schema_path))
+
+        # Changed schema
+        self.write_content_to_file(SCHEMA_XML.replace("minOccurs='1'",
+                                                      "minOccurs='2'"),
+                                   self.schema_path)
+        utime(self.schema_path, (2000, 2000))
+        self.assertIsNot(schema, get_schema(self.schema_path))
+
+    def test_validate_incremental(self):
+        xml_validator = XMLValidator()
+        self.write_content_to_file(SCHEMA_XML, self.schema_path)
+        addresses = ''.join('<address><name>{0}</name></address>\n'.format(
+                index) for index in range(10000))
+        self.write_content_to_file(
+                DEPLOYMENT_XML.replace('<address>', addresses + '<address>'),
+                self.xml_path)
+        with patch('h_xml.xml_validator.parse', wraps=parse) as m_parse:
+            xml_validator.validate(self.xml_path, self.schema_path,
+                                   incremental=True)
+        # Only the schema was loaded as a tree
+        m_parse.assert_called_once_with(self.schema_path)
+
+    def test_validate_incremental_invalid(self):
+        xml_validator = XMLValidator()
+        self.write_content_to_file(DEPLOYMENT_XML_MISSING_ELEMENT,
+                                   self.xml_path)
+        self.write_content_to_file(SCHEMA_XML, self.schema_path)
+        with self.assertRaises(DocumentInvalid) as error:
+            xml_validator.validate(self.xml_path, self.schema_path,
+                                   incremental=True)
+        self.assertEqual(7, error.exception.error_log.last_error.line)
+
+        self.write_content_to_file(DEPLOYMENT_XML_INVALID, self.xml_path)
+        self.assertRaises(XMLSyntaxError, xml_validator.validate,
+                          self.xml_path, self.schema_path, incremental=True)
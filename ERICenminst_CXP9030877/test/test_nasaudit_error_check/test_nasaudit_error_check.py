@@ -6,6 +6,10 @@ fcaps_healthcheck_modules = test_utils.mock_fcaps_healthcheck_module()
 fcaps_healthcheck_module_patcher = patch.dict('sys.modules', fcaps_healthcheck_modules)
 fcaps_healthcheck_module_patcher.start()
 
+import shutil
+from os.path import join
+from tempfile import mkdtemp
+
 from nasaudit_error_check import NasAuditCheck
 from h_litp.litp_rest_client import LitpException
 from restapi import RESTapi
@@ -15,6 +19,16 @@ import unittest2
 
 class NasAuditCheckUnitTests(unittest2.TestCase):
 
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        state_patcher = patch('nasaudit_error_check.STATE_FILE',
+                              join(self.tmpdir, 'state.json'))
+        state_patcher.start()
+        self.addCleanup(state_patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
     @patch('h_litp.litp_rest_client.LitpRestClient.get', return_value={"properties":{"ipaddress":"172.16.206.140"}})
     @patch('h_litp.litp_rest_client.LitpRestClient.get_items_by_type')
     def test_build_alarm_url(self, mock_ip_path, *_):
@@ -108,6 +122,74 @@ class NasAuditCheckUnitTests(unittest2.TestCase):
         nac.nasaudit_main()
         self.assertEquals(mock_log.return_value.info.call_count, 2)
 
+    @patch('nasaudit_error_check.NasAuditCheck.build_alarm')
+    @patch('h_litp.litp_maintenance.LitpMaintenance.is_maintenance_mode')
+    @patch('nasaudit_error_check.NasConsole')
+    @patch.object(HealthCheck, '_get_nas_info')
+    @patch.object(HealthCheck, '_get_psw')
+    @patch('enm_healthcheck.get_nas_type')
+    @patch('nasaudit_error_check.init_enminst_logging')
+    def test_nasaudit_main_unchanged(self, mock_log, mock_nas_type,
+                                     mock_pwd, mock_nas_info,
+                                     mock_exec, mock_litp_maintenance,
+                                     mock_alarm):
+        mock_nas_info.return_value = {'nas': ["sfs-service", "sfs-pool",
+                                              "sfs-filesystem"]}
+        mock_pwd.return_value = 'some_pwd'
+        mock_exec.return_value.exec_basic_nas_command.side_effect = (
+            [(0, "success", "no_error", "clear"),
+             (0, "success", "no_error", "clear"),
+             (3, "success", "minor", "cleared"),
+             (1, "success", "critical", "cleared"),
+             (0, "success", "no_error", "cleared")])
+        mock_litp_maintenance.return_value = False
+        mock_nas_type.return_value = ''
+        mock_alarm.return_value = True
+        NasAuditCheck().nasaudit_main()
+        self.assertEqual(2, mock_alarm.call_count)
+
+        # Still a warning: no alarm sent, no LITP or NAS software lookups
+        NasAuditCheck().nasaudit_main()
+        self.assertEqual(2, mock_alarm.call_count)
+        self.assertEqual(1, mock_nas_info.call_count)
+
+        NasAuditCheck().nasaudit_main()
+        self.assertEqual(3, mock_alarm.call_count)
+        mock_alarm.assert_called_with()
+        self.assertEqual(5, mock_log.return_value.info.call_count)
+
+    @patch('nasaudit_error_check.RESTapi')
+    @patch('nasaudit_error_check.NasAuditCheck.lookup_alarm_url')
+    @patch('h_litp.litp_maintenance.LitpMaintenance.is_maintenance_mode')
+    @patch('nasaudit_error_check.NasConsole')
+    @patch.object(HealthCheck, '_get_nas_info')
+    @patch.object(HealthCheck, '_get_psw')
+    @patch('enm_healthcheck.get_nas_type')
+    @patch('nasaudit_error_check.init_enminst_logging')
+    def test_nasaudit_main_send_failed(self, mock_log, mock_nas_type,
+                                       mock_pwd, mock_nas_info,
+                                       mock_exec, mock_litp_maintenance,
+                                       mock_url, mock_rest):
+        mock_nas_info.return_value = {'nas': ["sfs-service", "sfs-pool",
+                                              "sfs-filesystem"]}
+        mock_pwd.return_value = 'some_pwd'
+        mock_exec.return_value.exec_basic_nas_command.side_effect = (
+            [(0, "success", "no_error", "clear"),
+             (0, "success", "no_error", "clear"),
+             (0, "success", "no_error", "cleared"),
+             (0, "success", "no_error", "cleared")])
+        mock_litp_maintenance.return_value = False
+        mock_nas_type.return_value = ''
+        mock_url.return_value = 'http://haproxy'
+        mock_rest.return_value.post.return_value = False
+        NasAuditCheck().nasaudit_main()
+
+        # Sent again, with the alarm URL looked up again
+        mock_rest.return_value.post.return_value = True
+        NasAuditCheck().nasaudit_main()
+        self.assertEqual(2, mock_rest.return_value.post.call_count)
+        self.assertEqual(2, mock_url.call_count)
+
     @patch('nasaudit_error_check.NasConsole')
     @patch.object(HealthCheck, '_get_nas_info')
     @patch.object(HealthCheck, '_get_psw')
@@ -218,17 +218,17 @@ class TestPreUpgradeRpm(TestCase):
         self.assertEqual(m_update_rpm_info.call_count, 3)
         self.assertTrue(m_del_file.called)
 
-    @patch('pre_upgrade_rpms.get_rpm_info')
-    @patch('pre_upgrade_rpms.check_package_installed')
+    @patch('pre_upgrade_rpms.query_rpms')
     @patch('h_puppet.mco_agents.EnmPreCheckAgent.get_package_info')
     def test_get_installed_rpms_versions(self,
                                          m_mco,
-                                         m_pkg_installed,
-                                         m_get_pkg_info):
+                                         m_query_rpms):
         # self.pre_upgrade_rpms.litp_rest = self.litpd
         m_mco.return_value = "name=ERIClitpsanemc_CXP9030788,version=2.18.5,release=1"
-        m_get_pkg_info.return_value = {"name": "ERICdstutilities_CXP9032738", "version": "1.51.1", "release": "1"}
-        m_pkg_installed.return_value = True
+        m_query_rpms.return_value = {
+            "ERIClitpsanemc_CXP9030788": {"name": "ERIClitpsanemc_CXP9030788", "version": "2.18.5", "release": "1"},
+            "ERICdstutilities_CXP9032738": {"name": "ERICdstutilities_CXP9032738", "version": "1.51.1", "release": "1"},
+            "ERICenmdeploymenttemplates_CXP9031758": None}
 
         self.pre_upgrade_rpms.rpms_to_install = ["/litp/plugins/ENM/ERIClitpsanemc_CXP9030788-1.20.2.rpm",
                                                  "/repos/ENM/ms/ERICdstutilities_CXP9032738-1.51.1.rpm",
@@ -236,6 +236,34 @@ class TestPreUpgradeRpm(TestCase):
         self.pre_upgrade_rpms.get_installed_rpms_versions()
 
         self.assertEqual(len(self.pre_upgrade_rpms.rpm_info), 5)
+        m_query_rpms.assert_called_once_with(rpm_names=[
+            "ERIClitpsanemc_CXP9030788", "ERICdstutilities_CXP9032738",
+            "ERICenmdeploymenttemplates_CXP9031758"])
+        self.assertEqual(["1.51.1", None],
+                         [info.pre_rpm_version for info in self.pre_upgrade_rpms.rpm_info[-2:]])
+
+    @patch.object(PreUpgradeRpm, 'UPGRADE_FAILURE', False)
+    @patch('pre_upgrade_rpms.import_iso')
+    @patch('pre_upgrade_rpms.query_rpms')
+    @patch('pre_upgrade_rpms.get_lms_free_space')
+    def test_check_for_install_space_batched(self, m_free_space,
+                                             m_query_rpms, m_import_iso):
+        self.pre_upgrade_rpms.rpms_to_install = ["/repos/ENM/ms/ERICdstutilities_CXP9032738-1.51.1.rpm",
+                                                 "/repos/ENM/ms/ERICenmdeploymenttemplates_CXP9031758-1.75.7.rpm"]
+        installed = {"ERICdstutilities_CXP9032738": {"size": "1000"},
+                     "ERICenmdeploymenttemplates_CXP9031758": None}
+        iso_rpms = {"/repos/ENM/ms/ERICdstutilities_CXP9032738-1.51.1.rpm": {"size": "1500"},
+                    "/repos/ENM/ms/ERICenmdeploymenttemplates_CXP9031758-1.75.7.rpm": {"size": "700"}}
+        m_query_rpms.side_effect = lambda rpm_names=None, rpm_paths=None: \
+            installed if rpm_paths is None else iso_rpms
+
+        m_free_space.return_value = '1200'
+        self.pre_upgrade_rpms.check_for_install_space()
+        self.assertEqual(2, m_query_rpms.call_count)
+
+        m_free_space.return_value = '1199'
+        self.assertRaises(SystemExit,
+                          self.pre_upgrade_rpms.check_for_install_space)
 
     @patch('h_util.h_utils.get_rpm_install_size')
     @patch('h_util.h_utils.get_lms_free_space')
@@ -10,6 +10,7 @@ import shutil
 import stat
 import random
 import tempfile
+import threading
 import time
 import errno
 from functools import partial
@@ -18,6 +19,7 @@ from unittest2 import TestCase
 from os.path import exists
 from tempfile import gettempdir, NamedTemporaryFile
 from h_util.h_postgres import PostgresService
+from h_util.h_process import ProcessResult, ProcessTimeout
 from h_util.h_utils import touch, get_enable_cron_on_expiry_cmd, \
                             cmd_DISABLE_CRON_ON_EXPIRY
 from h_litp.litp_utils import LitpException
@@ -661,7 +663,8 @@ D /var/www/html/vm_scripts/
         self.upgrader.create_arg_parser()
         valid_bool_options = [('-v', 'verbose'),
                               ('--resume', 'resume'),
-                              ('--hybrid_state', 'hybrid_state')]
+                              ('--hybrid_state', 'hybrid_state'),
+                              ('--dd_diff_in_process', 'dd_diff_in_process')]
         valid_args = [opt[0] for opt in valid_bool_options]
         processed = self.upgrader.parser.parse_args(valid_args)
         for _, param in valid_bool_options:
@@ -860,6 +863,21 @@ D /var/www/html/vm_scripts/
                 )
             self.assertEqual(sysexit.exception.code, 1)
 
+    @patch('rh7_upgrade_enm.run_process')
+    def test_run_command(self, m_run_process):
+        m_run_process.return_value = ProcessResult(1, ' out\n', 0.01)
+        self.assertEqual((1, 'out'),
+                         self.upgrader._run_command('ls', timeout_secs=5))
+        m_run_process.assert_called_once_with('ls', timeout=5,
+                                              logger=self.upgrader.log)
+
+        m_run_process.side_effect = ProcessTimeout('<hidden>', 5, '')
+        with patch.object(self.upgrader, '_print_error') as m_error:
+            with self.assertRaises(SystemExit):
+                self.upgrader._run_command('ls', do_logging=False)
+        m_error.assert_called_once_with('Command timed out, <hidden>')
+        self.assertIsNone(m_run_process.call_args[1]['logger'])
+
     def test_run_command_set(self):
         self.upgrader._run_command = Mock(return_value=(0, ''))
         cmds = ['cmd1', 'cmd2']
@@ -2126,6 +2144,40 @@ node2"""
                           mock_run_command.call_args_list)
         mock_remove_file.assert_called_once_with(Rh7EnmUpgrade.DELTA_OUTPUT)
 
+    @patch('rh7_upgrade_enm.Rh7EnmUpgrade._run_command')
+    def test_create_xml_diff_file_in_process(self, mock_run_command):
+        """test _create_xml_diff_file with dd_diff_in_process"""
+        self.upgrader.create_arg_parser()
+        self.upgrader.processed_args = self.upgrader.parser.parse_args(
+                ['--action', Rh7EnmUpgrade.ACTION_CHOICES[4],
+                 '--dd_diff_in_process'])
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        xml = ('<litp:root xmlns:litp="http://www.ericsson.com/litp" '
+               'id="root"><litp:ms id="ms">{0}</litp:ms></litp:root>')
+        from_state = os.path.join(tmpdir, 'from_state.xml')
+        to_state = os.path.join(tmpdir, 'to_state.xml')
+        delta_file = os.path.join(tmpdir, 'output_enm_deployment.txt')
+        with open(from_state, 'w') as _writer:
+            _writer.write(xml.format('<hostname>ms1</hostname>'
+                                     '<litp:alias id="a1"/>'))
+        with open(to_state, 'w') as _writer:
+            _writer.write(xml.format('<litp:alias id="a2"/>'))
+
+        with patch.object(Rh7EnmUpgrade, 'DELTA_OUTPUT', delta_file):
+            self.upgrader._create_xml_diff_file(from_state, to_state)
+            with open(delta_file) as _reader:
+                self.assertEqual('y hostname@/ms\ny /ms/a1\n',
+                                 _reader.read())
+            self.assertFalse(mock_run_command.called)
+
+            with open(to_state, 'w') as _writer:
+                _writer.write('<litp:root')
+            self.assertRaises(SystemExit, self.upgrader._create_xml_diff_file,
+                              from_state, to_state)
+            self.assertRaises(SystemExit, self.upgrader._create_xml_diff_file,
+                              from_state, os.path.join(tmpdir, 'missing'))
+
     @patch("rh7_upgrade_enm.Rh7EnmUpgrade.DELTA_OUTPUT",
            '/tmp/output_enm_deployment.txt')
     @patch('rh7_upgrade_enm.Rh7EnmUpgrade._run_command')
@@ -2686,17 +2738,17 @@ node2"""
         to_state_sfs_xml = xml_hdr + sfs_fs_big_xml + xml_ftr
         self.do_infra_plan_wrkr(from_state_sfs_xml)
 
-        expected = ('litp create -t sfs-export -p ' +
+        expected = ('litp create -t sfs-filesystem -p /managed_fs2 ' +
+                    '-o path=/vx/CIcdb-managed-fs1 size=500M\n' +
+                    'litp create -t sfs-export -p ' +
                     '/managed_fs2/exports/export1 -o ' +
                     'ipv4allowed_clients=1.2.3.4/16 ' +
-                    'options=rw,no_wdelay,no_root_squash' + '\n' +
-                    'litp create -t sfs-filesystem -p //managed_fs2 ' +
-                    '-o path=/vx/CIcdb-managed-fs1 size=500M\n')
+                    'options=rw,no_wdelay,no_root_squash' + '\n')
 
         self.do_infra_plan_wrkr(empty_xml, to_state_sfs_xml,
                                 expected_clis=expected)
 
-        expected = 'litp update -p //managed_fs2 -o size=500M\n'
+        expected = 'litp update -p /managed_fs2 -o size=500M\n'
         self.do_infra_plan_wrkr(from_state_sfs_xml, to_state_sfs_xml,
                                 expected_clis=expected)
 
@@ -2707,7 +2759,7 @@ node2"""
 
         # ----
         to_state_vxfs_xml = xml_hdr + vxfs_fs_xml + xml_ftr
-        expected = ('litp create -t file-system -p //elastic_fs -o ' +
+        expected = ('litp create -t file-system -p /elastic_fs -o ' +
                     'mount_point=/a/b/c snap_external=false fsck_pass=2 ' +
                     'snap_size=4 type=vxfs size=500G\n')
         self.do_infra_plan_wrkr(empty_xml, to_state_vxfs_xml,
@@ -2718,7 +2770,7 @@ node2"""
         to_state_lun_xml = xml_hdr + lun_disk_big_xml + xml_ftr
         self.do_infra_plan_wrkr(from_state_lun_xml)
 
-        expected = ('litp create -t lun-disk -p //app_disk ' +
+        expected = ('litp create -t lun-disk -p /app_disk ' +
                     '-o lun_name=LITP_ENM_app1 name=sda ' +
                     'balancing_group=low bootable=false snap_size=100 ' +
                     'disk_part=false storage_container=LITP1 shared=false ' +
@@ -2726,7 +2778,7 @@ node2"""
         self.do_infra_plan_wrkr(empty_xml, to_state_lun_xml,
                                 expected_clis=expected)
 
-        expected = 'litp update -p //app_disk -o size=100G\n'
+        expected = 'litp update -p /app_disk -o size=100G\n'
         self.do_infra_plan_wrkr(from_state_lun_xml, to_state_lun_xml,
                                 expected_clis=expected)
 
@@ -2794,7 +2846,7 @@ node2"""
                      ['ERIClitpvcs_CXP9030870'])
 
     @patch('os.path.exists')
-    @patch('rh7_upgrade_enm.load_xml', MagicMock())
+    @patch('rh7_upgrade_enm.diff_models', MagicMock())
     def test_do_infra_no_plan(self, m_exists):
 
         self.upgrader.processed_args = Mock(resume=False)
@@ -3105,10 +3157,9 @@ node2"""
                     '/var/www/html/ENM_streaming',
                     '/var/www/html/ENM_streaming_rhel7']
 
-        prefix = 'createrepo /var/www/html/'
+        prefix = '/var/www/html/'
 
-        expected = ['yum clean metadata',
-                    prefix + 'litp',
+        expected = [prefix + 'litp',
                     prefix + 'litp_plugins',
                     prefix + '3pp',
                     prefix + 'ENM',
@@ -3132,10 +3183,82 @@ node2"""
                     ]
 
         self.upgrader._run_command_set = MagicMock()
+        self.upgrader._create_repos = MagicMock()
+        self.upgrader._get_createrepo_workers = MagicMock(return_value=3)
 
         self.upgrader._refresh_yum_repos()
-        self.upgrader._run_command_set.assert_called_with(expected,
-                                                          'Refresh yum repositories')
+        self.upgrader._run_command_set.assert_called_with(
+                ['yum clean metadata'], 'Refresh yum repositories')
+        self.upgrader._create_repos.assert_called_with(
+                expected, 'Refresh yum repositories', workers=3)
+
+    @patch('rh7_upgrade_enm.os.path.exists')
+    def test_format_create_repo_cmd(self, mock_exists):
+        mock_exists.return_value = False
+        self.assertEqual(
+                'createrepo --cachedir /var/cache/createrepo/var_www_html_ENM '
+                '/var/www/html/ENM',
+                Rh7EnmUpgrade._format_create_repo_cmd('/var/www/html/ENM'))
+        mock_exists.return_value = True
+        self.assertEqual(
+                'createrepo --update '
+                '--cachedir /var/cache/createrepo/var_www_html_ENM '
+                '/var/www/html/ENM',
+                Rh7EnmUpgrade._format_create_repo_cmd('/var/www/html/ENM'))
+        mock_exists.assert_called_with(
+                '/var/www/html/ENM/repodata/repomd.xml')
+
+    @patch('rh7_upgrade_enm.read_enminst_config')
+    @patch('rh7_upgrade_enm.cpu_count')
+    def test_get_createrepo_workers(self, mock_cpu_count, mock_config):
+        mock_cpu_count.return_value = 8
+        mock_config.return_value = {'createrepo_workers': '6'}
+        self.assertEqual(6, Rh7EnmUpgrade._get_createrepo_workers())
+        mock_cpu_count.return_value = 2
+        self.assertEqual(2, Rh7EnmUpgrade._get_createrepo_workers())
+        mock_config.return_value = {'createrepo_workers': '0'}
+        self.assertEqual(1, Rh7EnmUpgrade._get_createrepo_workers())
+        mock_config.return_value = {}
+        self.assertEqual(2, Rh7EnmUpgrade._get_createrepo_workers())
+
+    @patch('rh7_upgrade_enm.os.path.exists', return_value=False)
+    def test_create_repos_concurrently(self, _):
+        paths = ['/var/www/html/repo{0}'.format(i) for i in range(6)]
+        running = []
+        most = []
+        lock = threading.Lock()
+
+        def run(cmd, timeout_secs=None):
+            with lock:
+                running.append(cmd)
+                most.append(len(running))
+            os.system('sleep 0.2')
+            with lock:
+                running.remove(cmd)
+            return 0, ''
+
+        self.upgrader._run_command = MagicMock(side_effect=run)
+        self.upgrader._create_repos(paths, 'Refresh', workers=3)
+        self.assertEqual(6, self.upgrader._run_command.call_count)
+        self.assertEqual(3, max(most))
+
+    @patch('rh7_upgrade_enm.os.path.exists', return_value=False)
+    def test_create_repos_failure(self, _):
+        paths = ['/var/www/html/repo{0}'.format(i) for i in range(3)]
+
+        # Concurrently, every repository is refreshed before exiting
+        self.upgrader._run_command = MagicMock(
+                side_effect=[(0, ''), SystemExit(1), (0, '')])
+        self.assertRaises(SystemExit, self.upgrader._create_repos, paths,
+                          'Refresh', workers=2)
+        self.assertEqual(3, self.upgrader._run_command.call_count)
+
+        # One after the other, stop at the first failure
+        self.upgrader._run_command = MagicMock(
+                side_effect=[(0, ''), (1, ''), (0, '')])
+        self.assertRaises(SystemExit, self.upgrader._create_repos, paths,
+                          'Refresh')
+        self.assertEqual(2, self.upgrader._run_command.call_count)
 
     @patch('rh7_upgrade_enm.os.symlink')
     @patch('rh7_upgrade_enm.os.path.exists')
@@ -1,3 +1,7 @@
+import shutil
+from os.path import join
+from tempfile import mkdtemp
+
 from unittest2 import TestCase
 from mock import patch, Mock, mock_open, MagicMock
 
@@ -141,9 +145,17 @@ mock_nas_servers_no_connect = [
 class TestSanFaultCheck(TestCase):
 
     def setUp(self):
+        self.tmpdir = mkdtemp()
+        state_patcher = patch('san_fault_check.STATE_FILE',
+                              join(self.tmpdir, 'state.json'))
+        state_patcher.start()
+        self.addCleanup(state_patcher.stop)
         self.san_fault = SanFaultCheck()
         self.logger = init_enminst_logging()
 
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
     @patch('san_fault_check.get_nas_type')
     def test_is_unityxt(self, get):
         self.logger.error = MagicMock()
@@ -342,6 +354,45 @@ class TestSanFaultCheck(TestCase):
         self.assertEqual(self.san_fault.alerts_to_clear[0], current_alarm[0].replace('!', ''))
         self.assertTrue(m_write_alarms.called)
 
+    @patch('san_fault_check.SanFaultCheck.get_current_alarms')
+    def test_only_new_alarms_created(self, m_current_alarm):
+        alerts = [Mock(message="Message1"), Mock(message="Message2")]
+        raised = SanFaultCheck.build_alarm_message(alerts[0])
+        new = SanFaultCheck.build_alarm_message(alerts[1])
+        gone = raised.replace("Message1", "Message3")
+        m_current_alarm.return_value = [raised, gone]
+
+        with patch.object(self.san_fault, 'write_alarms_to_file'):
+            self.san_fault.san_alerts = alerts
+            self.san_fault.get_alarms_to_create_and_clear()
+            # First run without state, the active alarms are all sent
+            self.assertEqual([raised, new], self.san_fault.alerts_to_create)
+
+            check = SanFaultCheck()
+            check.state = self.san_fault.state
+            check.san_alerts = alerts
+            check.get_alarms_to_create_and_clear()
+        self.assertEqual([new], check.alerts_to_create)
+        self.assertEqual([gone], check.alerts_to_clear)
+        self.assertEqual([raised, new], check.active_alarms)
+
+    @patch('requests.post')
+    @patch('san_fault_check.SanFaultCheck.lookup_haproxy_internal_ip')
+    def test_failed_alarms_retried(self, m_lookup, m_post):
+        m_lookup.return_value = '192.110.10.12'
+        m_post.return_value = Mock(status_code=503)
+        self.san_fault.active_alarms = ['raise', 'keep']
+        self.san_fault.alerts_to_create = ['raise']
+        self.san_fault.alerts_to_clear = ['{"probableCause": "clear"}']
+        self.san_fault.create_fmalarm()
+        self.san_fault.clear_fmalarm()
+        self.assertEqual(['keep', '{"probableCause": "clear"}'],
+                         self.san_fault.active_alarms)
+        # The haproxy address is only looked up once per run
+        self.assertEqual(1, m_lookup.call_count)
+        self.assertNotIn('haproxy_int_ip',
+                         self.san_fault.state.state['lookups'])
+
     @patch('requests.post')
     @patch('san_fault_check.SanFaultCheck.build_alarm_url')
     def test_create_fmalarm_success(self, m_alarm_url,
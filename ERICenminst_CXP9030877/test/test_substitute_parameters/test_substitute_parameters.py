@@ -1,4 +1,5 @@
 import os
+from collections import OrderedDict
 from os import remove, environ
 from os.path import join, dirname
 from tempfile import gettempdir
@@ -6,7 +7,8 @@ from mock import patch
 import unittest2
 from h_litp.litp_utils import main_exceptions
 from h_util.h_utils import ExitCodes
-from substitute_parameters import Substituter, main
+from substitute_parameters import Substituter, main, \
+    substitute_placeholders, find_placeholders
 
 sed = '''#SED Template Version: 1.0.27
 COM_INF_LDAP_ROOT_SUFFIX=dc=ieatlms4352,dc=com
@@ -250,6 +252,68 @@ class TestSubstitution(unittest2.TestCase):
         xml_incomplete = subber.replace_values(missing_xml)
         self.assertRaises(SystemExit, subber.verify_xml, xml_incomplete)
 
+    def test_verify_xml_lines(self):
+        subber = Substituter()
+        _xml = '<a>%%ip_1%%,%%ip_2%%</a>\n<b>100%% done</b>\n' \
+               '<c>%%ip_2%%</c>\n'
+        with patch.object(subber, 'log') as m_log:
+            with self.assertRaises(SystemExit):
+                subber.verify_xml(_xml)
+        m_log.error.assert_any_call(
+                'Parameter %%ip_1%% not substituted on line(s) 1')
+        m_log.error.assert_any_call(
+                'Parameter %%ip_2%% not substituted on line(s) 1, 3')
+        self.assertEqual(3, m_log.error.call_count)
+        self.assertEqual(['%%ip_1%%', '%%ip_2%%'],
+                         find_placeholders(_xml).keys())
+
+    def test_substitute_placeholders(self):
+        texts = ['', 'no placeholders', '%%a%%', '%%a%%%%a%%', '%%%a%%%',
+                 '%%x%%a%%', '%%a%%x%%', '%%x', '%%%%',
+                 'x %%unknown%% %%a%% %%', '%%a%% %%b%%']
+        for values in [{'a': '1', 'b': '2', '': 'empty'},
+                       {'a': '1', 'b': '%%a%%', '': 'empty'},
+                       {'a': '%', 'b': 'a%', '': 'empty'}]:
+            for text in texts:
+                expected = text
+                for key, value in values.items():
+                    expected = expected.replace('%%{0}%%'.format(key), value)
+                self.assertEqual(expected,
+                                 substitute_placeholders(text, values),
+                                 (text, values))
+
+    def test_substitute_placeholders_in_values(self):
+        # e.g. file:// contents, expanded by the keys that follow them
+        values = OrderedDict([('config', 'ip=%%ip%%'), ('ip', '10.0.0.1')])
+        self.assertEqual('<c>ip=10.0.0.1</c>',
+                         substitute_placeholders('<c>%%config%%</c>', values))
+        values = OrderedDict([('ip', '10.0.0.1'), ('config', 'ip=%%ip%%')])
+        self.assertEqual('<c>ip=%%ip%%</c>',
+                         substitute_placeholders('<c>%%config%%</c>', values))
+
+    def test_replace_values_large_template(self):
+        # A template with 60000 placeholders of 1000 keys
+        subber = Substituter()
+        subber.full_parameter_list = dict(
+                ('node{0}_IP'.format(key), '10.0.{0}.{1}'.format(key / 250,
+                                                                key % 250))
+                for key in range(1000))
+        template = '\n'.join(
+                '<address id="{0}">%%node{1}_IP%%</address>{2}'.format(
+                        index, index % 1000,
+                        '%%missing%%' if index == 59999 else '')
+                for index in range(60000))
+
+        populated = subber.replace_values(template)
+
+        self.assertTrue(populated.startswith(
+                '<address id="0">10.0.0.0</address>\n'
+                '<address id="1">10.0.0.1</address>\n'))
+        self.assertIn('<address id="59998">10.0.3.248</address>\n',
+                      populated)
+        self.assertEqual({'%%missing%%': [60000]},
+                         find_placeholders(populated))
+
     def test_main_no_args(self):
         self.assertRaises(SystemExit, main, [])
 